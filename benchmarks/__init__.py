@@ -0,0 +1 @@
+"""Microbenchmarks for the per-turn CPU paths (run with python -m benchmarks.run)."""
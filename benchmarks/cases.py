@@ -0,0 +1,208 @@
+"""
+Benchmark cases for the CPU-bound code that runs on every turn.
+
+Each case is registered with @case(name, param, sizes) and is a setup function taking one
+size and returning the zero-argument callable to time. Setup work (seeding the database,
+building synthetic data, warming caches) is not timed.
+
+The cases run inside an app context backed by a throwaway database (BENCHMARK_DATABASE_URL,
+in-memory SQLite by default), never the database configured for the app.
+"""
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import synthetic
+
+PLOT_POINT_SIZES = [10, 50, 100, 500]
+LOG_ENTRY_SIZES = [10, 100, 1000, 10000]
+
+
+class Case:
+    def __init__(self, name: str, param: str, sizes: List[int], setup: Callable[[int], Callable[[], Any]]):
+        self.name = name
+        self.param = param
+        self.sizes = sizes
+        self.setup = setup
+        self.description = (setup.__doc__ or '').strip().split('\n')[0]
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, param: str, sizes: List[int]):
+    """Registers a benchmark setup function."""
+    def register(setup):
+        CASES.append(Case(name, param, sizes, setup))
+        return setup
+    return register
+
+
+# --- app and synthetic games -----------------------------------------------------------------
+
+_app = None
+_games: Dict[Tuple[int, bool], Any] = {}
+
+
+def get_app():
+    """Creates the app on a throwaway database (once) and pushes an app context for the whole run."""
+    global _app
+    if _app is not None:
+        return _app
+    # Config reads DATABASE_URL when it is first imported, so this must happen before create_app
+    os.environ['DATABASE_URL'] = os.environ.get('BENCHMARK_DATABASE_URL') or 'sqlite://'
+    from questforge import create_app
+    from questforge.extensions import db
+
+    app = create_app()
+    app.logger.setLevel(logging.WARNING) # Log handlers would otherwise dominate the timings
+    app.app_context().push()
+    db.create_all()
+    _app = app
+    return app
+
+
+def seed_game(plot_point_count: int, concluded: bool = False):
+    """
+    A committed game of the given campaign size with two players and a mid-game (or, with
+    concluded=True, finished) state. Returns the GameState; games are reused across cases.
+    """
+    key = (plot_point_count, concluded)
+    if key in _games:
+        return _games[key]
+    get_app()
+    from questforge.extensions import db
+    from questforge.models.campaign import Campaign
+    from questforge.models.game import Game, GamePlayer
+    from questforge.models.game_state import GameState
+    from questforge.models.template import Template
+    from questforge.models.user import User
+
+    users = User.query.filter(User.username.like('bench_user_%')).order_by(User.id).all()
+    if not users:
+        users = [User(username=f"bench_user_{i}", email=f"bench_user_{i}@bench.invalid", password="bench") for i in range(2)]
+        db.session.add_all(users)
+        db.session.flush()
+    template = Template.query.filter_by(name="Benchmark template").first()
+    if template is None:
+        template = Template(name="Benchmark template", description="Synthetic", created_by=users[0].id,
+                            genre="Fantasy", core_conflict="Recover the stolen lantern of the valley.")
+        db.session.add(template)
+        db.session.flush()
+
+    game = Game(name=f"Benchmark game {plot_point_count}{' (concluded)' if concluded else ''}",
+                template_id=template.id, created_by=users[0].id)
+    db.session.add(game)
+    db.session.flush()
+    for i, user in enumerate(users):
+        db.session.add(GamePlayer(game_id=game.id, user_id=user.id, is_ready=True,
+                                  character_name=f"Hero {i}", character_description="A synthetic adventurer."))
+
+    fields = synthetic.make_campaign_fields(plot_point_count)
+    campaign = Campaign(game_id=game.id, template_id=template.id, **fields)
+    db.session.add(campaign)
+    game_state = GameState(game_id=game.id, state_data=synthetic.make_state_data(fields, concluded=concluded))
+    db.session.add(game_state)
+    db.session.commit()
+    _games[key] = game_state
+    return game_state
+
+
+def _next_required_description(game_state) -> Optional[str]:
+    completed = {cp['id'] for cp in game_state.state_data.get('completed_plot_points', [])}
+    pending = [pp for pp in game_state.game.campaign.major_plot_points if pp['required'] and pp['id'] not in completed]
+    return pending[0]['description'] if pending else None
+
+
+# --- cases -----------------------------------------------------------------------------------
+
+@case('render_campaign_context', 'plot_points', PLOT_POINT_SIZES)
+def bench_render_campaign_context(size):
+    """Renders the campaign section of the context without the memo cache."""
+    from questforge.utils.context_manager import _render_campaign_context_block
+    campaign = seed_game(size).game.campaign
+    return lambda: _render_campaign_context_block(campaign)
+
+
+@case('build_context', 'plot_points', PLOT_POINT_SIZES)
+def bench_build_context(size):
+    """build_context for one turn (campaign block cached, players query included)."""
+    from questforge.utils.context_manager import build_context
+    game_state = seed_game(size)
+    next_required = _next_required_description(game_state)
+    build_context(game_state, next_required) # Warm the campaign block cache, as on every turn after the first
+    return lambda: build_context(game_state, next_required)
+
+
+@case('build_response_messages', 'plot_points', PLOT_POINT_SIZES)
+def bench_build_response_messages(size):
+    """Builds the Stage 1 prompt messages from a prebuilt context."""
+    from questforge.utils.context_manager import build_context
+    from questforge.utils.prompt_builder import build_response_messages
+    game_state = seed_game(size)
+    next_required = _next_required_description(game_state)
+    context = build_context(game_state, next_required)
+    return lambda: build_response_messages(context, "Search the rusty ledger near the mill", False, next_required, 'normal')
+
+
+@case('build_plot_point_index', 'plot_points', PLOT_POINT_SIZES)
+def bench_build_plot_point_index(size):
+    """Builds the Stage 2 inverted index (once per campaign)."""
+    from questforge.utils.plot_index import build_plot_point_index
+    fields = synthetic.make_campaign_fields(size)
+    return lambda: build_plot_point_index(fields['major_plot_points'], fields['key_locations'], fields['key_characters'])
+
+
+@case('stage2_plausibility', 'plot_points', PLOT_POINT_SIZES)
+def bench_stage2_plausibility(size):
+    """The Stage 2 plausibility check of one turn."""
+    from questforge.utils.plot_index import build_plot_point_index, select_plausible_plot_points
+    fields = synthetic.make_campaign_fields(size)
+    index = build_plot_point_index(fields['major_plot_points'], fields['key_locations'], fields['key_characters'])
+    state_data = synthetic.make_state_data(fields)
+    completed_ids = [cp['id'] for cp in state_data['completed_plot_points']]
+    text = synthetic.make_turn_text(fields)
+    return lambda: select_plausible_plot_points(index, fields['major_plot_points'], completed_ids, text, state_data,
+                                                turns_since_plot_progress=state_data['turns_since_plot_progress'])
+
+
+@case('check_conclusion', 'plot_points', PLOT_POINT_SIZES)
+def bench_check_conclusion(size):
+    """check_conclusion on a finished game (required-ID pre-check plus every condition)."""
+    from questforge.services.campaign_service import check_conclusion
+    game_state = seed_game(size, concluded=True)
+    assert check_conclusion(game_state), "synthetic concluded game should satisfy check_conclusion"
+    return lambda: check_conclusion(game_state)
+
+
+@case('plot_point_atomicity', 'plot_points', PLOT_POINT_SIZES)
+def bench_plot_point_atomicity(size):
+    """Atomicity check over every plot point of a generated campaign."""
+    from questforge.services.ai_service import ai_service
+    get_app()
+    descriptions = [pp['description'] for pp in synthetic.make_plot_points(size)]
+
+    def run():
+        for description in descriptions:
+            ai_service._check_plot_point_atomicity(description)
+    return run
+
+
+@case('log_views', 'log_entries', LOG_ENTRY_SIZES)
+def bench_log_views(size):
+    """Rebuilds latest_ai_response and player_commands from the full game log."""
+    from questforge.services.game_state_service import build_log_views
+    get_app()
+    game_log = synthetic.make_game_log(size)
+    return lambda: build_log_views(game_log)
+
+
+@case('log_views_incremental', 'log_entries', LOG_ENTRY_SIZES)
+def bench_log_views_incremental(size):
+    """Refolds a synced turn (last two log entries) into cached log views, as sync_from_db does."""
+    from questforge.services.game_state_service import fold_log_views, new_log_views
+    get_app()
+    game_log = synthetic.make_game_log(size)
+    views = fold_log_views(new_log_views(), game_log)
+    keep = max(len(game_log) - 2, 0)
+    return lambda: fold_log_views(views, game_log, keep)
@@ -0,0 +1,177 @@
+"""
+Microbenchmark runner for the per-turn CPU paths (see benchmarks/cases.py).
+
+Run from the repository root:
+
+    python -m benchmarks.run                        # all cases, results in benchmarks/results/<commit>.json
+    python -m benchmarks.run -k context --quick     # matching cases, smallest and largest size only
+    python -m benchmarks.run --compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+Every case is timed per size with timeit (the loop count is calibrated with autorange, the
+best and median of --repeat runs are kept). For each case the scaling exponent k in
+time ~ size^k is estimated from the smallest and largest size, so a change from linear to
+quadratic behaviour shows up even if the absolute time at one size barely moves.
+
+--compare reports the per-size median ratio and the change in exponent between two result
+files and exits with status 1 if any case got slower than --threshold or its exponent grew
+by more than --exponent-threshold, so it can gate CI.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from typing import Any, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Default regression limits for --compare
+SLOWDOWN_THRESHOLD = 1.25 # Median per-call time ratio (head / base)
+EXPONENT_THRESHOLD = 0.3 # Growth in the scaling exponent
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata() -> Dict[str, Any]:
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'branch': _git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def measure(func, repeat: int, min_time: float) -> Dict[str, Any]:
+    """Per-call timings of func in microseconds (best and median of `repeat` calibrated runs)."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2)) # autorange targets 0.2s per run
+    runs = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'best_us': round(min(runs), 3),
+        'median_us': round(statistics.median(runs), 3),
+        'loops': number,
+        'repeat': repeat,
+    }
+
+
+def scaling_exponent(sizes: Dict[str, Dict[str, Any]]) -> Optional[float]:
+    """k in time ~ size^k between the smallest and largest measured size."""
+    points = sorted((int(size), timing['median_us']) for size, timing in sizes.items())
+    if len(points) < 2 or points[0][0] == points[-1][0] or points[0][1] <= 0:
+        return None
+    (small_n, small_t), (large_n, large_t) = points[0], points[-1]
+    return round(math.log(large_t / small_t) / math.log(large_n / small_n), 3)
+
+
+def run_cases(name_filter: Optional[str], quick: bool, repeat: int, min_time: float) -> Dict[str, Any]:
+    from .cases import CASES
+
+    results = {}
+    for bench in CASES:
+        if name_filter and name_filter not in bench.name:
+            continue
+        sizes = [bench.sizes[0], bench.sizes[-1]] if quick else bench.sizes
+        timings = {}
+        for size in sizes:
+            func = bench.setup(size)
+            func() # Warm-up (first-call caches, lazy imports)
+            timings[str(size)] = measure(func, repeat, min_time)
+            print(f"  {bench.name:<26} {bench.param}={size:<6} median {timings[str(size)]['median_us']:>12.2f} us", flush=True)
+        results[bench.name] = {
+            'description': bench.description,
+            'param': bench.param,
+            'sizes': timings,
+            'scaling_exponent': scaling_exponent(timings),
+        }
+    return results
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float, exponent_threshold: float) -> List[str]:
+    """Prints a comparison table and returns the list of regressions found."""
+    regressions = []
+    print(f"base: {base['meta'].get('commit')} ({base['meta'].get('timestamp')})  head: {head['meta'].get('commit')} ({head['meta'].get('timestamp')})")
+    print(f"{'case':<26} {'size':>7} {'base us':>12} {'head us':>12} {'ratio':>7}")
+    for name, head_case in head['results'].items():
+        base_case = base['results'].get(name)
+        if base_case is None:
+            print(f"{name:<26} (new case)")
+            continue
+        for size, head_timing in head_case['sizes'].items():
+            base_timing = base_case['sizes'].get(size)
+            if base_timing is None or base_timing['median_us'] <= 0:
+                continue
+            ratio = head_timing['median_us'] / base_timing['median_us']
+            flag = ''
+            if ratio > threshold:
+                flag = '  SLOWER'
+                regressions.append(f"{name}[{head_case['param']}={size}] {ratio:.2f}x slower")
+            print(f"{name:<26} {size:>7} {base_timing['median_us']:>12.2f} {head_timing['median_us']:>12.2f} {ratio:>6.2f}x{flag}")
+        base_k, head_k = base_case.get('scaling_exponent'), head_case.get('scaling_exponent')
+        if base_k is not None and head_k is not None:
+            flag = ''
+            if head_k - base_k > exponent_threshold:
+                flag = '  SCALING'
+                regressions.append(f"{name} scaling exponent {base_k:.2f} -> {head_k:.2f}")
+            print(f"{name:<26} {'k':>7} {base_k:>12.2f} {head_k:>12.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="QuestForge microbenchmarks.")
+    parser.add_argument('-k', '--filter', help="Only run cases whose name contains this string.")
+    parser.add_argument('--quick', action='store_true', help="Only the smallest and largest size of each case.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds per timing run.")
+    parser.add_argument('--output', help=f"Result file (default {os.path.relpath(RESULTS_DIR)}/<commit>.json).")
+    parser.add_argument('--compare', nargs='+', metavar='RESULT', help="Compare BASE [HEAD] result files (HEAD defaults to a fresh run).")
+    parser.add_argument('--threshold', type=float, default=SLOWDOWN_THRESHOLD)
+    parser.add_argument('--exponent-threshold', type=float, default=EXPONENT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes a base result file and optionally a head result file")
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[1]) as f:
+            head = json.load(f)
+    else:
+        meta = run_metadata()
+        print(f"Running benchmarks at {meta['commit']}{' (dirty)' if meta['dirty'] else ''} on Python {meta['python']}")
+        head = {'meta': meta, 'results': run_cases(args.filter, args.quick, args.repeat, args.min_time)}
+        output = args.output or os.path.join(RESULTS_DIR, f"{meta['commit'] or 'unknown'}{'-dirty' if meta['dirty'] else ''}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(head, f, indent=2)
+        print(f"Results written to {output}")
+
+    if not args.compare:
+        return 0
+    with open(args.compare[0]) as f:
+        base = json.load(f)
+    regressions = compare(base, head, args.threshold, args.exponent_threshold)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Synthetic campaign, game state and game log data of parametrized size for the benchmarks.
+
+Everything is generated deterministically from the size arguments, so two runs (or two
+commits) benchmark exactly the same inputs.
+"""
+from typing import Any, Dict, List
+
+ADJECTIVES = ["rusty", "ancient", "glowing", "hidden", "broken", "silver", "cursed", "forgotten", "sealed", "burning"]
+NOUNS = ["key", "map", "lantern", "amulet", "ledger", "statue", "door", "crown", "letter", "bridge", "relic", "compass"]
+VERBS = ["find", "recover", "open", "destroy", "deliver", "decipher", "repair", "steal", "protect", "activate"]
+PLACES = ["Old Mill", "Whispering Caves", "Ruined Watchtower", "Sunken Chapel", "Village Square", "Iron Gate",
+          "Crystal Lake", "Ashen Forest", "Merchant Quarter", "Throne Room", "Smugglers Dock", "Bell Tower"]
+NPC_NAMES = ["Elder Maren", "Tobin", "Captain Vey", "Sister Alda", "Grim", "Old Hettie", "Lord Carrow", "Pip",
+             "Madame Sorrel", "Brother Ansel", "Kestrel", "The Warden"]
+
+PLAYER_ACTIONS = ["Look around the {place}", "Search the {noun}", "Talk to {npc}", "Head towards the {place}",
+                  "Examine the {adj} {noun}", "Ask {npc} about the {noun}"]
+
+
+def _pick(options: List[str], i: int) -> str:
+    return options[i % len(options)]
+
+
+def make_locations(count: int) -> List[Dict[str, str]]:
+    return [{'name': f"{_pick(PLACES, i)}{'' if i < len(PLACES) else f' {i // len(PLACES)}'}",
+             'description': f"A {_pick(ADJECTIVES, i)} place where the {_pick(NOUNS, i)} was last seen."}
+            for i in range(count)]
+
+
+def make_characters(count: int) -> List[Dict[str, str]]:
+    return [{'name': f"{_pick(NPC_NAMES, i)}{'' if i < len(NPC_NAMES) else f' {i // len(NPC_NAMES)}'}",
+             'role': "Informant" if i % 2 else "Rival",
+             'description': f"Knows something about the {_pick(ADJECTIVES, i + 3)} {_pick(NOUNS, i + 5)}."}
+            for i in range(count)]
+
+
+def make_plot_points(count: int) -> List[Dict[str, Any]]:
+    """
+    `count` plot points with unique ids. Every third is required; every seventh description is
+    compound ("... and ...") so the atomicity check has something to flag.
+    """
+    plot_points = []
+    for i in range(count):
+        description = (f"Players {_pick(VERBS, i)} the {_pick(ADJECTIVES, i * 3)} {_pick(NOUNS, i * 7)} "
+                       f"at the {_pick(PLACES, i * 5)}")
+        if i % 7 == 6:
+            description += f" and speak with {_pick(NPC_NAMES, i)}"
+        plot_points.append({'id': f"pp_{i:04d}", 'description': description + ".", 'required': i % 3 == 0})
+    return plot_points
+
+
+def make_conclusion_conditions(locations: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """One condition of each supported type; all of them hold for make_state_data(..., concluded=True)."""
+    return [
+        {'type': 'state_key_equals', 'key': 'lantern_recovered', 'value': True},
+        {'type': 'state_key_exists', 'key': 'final_door_state'},
+        {'type': 'state_key_contains', 'key': 'inventory', 'value': 'lantern'},
+        {'type': 'location_visited', 'location': locations[-1]['name']},
+    ]
+
+
+def make_campaign_fields(plot_point_count: int) -> Dict[str, Any]:
+    """Keyword arguments for Campaign(...) (without game_id/template_id)."""
+    locations = make_locations(max(plot_point_count // 5, 3))
+    characters = make_characters(max(plot_point_count // 10, 2))
+    plot_points = make_plot_points(plot_point_count)
+    return {
+        'campaign_data': {
+            'campaign_objective': "Recover the stolen lantern of the valley.",
+            'campaign_summary': "A synthetic campaign used for benchmarking.",
+        },
+        'objectives': ["Recover the stolen lantern of the valley."],
+        'conclusion_conditions': make_conclusion_conditions(locations),
+        'key_locations': locations,
+        'key_characters': characters,
+        'major_plot_points': plot_points,
+        'possible_branches': {},
+    }
+
+
+def make_state_data(campaign_fields: Dict[str, Any], completed_fraction: float = 0.5, concluded: bool = False,
+                    summaries: int = 20) -> Dict[str, Any]:
+    """
+    A turn's state_data for the campaign: a share of the plot points completed, NPC and world
+    object state, visited locations and a full historical summary. With concluded=True every
+    plot point is completed and every conclusion condition holds.
+    """
+    plot_points = campaign_fields['major_plot_points']
+    locations = campaign_fields['key_locations']
+    characters = campaign_fields['key_characters']
+    completed_count = len(plot_points) if concluded else int(len(plot_points) * completed_fraction)
+    state = {
+        'location': locations[0]['name'],
+        'inventory': ["torch", "rope", "bread"] + (["brass lantern"] if concluded else []),
+        'npc_status': {
+            npc['name']: {'status': 'friendly' if i % 2 else 'neutral', 'location': locations[i % len(locations)]['name']}
+            for i, npc in enumerate(characters)
+        },
+        'world_objects': {f"object_{i}": {'state': 'closed' if i % 2 else 'open'} for i in range(10)},
+        'visited_locations': [loc['name'] for loc in locations],
+        'completed_plot_points': [{'id': pp['id'], 'description': pp['description']} for pp in plot_points[:completed_count]],
+        'turns_since_plot_progress': 1,
+        'historical_summary': [f"Turn {i}: the players searched the {_pick(PLACES, i)} and found a {_pick(NOUNS, i)}."
+                               for i in range(summaries)],
+    }
+    if concluded:
+        state['lantern_recovered'] = True
+        state['final_door_state'] = 'open'
+    return state
+
+
+def make_game_log(entry_count: int, players: int = 2) -> List[Dict[str, Any]]:
+    """A log of alternating player and AI entries with an occasional system message."""
+    log = []
+    for i in range(entry_count):
+        if i % 25 == 24:
+            log.append({'type': 'system', 'content': f"Plot point achieved: pp_{i:04d}"})
+        elif i % 2 == 0:
+            action = _pick(PLAYER_ACTIONS, i).format(place=_pick(PLACES, i), noun=_pick(NOUNS, i),
+                                                     npc=_pick(NPC_NAMES, i), adj=_pick(ADJECTIVES, i))
+            log.append({'type': 'player', 'user_id': str(1 + (i // 2) % players), 'content': action})
+        else:
+            log.append({'type': 'ai', 'content': f"The {_pick(ADJECTIVES, i)} {_pick(NOUNS, i)} glints in the dim light of the "
+                                                 f"{_pick(PLACES, i)}. {_pick(NPC_NAMES, i)} watches you closely."})
+    return log
+
+
+def make_turn_text(campaign_fields: Dict[str, Any]) -> str:
+    """A lowercased action + narrative string of the kind Stage 2 scores against the plot points."""
+    plot_points = campaign_fields['major_plot_points']
+    target = plot_points[len(plot_points) // 2]['description'] if plot_points else ""
+    return (f"search the {_pick(ADJECTIVES, 4)} {_pick(NOUNS, 2)} near the mill. "
+            f"you look around carefully. {target}").lower()
@@ -19,9 +19,73 @@ class Config:
 
     OPENAI_TEMPERATURE = float(os.environ.get('OPENAI_TEMPERATURE') or 0.7)
     OPENAI_MAX_TOKENS = int(os.environ.get('OPENAI_MAX_TOKENS') or 1024)
+    # Alternative OpenAI-compatible endpoint, e.g. the offline mock server in loadtest/ (http://127.0.0.1:8099/v1)
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None
+
+    # Shared connection pool for the async OpenAI client (AsyncAIService). One pool is shared by all games in a worker.
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS') or 100)
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS') or 20)
+    OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT') or 60.0) # Seconds per request
 
     # Gameplay settings
     MAX_HISTORICAL_SUMMARIES = int(os.environ.get('MAX_HISTORICAL_SUMMARIES') or 20) # Max historical summaries to keep in state
+    # Summaries are generated in the background after each turn; the next action waits at most this long for it
+    HISTORICAL_SUMMARY_WAIT_SECONDS = float(os.environ.get('HISTORICAL_SUMMARY_WAIT_SECONDS') or 30.0)
+
+    # Stream the Stage 1 narrative to the game room ('narrative_chunk' / 'narrative_done') while it is generated
+    STREAM_NARRATIVE = (os.environ.get('STREAM_NARRATIVE') or 'true').lower() in ('true', '1', 'yes')
+
+    # Stage 3 plot point checks run in parallel; turn latency is bounded by the slowest check or the deadline
+    PLOT_CHECK_MAX_CONCURRENCY = int(os.environ.get('PLOT_CHECK_MAX_CONCURRENCY') or 4)
+    PLOT_CHECK_DEADLINE_SECONDS = float(os.environ.get('PLOT_CHECK_DEADLINE_SECONDS') or 20.0)
+    # Judge all candidate plot points in one request; IDs missing from the reply fall back to single checks
+    PLOT_CHECK_BATCH_MODE = (os.environ.get('PLOT_CHECK_BATCH_MODE') or 'true').lower() in ('true', '1', 'yes')
+
+    # Player actions run one turn at a time per game. While a player already has an action waiting,
+    # a new one from the same player is queued separately ('none'), appended to it ('merge') or ignored ('drop').
+    ACTION_QUEUE_COALESCE_MODE = (os.environ.get('ACTION_QUEUE_COALESCE_MODE') or 'none').lower()
+    ACTION_QUEUE_WAIT_SECONDS = float(os.environ.get('ACTION_QUEUE_WAIT_SECONDS') or 300.0) # Max wait for the game's turn slot
+
+    # In-memory game state cache: least recently used games are evicted beyond these limits, and
+    # games untouched for GAME_STATE_CACHE_IDLE_SECONDS are dropped; evicted games reload from the DB
+    GAME_STATE_CACHE_MAX_GAMES = int(os.environ.get('GAME_STATE_CACHE_MAX_GAMES') or 500)
+    GAME_STATE_CACHE_MAX_BYTES = int(os.environ.get('GAME_STATE_CACHE_MAX_BYTES') or 256 * 1024 * 1024) # Approximate, from JSON size
+    GAME_STATE_CACHE_IDLE_SECONDS = float(os.environ.get('GAME_STATE_CACHE_IDLE_SECONDS') or 3600.0)
+
+    # Store shared by all workers for hot game state (version, state, log length, player locations;
+    # the log itself is read from game_log_entries).
+    # 'memory' keeps it in-process; 'redis' (requires the redis package) shares it across gunicorn workers.
+    STATE_CACHE_BACKEND = (os.environ.get('STATE_CACHE_BACKEND') or 'memory').lower()
+    STATE_CACHE_REDIS_URL = os.environ.get('STATE_CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    STATE_CACHE_KEY_PREFIX = os.environ.get('STATE_CACHE_KEY_PREFIX') or 'questforge:game_state:'
+    STATE_CACHE_TTL_SECONDS = int(os.environ.get('STATE_CACHE_TTL_SECONDS') or 3600) # Expiry of games with no writes (in-process: no reads or writes)
+    # Version-to-version JSON patches kept per game; clients further behind get the full state
+    STATE_HISTORY_SIZE = int(os.environ.get('STATE_HISTORY_SIZE') or 20)
+    # 'delta': game_state_update carries the version, a state/log patch and the new player commands;
+    # 'full': every update carries the whole state and log (as before)
+    BROADCAST_MODE = (os.environ.get('BROADCAST_MODE') or 'delta').lower()
+
+    # /admin/metrics (Prometheus text format) is served to requests carrying
+    # 'Authorization: Bearer <METRICS_TOKEN>' or to logged-in users listed in ADMIN_USERNAMES
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    ADMIN_USERNAMES = [name.strip() for name in (os.environ.get('ADMIN_USERNAMES') or '').split(',') if name.strip()]
+
+    # Log one JSON timing record per turn (stages, AI calls with model/tokens, queue wait) on the
+    # 'questforge.turn_timing' logger and aggregate p50/p95/p99 per stage (/debug_turn_timing)
+    TURN_TIMING_ENABLED = (os.environ.get('TURN_TIMING_ENABLED') or 'true').lower() == 'true'
+
+    # API usage rows are buffered and bulk-written by a background flusher at this interval
+    # (or once USAGE_FLUSH_MAX_ROWS are waiting); 0 writes each row immediately in its own transaction
+    USAGE_FLUSH_INTERVAL_SECONDS = float(os.environ.get('USAGE_FLUSH_INTERVAL_SECONDS') or 2.0)
+    USAGE_FLUSH_MAX_ROWS = int(os.environ.get('USAGE_FLUSH_MAX_ROWS') or 50)
+    # A row that fails this many flushes (e.g. its game was deleted) is logged and dropped; the buffer
+    # never holds more than USAGE_BUFFER_MAX_ROWS (oldest rows are logged and dropped first)
+    USAGE_FLUSH_MAX_ATTEMPTS = int(os.environ.get('USAGE_FLUSH_MAX_ATTEMPTS') or 5)
+    USAGE_BUFFER_MAX_ROWS = int(os.environ.get('USAGE_BUFFER_MAX_ROWS') or 10000)
+
+    # Prompt tokens served from the provider's prompt prefix cache are billed at this fraction of the prompt
+    # price, unless a model's OPENAI_PRICING entry has its own 'cached_prompt' price
+    OPENAI_CACHED_PROMPT_PRICE_RATIO = float(os.environ.get('OPENAI_CACHED_PROMPT_PRICE_RATIO') or 0.5)
 
     # OpenAI Pricing (per 1K tokens) - **Update with actual values!**
     # Valitdation: 2025-05-15 kkrug
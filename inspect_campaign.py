@@ -4,6 +4,7 @@ from questforge import create_app
 from questforge.models.campaign import Campaign
 from questforge.models.game_state import GameState # Import GameState
 from questforge.models.template import Template # Import Template
+from questforge.services.game_log_service import game_log_service
 from questforge.extensions import db
 from sqlalchemy import desc # Import desc for ordering
 
@@ -92,7 +93,7 @@ def print_campaign_details(campaign_id):
             print_json_nicely(latest_game_state.state_data)
             
             print("\n--- Game Log (Player Actions/Narrative) ---")
-            game_log = latest_game_state.game_log
+            game_log = game_log_service.get_log(latest_game_state.game_id, game_state=latest_game_state)
             if game_log:
                 if isinstance(game_log, str):
                     game_log = [game_log]  # Convert to list if it's a single string
@@ -123,7 +124,7 @@ def print_campaign_details(campaign_id):
             print(f"Last Updated: {state.last_updated}")
             print_json_nicely(state.state_data)
             print("\nGame Log:")
-            print_structured_data(state.game_log)
+            print_structured_data(game_log_service.get_log(state.game_id, game_state=state))
             print("\nAvailable Actions:")
             print_structured_data(state.available_actions)
 
@@ -0,0 +1,417 @@
+"""
+End-to-end Socket.IO load-test harness for QuestForge.
+
+Drives simulated players through the same events the browser client sends
+(join_game -> player_ready -> start_game -> player_action ...) and reports turn
+throughput, latency percentiles and resource usage for the server under test.
+Run the server against loadtest/mock_openai_server.py so no real API calls are made.
+
+1. Create the test users, template and games (uses the app's configured database):
+
+    python loadtest/harness.py setup --games 20 --players-per-game 1 --fixtures loadtest_fixtures.json
+
+2. Start the mock LLM and the server in the worker configuration to measure, e.g.:
+
+    python loadtest/mock_openai_server.py --port 8099 &
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8099/v1 gunicorn -c gunicorn_config.py app:app &
+
+3. Run the load:
+
+    python loadtest/harness.py run --url http://127.0.0.1:5014 --fixtures loadtest_fixtures.json \\
+        --turns 10 --think-time 0.5 --server-pid <gunicorn master pid> --label "1 eventlet worker" \\
+        --output results.json
+
+Turn latency is the time from emitting player_action until the 'game_state_update' for that
+player's action (broadcast_data['user_id']) reaches the client. With more than one player per game
+the turns of a game are serialized by the server's action queue, so latency includes queue wait.
+Server CPU/RSS sampling (--server-pid, children included) needs psutil; the client side needs
+python-socketio[client] (see loadtest/requirements.txt).
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Actions cycled through by the simulated players (none of them uses an item, so the
+# inventory validation never rejects them)
+ACTIONS = ["Look around", "Search the area", "Talk to the stranger", "Head north", "Listen carefully", "Rest for a moment"]
+
+LOADTEST_USER_PREFIX = "loadtest_user_"
+LOADTEST_TEMPLATE_NAME = "Load test template"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    values = sorted(samples_ms)
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values), 2) if values else 0.0,
+        'p50_ms': round(percentile(values, 50), 2),
+        'p95_ms': round(percentile(values, 95), 2),
+        'p99_ms': round(percentile(values, 99), 2),
+        'max_ms': round(values[-1], 2) if values else 0.0
+    }
+
+
+# --- setup -----------------------------------------------------------------------------------
+
+def setup_fixtures(games: int, players_per_game: int) -> Dict[str, Any]:
+    """
+    Creates (or reuses) the load-test users and template and creates `games` new games with
+    all their players joined and ready, in the database the app is configured for.
+
+    Returns:
+        {'games': [{'game_id': ..., 'creator_id': ..., 'user_ids': [...]}, ...]}
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from questforge import create_app
+    from questforge.extensions import db
+    from questforge.models.game import Game, GamePlayer
+    from questforge.models.template import Template
+    from questforge.models.user import User
+
+    app = create_app()
+    with app.app_context():
+        users = []
+        for i in range(players_per_game):
+            username = f"{LOADTEST_USER_PREFIX}{i}"
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                user = User(username=username, email=f"{username}@loadtest.invalid", password=username)
+                db.session.add(user)
+                db.session.flush()
+            users.append(user)
+
+        template = Template.query.filter_by(name=LOADTEST_TEMPLATE_NAME).first()
+        if template is None:
+            template = Template(
+                name=LOADTEST_TEMPLATE_NAME,
+                description="Template used by loadtest/harness.py",
+                created_by=users[0].id,
+                genre="Fantasy",
+                core_conflict="Recover the stolen lantern of the valley."
+            )
+            db.session.add(template)
+            db.session.flush()
+
+        fixtures = []
+        for i in range(games):
+            game = Game(name=f"Load test game {i}", template_id=template.id, created_by=users[0].id, difficulty='Normal')
+            game.template_overrides = {}
+            game.creator_customizations = {}
+            db.session.add(game)
+            db.session.flush()
+            for user in users:
+                db.session.add(GamePlayer(game_id=game.id, user_id=user.id, is_ready=True,
+                                          character_description=f"Adventurer {user.username}"))
+            fixtures.append({'game_id': game.id, 'creator_id': users[0].id, 'user_ids': [user.id for user in users]})
+        db.session.commit()
+    return {'games': fixtures}
+
+
+# --- run -------------------------------------------------------------------------------------
+
+class ResourceSampler:
+    """Samples CPU and RSS of the server process (and its worker children) once per interval."""
+
+    def __init__(self, pids: List[int], interval: float = 1.0):
+        self.pids = pids
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self.available = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        try:
+            import psutil
+            self._psutil = psutil
+            self.available = bool(pids)
+        except ImportError:
+            self._psutil = None
+
+    def _processes(self):
+        processes = []
+        for pid in self.pids:
+            try:
+                process = self._psutil.Process(pid)
+            except self._psutil.NoSuchProcess:
+                continue
+            processes.append(process)
+            processes.extend(process.children(recursive=True))
+        return processes
+
+    def _run(self):
+        tracked = {}
+        while not self._stop.is_set():
+            cpu = 0.0
+            rss = 0
+            for process in self._processes():
+                try:
+                    # cpu_percent needs a previous call on the same Process object to measure against
+                    process = tracked.setdefault(process.pid, process)
+                    cpu += process.cpu_percent(None)
+                    rss += process.memory_info().rss
+                except self._psutil.Error:
+                    continue
+            self.samples.append({'cpu_percent': cpu, 'rss_mb': rss / (1024 * 1024)})
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.available:
+            self._thread = threading.Thread(target=self._run, name="loadtest-resource-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        if not self.available:
+            return {'server': None, 'note': "psutil not installed or no --server-pid given"}
+        samples = self.samples[1:] or self.samples # The first cpu_percent reading is always 0
+        if not samples:
+            return {'server': None, 'note': "no samples collected"}
+        cpu = [s['cpu_percent'] for s in samples]
+        rss = [s['rss_mb'] for s in samples]
+        return {'server': {
+            'samples': len(samples),
+            'cpu_percent_mean': round(sum(cpu) / len(cpu), 1),
+            'cpu_percent_max': round(max(cpu), 1),
+            'rss_mb_mean': round(sum(rss) / len(rss), 1),
+            'rss_mb_max': round(max(rss), 1)
+        }}
+
+
+class Results:
+    """Counters and latency samples shared by all simulated players."""
+
+    def __init__(self):
+        self.turn_latencies_ms: List[float] = []
+        self.start_latencies_ms: List[float] = []
+        self.turns_completed = 0
+        self.turns_failed = 0
+        self.turns_timed_out = 0
+        self.turns_coalesced = 0
+        self.games_concluded = 0
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_turn(self, outcome: str, milliseconds: float):
+        with self._lock:
+            if outcome == 'ok':
+                self.turns_completed += 1
+                self.turn_latencies_ms.append(milliseconds)
+            elif outcome == 'timeout':
+                self.turns_timed_out += 1
+            elif outcome == 'coalesced':
+                self.turns_coalesced += 1
+            else:
+                self.turns_failed += 1
+
+    def add_start(self, milliseconds: float):
+        with self._lock:
+            self.start_latencies_ms.append(milliseconds)
+
+    def add_error(self, message: str):
+        with self._lock:
+            self.errors[message] = self.errors.get(message, 0) + 1
+
+    def add_conclusion(self):
+        with self._lock:
+            self.games_concluded += 1
+
+
+class SimulatedPlayer:
+    """One Socket.IO client playing one seat of one game."""
+
+    def __init__(self, url: str, game_id: int, user_id: int, is_creator: bool, results: Results, args, started: threading.Event):
+        import socketio
+        self.url = url
+        self.game_id = str(game_id) # The browser client sends ids as strings (data attributes)
+        self.user_id = str(user_id)
+        self.is_creator = is_creator
+        self.results = results
+        self.args = args
+        self.game_started = started # Shared by the players of one game
+        self.concluded = False
+        self._pending: Optional[Dict[str, Any]] = None
+        self._pending_lock = threading.Lock()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('game_started', self._on_game_started)
+        self.sio.on('game_state_update', self._on_game_state_update)
+        self.sio.on('action_queued', self._on_action_queued)
+        self.sio.on('game_concluded', self._on_game_concluded)
+        self.sio.on('error', self._on_error)
+
+    def _resolve(self, outcome: str):
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            pending['outcome'] = outcome
+            pending['finished'] = time.perf_counter()
+            pending['event'].set()
+
+    def _on_game_started(self, data):
+        self.game_started.set()
+
+    def _on_game_state_update(self, data):
+        if str((data or {}).get('user_id')) == self.user_id:
+            self._resolve('ok')
+
+    def _on_action_queued(self, data):
+        data = data or {}
+        if str(data.get('user_id')) == self.user_id and data.get('status') not in (None, 'queued'):
+            self._resolve('coalesced') # Merged into (or superseded by) another waiting action: no own update follows
+
+    def _on_game_concluded(self, data):
+        self.concluded = True
+        if self.is_creator:
+            self.results.add_conclusion()
+        self._resolve('ok')
+
+    def _on_error(self, data):
+        message = (data or {}).get('message', 'unknown error')
+        self.results.add_error(message)
+        if self.args.players_per_game == 1:
+            self._resolve('error') # Room-wide errors cannot be attributed to a player when several share a game
+
+    def run(self):
+        try:
+            self.sio.connect(self.url, transports=self.args.transports)
+        except Exception as e:
+            self.results.add_error(f"connect failed: {type(e).__name__}")
+            return
+        try:
+            self.sio.emit('join_game', {'game_id': self.game_id, 'user_id': self.user_id})
+            self.sio.emit('player_ready', {'game_id': self.game_id, 'user_id': self.user_id})
+            if self.is_creator:
+                time.sleep(0.2) # Let the other seats join first
+                started = time.perf_counter()
+                self.sio.emit('start_game', {'game_id': self.game_id, 'user_id': self.user_id})
+                if self.game_started.wait(self.args.start_timeout):
+                    self.results.add_start((time.perf_counter() - started) * 1000.0)
+            if not self.game_started.wait(self.args.start_timeout):
+                self.results.add_error("game did not start")
+                return
+
+            for turn in range(self.args.turns):
+                if self.concluded:
+                    break
+                action = ACTIONS[(turn + int(self.user_id)) % len(ACTIONS)]
+                pending = {'event': threading.Event(), 'outcome': None, 'finished': None}
+                with self._pending_lock:
+                    self._pending = pending
+                sent = time.perf_counter()
+                self.sio.emit('player_action', {'game_id': self.game_id, 'user_id': self.user_id, 'action': action})
+                if pending['event'].wait(self.args.turn_timeout):
+                    self.results.add_turn(pending['outcome'], (pending['finished'] - sent) * 1000.0)
+                else:
+                    self._resolve('timeout')
+                    self.results.add_turn('timeout', 0.0)
+                if self.args.think_time > 0:
+                    time.sleep(self.args.think_time)
+        finally:
+            self.sio.disconnect()
+
+
+def run_load(args, fixtures: Dict[str, Any]) -> Dict[str, Any]:
+    games = fixtures['games'][:args.games] if args.games else fixtures['games']
+    results = Results()
+    sampler = ResourceSampler(args.server_pid or [])
+    players = []
+    for game in games:
+        started = threading.Event()
+        for user_id in game['user_ids'][:args.players_per_game]:
+            players.append(SimulatedPlayer(args.url, game['game_id'], user_id, user_id == game['creator_id'], results, args, started))
+
+    threads = [threading.Thread(target=player.run, name=f"loadtest-player-{i}", daemon=True) for i, player in enumerate(players)]
+    sampler.start()
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        if args.ramp_up > 0:
+            time.sleep(args.ramp_up / max(len(threads), 1))
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started_at
+    resources = sampler.stop()
+
+    return {
+        'label': args.label,
+        'config': {
+            'url': args.url,
+            'games': len(games),
+            'players_per_game': args.players_per_game,
+            'clients': len(players),
+            'turns_per_player': args.turns,
+            'think_time_s': args.think_time,
+            'transports': args.transports
+        },
+        'duration_s': round(duration, 2),
+        'turns': {
+            'completed': results.turns_completed,
+            'failed': results.turns_failed,
+            'timed_out': results.turns_timed_out,
+            'coalesced': results.turns_coalesced,
+            'throughput_per_s': round(results.turns_completed / duration, 3) if duration > 0 else 0.0
+        },
+        'turn_latency': latency_summary(results.turn_latencies_ms),
+        'start_game_latency': latency_summary(results.start_latencies_ms),
+        'games_concluded': results.games_concluded,
+        'errors': results.errors,
+        'resources': resources
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="QuestForge Socket.IO load-test harness.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    setup_parser = subparsers.add_parser('setup', help="Create load-test users, template and games in the app's database.")
+    setup_parser.add_argument('--games', type=int, default=10)
+    setup_parser.add_argument('--players-per-game', type=int, default=1)
+    setup_parser.add_argument('--fixtures', default='loadtest_fixtures.json', help="Where to write the created game/user ids.")
+
+    run_parser = subparsers.add_parser('run', help="Drive simulated players against a running server.")
+    run_parser.add_argument('--url', default='http://127.0.0.1:5014')
+    run_parser.add_argument('--fixtures', default='loadtest_fixtures.json')
+    run_parser.add_argument('--games', type=int, default=0, help="Use only the first N fixture games (0 = all).")
+    run_parser.add_argument('--players-per-game', type=int, default=1)
+    run_parser.add_argument('--turns', type=int, default=10, help="Actions sent per player.")
+    run_parser.add_argument('--think-time', type=float, default=0.0, help="Seconds a player waits between turns.")
+    run_parser.add_argument('--ramp-up', type=float, default=0.0, help="Seconds over which the clients are started.")
+    run_parser.add_argument('--start-timeout', type=float, default=120.0)
+    run_parser.add_argument('--turn-timeout', type=float, default=120.0)
+    run_parser.add_argument('--transports', nargs='+', default=['websocket', 'polling'])
+    run_parser.add_argument('--server-pid', type=int, action='append', help="Server process to sample (its children are included). Repeatable.")
+    run_parser.add_argument('--label', default='', help="Worker configuration under test, recorded in the report.")
+    run_parser.add_argument('--output', help="Also write the report to this JSON file.")
+
+    args = parser.parse_args(argv)
+    if args.command == 'setup':
+        fixtures = setup_fixtures(args.games, args.players_per_game)
+        with open(args.fixtures, 'w') as f:
+            json.dump(fixtures, f, indent=2)
+        print(f"Created {len(fixtures['games'])} games with {args.players_per_game} player(s) each; ids written to {args.fixtures}.")
+        return
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+    report = run_load(args, fixtures)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+"""
+Offline OpenAI-compatible mock server for load-testing QuestForge without real API calls.
+
+Serves POST /v1/chat/completions (streamed and non-streamed) and returns payloads that pass
+the validation in AIService: campaign structures, Stage 1 turn responses, single and batched
+plot checks, summaries, hints and character names. The kind of request is recognised from
+the prompt. Every response carries a usage block, so cost tracking and metrics behave as
+they do against the real API.
+
+Latency is sampled per request kind from a configurable distribution, e.g.:
+
+    python loadtest/mock_openai_server.py --port 8099 \\
+        --latency turn=lognormal:1500,0.35 --latency campaign=normal:4000,800 \\
+        --latency default=uniform:150,400 --error-rate 0.01
+
+Then point the app at it (any non-empty API key works):
+
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python app.py
+
+GET /stats returns the number of requests served per kind; POST /stats/reset clears it.
+Only the standard library is used.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# Request kinds, recognised from (a prefix of) the prompts built in questforge/utils/prompt_builder.py
+KIND_MARKERS = [
+    ('campaign', "You are a creative game master designing the beginning"),
+    ('turn', "This is Stage 1 of a multi-stage response generation"),
+    ('batch_plot_check', "independently for each listed game objective"),
+    ('plot_check', "determine if a specific, single game objective"),
+    ('summary', "concisely summarizes game events"),
+    ('hint', "A player has asked for a hint"),
+    ('character_name', "Generate a single, suitable, creative fantasy character name"),
+]
+
+# Default latency per kind (milliseconds), roughly what the real models take
+DEFAULT_LATENCY = {
+    'campaign': 'normal:4000,800',
+    'turn': 'lognormal:1500,0.35',
+    'plot_check': 'uniform:300,700',
+    'batch_plot_check': 'uniform:400,900',
+    'summary': 'uniform:300,600',
+    'hint': 'uniform:300,600',
+    'character_name': 'uniform:150,300',
+    'default': 'uniform:150,400',
+}
+
+LOCATIONS = ["Village Square", "Old Mill", "Whispering Caves", "Ruined Watchtower", "Sunken Chapel"]
+ACTIONS = ["Look around", "Search the area", "Talk to the stranger", "Head north", "Listen carefully", "Rest for a moment"]
+NAMES = ["Aldric", "Brina", "Corwin", "Delphine", "Eamon", "Fenna", "Garrick", "Isolde"]
+
+
+class LatencyDistribution:
+    """
+    A latency distribution in milliseconds, parsed from '<kind>:<params>':
+
+        fixed:200            always 200 ms
+        uniform:100,400      uniform between 100 and 400 ms
+        normal:800,150       normal with mean 800 and standard deviation 150 (clamped at 0)
+        lognormal:1200,0.4   log-normal with median 1200 and sigma 0.4 (long right tail)
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        name, _, params = spec.partition(':')
+        self.name = name.strip().lower()
+        try:
+            self.params = [float(p) for p in params.split(',') if p.strip()]
+        except ValueError:
+            raise ValueError(f"Invalid latency parameters in '{spec}'")
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+        if self.name not in expected or len(self.params) != expected[self.name]:
+            raise ValueError(f"Invalid latency distribution '{spec}' (expected fixed:ms, uniform:lo,hi, normal:mean,sd or lognormal:median,sigma)")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.name == 'fixed':
+            value = self.params[0]
+        elif self.name == 'uniform':
+            value = rng.uniform(self.params[0], self.params[1])
+        elif self.name == 'normal':
+            value = rng.gauss(self.params[0], self.params[1])
+        else:
+            value = self.params[0] * rng.lognormvariate(0.0, self.params[1])
+        return max(value, 0.0)
+
+
+def classify(messages: List[Dict[str, Any]]) -> str:
+    """The request kind, from the prompt text."""
+    text = "\n".join(str(m.get('content', '')) for m in messages if isinstance(m, dict))
+    for kind, marker in KIND_MARKERS:
+        if marker in text:
+            return kind
+    return 'default'
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(len(text) // 4, 1)
+
+
+class MockResponder:
+    """Builds schema-valid response content for each request kind."""
+
+    def __init__(self, completion_rate: float, seed: Optional[int] = None):
+        self.completion_rate = completion_rate
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _random(self) -> float:
+        with self._lock:
+            return self.rng.random()
+
+    def _choice(self, options):
+        with self._lock:
+            return self.rng.choice(options)
+
+    def content(self, kind: str, messages: List[Dict[str, Any]]) -> str:
+        prompt = "\n".join(str(m.get('content', '')) for m in messages if isinstance(m, dict))
+        builder = getattr(self, f"_{kind}", self._default)
+        return builder(prompt)
+
+    def _campaign(self, prompt: str) -> str:
+        return json.dumps({
+            'campaign_objective': "Recover the stolen lantern of the valley.",
+            'generated_locations': [{'name': name, 'description': f"A quiet place called {name}."} for name in LOCATIONS[:4]],
+            'generated_characters': [
+                {'name': "Elder Maren", 'role': "Quest giver", 'description': "The village elder who saw the thief."},
+                {'name': "Tobin", 'role': "Suspect", 'description': "A nervous miller with muddy boots."},
+            ],
+            'generated_plot_points': [
+                {'id': "pp_001", 'description': "Players speak with Elder Maren.", 'required': True},
+                {'id': "pp_002", 'description': "Players find the muddy footprints at the Old Mill.", 'required': True},
+                {'id': "pp_003", 'description': "Players enter the Whispering Caves.", 'required': False},
+                {'id': "pp_004", 'description': "Players recover the lantern.", 'required': True},
+            ],
+            'initial_scene': {
+                'description': "The players stand in the Village Square as the last light fades.",
+                'state': {'location': LOCATIONS[0]},
+                'goals': ["Talk to Elder Maren", "Look around"],
+            },
+            'campaign_summary': "A small mystery in a sleepy valley.",
+            'conclusion_conditions': [{'type': 'state_key_equals', 'key': 'lantern_recovered', 'value': True}],
+            'possible_branches': {},
+            'special_rules': "",
+            'exclusions': [],
+        })
+
+    def _turn(self, prompt: str) -> str:
+        location = self._choice(LOCATIONS)
+        return json.dumps({
+            'content': f"You take a careful look around. The path leads on towards the {location}, where something stirs in the shadows.",
+            'state_changes': {'location': location, 'environmental_conditions': {'time_of_day': 'dusk'}},
+            'available_actions': list(ACTIONS[:4]),
+        })
+
+    def _plot_check(self, prompt: str) -> str:
+        match = re.search(r"Plot Point ID: (\S+)", prompt)
+        return json.dumps({
+            'plot_point_id': match.group(1) if match else "pp_001",
+            'completed': self._random() < self.completion_rate,
+            'confidence_score': 0.9,
+        })
+
+    def _batch_plot_check(self, prompt: str) -> str:
+        ids = re.findall(r"- Plot Point ID: (\S+)", prompt)
+        return json.dumps({'results': [
+            {'plot_point_id': pp_id, 'completed': self._random() < self.completion_rate, 'confidence_score': 0.9}
+            for pp_id in ids
+        ]})
+
+    def _summary(self, prompt: str) -> str:
+        return "The players explored further and the trail of the thief grew warmer."
+
+    def _hint(self, prompt: str) -> str:
+        return "Perhaps someone in the village noticed which way the thief went."
+
+    def _character_name(self, prompt: str) -> str:
+        return self._choice(NAMES)
+
+    def _default(self, prompt: str) -> str:
+        return "OK"
+
+
+class MockState:
+    """Settings and counters shared by all request handler threads."""
+
+    def __init__(self, latencies: Dict[str, LatencyDistribution], responder: MockResponder,
+                 error_rate: float, stream_chunks: int, seed: Optional[int] = None):
+        self.latencies = latencies
+        self.responder = responder
+        self.error_rate = error_rate
+        self.stream_chunks = max(stream_chunks, 1)
+        self.rng = random.Random(seed)
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def latency_ms(self, kind: str) -> float:
+        distribution = self.latencies.get(kind) or self.latencies['default']
+        with self._lock:
+            return distribution.sample(self.rng)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def count(self, kind: str, failed: bool = False) -> None:
+        with self._lock:
+            target = self.errors if failed else self.counts
+            target[kind] = target.get(kind, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': dict(self.counts), 'errors': dict(self.errors)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+            self.errors.clear()
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, like the real API (the app's httpx pool reuses connections)
+    state: MockState = None # Set by make_server
+
+    def log_message(self, format, *args):
+        pass # One line per request would dominate the output under load
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/stats', '/v1/stats'):
+            self._send_json(200, self.state.stats())
+        elif self.path.rstrip('/') in ('/models', '/v1/models'):
+            self._send_json(200, {'object': 'list', 'data': []})
+        else:
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if self.path.rstrip('/') in ('/stats/reset', '/v1/stats/reset'):
+            self.state.reset()
+            self._send_json(200, {'status': 'reset'})
+            return
+        if self.path.rstrip('/') not in ('/chat/completions', '/v1/chat/completions'):
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+            return
+        try:
+            payload = json.loads(raw or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': "Request body is not valid JSON", 'type': 'invalid_request_error'}})
+            return
+
+        messages = payload.get('messages') or []
+        kind = classify(messages)
+        latency_s = self.state.latency_ms(kind) / 1000.0
+        if self.state.should_fail():
+            time.sleep(latency_s)
+            self.state.count(kind, failed=True)
+            self._send_json(500, {'error': {'message': "Injected mock failure", 'type': 'server_error'}})
+            return
+
+        content = self.state.responder.content(kind, messages)
+        model = payload.get('model') or 'mock-model'
+        prompt_text = "\n".join(str(m.get('content', '')) for m in messages if isinstance(m, dict))
+        usage = {
+            'prompt_tokens': estimate_tokens(prompt_text),
+            'completion_tokens': estimate_tokens(content),
+            'prompt_tokens_details': {'cached_tokens': 0},
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+
+        if payload.get('stream'):
+            self._stream(completion_id, model, content, usage, latency_s, payload)
+        else:
+            time.sleep(latency_s)
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+        self.state.count(kind)
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: Dict[str, Any],
+                latency_s: float, payload: Dict[str, Any]) -> None:
+        """
+        Sends the content as server-sent events. A third of the latency passes before the first
+        chunk (time to first token) and the rest is spread evenly over the remaining chunks.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close') # No Content-Length: the stream ends when the connection closes
+        self.end_headers()
+        self.close_connection = True
+
+        def send(data: Dict[str, Any]) -> None:
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+
+        chunk_count = self.state.stream_chunks
+        step = max(len(content) // chunk_count, 1)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)] or ['']
+        time.sleep(latency_s / 3.0)
+        send(chunk({'role': 'assistant', 'content': ''}))
+        for piece in pieces:
+            time.sleep(latency_s * 2.0 / 3.0 / len(pieces))
+            send(chunk({'content': piece}))
+        send(chunk({}, finish_reason='stop'))
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            final = chunk({})
+            final['choices'] = []
+            final['usage'] = usage
+            send(final)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def parse_latencies(specs: List[str]) -> Dict[str, LatencyDistribution]:
+    """Merges '<kind>=<distribution>' overrides into the default latency table."""
+    table = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        kind, sep, distribution = spec.partition('=')
+        if not sep:
+            raise ValueError(f"Invalid --latency '{spec}' (expected <kind>=<distribution>)")
+        kind = kind.strip()
+        if kind != 'all' and kind not in table:
+            raise ValueError(f"Unknown request kind '{kind}' (known: {', '.join(sorted(table))}, all)")
+        for key in (table if kind == 'all' else [kind]):
+            table[key] = distribution.strip()
+    return {kind: LatencyDistribution(spec) for kind, spec in table.items()}
+
+
+def make_server(host: str, port: int, latencies: Dict[str, LatencyDistribution], completion_rate: float = 0.1,
+                error_rate: float = 0.0, stream_chunks: int = 20, seed: Optional[int] = None) -> ThreadingHTTPServer:
+    """Builds the mock server (call serve_forever on it)."""
+    state = MockState(latencies, MockResponder(completion_rate, seed), error_rate, stream_chunks, seed)
+    handler = type('BoundMockOpenAIHandler', (MockOpenAIHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible mock server for QuestForge load tests.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', action='append', default=[], metavar='KIND=DIST',
+                        help="Latency distribution per request kind (campaign, turn, plot_check, batch_plot_check, "
+                             "summary, hint, character_name, default or all), e.g. turn=lognormal:1500,0.35. Repeatable.")
+    parser.add_argument('--completion-rate', type=float, default=0.1, help="Probability a plot check reports the plot point completed.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+    parser.add_argument('--stream-chunks', type=int, default=20, help="Content chunks per streamed response.")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for reproducible latencies and outcomes.")
+    args = parser.parse_args(argv)
+
+    try:
+        latencies = parse_latencies(args.latency)
+    except ValueError as e:
+        parser.error(str(e))
+    server = make_server(args.host, args.port, latencies, args.completion_rate, args.error_rate, args.stream_chunks, args.seed)
+    print(f"Mock OpenAI server listening on http://{args.host}:{args.port}/v1")
+    for kind in sorted(latencies):
+        print(f"  {kind:<17} {latencies[kind].spec}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,14 +15,35 @@ def cli():
 @cli.command()
 def initdb():
     """Initialize the database."""
-    db.create_all()
+    from flask_migrate import stamp
+    with app.app_context():
+        db.create_all()
+        stamp() # create_all built the current schema; 'db upgrade' only applies later revisions
     click.echo('Initialized the database.')
 
-# Import the migration commands
-from flask_migrate.cli import db
+@cli.command('migrate-game-logs')
+@click.option('--batch-size', default=100, show_default=True, help='GameState rows per commit.')
+def migrate_game_logs(batch_size):
+    """Move legacy GameState.game_log JSON into game_log_entries rows."""
+    from questforge.services.game_log_service import game_log_service
+    with app.app_context():
+        games, entries = game_log_service.migrate_legacy_logs(batch_size=batch_size)
+    click.echo(f'Migrated {entries} log entries from {games} games.')
+
+@cli.command('recompute-game-costs')
+@click.option('--game-id', type=int, default=None, help='Only recompute this game.')
+def recompute_game_costs(game_id):
+    """Rebuild Game.total_cost from the api_usage_logs rows."""
+    from questforge.services.ai_service import recompute_game_costs as recompute
+    with app.app_context():
+        updated = recompute(game_id=game_id)
+    click.echo(f'Recomputed total cost for {updated} game(s).')
+
+# Import the migration commands (aliased: 'db' is the SQLAlchemy instance used above)
+from flask_migrate.cli import db as db_commands
 
 # Add the db command group
-cli.add_command(db)
+cli.add_command(db_commands)
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
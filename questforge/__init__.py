@@ -87,6 +87,22 @@ def create_app(config_name='default'):
     app.register_blueprint(template_bp)
     app.register_blueprint(admin_bp)
 
+    # Let the async AI service push an app context from the background event loop
+    from .services.async_ai_service import async_ai_service
+    async_ai_service.init_app(app)
+
+    # Prometheus-format metrics (SQL statement counter, request timing, service gauges)
+    from .utils import metrics
+    metrics.init_app(app)
+
+    # Background writer for buffered API usage rows
+    from .services.usage_recorder import usage_recorder
+    usage_recorder.init_app(app)
+
+    # Apply the in-memory game state cache limits
+    from .services.game_state_service import game_state_service
+    game_state_service.init_app(app)
+
     # Register socket handlers
     SocketService.register_handlers()
 
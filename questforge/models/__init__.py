@@ -6,5 +6,6 @@ from .template import Template
 from .campaign import Campaign
 from .game_state import GameState
 from .api_usage_log import ApiUsageLog # Import the new model
+from .game_log_entry import GameLogEntry
 # Import the association object model as well
 from .game import GamePlayer
@@ -12,6 +12,8 @@ class ApiUsageLog(db.Model):
     prompt_tokens = db.Column(db.Integer, nullable=False)
     completion_tokens = db.Column(db.Integer, nullable=False)
     total_tokens = db.Column(db.Integer, nullable=False)
+    # Prompt tokens served from the provider's prompt prefix cache (a subset of prompt_tokens)
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # Using Numeric for cost to handle potential decimal values accurately
     # Precision and scale can be adjusted as needed (e.g., 10 total digits, 6 after decimal)
     cost = db.Column(db.Numeric(10, 6), nullable=True) 
@@ -1,8 +1,11 @@
 from datetime import datetime
 from questforge.extensions import db
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, event, inspect
 from sqlalchemy.orm import relationship
 
+# Columns the plot point index is built from
+PLOT_INDEX_FIELDS = ('major_plot_points', 'key_locations', 'key_characters')
+
 class Campaign(db.Model):
     __tablename__ = 'campaigns'
     
@@ -16,6 +19,10 @@ class Campaign(db.Model):
     key_characters = db.Column(db.JSON, nullable=False)
     major_plot_points = db.Column(db.JSON, nullable=False)
     possible_branches = db.Column(db.JSON, nullable=False)
+    # Precomputed Stage 2 lookup index (see questforge.utils.plot_index); rebuilt when major_plot_points changes
+    plot_point_index = db.Column(db.JSON, nullable=True)
+    # Content version; bumped on every edit so cached prompt context for the campaign is rebuilt
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     game = db.relationship('Game', back_populates='campaign')
     template = db.relationship('Template', backref='campaign_structures')
@@ -33,10 +40,18 @@ class Campaign(db.Model):
         self.key_characters = key_characters
         self.major_plot_points = major_plot_points
         self.possible_branches = possible_branches
+        self.rebuild_plot_point_index()
         
     def __repr__(self):
         return f'<Campaign {self.id}>'
 
+    def rebuild_plot_point_index(self):
+        """Rebuilds plot_point_index from major_plot_points, key_locations and key_characters."""
+        from questforge.utils.plot_index import build_plot_point_index, plot_index_cache
+        self.plot_point_index = build_plot_point_index(self.major_plot_points, self.key_locations, self.key_characters)
+        if self.id is not None:
+            plot_index_cache.invalidate(self.id)
+
     @property
     def current_state(self):
         """Get current game state from latest GameState record"""
@@ -64,3 +79,19 @@ class Campaign(db.Model):
     #     # Basic implementation - should be expanded based on game rules
     #     # ... (original implementation commented out) ...
     #     pass # Placeholder if needed, or just remove the method definition entirely if preferred
+
+
+def _refresh_plot_point_index(mapper, connection, campaign):
+    """
+    Rebuilds plot_point_index and bumps version in the same UPDATE when any PLOT_INDEX_FIELDS
+    column changed (assigned, or flagged with flag_modified), whichever code made the edit.
+    Caches keyed by (campaign id, version) in every process then miss and reload.
+    """
+    state = inspect(campaign)
+    if not any(state.attrs[field].history.has_changes() for field in PLOT_INDEX_FIELDS):
+        return
+    campaign.rebuild_plot_point_index()
+    if not state.attrs.version.history.has_changes(): # Not already bumped by the caller (update_campaign)
+        campaign.version = (campaign.version or 1) + 1
+
+event.listen(Campaign, 'before_update', _refresh_plot_point_index)
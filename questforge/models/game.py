@@ -19,7 +19,11 @@ class GamePlayer(db.Model):
 
 class Game(db.Model):
     __tablename__ = 'games'
-    
+    __table_args__ = (
+        # Keyset pagination of the game list (newest first)
+        db.Index('ix_games_created_at_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     template_id = db.Column(db.Integer, ForeignKey('templates.id'))
     name = db.Column(db.String(100), nullable=False)
@@ -29,6 +33,9 @@ class Game(db.Model):
     creator_customizations = db.Column(db.JSON, nullable=True) # Creator-provided additions/changes
     template_overrides = db.Column(db.JSON, nullable=True) # Creator-provided overrides for base template fields
     current_difficulty = db.Column(db.String(20), default='Normal', nullable=False)
+    # Running sum of ApiUsageLog.cost for this game, maintained by ai_service.record_game_cost in the
+    # same transaction as each usage row (repair with 'manage.py recompute-game-costs')
+    total_cost = db.Column(db.Numeric(12, 6), nullable=False, default=0, server_default='0')
 
     template = relationship('Template', backref='games')
     creator = relationship('User', foreign_keys=[created_by]) # Specify foreign key for creator
@@ -0,0 +1,32 @@
+from datetime import datetime
+from questforge.extensions import db
+import sqlalchemy as sa
+
+class GameLogEntry(db.Model):
+    """One entry of a game's log, stored as its own row.
+
+    Replaces appending to the GameState.game_log JSON column, which had to be loaded and
+    rewritten in full on every turn. Entries are numbered per game by seq (0, 1, 2, ...),
+    so appends are single-row inserts and pages/tails are index range reads.
+
+    Attributes:
+        game_id (int): The game the entry belongs to.
+        seq (int): Position in the game's log, unique per game.
+        entry_type (str): The entry's 'type' ('player', 'ai', 'system'), if it is a dict.
+        data (JSON): The log entry exactly as it appeared in game_log (dict or string).
+    """
+    __tablename__ = 'game_log_entries'
+    __table_args__ = (
+        db.UniqueConstraint('game_id', 'seq', name='uq_game_log_entries_game_seq'),
+        db.Index('ix_game_log_entries_game_type_seq', 'game_id', 'entry_type', 'seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('games.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    entry_type = db.Column(db.String(20), nullable=True)
+    data = db.Column(sa.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<GameLogEntry game_id={self.game_id} seq={self.seq} type={self.entry_type}>'
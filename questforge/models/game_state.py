@@ -24,6 +24,9 @@ class GameState(db.Model):
     Relationships:
         - game: Parent Game record
         - campaign: Associated Campaign template
+    version (int): Optimistic lock counter, incremented on every committed update
+    log_length (int): Number of entries in the game's log (GameLogEntry rows plus any
+        legacy entries still in game_log); the next entry gets seq = log_length
     Spec Reference: Section 4.3 (Campaign State Management)
     Last Updated: 2025-07-04"""
     __tablename__ = 'game_states'
@@ -44,14 +47,23 @@ class GameState(db.Model):
     current_branch = db.Column(db.String(50), default='main')
     campaign_complete = db.Column(db.Boolean, default=False)
     
+    # Legacy log storage. New entries are GameLogEntry rows (see game_log_service); this column only
+    # holds logs written before that and not yet moved by 'manage.py migrate-game-logs'. Deferred so
+    # loading a GameState does not pull the whole log.
+    game_log = db.deferred(db.Column(sa.JSON, default=list, nullable=False))
+    log_length = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # Using standard sa.JSON
-    game_log = db.Column(sa.JSON, default=list, nullable=False)
     available_actions = db.Column(sa.JSON, default=list, nullable=False)
     visited_locations = db.Column(sa.JSON, default=list, nullable=False) # Added visited_locations field
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Optimistic concurrency control: SQLAlchemy bumps this on every UPDATE and adds
+    # "WHERE version = <old>" to it, so a writer holding a stale copy gets StaleDataError.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
     # Relationship back to the Game
     game = db.relationship('Game', back_populates='game_states')
     # Removed campaign relationship
@@ -0,0 +1,214 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+
+class QueuedAction:
+    """One submitted player action waiting for (or holding) its game's turn slot."""
+
+    def __init__(self, ticket_id: int, game_id: str, user_id, action: str):
+        self.ticket_id = ticket_id
+        self.game_id = game_id
+        self.user_id = user_id
+        self.action = action
+        self.merged_count = 0 # How many later submissions were merged into this one
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def wait_seconds(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+class GameActionQueue:
+    """
+    Serializes player actions per game.
+
+    Every player_action runs the full read -> AI -> write pipeline, so two actions for
+    the same game must not overlap (the later commit would be computed from a stale
+    state_data). Each game gets a FIFO of QueuedAction tickets and only the ticket at
+    the head may run; the handler threads for the other tickets block on the game's
+    condition until it is their turn. Different games never share a queue, so they
+    still run fully in parallel.
+
+    While a player already has an action waiting (queued but not started), a new
+    action from the same player is coalesced according to ACTION_QUEUE_COALESCE_MODE:
+        'none'  - queue it as a separate turn (default),
+        'merge' - append its text to the waiting action, so both run as one turn,
+        'drop'  - discard it; the waiting action still runs.
+
+    Per-game statistics outlive a game's queue, but only for the max_stats_games most
+    recently active games (least recently used idle games are forgotten first).
+    """
+
+    COALESCE_MODES = ('none', 'merge', 'drop')
+
+    def __init__(self, max_stats_games: int = 1000):
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[QueuedAction]] = {} # str(game_id): tickets, head is running or next
+        self._conditions: Dict[str, threading.Condition] = {}
+        self._stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict() # LRU, most recently active last
+        self.max_stats_games = max_stats_games
+        self._ticket_ids = itertools.count(1)
+
+    def _condition(self, key: str) -> threading.Condition:
+        condition = self._conditions.get(key)
+        if condition is None:
+            condition = threading.Condition(self._lock)
+            self._conditions[key] = condition
+        return condition
+
+    def _game_stats(self, key: str) -> Dict[str, Any]:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = {
+                'processed': 0,
+                'merged': 0,
+                'dropped': 0,
+                'timed_out': 0,
+                'max_depth': 0,
+                'total_wait_seconds': 0.0,
+                'max_wait_seconds': 0.0,
+                'last_wait_seconds': 0.0,
+            }
+            self._stats[key] = stats
+            self._trim_stats()
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+    def _trim_stats(self) -> None:
+        """Forgets the least recently active idle games beyond max_stats_games. Caller holds the lock."""
+        excess = len(self._stats) - max(self.max_stats_games, 1)
+        if excess <= 0:
+            return
+        for key in [key for key in self._stats if key not in self._queues][:excess]:
+            del self._stats[key]
+
+    def submit(self, game_id, user_id, action: str, coalesce_mode: str = 'none') -> Dict[str, Any]:
+        """
+        Adds an action to its game's queue (or coalesces it into the player's waiting action).
+
+        Returns:
+            A dict with:
+                'status': 'queued', 'merged' or 'dropped'.
+                'ticket': The QueuedAction to pass to wait_for_turn()/finish() (only for 'queued';
+                          for 'merged' it is the waiting ticket that absorbed the action).
+                'position': Number of tickets ahead of this one (0 means it runs immediately).
+                'depth': Queue length after the submission.
+        """
+        key = str(game_id)
+        if coalesce_mode not in self.COALESCE_MODES:
+            coalesce_mode = 'none'
+        with self._lock:
+            queue = self._queues.setdefault(key, deque())
+            stats = self._game_stats(key)
+
+            if coalesce_mode != 'none':
+                waiting = next(
+                    (t for t in queue if not t.started and str(t.user_id) == str(user_id)),
+                    None
+                )
+                if waiting is not None:
+                    position = queue.index(waiting)
+                    if coalesce_mode == 'merge':
+                        waiting.action = f"{waiting.action}; then {action}"
+                        waiting.merged_count += 1
+                        stats['merged'] += 1
+                        return {'status': 'merged', 'ticket': waiting, 'position': position, 'depth': len(queue)}
+                    stats['dropped'] += 1
+                    return {'status': 'dropped', 'ticket': None, 'position': position, 'depth': len(queue)}
+
+            ticket = QueuedAction(next(self._ticket_ids), key, user_id, action)
+            queue.append(ticket)
+            stats['max_depth'] = max(stats['max_depth'], len(queue))
+            return {'status': 'queued', 'ticket': ticket, 'position': len(queue) - 1, 'depth': len(queue)}
+
+    def wait_for_turn(self, ticket: QueuedAction, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the ticket is at the head of its game's queue, then marks it started.
+
+        Returns:
+            True if the ticket may run now, False if the timeout expired (the ticket is
+            removed from the queue in that case and must not be passed to finish()).
+        """
+        key = ticket.game_id
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            condition = self._condition(key)
+            queue = self._queues.get(key)
+            while queue and queue[0] is not ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    queue.remove(ticket)
+                    self._game_stats(key)['timed_out'] += 1
+                    condition.notify_all()
+                    self._discard_if_idle(key)
+                    return False
+                condition.wait(remaining)
+                queue = self._queues.get(key)
+
+            ticket.started_at = time.monotonic()
+            stats = self._game_stats(key)
+            wait = ticket.wait_seconds
+            stats['last_wait_seconds'] = wait
+            stats['total_wait_seconds'] += wait
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], wait)
+            return True
+
+    def finish(self, ticket: QueuedAction) -> None:
+        """Removes a finished (or failed) ticket from the head and wakes the next one."""
+        key = ticket.game_id
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+            self._game_stats(key)['processed'] += 1
+            self._condition(key).notify_all()
+            self._discard_if_idle(key)
+
+    def _discard_if_idle(self, key: str) -> None:
+        """Drops the per-game queue and condition once nothing is queued (stats are kept). Caller holds the lock."""
+        queue = self._queues.get(key)
+        if queue is not None and not queue:
+            del self._queues[key]
+            self._conditions.pop(key, None)
+
+    def depth(self, game_id) -> int:
+        """Number of actions queued for a game, including the one currently running."""
+        with self._lock:
+            return len(self._queues.get(str(game_id), ()))
+
+    def depths(self) -> Dict[str, int]:
+        """Queue depth of every game with queued actions (idle games are not listed)."""
+        with self._lock:
+            return {key: len(queue) for key, queue in self._queues.items()}
+
+    def stats(self, game_id=None) -> Dict[str, Any]:
+        """
+        Queue statistics for one game (or all tracked games keyed by game_id if game_id is None;
+        see max_stats_games).
+
+        Each entry holds the current depth, the maximum depth seen, counts of processed,
+        merged, dropped and timed out actions, and the last/average/max queue wait in seconds.
+        """
+        with self._lock:
+            keys = [str(game_id)] if game_id is not None else list(self._stats.keys())
+            result = {}
+            for key in keys:
+                stats = dict(self._stats.get(key) or self._game_stats(key))
+                stats['depth'] = len(self._queues.get(key, ()))
+                started = stats['processed'] + (1 if self._queues.get(key) and self._queues[key][0].started else 0)
+                stats['avg_wait_seconds'] = stats['total_wait_seconds'] / started if started else 0.0
+                result[key] = stats
+            return result[str(game_id)] if game_id is not None else result
+
+
+action_queue = GameActionQueue()
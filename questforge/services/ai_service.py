@@ -7,14 +7,51 @@ from questforge.models.game import Game
 from questforge.models.game_state import GameState
 from questforge.models.template import Template
 from questforge.models.campaign import Campaign
-from questforge.utils.prompt_builder import build_campaign_prompt, build_response_prompt, build_character_name_prompt, build_hint_prompt, build_plot_completion_check_prompt, build_summary_prompt # Added build_summary_prompt
+from questforge.utils.prompt_builder import build_campaign_prompt, build_response_messages, build_character_name_prompt, build_hint_messages, build_plot_completion_check_messages, build_batch_plot_completion_check_messages, build_summary_prompt, format_messages_for_log # Added build_summary_prompt
 from questforge.utils.context_manager import build_context
-from typing import Dict, Optional, Tuple, Any, List
+from questforge.utils.json_stream import JsonStringFieldStreamer
+from questforge.utils.profiling import ai_call_span
+from questforge.utils.metrics import observe_ai_cost
+from typing import Callable, Dict, Optional, Tuple, Any, List
 import requests
 from decimal import Decimal
+import sqlalchemy as sa
 from ..models.api_usage_log import ApiUsageLog
+from .usage_recorder import usage_recorder, record_game_cost
 from ..extensions import db
 
+class CompletionStreamAccumulator:
+    """
+    Collects a streamed chat completion (stream=True with include_usage) back into
+    the pieces a non-streamed response provides: full content, model and usage.
+    Optionally extracts one top-level JSON string field as it arrives.
+    """
+
+    def __init__(self, stream_field: Optional[str] = None):
+        self.parts = []
+        self.model = None
+        self.usage = None
+        self.streamer = JsonStringFieldStreamer(stream_field) if stream_field else None
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+    def add_chunk(self, chunk) -> str:
+        """Records one stream chunk. Returns newly decoded text of the stream field (or '')."""
+        if getattr(chunk, 'model', None):
+            self.model = chunk.model
+        if getattr(chunk, 'usage', None):
+            self.usage = chunk.usage # Sent on the final chunk when include_usage is set
+        if not chunk.choices:
+            return ""
+        delta_text = chunk.choices[0].delta.content or ""
+        if not delta_text:
+            return ""
+        self.parts.append(delta_text)
+        return self.streamer.feed(delta_text) if self.streamer else ""
+
+
 class AIService:
     """Service for handling AI interactions, including campaign generation and responses."""
 
@@ -29,7 +66,8 @@ class AIService:
                 print("Warning: OPENAI_API_KEY not set and running outside Flask app context.")
             self.client = None
         else:
-            self.client = OpenAI(api_key=api_key)
+            # OPENAI_BASE_URL points the client at another OpenAI-compatible server (e.g. loadtest/mock_openai_server.py)
+            self.client = OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None)
             self.temperature = float(os.getenv("OPENAI_TEMPERATURE") or 0.7)
             self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS") or 1024)
 
@@ -79,111 +117,122 @@ class AIService:
 
         return len(issues) == 0, issues
 
-    def generate_campaign(self, template: Template, template_overrides: Optional[Dict[str, Any]] = None, creator_customizations: Optional[Dict[str, Any]] = None, player_details: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+    def _build_campaign_payload(self, app, template: Template, template_overrides: Optional[Dict[str, Any]] = None, creator_customizations: Optional[Dict[str, Any]] = None, player_details: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Builds the chat completion payload for campaign generation (shared by the sync and async clients)."""
         from questforge.utils.ai_debug_logger import log_ai_debug_payload
-        app = current_app._get_current_object()
-        if not self.client:
-            app.logger.error("OpenAI client not initialized. Cannot generate campaign.")
-            return {"error": "AI service not available."}
         prompt = build_campaign_prompt(template, template_overrides, creator_customizations, player_details)
         app.logger.debug(f"--- AI Service: Generating campaign with prompt ---\\n{prompt}\\n-------------------------------------------------")
-        generated_content = ""
+        # Use OPENAI_MODEL_LOGIC for critical logic-heavy calls
+        model_to_use = app.config.get('OPENAI_MODEL_LOGIC', 'gpt-4o')
+        app.logger.debug(f"Using OPENAI_MODEL_LOGIC for generate_campaign: {model_to_use}")
+        payload = {
+            "model": model_to_use,
+            "messages": [
+                {"role": "system", "content": "You are a creative game master designing the beginning of a text-based adventure game according to the user's template and inputs. Output ONLY the requested JSON object."},
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": self.temperature,
+            "max_tokens": 2048
+        }
+        log_ai_debug_payload("Generate campaign from template", payload, "campaign", 1)
+        return payload
+
+    def _parse_campaign_response(self, app, response) -> Any:
+        """Validates a campaign generation response. Returns (parsed_data, model_used, usage_data) or an error dict."""
+        generated_content = response.choices[0].message.content
+        app.logger.debug(f"--- AI Service: Received raw response ---\\n{generated_content}\\n------------------------------------------")
         try:
-            # Use OPENAI_MODEL_LOGIC for critical logic-heavy calls
-            model_to_use = app.config.get('OPENAI_MODEL_LOGIC', 'gpt-4o')
-            app.logger.debug(f"Using OPENAI_MODEL_LOGIC for generate_campaign: {model_to_use}")
-            payload = {
-                "model": model_to_use,
-                "messages": [
-                    {"role": "system", "content": "You are a creative game master designing the beginning of a text-based adventure game according to the user's template and inputs. Output ONLY the requested JSON object."},
-                    {"role": "user", "content": prompt}
-                ],
-                "response_format": {"type": "json_object"},
-                "temperature": self.temperature,
-                "max_tokens": 2048
-            }
-            log_ai_debug_payload("Generate campaign from template", payload, "campaign", 1)
-            response = self.client.chat.completions.create(**payload)
-            generated_content = response.choices[0].message.content
-            app.logger.debug(f"--- AI Service: Received raw response ---\\n{generated_content}\\n------------------------------------------")
             parsed_data = json.loads(generated_content)
-            required_top_level_keys = ['campaign_objective', 'generated_locations', 'generated_characters', 'generated_plot_points', 'initial_scene']
-            missing_keys = [k for k in required_top_level_keys if k not in parsed_data]
-            if missing_keys:
-                app.logger.error(f"AI campaign response missing required top-level keys: {missing_keys}")
-                app.logger.debug(f"Received data: {parsed_data}")
-                return {"error": f"AI response missing required keys: {', '.join(missing_keys)}"}
-            initial_scene = parsed_data.get('initial_scene', {})
-            if not isinstance(initial_scene, dict) or not all(k in initial_scene for k in ['description', 'state', 'goals']):
-                app.logger.error("AI campaign response 'initial_scene' is missing required keys ('description', 'state', 'goals') or is not a dictionary.")
-                app.logger.debug(f"Received initial_scene: {initial_scene}")
-                return {"error": "Invalid 'initial_scene' structure in AI response."}
-            if not isinstance(initial_scene.get('state'), dict):
-                app.logger.error("AI campaign response 'initial_scene.state' is not a dictionary.")
-                app.logger.debug(f"Received initial_scene state: {initial_scene.get('state')}")
-                return {"error": "Invalid 'initial_scene.state' structure in AI response."}
-            if not isinstance(initial_scene.get('goals'), list):
-                app.logger.error("AI campaign response 'initial_scene.goals' is not a list.")
-                app.logger.debug(f"Received initial_scene goals: {initial_scene.get('goals')}")
-                return {"error": "Invalid 'initial_scene.goals' structure in AI response."}
-            if not isinstance(parsed_data.get('generated_locations'), list):
-                app.logger.warning("AI campaign response 'generated_locations' is not a list.")
-            if not isinstance(parsed_data.get('generated_characters'), list):
-                app.logger.warning("AI campaign response 'generated_characters' is not a list.")
-            plot_points = parsed_data.get('generated_plot_points')
-            if not isinstance(plot_points, list):
-                app.logger.error("AI campaign response 'generated_plot_points' is not a list.")
-                return {"error": "Invalid 'generated_plot_points' structure: not a list."}
-            seen_ids = set()
-            for i, pp in enumerate(plot_points):
-                if not isinstance(pp, dict) or not all(k in pp for k in ['id', 'description', 'required']):
-                    app.logger.error(f"AI campaign response 'generated_plot_points' item {i} is not a dict or missing 'id'/'description'/'required' keys.")
-                    return {"error": f"Invalid 'generated_plot_points' item structure at index {i} (missing id, description, or required)."}
-                plot_id = pp.get('id')
-                if not isinstance(plot_id, str) or not plot_id.strip():
-                    app.logger.error(f"AI campaign response 'generated_plot_points' item {i} 'id' is not a non-empty string.")
-                    return {"error": f"Invalid 'generated_plot_points' item {i} 'id' type or empty."}
-                if plot_id in seen_ids:
-                    app.logger.error(f"AI campaign response 'generated_plot_points' item {i} has duplicate 'id': {plot_id}.")
-                    return {"error": f"Duplicate 'id' ({plot_id}) found in 'generated_plot_points'."}
-                seen_ids.add(plot_id)
-                if not isinstance(pp.get('description'), str):
-                    app.logger.error(f"AI campaign response 'generated_plot_points' item {i} 'description' is not a string.")
-                    return {"error": f"Invalid 'generated_plot_points' item {i} 'description' type."}
-                if not isinstance(pp.get('required'), bool):
-                    app.logger.error(f"AI campaign response 'generated_plot_points' item {i} 'required' is not a boolean.")
-                    return {"error": f"Invalid 'generated_plot_points' item {i} 'required' type."}
-
-            app.logger.info("Validating plot point atomicity...")
-            non_atomic_plot_points = []
-            for i, pp in enumerate(plot_points):
-                plot_id = pp.get('id')
-                description = pp.get('description')
-                is_atomic, issues = self._check_plot_point_atomicity(description)
-
-                if not is_atomic:
-                    non_atomic_plot_points.append({
-                        'id': plot_id,
-                        'description': description,
-                        'issues': issues
-                    })
-                    issue_str = "; ".join(issues)
-                    app.logger.warning(f"Plot point '{plot_id}' may not be atomic: {issue_str}")
-                    app.logger.warning(f"  Description: '{description}'")
-
-            if non_atomic_plot_points:
-                app.logger.warning(f"Found {len(non_atomic_plot_points)} potentially non-atomic plot points out of {len(plot_points)} total.")
-            else:
-                app.logger.info("All plot points appear to be atomic.")
-
-            app.logger.info("--- AI Service: Parsed campaign data successfully (new structure) ---")
-            usage_data = response.usage if response.usage else None
-            model_used = response.model
-            return parsed_data, model_used, usage_data
         except json.JSONDecodeError as e:
             app.logger.error(f"Error decoding AI JSON response: {e}")
             app.logger.error(f"Raw content that failed JSON parsing: {generated_content}")
             return {"error": "AI response content is not valid JSON", "raw_content": generated_content}
+        required_top_level_keys = ['campaign_objective', 'generated_locations', 'generated_characters', 'generated_plot_points', 'initial_scene']
+        missing_keys = [k for k in required_top_level_keys if k not in parsed_data]
+        if missing_keys:
+            app.logger.error(f"AI campaign response missing required top-level keys: {missing_keys}")
+            app.logger.debug(f"Received data: {parsed_data}")
+            return {"error": f"AI response missing required keys: {', '.join(missing_keys)}"}
+        initial_scene = parsed_data.get('initial_scene', {})
+        if not isinstance(initial_scene, dict) or not all(k in initial_scene for k in ['description', 'state', 'goals']):
+            app.logger.error("AI campaign response 'initial_scene' is missing required keys ('description', 'state', 'goals') or is not a dictionary.")
+            app.logger.debug(f"Received initial_scene: {initial_scene}")
+            return {"error": "Invalid 'initial_scene' structure in AI response."}
+        if not isinstance(initial_scene.get('state'), dict):
+            app.logger.error("AI campaign response 'initial_scene.state' is not a dictionary.")
+            app.logger.debug(f"Received initial_scene state: {initial_scene.get('state')}")
+            return {"error": "Invalid 'initial_scene.state' structure in AI response."}
+        if not isinstance(initial_scene.get('goals'), list):
+            app.logger.error("AI campaign response 'initial_scene.goals' is not a list.")
+            app.logger.debug(f"Received initial_scene goals: {initial_scene.get('goals')}")
+            return {"error": "Invalid 'initial_scene.goals' structure in AI response."}
+        if not isinstance(parsed_data.get('generated_locations'), list):
+            app.logger.warning("AI campaign response 'generated_locations' is not a list.")
+        if not isinstance(parsed_data.get('generated_characters'), list):
+            app.logger.warning("AI campaign response 'generated_characters' is not a list.")
+        plot_points = parsed_data.get('generated_plot_points')
+        if not isinstance(plot_points, list):
+            app.logger.error("AI campaign response 'generated_plot_points' is not a list.")
+            return {"error": "Invalid 'generated_plot_points' structure: not a list."}
+        seen_ids = set()
+        for i, pp in enumerate(plot_points):
+            if not isinstance(pp, dict) or not all(k in pp for k in ['id', 'description', 'required']):
+                app.logger.error(f"AI campaign response 'generated_plot_points' item {i} is not a dict or missing 'id'/'description'/'required' keys.")
+                return {"error": f"Invalid 'generated_plot_points' item structure at index {i} (missing id, description, or required)."}
+            plot_id = pp.get('id')
+            if not isinstance(plot_id, str) or not plot_id.strip():
+                app.logger.error(f"AI campaign response 'generated_plot_points' item {i} 'id' is not a non-empty string.")
+                return {"error": f"Invalid 'generated_plot_points' item {i} 'id' type or empty."}
+            if plot_id in seen_ids:
+                app.logger.error(f"AI campaign response 'generated_plot_points' item {i} has duplicate 'id': {plot_id}.")
+                return {"error": f"Duplicate 'id' ({plot_id}) found in 'generated_plot_points'."}
+            seen_ids.add(plot_id)
+            if not isinstance(pp.get('description'), str):
+                app.logger.error(f"AI campaign response 'generated_plot_points' item {i} 'description' is not a string.")
+                return {"error": f"Invalid 'generated_plot_points' item {i} 'description' type."}
+            if not isinstance(pp.get('required'), bool):
+                app.logger.error(f"AI campaign response 'generated_plot_points' item {i} 'required' is not a boolean.")
+                return {"error": f"Invalid 'generated_plot_points' item {i} 'required' type."}
+
+        app.logger.info("Validating plot point atomicity...")
+        non_atomic_plot_points = []
+        for i, pp in enumerate(plot_points):
+            plot_id = pp.get('id')
+            description = pp.get('description')
+            is_atomic, issues = self._check_plot_point_atomicity(description)
+
+            if not is_atomic:
+                non_atomic_plot_points.append({
+                    'id': plot_id,
+                    'description': description,
+                    'issues': issues
+                })
+                issue_str = "; ".join(issues)
+                app.logger.warning(f"Plot point '{plot_id}' may not be atomic: {issue_str}")
+                app.logger.warning(f"  Description: '{description}'")
+
+        if non_atomic_plot_points:
+            app.logger.warning(f"Found {len(non_atomic_plot_points)} potentially non-atomic plot points out of {len(plot_points)} total.")
+        else:
+            app.logger.info("All plot points appear to be atomic.")
+
+        app.logger.info("--- AI Service: Parsed campaign data successfully (new structure) ---")
+        usage_data = response.usage if response.usage else None
+        model_used = response.model
+        return parsed_data, model_used, usage_data
+
+    def generate_campaign(self, template: Template, template_overrides: Optional[Dict[str, Any]] = None, creator_customizations: Optional[Dict[str, Any]] = None, player_details: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+        app = current_app._get_current_object()
+        if not self.client:
+            app.logger.error("OpenAI client not initialized. Cannot generate campaign.")
+            return {"error": "AI service not available."}
+        try:
+            payload = self._build_campaign_payload(app, template, template_overrides, creator_customizations, player_details)
+            with ai_call_span('campaign') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
+            return self._parse_campaign_response(app, response)
         except Exception as e:
             app.logger.error(f"Error calling OpenAI API or processing response: {e}", exc_info=True)
             return {"error": f"Failed to call AI service: {e}"}
@@ -227,7 +276,9 @@ class AIService:
                 "max_tokens": self.max_tokens
             }
             log_ai_debug_payload("Generate initial scene", payload, "initial_scene", 1)
-            response = self.client.chat.completions.create(**payload)
+            with ai_call_span('initial_scene') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
             app.logger.info(f"OpenAI API call successful for initial scene (Game {game.id}).")
             generated_content = response.choices[0].message.content
             app.logger.debug(f"--- AI Service: Received raw initial scene response ---\\n{generated_content}\\n------------------------------------------")
@@ -250,179 +301,242 @@ class AIService:
             app.logger.error(f"Error generating initial scene: {e}", exc_info=True)
             return None
 
-    def get_response(self, game_state: GameState, player_action: str, is_stuck: bool = False, next_required_plot_point: Optional[str] = None, current_difficulty: Optional[str] = None) -> dict | None:
+    def _build_response_payload(self, app, game_state: GameState, player_action: str, is_stuck: bool = False, next_required_plot_point: Optional[str] = None, current_difficulty: Optional[str] = None, context: Optional[str] = None) -> Dict[str, Any] | None:
+        """
+        Builds the Stage 1 chat completion payload for a player action. Returns None if the context cannot be built.
+        A prebuilt context (from build_context) may be passed in so no database access happens here.
+        """
         from questforge.utils.ai_debug_logger import log_ai_debug_payload
-        app = current_app._get_current_object()
-        if not self.client:
-            app.logger.error("OpenAI client not initialized. Cannot get response.")
-            return None
-        context = build_context(game_state, next_required_plot_point)
+        if context is None:
+            context = build_context(game_state, next_required_plot_point)
         if context.startswith("Error:"):
             app.logger.error(f"Error building context: {context}")
             return None
         app.logger.debug(f"--- AI Service: Context built for get_response ---\\n{context}\\n-------------------------------------------------")
-        prompt = build_response_prompt(context, player_action, is_stuck, next_required_plot_point, current_difficulty)
-        app.logger.debug(f"--- AI Service: Getting response with prompt ---\\n{prompt}\\n---------------------------------------------")
-        generated_content = ""
+        # Static instructions -> campaign context -> per-turn tail (stable prefix for prompt caching)
+        messages = build_response_messages(context, player_action, is_stuck, next_required_plot_point, current_difficulty)
+        app.logger.debug(f"--- AI Service: Getting response with prompt ---\\n{format_messages_for_log(messages)}\\n---------------------------------------------")
+        # Use OPENAI_MODEL_LOGIC for critical logic-heavy calls
+        model_to_use = app.config.get('OPENAI_MODEL_LOGIC', 'gpt-4o')
+        app.logger.debug(f"Using OPENAI_MODEL_LOGIC for get_response: {model_to_use}")
+        payload = {
+            "model": model_to_use,
+            "messages": messages,
+            "response_format": {"type": "json_object"},
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        log_ai_debug_payload("Get AI response for player action", payload, "response", 1)
+        return payload
+
+    def _parse_response_content(self, app, generated_content: str, previous_state_data: Dict[str, Any]) -> Dict[str, Any] | None:
+        """
+        Validates the raw Stage 1 JSON content and merges the AI's state changes
+        over the previous state. Returns the stage one output dict or None.
+        """
+        app.logger.debug(f"--- AI Service: Received raw response ---\\n{generated_content}\\n------------------------------------------")
         try:
-            # Use OPENAI_MODEL_LOGIC for critical logic-heavy calls
-            model_to_use = app.config.get('OPENAI_MODEL_LOGIC', 'gpt-4o')
-            app.logger.debug(f"Using OPENAI_MODEL_LOGIC for get_response: {model_to_use}")
-            payload = {
-                "model": model_to_use,
-                "messages": [{"role": "user", "content": prompt}],
-                "response_format": {"type": "json_object"},
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens
-            }
-            log_ai_debug_payload("Get AI response for player action", payload, "response", 1)
-            response = self.client.chat.completions.create(**payload)
-            generated_content = response.choices[0].message.content
-            app.logger.debug(f"--- AI Service: Received raw response ---\\n{generated_content}\\n------------------------------------------")
             parsed_data = json.loads(generated_content)
+        except json.JSONDecodeError as e:
+            app.logger.error(f"Error decoding AI Stage 1 JSON response: {e}")
+            app.logger.error(f"Raw content: {generated_content}")
+            return None
 
-            if not isinstance(parsed_data.get('content'), str):
-                app.logger.error("AI Stage 1 response 'content' (narrative) is missing or not a string.")
-                return None
-            if not isinstance(parsed_data.get('available_actions'), list):
-                app.logger.error("AI Stage 1 response 'available_actions' is missing or not a list.")
-                return None
+        if not isinstance(parsed_data.get('content'), str):
+            app.logger.error("AI Stage 1 response 'content' (narrative) is missing or not a string.")
+            return None
+        if not isinstance(parsed_data.get('available_actions'), list):
+            app.logger.error("AI Stage 1 response 'available_actions' is missing or not a list.")
+            return None
 
-            ai_state_changes = parsed_data.get('state_changes', {})
-            if not isinstance(ai_state_changes, dict):
-                app.logger.error("AI Stage 1 response 'state_changes' is not a dictionary. Using empty state changes.")
-                ai_state_changes = {}
+        ai_state_changes = parsed_data.get('state_changes', {})
+        if not isinstance(ai_state_changes, dict):
+            app.logger.error("AI Stage 1 response 'state_changes' is not a dictionary. Using empty state changes.")
+            ai_state_changes = {}
 
-            final_state_changes = {}
-            previous_state_data = game_state.state_data or {}
+        final_state_changes = {}
+        previous_state_data = previous_state_data or {}
 
-            new_location = ai_state_changes.get('location')
-            if isinstance(new_location, str) and new_location.strip():
-                final_state_changes['location'] = new_location.strip()
+        new_location = ai_state_changes.get('location')
+        if isinstance(new_location, str) and new_location.strip():
+            final_state_changes['location'] = new_location.strip()
+        else:
+            if 'location' in ai_state_changes:
+                app.logger.warning(f"AI provided invalid location: '{new_location}'. Falling back to previous location.")
             else:
-                if 'location' in ai_state_changes:
-                    app.logger.warning(f"AI provided invalid location: '{new_location}'. Falling back to previous location.")
-                else:
-                    app.logger.warning("AI did not provide 'location' in state_changes. Falling back to previous location.")
-                final_state_changes['location'] = previous_state_data.get('location', "Unknown Location")
-
-            new_inventory = ai_state_changes.get('inventory')
-            if isinstance(new_inventory, list) and all(isinstance(item, str) for item in new_inventory):
-                final_state_changes['inventory'] = new_inventory
+                app.logger.warning("AI did not provide 'location' in state_changes. Falling back to previous location.")
+            final_state_changes['location'] = previous_state_data.get('location', "Unknown Location")
+
+        new_inventory = ai_state_changes.get('inventory')
+        if isinstance(new_inventory, list) and all(isinstance(item, str) for item in new_inventory):
+            final_state_changes['inventory'] = new_inventory
+        else:
+            if 'inventory' in ai_state_changes:
+                app.logger.warning(f"AI provided invalid inventory: '{new_inventory}'. Falling back to previous inventory.")
             else:
-                if 'inventory' in ai_state_changes:
-                    app.logger.warning(f"AI provided invalid inventory: '{new_inventory}'. Falling back to previous inventory.")
-                else:
-                    app.logger.warning("AI did not provide 'inventory' in state_changes. Falling back to previous inventory.")
-                final_state_changes['inventory'] = previous_state_data.get('inventory', [])
-
-            new_npc_states = ai_state_changes.get('npc_states')
-            if isinstance(new_npc_states, dict):
-                valid_npc_states = True
-                for npc_id, npc_data in new_npc_states.items():
-                    if not isinstance(npc_id, str) or not isinstance(npc_data, dict):
-                        valid_npc_states = False
-                        break
-                if valid_npc_states:
-                    final_state_changes['npc_states'] = new_npc_states
-                else:
-                    app.logger.warning(f"AI provided 'npc_states' with invalid structure: '{new_npc_states}'. Falling back.")
-                    final_state_changes['npc_states'] = previous_state_data.get('npc_states', {})
+                app.logger.warning("AI did not provide 'inventory' in state_changes. Falling back to previous inventory.")
+            final_state_changes['inventory'] = previous_state_data.get('inventory', [])
+
+        new_npc_states = ai_state_changes.get('npc_states')
+        if isinstance(new_npc_states, dict):
+            valid_npc_states = True
+            for npc_id, npc_data in new_npc_states.items():
+                if not isinstance(npc_id, str) or not isinstance(npc_data, dict):
+                    valid_npc_states = False
+                    break
+            if valid_npc_states:
+                final_state_changes['npc_states'] = new_npc_states
             else:
-                if 'npc_states' in ai_state_changes:
-                    app.logger.warning(f"AI provided invalid npc_states (not a dict): '{new_npc_states}'. Falling back.")
-                else:
-                    app.logger.debug("AI did not provide 'npc_states'. Using previous or default.")
+                app.logger.warning(f"AI provided 'npc_states' with invalid structure: '{new_npc_states}'. Falling back.")
                 final_state_changes['npc_states'] = previous_state_data.get('npc_states', {})
-
-            new_world_objects = ai_state_changes.get('world_objects')
-            if isinstance(new_world_objects, dict):
-                valid_world_objects = True
-                for obj_id, obj_data in new_world_objects.items():
-                    if not isinstance(obj_id, str) or not isinstance(obj_data, dict):
-                        valid_world_objects = False
-                        break
-                if valid_world_objects:
-                    final_state_changes['world_objects'] = new_world_objects
-                else:
-                    app.logger.warning(f"AI provided 'world_objects' with invalid structure: '{new_world_objects}'. Falling back.")
-                    final_state_changes['world_objects'] = previous_state_data.get('world_objects', {})
+        else:
+            if 'npc_states' in ai_state_changes:
+                app.logger.warning(f"AI provided invalid npc_states (not a dict): '{new_npc_states}'. Falling back.")
             else:
-                if 'world_objects' in ai_state_changes:
-                    app.logger.warning(f"AI provided invalid world_objects (not a dict): '{new_world_objects}'. Falling back.")
-                else:
-                    app.logger.debug("AI did not provide 'world_objects'. Using previous or default.")
+                app.logger.debug("AI did not provide 'npc_states'. Using previous or default.")
+            final_state_changes['npc_states'] = previous_state_data.get('npc_states', {})
+
+        new_world_objects = ai_state_changes.get('world_objects')
+        if isinstance(new_world_objects, dict):
+            valid_world_objects = True
+            for obj_id, obj_data in new_world_objects.items():
+                if not isinstance(obj_id, str) or not isinstance(obj_data, dict):
+                    valid_world_objects = False
+                    break
+            if valid_world_objects:
+                final_state_changes['world_objects'] = new_world_objects
+            else:
+                app.logger.warning(f"AI provided 'world_objects' with invalid structure: '{new_world_objects}'. Falling back.")
                 final_state_changes['world_objects'] = previous_state_data.get('world_objects', {})
+        else:
+            if 'world_objects' in ai_state_changes:
+                app.logger.warning(f"AI provided invalid world_objects (not a dict): '{new_world_objects}'. Falling back.")
+            else:
+                app.logger.debug("AI did not provide 'world_objects'. Using previous or default.")
+            final_state_changes['world_objects'] = previous_state_data.get('world_objects', {})
+
+        standard_keys = {'location', 'inventory', 'npc_states', 'world_objects', 'achieved_plot_point_id'}
+        for key, value in ai_state_changes.items():
+            if key not in standard_keys:
+                final_state_changes[key] = value
+                app.logger.debug(f"Merged custom AI state key '{key}'.")
+
+        if 'achieved_plot_point_id' in final_state_changes:
+            app.logger.warning("AI Stage 1 response unexpectedly included 'achieved_plot_point_id'. This should be handled by Stage 3. Removing it.")
+            del final_state_changes['achieved_plot_point_id']
+
+        app.logger.info("--- AI Service: Processed and validated Stage 1 response data successfully ---")
+        stage_one_ai_output = {
+            'narrative': parsed_data['content'],
+            'state_changes': final_state_changes,
+            'available_actions': parsed_data['available_actions']
+        }
+        return stage_one_ai_output
+
+    @staticmethod
+    def _streaming_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a copy of the payload that requests a streamed completion with usage on the final chunk."""
+        return dict(payload, stream=True, stream_options={"include_usage": True})
+
+    @staticmethod
+    def _emit_stream_delta(app, stream_callback: Callable[[str], None], delta: str):
+        """Passes a narrative delta to the caller's callback. Callback failures never abort the AI call."""
+        try:
+            stream_callback(delta)
+        except Exception as e:
+            app.logger.warning(f"Narrative stream callback failed: {e}")
 
-            standard_keys = {'location', 'inventory', 'npc_states', 'world_objects', 'achieved_plot_point_id'}
-            for key, value in ai_state_changes.items():
-                if key not in standard_keys:
-                    final_state_changes[key] = value
-                    app.logger.debug(f"Merged custom AI state key '{key}'.")
-
-            if 'achieved_plot_point_id' in final_state_changes:
-                app.logger.warning("AI Stage 1 response unexpectedly included 'achieved_plot_point_id'. This should be handled by Stage 3. Removing it.")
-                del final_state_changes['achieved_plot_point_id']
+    def get_response(self, game_state: GameState, player_action: str, is_stuck: bool = False, next_required_plot_point: Optional[str] = None, current_difficulty: Optional[str] = None, stream_callback: Optional[Callable[[str], None]] = None, context: Optional[str] = None) -> dict | None:
+        """
+        Stage 1: generates the narrative, state changes and available actions for a player action.
 
-            app.logger.info("--- AI Service: Processed and validated Stage 1 response data successfully ---")
-            usage_data = response.usage if response.usage else None
-            model_used = response.model
+        If stream_callback is given, the completion is streamed and the callback receives
+        each newly decoded piece of the 'content' (narrative) field as it arrives. The
+        return value is the same either way and is only produced once the full response
+        has been validated.
 
-            stage_one_ai_output = {
-                'narrative': parsed_data['content'],
-                'state_changes': final_state_changes,
-                'available_actions': parsed_data['available_actions']
-            }
-            return stage_one_ai_output, model_used, usage_data
-        except json.JSONDecodeError as e:
-            app.logger.error(f"Error decoding AI Stage 1 JSON response: {e}")
-            app.logger.error(f"Raw content: {generated_content}")
+        If context is given (a string prebuilt with build_context), no database access
+        happens and only game_state.state_data is read, so a detached snapshot is fine.
+        """
+        app = current_app._get_current_object()
+        if not self.client:
+            app.logger.error("OpenAI client not initialized. Cannot get response.")
+            return None
+        payload = self._build_response_payload(app, game_state, player_action, is_stuck, next_required_plot_point, current_difficulty, context)
+        if payload is None:
             return None
+        try:
+            if stream_callback:
+                accumulator = CompletionStreamAccumulator('content')
+                with ai_call_span('response', stream=True) as ai_span:
+                    for chunk in self.client.chat.completions.create(**self._streaming_payload(payload)):
+                        delta = accumulator.add_chunk(chunk)
+                        if delta:
+                            self._emit_stream_delta(app, stream_callback, delta)
+                    generated_content, model_used, usage_data = accumulator.content, accumulator.model, accumulator.usage
+                    ai_span.record_usage(model_used, usage_data)
+            else:
+                with ai_call_span('response') as ai_span:
+                    response = self.client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                generated_content = response.choices[0].message.content
+                usage_data = response.usage if response.usage else None
+                model_used = response.model
+            stage_one_ai_output = self._parse_response_content(app, generated_content, game_state.state_data)
+            if stage_one_ai_output is None:
+                return None
+            return stage_one_ai_output, model_used, usage_data
         except Exception as e:
             app.logger.error(f"Error generating response: {e}", exc_info=True)
             return None
 
-    def generate_character_name(self, description: str) -> str | None:
+    def _build_character_name_payload(self, app, description: str) -> Dict[str, Any]:
+        """Builds the chat completion payload for generating a character name."""
         from questforge.utils.ai_debug_logger import log_ai_debug_payload
+        prompt = build_character_name_prompt(description)
+        app.logger.debug(f"--- AI Service: Generating character name with prompt ---\\n{prompt}\\n-------------------------------------------------")
+        # Use OPENAI_MODEL_MAIN for less critical calls
+        model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
+        app.logger.debug(f"Using OPENAI_MODEL_MAIN for generate_character_name: {model_to_use}")
+        payload = {
+            "model": model_to_use,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "max_tokens": 50
+        }
+        log_ai_debug_payload("Generate character name", payload, "charactername", 1)
+        return payload
+
+    def _parse_character_name_response(self, app, response) -> str | None:
+        """Extracts and cleans the generated character name from a completion response."""
+        generated_name = response.choices[0].message.content.strip()
+        app.logger.debug(f"--- AI Service: Received raw name response ---\\n{generated_name}\\n------------------------------------------")
+        generated_name = generated_name.strip('"\'')
+
+        if not generated_name:
+            app.logger.warning("AI generated an empty character name.")
+            return None
+        app.logger.info(f"--- AI Service: Generated character name successfully: {generated_name} ---")
+        return generated_name
+
+    def generate_character_name(self, description: str) -> str | None:
         app = current_app._get_current_object()
         if not self.client:
             app.logger.error("OpenAI client not initialized. Cannot generate character name.")
             return None
-        prompt = build_character_name_prompt(description)
-        app.logger.debug(f"--- AI Service: Generating character name with prompt ---\\n{prompt}\\n-------------------------------------------------")
-        generated_name = None
         try:
-            # Use OPENAI_MODEL_MAIN for less critical calls
-            model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
-            app.logger.debug(f"Using OPENAI_MODEL_MAIN for generate_character_name: {model_to_use}")
-            payload = {
-                "model": model_to_use,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": self.temperature,
-                "max_tokens": 50
-            }
-            log_ai_debug_payload("Generate character name", payload, "charactername", 1)
-            response = self.client.chat.completions.create(**payload)
-            generated_name = response.choices[0].message.content.strip()
-            app.logger.debug(f"--- AI Service: Received raw name response ---\\n{generated_name}\\n------------------------------------------")
-            generated_name = generated_name.strip('"\'')
-
-            if not generated_name:
-                app.logger.warning("AI generated an empty character name.")
-                return None
-            app.logger.info(f"--- AI Service: Generated character name successfully: {generated_name} ---")
-            return generated_name
+            payload = self._build_character_name_payload(app, description)
+            with ai_call_span('character_name') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
+            return self._parse_character_name_response(app, response)
         except Exception as e:
             app.logger.error(f"Error calling OpenAI API or processing name response: {e}", exc_info=True)
             return None
 
-    def get_ai_hint(self, game_state: GameState, campaign: Campaign) -> Optional[Tuple[str, str, Optional[Dict[str, int]]]]:
+    def _build_hint_payload(self, app, game_state: GameState, campaign: Campaign) -> Dict[str, Any] | None:
+        """Builds the chat completion payload for an in-game hint. Returns None if the context cannot be built."""
         from questforge.utils.ai_debug_logger import log_ai_debug_payload
-        app = current_app._get_current_object()
-        if not self.client:
-            app.logger.error("OpenAI client not initialized. Cannot get hint.")
-            return None
-
         next_required_plot_point_desc = None
         state_data = game_state.state_data or {}
         completed_plot_points_data = state_data.get('completed_plot_points', [])
@@ -461,47 +575,59 @@ class AIService:
             else:
                 app.logger.warning(f"campaign.campaign_data for game {game_state.game_id} is not a dict after potential parse in get_ai_hint.")
 
-        prompt = build_hint_prompt(
+        messages = build_hint_messages(
             context=context_for_hint,
             campaign_objective=campaign_objective_text,
             next_required_plot_point_desc=next_required_plot_point_desc
         )
-        app.logger.debug(f"--- AI Service: Getting hint with prompt ---\\n{prompt}\\n---------------------------------------------")
+        app.logger.debug(f"--- AI Service: Getting hint with prompt ---\\n{format_messages_for_log(messages)}\\n---------------------------------------------")
+
+        # Use OPENAI_MODEL_MAIN for less critical calls
+        model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
+        app.logger.debug(f"Using OPENAI_MODEL_MAIN for get_ai_hint: {model_to_use}")
+
+        payload = {
+            "model": model_to_use,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": 150
+        }
+        log_ai_debug_payload("Get AI hint", payload, "hint", 1)
+        return payload
+
+    def _parse_hint_response(self, app, response) -> str | None:
+        """Extracts the hint text from a completion response."""
+        generated_hint = response.choices[0].message.content.strip()
+        app.logger.debug(f"--- AI Service: Received raw hint response ---\\n{generated_hint}\\n------------------------------------------")
+
+        if not generated_hint:
+            app.logger.warning("AI generated an empty hint.")
+            return None
+        return generated_hint
 
-        generated_hint = ""
-        try:
-            # Use OPENAI_MODEL_MAIN for less critical calls
-            model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
-            app.logger.debug(f"Using OPENAI_MODEL_MAIN for get_ai_hint: {model_to_use}")
+    def get_ai_hint(self, game_state: GameState, campaign: Campaign) -> Optional[Tuple[str, str, Optional[Dict[str, int]]]]:
+        app = current_app._get_current_object()
+        if not self.client:
+            app.logger.error("OpenAI client not initialized. Cannot get hint.")
+            return None
 
-            payload = {
-                "model": model_to_use,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": self.temperature,
-                "max_tokens": 150
-            }
-            log_ai_debug_payload("Get AI hint", payload, "hint", 1)
-            response = self.client.chat.completions.create(**payload)
-            generated_hint = response.choices[0].message.content.strip()
-            app.logger.debug(f"--- AI Service: Received raw hint response ---\\n{generated_hint}\\n------------------------------------------")
+        payload = self._build_hint_payload(app, game_state, campaign)
+        if payload is None:
+            return None
 
-            if not generated_hint:
-                app.logger.warning("AI generated an empty hint.")
+        try:
+            with ai_call_span('hint') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
+            generated_hint = self._parse_hint_response(app, response)
+            if generated_hint is None:
                 return None
 
             usage_data = response.usage if response.usage else None
             model_used = response.model
 
             if game_state.game_id and usage_data:
-                cost = calculate_cost(model_used, {'prompt_tokens': usage_data.prompt_tokens, 'completion_tokens': usage_data.completion_tokens})
-                log_api_usage(
-                    model_name=model_used,
-                    prompt_tokens=usage_data.prompt_tokens,
-                    completion_tokens=usage_data.completion_tokens,
-                    total_tokens=usage_data.total_tokens,
-                    cost=cost,
-                    game_id=game_state.game_id
-                )
+                self._log_usage(model_used, usage_data, game_state.game_id)
 
             return generated_hint, model_used, usage_data
 
@@ -509,6 +635,96 @@ class AIService:
             app.logger.error(f"Error generating hint: {e}", exc_info=True)
             return None
 
+    def _build_plot_check_payload(
+        self,
+        app,
+        plot_point_id: str,
+        plot_point_description: str,
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str
+    ) -> Dict[str, Any]:
+        """Builds the chat completion payload for a single atomic plot point check."""
+        from questforge.utils.ai_debug_logger import log_ai_debug_payload
+        messages = build_plot_completion_check_messages(
+            plot_point_id=plot_point_id,
+            plot_point_description=plot_point_description,
+            current_game_state_data=current_game_state_data,
+            player_action=player_action,
+            stage_one_narrative=stage_one_narrative
+        )
+        app.logger.debug(f"--- AI Service: Checking plot point completion with prompt ---\\n{format_messages_for_log(messages)}\\n-------------------------------------------------")
+        # Use OPENAI_MODEL_MAIN for less critical calls; remove OPENAI_MODEL_PLOT_CHECK usage
+        model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
+        app.logger.debug(f"Using OPENAI_MODEL_MAIN for check_atomic_plot_completion: {model_to_use}")
+
+        payload = {
+            "model": model_to_use,
+            "messages": messages,
+            "response_format": {"type": "json_object"},
+            "temperature": 0.2,
+            "max_tokens": 256
+        }
+        log_ai_debug_payload("Check atomic plot completion", payload, "plotcheck", 1)
+        return payload
+
+    def _parse_plot_check_response(self, app, response, plot_point_id: str) -> Dict[str, Any]:
+        """
+        Validates a plot check completion response.
+
+        Returns:
+            The normalized result dict ('plot_point_id', 'completed', 'confidence_score',
+            'model_used', 'usage_data') or an {"error": ...} dict.
+        """
+        generated_content = response.choices[0].message.content
+        app.logger.debug(f"--- AI Service: Received raw plot check response ---\\n{generated_content}\\n------------------------------------------")
+
+        try:
+            parsed_data = json.loads(generated_content)
+        except json.JSONDecodeError as e:
+            app.logger.error(f"Error decoding AI plot check JSON response: {e}")
+            app.logger.error(f"Raw content: {generated_content}")
+            return {"error": "AI response content is not valid JSON", "raw_content": generated_content}
+
+        required_keys = ['plot_point_id', 'completed', 'confidence_score']
+        missing_keys = [k for k in required_keys if k not in parsed_data]
+        if missing_keys:
+            app.logger.error(f"AI plot check response missing required keys: {missing_keys}. Data: {parsed_data}")
+            return {"error": f"AI response missing required keys: {', '.join(missing_keys)}", "raw_content": generated_content}
+
+        if not isinstance(parsed_data.get('plot_point_id'), str) or parsed_data.get('plot_point_id') != plot_point_id:
+            app.logger.error(f"AI plot check response 'plot_point_id' mismatch or not a string. Expected: {plot_point_id}, Got: {parsed_data.get('plot_point_id')}")
+            return {"error": "Invalid 'plot_point_id' in AI response", "raw_content": generated_content}
+        if not isinstance(parsed_data.get('completed'), bool):
+            app.logger.error(f"AI plot check response 'completed' is not a boolean. Got: {parsed_data.get('completed')}")
+            return {"error": "Invalid 'completed' type in AI response", "raw_content": generated_content}
+        if not isinstance(parsed_data.get('confidence_score'), (float, int)):
+            app.logger.error(f"AI plot check response 'confidence_score' is not a float/int. Got: {parsed_data.get('confidence_score')}")
+            return {"error": "Invalid 'confidence_score' type in AI response", "raw_content": generated_content}
+
+        confidence = float(parsed_data['confidence_score'])
+        if not (0.0 <= confidence <= 1.0):
+            app.logger.error(f"AI plot check response 'confidence_score' out of range (0.0-1.0). Got: {confidence}")
+            return {"error": "'confidence_score' out of range", "raw_content": generated_content}
+        parsed_data['confidence_score'] = confidence
+
+        app.logger.info(f"--- AI Service: Parsed plot check data successfully for {plot_point_id} ---")
+
+        usage_data = response.usage if response.usage else None
+        model_used = response.model
+
+        return {
+            'plot_point_id': parsed_data['plot_point_id'],
+            'completed': parsed_data['completed'],
+            'confidence_score': parsed_data['confidence_score'],
+            'model_used': model_used,
+            'usage_data': {
+                'prompt_tokens': usage_data.prompt_tokens if usage_data else 0,
+                'completion_tokens': usage_data.completion_tokens if usage_data else 0,
+                'total_tokens': usage_data.total_tokens if usage_data else 0,
+            } if usage_data else None
+        }
+
     def check_atomic_plot_completion(
         self,
         plot_point_id: str,
@@ -518,165 +734,223 @@ class AIService:
         stage_one_narrative: str,
         game_id: Optional[int] = None
     ) -> Dict[str, Any] | None:
-        from questforge.utils.ai_debug_logger import log_ai_debug_payload
         app = current_app._get_current_object()
         if not self.client:
             app.logger.error("OpenAI client not initialized. Cannot check plot point completion.")
             return None
 
-        prompt = build_plot_completion_check_prompt(
-            plot_point_id=plot_point_id,
-            plot_point_description=plot_point_description,
+        try:
+            payload = self._build_plot_check_payload(app, plot_point_id, plot_point_description, current_game_state_data, player_action, stage_one_narrative)
+            with ai_call_span('plot_check') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
+            result = self._parse_plot_check_response(app, response, plot_point_id)
+
+            if game_id and 'error' not in result and response.usage:
+                self._log_usage(result['model_used'], response.usage, game_id)
+
+            return result
+
+        except Exception as e:
+            app.logger.error(f"Error in check_atomic_plot_completion for {plot_point_id}: {e}", exc_info=True)
+            return {"error": f"Failed to check plot point completion: {e}"}
+
+    def _build_batch_plot_check_payload(
+        self,
+        app,
+        plot_points: List[Dict[str, Any]],
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str
+    ) -> Dict[str, Any]:
+        """Builds the chat completion payload that checks several plot points in one request."""
+        from questforge.utils.ai_debug_logger import log_ai_debug_payload
+        messages = build_batch_plot_completion_check_messages(
+            plot_points=plot_points,
             current_game_state_data=current_game_state_data,
             player_action=player_action,
             stage_one_narrative=stage_one_narrative
         )
-        app.logger.debug(f"--- AI Service: Checking plot point completion with prompt ---\\n{prompt}\\n-------------------------------------------------")
-        generated_content = ""
-        try:
-            # Use OPENAI_MODEL_MAIN for less critical calls; remove OPENAI_MODEL_PLOT_CHECK usage
-            model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
-            app.logger.debug(f"Using OPENAI_MODEL_MAIN for check_atomic_plot_completion: {model_to_use}")
-
-            payload = {
-                "model": model_to_use,
-                "messages": [
-                    {"role": "system", "content": "You are an analytical AI assistant. Evaluate the game event based on the provided objective and context. Respond ONLY with the requested JSON object."},
-                    {"role": "user", "content": prompt}
-                ],
-                "response_format": {"type": "json_object"},
-                "temperature": 0.2,
-                "max_tokens": 256
-            }
-            log_ai_debug_payload("Check atomic plot completion", payload, "plotcheck", 1)
-            response = self.client.chat.completions.create(**payload)
-            generated_content = response.choices[0].message.content
-            app.logger.debug(f"--- AI Service: Received raw plot check response ---\\n{generated_content}\\n------------------------------------------")
+        app.logger.debug(f"--- AI Service: Checking {len(plot_points)} plot points in one batch with prompt ---\\n{format_messages_for_log(messages)}\\n-------------------------------------------------")
+        model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini')
+        app.logger.debug(f"Using OPENAI_MODEL_MAIN for check_batch_plot_completion: {model_to_use}")
+
+        payload = {
+            "model": model_to_use,
+            "messages": messages,
+            "response_format": {"type": "json_object"},
+            "temperature": 0.2,
+            "max_tokens": 64 + 64 * len(plot_points) # Roughly one small JSON entry per plot point
+        }
+        log_ai_debug_payload("Check batched plot completion", payload, "plotcheck_batch", 1)
+        return payload
+
+    def _parse_batch_plot_check_response(self, app, response, plot_point_ids: List[str]) -> List[Dict[str, Any]] | Dict[str, Any]:
+        """
+        Validates a batched plot check response.
 
-            parsed_data = json.loads(generated_content)
+        Entries that are malformed, duplicated or for IDs that were not requested are
+        dropped (and logged), so the caller can fall back to single checks for them.
 
-            required_keys = ['plot_point_id', 'completed', 'confidence_score']
-            missing_keys = [k for k in required_keys if k not in parsed_data]
-            if missing_keys:
-                app.logger.error(f"AI plot check response missing required keys: {missing_keys}. Data: {parsed_data}")
-                return {"error": f"AI response missing required keys: {', '.join(missing_keys)}", "raw_content": generated_content}
-
-            if not isinstance(parsed_data.get('plot_point_id'), str) or parsed_data.get('plot_point_id') != plot_point_id:
-                app.logger.error(f"AI plot check response 'plot_point_id' mismatch or not a string. Expected: {plot_point_id}, Got: {parsed_data.get('plot_point_id')}")
-                return {"error": "Invalid 'plot_point_id' in AI response", "raw_content": generated_content}
-            if not isinstance(parsed_data.get('completed'), bool):
-                app.logger.error(f"AI plot check response 'completed' is not a boolean. Got: {parsed_data.get('completed')}")
-                return {"error": "Invalid 'completed' type in AI response", "raw_content": generated_content}
-            if not isinstance(parsed_data.get('confidence_score'), (float, int)):
-                app.logger.error(f"AI plot check response 'confidence_score' is not a float/int. Got: {parsed_data.get('confidence_score')}")
-                return {"error": "Invalid 'confidence_score' type in AI response", "raw_content": generated_content}
-
-            confidence = float(parsed_data['confidence_score'])
-            if not (0.0 <= confidence <= 1.0):
-                app.logger.error(f"AI plot check response 'confidence_score' out of range (0.0-1.0). Got: {confidence}")
-                return {"error": "'confidence_score' out of range", "raw_content": generated_content}
-            parsed_data['confidence_score'] = confidence
-
-            app.logger.info(f"--- AI Service: Parsed plot check data successfully for {plot_point_id} ---")
+        Returns:
+            A list of result dicts in the same shape as _parse_plot_check_response, in the
+            order the IDs were requested, or an {"error": ...} dict if the response is unusable.
+        """
+        generated_content = response.choices[0].message.content
+        app.logger.debug(f"--- AI Service: Received raw batch plot check response ---\\n{generated_content}\\n------------------------------------------")
 
-            usage_data = response.usage if response.usage else None
-            model_used = response.model
+        try:
+            parsed_data = json.loads(generated_content)
+        except json.JSONDecodeError as e:
+            app.logger.error(f"Error decoding AI batch plot check JSON response: {e}")
+            app.logger.error(f"Raw content: {generated_content}")
+            return {"error": "AI response content is not valid JSON", "raw_content": generated_content}
 
-            if game_id and usage_data:
-                cost = calculate_cost(model_used, {'prompt_tokens': usage_data.prompt_tokens, 'completion_tokens': usage_data.completion_tokens})
-                log_api_usage(
-                    model_name=model_used,
-                    prompt_tokens=usage_data.prompt_tokens,
-                    completion_tokens=usage_data.completion_tokens,
-                    total_tokens=usage_data.total_tokens,
-                    cost=cost,
-                    game_id=game_id
-                )
-
-            return {
-                'plot_point_id': parsed_data['plot_point_id'],
-                'completed': parsed_data['completed'],
-                'confidence_score': parsed_data['confidence_score'],
+        entries = parsed_data.get('results') if isinstance(parsed_data, dict) else None
+        if not isinstance(entries, list):
+            app.logger.error(f"AI batch plot check response 'results' is missing or not a list. Data: {parsed_data}")
+            return {"error": "AI response missing 'results' list", "raw_content": generated_content}
+
+        model_used = response.model
+        results_by_id = {}
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                app.logger.warning(f"AI batch plot check entry {i} is not a dict. Skipping.")
+                continue
+            entry_id = entry.get('plot_point_id')
+            if entry_id not in plot_point_ids:
+                app.logger.warning(f"AI batch plot check entry {i} has unexpected plot_point_id '{entry_id}'. Skipping.")
+                continue
+            if entry_id in results_by_id:
+                app.logger.warning(f"AI batch plot check returned plot_point_id '{entry_id}' more than once. Keeping the first entry.")
+                continue
+            if not isinstance(entry.get('completed'), bool):
+                app.logger.warning(f"AI batch plot check entry for '{entry_id}' has invalid 'completed': {entry.get('completed')}. Skipping.")
+                continue
+            confidence = entry.get('confidence_score')
+            if not isinstance(confidence, (float, int)) or isinstance(confidence, bool) or not (0.0 <= float(confidence) <= 1.0):
+                app.logger.warning(f"AI batch plot check entry for '{entry_id}' has invalid 'confidence_score': {confidence}. Skipping.")
+                continue
+            results_by_id[entry_id] = {
+                'plot_point_id': entry_id,
+                'completed': entry['completed'],
+                'confidence_score': float(confidence),
                 'model_used': model_used,
-                'usage_data': {
-                    'prompt_tokens': usage_data.prompt_tokens if usage_data else 0,
-                    'completion_tokens': usage_data.completion_tokens if usage_data else 0,
-                    'total_tokens': usage_data.total_tokens if usage_data else 0,
-                } if usage_data else None
+                'usage_data': None # Usage is recorded once for the whole batch
             }
 
-        except json.JSONDecodeError as e:
-            app.logger.error(f"Error decoding AI plot check JSON response: {e}")
-            app.logger.error(f"Raw content: {generated_content}")
-            return {"error": "AI response content is not valid JSON", "raw_content": generated_content}
-        except Exception as e:
-            app.logger.error(f"Error in check_atomic_plot_completion for {plot_point_id}: {e}", exc_info=True)
-            return {"error": f"Failed to check plot point completion: {e}"}
+        missing_ids = [pp_id for pp_id in plot_point_ids if pp_id not in results_by_id]
+        if missing_ids:
+            app.logger.warning(f"AI batch plot check response did not cover plot point IDs: {missing_ids}")
+        app.logger.info(f"--- AI Service: Parsed batch plot check data for {len(results_by_id)}/{len(plot_point_ids)} plot points ---")
+        return [results_by_id[pp_id] for pp_id in plot_point_ids if pp_id in results_by_id]
 
-    def generate_historical_summary(self, player_action: str, stage_one_narrative: str, state_changes: Dict[str, Any], game_id: Optional[int] = None) -> Optional[str]:
+    def check_batch_plot_completion(
+        self,
+        plot_points: List[Dict[str, Any]],
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str,
+        game_id: Optional[int] = None
+    ) -> List[Dict[str, Any]] | Dict[str, Any] | None:
         """
-        Generates a concise historical summary of a game turn using a secondary AI model.
+        Checks several atomic plot points for completion in a single AI request.
+
+        Returns:
+            A list of per-ID results in the same shape as check_atomic_plot_completion
+            (IDs the AI did not answer validly are omitted), or an {"error": ...} dict.
         """
-        from questforge.utils.ai_debug_logger import log_ai_debug_payload
         app = current_app._get_current_object()
         if not self.client:
-            app.logger.error("OpenAI client not initialized. Cannot generate historical summary.")
+            app.logger.error("OpenAI client not initialized. Cannot check plot point completion.")
             return None
 
+        plot_point_ids = [pp.get('id') for pp in plot_points]
+        try:
+            payload = self._build_batch_plot_check_payload(app, plot_points, current_game_state_data, player_action, stage_one_narrative)
+            with ai_call_span('batch_plot_check') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
+            results = self._parse_batch_plot_check_response(app, response, plot_point_ids)
+
+            if game_id and response.usage:
+                self._log_usage(response.model, response.usage, game_id)
+
+            return results
+
+        except Exception as e:
+            app.logger.error(f"Error in check_batch_plot_completion for {plot_point_ids}: {e}", exc_info=True)
+            return {"error": f"Failed to check plot point completion: {e}"}
+
+    def _build_summary_payload(self, app, player_action: str, stage_one_narrative: str, state_changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds the chat completion payload for a historical turn summary."""
         prompt = build_summary_prompt(
             player_action=player_action,
             stage_one_narrative=stage_one_narrative,
             state_changes=state_changes
         )
         app.logger.debug(f"--- AI Service: Generating historical summary with prompt ---\\n{prompt}\\n-------------------------------------------------")
-        
-        generated_summary = ""
-        try:
-            model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini') # Use OPENAI_MODEL_MAIN
-            app.logger.debug(f"Using OPENAI_MODEL_MAIN for generate_historical_summary: {model_to_use}")
-            
-            payload = {
-                "model": model_to_use,
-                "messages": [
-                    {"role": "system", "content": "You are an AI assistant that concisely summarizes game events. Output ONLY the summary string."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.5, # Slightly lower temperature for more factual summary
-                "max_tokens": 100 # Max tokens for a concise summary
-            }
-            # Assuming game_id is available if we want to log this payload specifically
-            # log_ai_debug_payload("Generate historical summary", payload, "summary", game_id if game_id else 0) # game_id might not be directly available here, consider passing if needed for logging
 
-            response = self.client.chat.completions.create(**payload)
-            generated_summary = response.choices[0].message.content.strip()
-            
-            app.logger.debug(f"--- AI Service: Received raw summary response ---\\n{generated_summary}\\n------------------------------------------")
+        model_to_use = app.config.get('OPENAI_MODEL_MAIN', 'gpt-4o-mini') # Use OPENAI_MODEL_MAIN
+        app.logger.debug(f"Using OPENAI_MODEL_MAIN for generate_historical_summary: {model_to_use}")
+
+        payload = {
+            "model": model_to_use,
+            "messages": [
+                {"role": "system", "content": "You are an AI assistant that concisely summarizes game events. Output ONLY the summary string."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.5, # Slightly lower temperature for more factual summary
+            "max_tokens": 100 # Max tokens for a concise summary
+        }
+        # Assuming game_id is available if we want to log this payload specifically
+        # log_ai_debug_payload("Generate historical summary", payload, "summary", game_id if game_id else 0) # game_id might not be directly available here, consider passing if needed for logging
+        return payload
+
+    def _parse_summary_response(self, app, response) -> Optional[str]:
+        """Extracts the summary text from a completion response."""
+        generated_summary = response.choices[0].message.content.strip()
+
+        app.logger.debug(f"--- AI Service: Received raw summary response ---\\n{generated_summary}\\n------------------------------------------")
+
+        if not generated_summary:
+            app.logger.warning("AI generated an empty historical summary.")
+            return None
+        return generated_summary
 
-            if not generated_summary:
-                app.logger.warning("AI generated an empty historical summary.")
+    def generate_historical_summary(self, player_action: str, stage_one_narrative: str, state_changes: Dict[str, Any], game_id: Optional[int] = None) -> Optional[str]:
+        """
+        Generates a concise historical summary of a game turn using a secondary AI model.
+        """
+        app = current_app._get_current_object()
+        if not self.client:
+            app.logger.error("OpenAI client not initialized. Cannot generate historical summary.")
+            return None
+
+        try:
+            payload = self._build_summary_payload(app, player_action, stage_one_narrative, state_changes)
+            with ai_call_span('historical_summary') as ai_span:
+                response = self.client.chat.completions.create(**payload)
+                ai_span.record_response(response)
+            generated_summary = self._parse_summary_response(app, response)
+            if generated_summary is None:
                 return None
 
             # Log API usage
-            usage_data = response.usage if response.usage else None
-            model_used = response.model
-            if game_id and usage_data: # Ensure game_id is passed if logging is desired
-                cost = calculate_cost(model_used, {'prompt_tokens': usage_data.prompt_tokens, 'completion_tokens': usage_data.completion_tokens})
-                log_api_usage(
-                    model_name=model_used,
-                    prompt_tokens=usage_data.prompt_tokens,
-                    completion_tokens=usage_data.completion_tokens,
-                    total_tokens=usage_data.total_tokens,
-                    cost=cost,
-                    game_id=game_id
-                )
+            if game_id and response.usage: # Ensure game_id is passed if logging is desired
+                cost = self._log_usage(response.model, response.usage, game_id)
                 app.logger.info(f"Logged API usage for historical summary (Game {game_id}). Cost: {cost}")
-            
+
             return generated_summary
 
         except Exception as e:
             app.logger.error(f"Error generating historical summary: {e}", exc_info=True)
             return None
 
+    def _log_usage(self, model_used: str, usage_data, game_id: Optional[int]) -> Decimal:
+        """Calculates the cost of a completion's usage and records it via log_api_usage. Returns the cost."""
+        return log_completion_usage(model_used, usage_data, game_id)
+
 
 def call_openai_api(prompt: str, model: str = 'gpt-4o') -> Tuple[Dict[str, Any], Decimal]:
     api_key = current_app.config.get('OPENAI_API_KEY')
@@ -703,19 +977,34 @@ def call_openai_api(prompt: str, model: str = 'gpt-4o') -> Tuple[Dict[str, Any],
         raise
 
 
+def cached_prompt_tokens(usage_data) -> int:
+    """Number of prompt tokens served from the provider's prompt cache (usage.prompt_tokens_details.cached_tokens)."""
+    details = getattr(usage_data, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        return details.get('cached_tokens') or 0
+    return getattr(details, 'cached_tokens', None) or 0
+
+
 def calculate_cost(model: str, usage: Dict[str, int]) -> Decimal:
     pricing = current_app.config.get('OPENAI_PRICING', {})
     prompt_tokens = usage.get('prompt_tokens', 0)
     completion_tokens = usage.get('completion_tokens', 0)
+    # Cached prompt tokens are billed at the model's 'cached_prompt' price, or a fixed ratio of the prompt price
+    cached_tokens = min(usage.get('cached_tokens', 0) or 0, prompt_tokens)
     prompt_cost_per_million = pricing.get(model, {}).get('prompt', 0)
     completion_cost_per_million = pricing.get(model, {}).get('completion', 0)
-    prompt_cost = (Decimal(prompt_tokens) / Decimal(1_000_000)) * Decimal(prompt_cost_per_million)
+    cached_cost_per_million = pricing.get(model, {}).get(
+        'cached_prompt',
+        Decimal(str(prompt_cost_per_million)) * Decimal(str(current_app.config.get('OPENAI_CACHED_PROMPT_PRICE_RATIO', 0.5)))
+    )
+    prompt_cost = (Decimal(prompt_tokens - cached_tokens) / Decimal(1_000_000)) * Decimal(prompt_cost_per_million)
+    prompt_cost += (Decimal(cached_tokens) / Decimal(1_000_000)) * Decimal(str(cached_cost_per_million))
     completion_cost = (Decimal(completion_tokens) / Decimal(1_000_000)) * Decimal(completion_cost_per_million)
     total_cost = prompt_cost + completion_cost
     return total_cost.quantize(Decimal('0.000001'))
 
 
-def log_api_usage(model_name: str, prompt_tokens: int, completion_tokens: int, total_tokens: int, cost: Decimal, game_id: Optional[int] = None):
+def log_api_usage(model_name: str, prompt_tokens: int, completion_tokens: int, total_tokens: int, cost: Decimal, game_id: Optional[int] = None, in_transaction: bool = False, cached_tokens: int = 0):
     """
     Logs API usage to the database.
 
@@ -726,17 +1015,83 @@ def log_api_usage(model_name: str, prompt_tokens: int, completion_tokens: int, t
         total_tokens: Total number of tokens.
         cost: The calculated cost of the API call.
         game_id: Optional ID of the game associated with the usage.
+        in_transaction: False (default) hands the row to the usage_recorder buffer, which writes it
+            in a bulk insert of its own shortly after; nothing touches the caller's session.
+            True adds the row (and the Game.total_cost increment) to the caller's session
+            without committing; it is written when the caller commits.
+        cached_tokens: Prompt tokens served from the provider's prompt cache (part of prompt_tokens).
     """
+    observe_ai_cost(model_name, cost)
+    if not in_transaction:
+        usage_recorder.record(
+            model_name=model_name,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            cost=cost,
+            game_id=game_id,
+            cached_tokens=cached_tokens
+        )
+        return
     log_entry = ApiUsageLog(
         model_name=model_name,
         prompt_tokens=prompt_tokens,
         completion_tokens=completion_tokens,
         total_tokens=total_tokens,
         cost=cost,
-        game_id=game_id
+        game_id=game_id,
+        cached_tokens=cached_tokens or 0
     )
     db.session.add(log_entry)
+    record_game_cost(game_id, cost)
+
+
+def recompute_game_costs(game_id: Optional[int] = None) -> int:
+    """
+    Rebuilds Game.total_cost from the raw ApiUsageLog rows (all games, or just game_id) and commits.
+
+    Returns:
+        The number of games updated.
+    """
+    usage_sum = (
+        sa.select(sa.func.coalesce(sa.func.sum(ApiUsageLog.cost), 0))
+        .where(ApiUsageLog.game_id == Game.id)
+        .scalar_subquery()
+    )
+    statement = sa.update(Game).values(total_cost=usage_sum).execution_options(synchronize_session=False)
+    if game_id is not None:
+        statement = statement.where(Game.id == game_id)
+    result = db.session.execute(statement)
     db.session.commit()
+    current_app.logger.info(f"Recomputed total_cost for {result.rowcount} game(s).")
+    return result.rowcount
+
+
+def log_completion_usage(model_used: str, usage_data, game_id: Optional[int] = None, in_transaction: bool = False) -> Decimal:
+    """
+    Calculates the cost of a completion's usage object (including cached prompt tokens)
+    and records it via log_api_usage (buffered, or in the caller's session with in_transaction=True).
+
+    Returns:
+        The calculated cost.
+    """
+    cached_tokens = cached_prompt_tokens(usage_data)
+    cost = calculate_cost(model_used, {
+        'prompt_tokens': usage_data.prompt_tokens,
+        'completion_tokens': usage_data.completion_tokens,
+        'cached_tokens': cached_tokens
+    })
+    log_api_usage(
+        model_name=model_used,
+        prompt_tokens=usage_data.prompt_tokens,
+        completion_tokens=usage_data.completion_tokens,
+        total_tokens=usage_data.total_tokens,
+        cost=cost,
+        game_id=game_id,
+        in_transaction=in_transaction,
+        cached_tokens=cached_tokens
+    )
+    return cost
 
 
 ai_service = AIService()
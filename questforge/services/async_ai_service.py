@@ -0,0 +1,413 @@
+import asyncio
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+import httpx
+from openai import AsyncOpenAI
+from flask import current_app, has_app_context
+
+from questforge.models.game_state import GameState
+from questforge.models.template import Template
+from questforge.models.campaign import Campaign
+from questforge.utils.profiling import ai_call_span
+from .ai_service import AIService, CompletionStreamAccumulator
+
+
+class AsyncAIService(AIService):
+    """
+    Asyncio-native variant of AIService.
+
+    Exposes awaitable versions of the AIService methods. Prompt building and
+    response validation are inherited from AIService, so both variants produce
+    identical payloads and return values; only the transport differs.
+
+    All games share one AsyncOpenAI client backed by a single bounded httpx
+    connection pool (see OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE_CONNECTIONS),
+    so many turns can be in flight without holding a worker thread per request.
+    The coroutines are meant to run on the shared loop in
+    questforge.utils.async_runner. Blocking work (context building that touches
+    the database, usage logging) is pushed to the loop's default executor.
+    """
+
+    def __init__(self):
+        """Reads the API settings. The HTTP client itself is created lazily on the running event loop."""
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None # Another OpenAI-compatible server (e.g. the load-test mock)
+        self.temperature = float(os.getenv("OPENAI_TEMPERATURE") or 0.7)
+        self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS") or 1024)
+        self.app = None
+        self.client = None
+        self._http_client = None
+        self._client_loop = None
+
+    def init_app(self, app):
+        """Registers the Flask app so coroutines running outside a request can push an app context."""
+        self.app = app
+
+    @contextmanager
+    def _app_context(self):
+        """Yields the current app, pushing an app context first if the coroutine runs outside one."""
+        if has_app_context():
+            yield current_app._get_current_object()
+            return
+        if self.app is None:
+            raise RuntimeError("AsyncAIService used outside an app context before init_app() was called.")
+        with self.app.app_context():
+            yield self.app
+
+    def _get_client(self, app) -> Optional[AsyncOpenAI]:
+        """
+        Returns the shared AsyncOpenAI client, creating it on the running loop if needed.
+
+        httpx connection pools are bound to the event loop that created them, so the
+        client is rebuilt if it is ever used from a different loop.
+        """
+        if not self.api_key:
+            return None
+        loop = asyncio.get_running_loop()
+        if self.client is None or self._client_loop is not loop:
+            limits = httpx.Limits(
+                max_connections=app.config.get('OPENAI_MAX_CONNECTIONS', 100),
+                max_keepalive_connections=app.config.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20),
+            )
+            timeout = httpx.Timeout(app.config.get('OPENAI_TIMEOUT', 60.0))
+            self._http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=self._http_client)
+            self._client_loop = loop
+            app.logger.info(f"Created shared AsyncOpenAI client (max_connections={limits.max_connections}, max_keepalive={limits.max_keepalive_connections}).")
+        return self.client
+
+    async def aclose(self):
+        """Closes the shared connection pool."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self.client = None
+        self._http_client = None
+        self._client_loop = None
+
+    async def _run_blocking(self, app, func, *args, **kwargs):
+        """Runs a blocking helper in the default executor inside its own app context."""
+        def _call():
+            with app.app_context():
+                return func(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(None, _call)
+
+    async def generate_campaign(self, template: Template, template_overrides: Optional[Dict[str, Any]] = None, creator_customizations: Optional[Dict[str, Any]] = None, player_details: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot generate campaign.")
+                return {"error": "AI service not available."}
+            try:
+                payload = await self._run_blocking(app, self._build_campaign_payload, app, template, template_overrides, creator_customizations, player_details)
+                with ai_call_span('campaign') as ai_span:
+                    response = await client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                return self._parse_campaign_response(app, response)
+            except Exception as e:
+                app.logger.error(f"Error calling OpenAI API or processing response: {e}", exc_info=True)
+                return {"error": f"Failed to call AI service: {e}"}
+
+    async def get_response(self, game_state: GameState, player_action: str, is_stuck: bool = False, next_required_plot_point: Optional[str] = None, current_difficulty: Optional[str] = None, stream_callback: Optional[Callable[[str], None]] = None, context: Optional[str] = None) -> dict | None:
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot get response.")
+                return None
+            previous_state_data = game_state.state_data
+            payload = await self._run_blocking(app, self._build_response_payload, app, game_state, player_action, is_stuck, next_required_plot_point, current_difficulty, context)
+            if payload is None:
+                return None
+            try:
+                if stream_callback:
+                    accumulator = CompletionStreamAccumulator('content')
+                    with ai_call_span('response', stream=True) as ai_span:
+                        stream = await client.chat.completions.create(**self._streaming_payload(payload))
+                        async for chunk in stream:
+                            delta = accumulator.add_chunk(chunk)
+                            if delta:
+                                self._emit_stream_delta(app, stream_callback, delta)
+                        generated_content, model_used, usage_data = accumulator.content, accumulator.model, accumulator.usage
+                        ai_span.record_usage(model_used, usage_data)
+                else:
+                    with ai_call_span('response') as ai_span:
+                        response = await client.chat.completions.create(**payload)
+                        ai_span.record_response(response)
+                    generated_content = response.choices[0].message.content
+                    usage_data = response.usage if response.usage else None
+                    model_used = response.model
+                stage_one_ai_output = self._parse_response_content(app, generated_content, previous_state_data)
+                if stage_one_ai_output is None:
+                    return None
+                return stage_one_ai_output, model_used, usage_data
+            except Exception as e:
+                app.logger.error(f"Error generating response: {e}", exc_info=True)
+                return None
+
+    async def generate_character_name(self, description: str) -> str | None:
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot generate character name.")
+                return None
+            try:
+                payload = self._build_character_name_payload(app, description)
+                with ai_call_span('character_name') as ai_span:
+                    response = await client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                return self._parse_character_name_response(app, response)
+            except Exception as e:
+                app.logger.error(f"Error calling OpenAI API or processing name response: {e}", exc_info=True)
+                return None
+
+    async def get_ai_hint(self, game_state: GameState, campaign: Campaign) -> Optional[Tuple[str, str, Optional[Dict[str, int]]]]:
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot get hint.")
+                return None
+            game_id = game_state.game_id
+            payload = await self._run_blocking(app, self._build_hint_payload, app, game_state, campaign)
+            if payload is None:
+                return None
+            try:
+                with ai_call_span('hint') as ai_span:
+                    response = await client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                generated_hint = self._parse_hint_response(app, response)
+                if generated_hint is None:
+                    return None
+
+                usage_data = response.usage if response.usage else None
+                model_used = response.model
+
+                if game_id and usage_data:
+                    await self._run_blocking(app, self._log_usage, model_used, usage_data, game_id)
+
+                return generated_hint, model_used, usage_data
+            except Exception as e:
+                app.logger.error(f"Error generating hint: {e}", exc_info=True)
+                return None
+
+    async def check_atomic_plot_completion(
+        self,
+        plot_point_id: str,
+        plot_point_description: str,
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str,
+        game_id: Optional[int] = None
+    ) -> Dict[str, Any] | None:
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot check plot point completion.")
+                return None
+            try:
+                payload = self._build_plot_check_payload(app, plot_point_id, plot_point_description, current_game_state_data, player_action, stage_one_narrative)
+                with ai_call_span('plot_check') as ai_span:
+                    response = await client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                result = self._parse_plot_check_response(app, response, plot_point_id)
+
+                if game_id and 'error' not in result and response.usage:
+                    await self._run_blocking(app, self._log_usage, result['model_used'], response.usage, game_id)
+
+                return result
+            except Exception as e:
+                app.logger.error(f"Error in check_atomic_plot_completion for {plot_point_id}: {e}", exc_info=True)
+                return {"error": f"Failed to check plot point completion: {e}"}
+
+    async def check_batch_plot_completion(
+        self,
+        plot_points: List[Dict[str, Any]],
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str,
+        game_id: Optional[int] = None
+    ) -> List[Dict[str, Any]] | Dict[str, Any] | None:
+        """Awaitable version of AIService.check_batch_plot_completion."""
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot check plot point completion.")
+                return None
+            plot_point_ids = [pp.get('id') for pp in plot_points]
+            try:
+                payload = self._build_batch_plot_check_payload(app, plot_points, current_game_state_data, player_action, stage_one_narrative)
+                with ai_call_span('batch_plot_check') as ai_span:
+                    response = await client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                results = self._parse_batch_plot_check_response(app, response, plot_point_ids)
+
+                if game_id and response.usage:
+                    await self._run_blocking(app, self._log_usage, response.model, response.usage, game_id)
+
+                return results
+            except Exception as e:
+                app.logger.error(f"Error in check_batch_plot_completion for {plot_point_ids}: {e}", exc_info=True)
+                return {"error": f"Failed to check plot point completion: {e}"}
+
+    async def check_plot_points(
+        self,
+        plot_points: List[Dict[str, Any]],
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str,
+        game_id: Optional[int] = None,
+        batch_mode: Optional[bool] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Stage 3 entry point: checks the candidate plot points for completion.
+
+        In batch mode (PLOT_CHECK_BATCH_MODE) all candidates are judged in one request,
+        and only the IDs missing from that response are re-checked individually (in
+        parallel) with whatever time is left of the deadline. Otherwise every candidate
+        gets its own parallel check.
+
+        Returns:
+            One result per input plot point, in input order (see check_plot_points_concurrently).
+        """
+        with self._app_context() as app:
+            if batch_mode is None:
+                batch_mode = app.config.get('PLOT_CHECK_BATCH_MODE', True)
+            if deadline_seconds is None:
+                deadline_seconds = app.config.get('PLOT_CHECK_DEADLINE_SECONDS', 20.0)
+
+            if not batch_mode or len(plot_points) < 2:
+                return await self.check_plot_points_concurrently(
+                    plot_points, current_game_state_data, player_action, stage_one_narrative,
+                    game_id=game_id, deadline_seconds=deadline_seconds
+                )
+
+            loop = asyncio.get_running_loop()
+            started_at = loop.time()
+            try:
+                batch_results = await asyncio.wait_for(
+                    self.check_batch_plot_completion(plot_points, current_game_state_data, player_action, stage_one_narrative, game_id=game_id),
+                    timeout=deadline_seconds
+                )
+            except asyncio.TimeoutError:
+                app.logger.warning(f"Batched plot check timed out after {deadline_seconds}s for game {game_id}.")
+                batch_results = None
+            if not isinstance(batch_results, list):
+                app.logger.warning(f"Batched plot check failed for game {game_id}: {batch_results}. Falling back to single checks.")
+                batch_results = []
+
+            results_by_id = {res['plot_point_id']: res for res in batch_results}
+            missing_plot_points = [pp for pp in plot_points if pp.get('id') not in results_by_id]
+            if missing_plot_points:
+                remaining_seconds = deadline_seconds - (loop.time() - started_at)
+                app.logger.info(f"Falling back to single checks for {len(missing_plot_points)} plot point(s) missing from the batch response ({remaining_seconds:.1f}s left).")
+                if remaining_seconds > 0:
+                    fallback_results = await self.check_plot_points_concurrently(
+                        missing_plot_points, current_game_state_data, player_action, stage_one_narrative,
+                        game_id=game_id, deadline_seconds=remaining_seconds
+                    )
+                    for pp, res in zip(missing_plot_points, fallback_results):
+                        results_by_id[pp.get('id')] = res
+
+            return [
+                results_by_id.get(pp.get('id')) or {"error": "Plot point check missed the deadline", "plot_point_id": pp.get('id')}
+                for pp in plot_points
+            ]
+
+    async def check_plot_points_concurrently(
+        self,
+        plot_points: List[Dict[str, Any]],
+        current_game_state_data: Dict[str, Any],
+        player_action: str,
+        stage_one_narrative: str,
+        game_id: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        deadline_seconds: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs check_atomic_plot_completion for several plot points in parallel.
+
+        At most `max_concurrency` checks are in flight at once. Any check still running
+        when `deadline_seconds` elapses is cancelled, so the caller waits for the slowest
+        single check (bounded by the deadline) instead of the sum of all of them.
+
+        Args:
+            plot_points: Plot point dicts (with 'id' and 'description') to check.
+            current_game_state_data: The state data after Stage 1 changes. Only read, never mutated.
+            player_action: The player's action text.
+            stage_one_narrative: The Stage 1 narrative.
+            game_id: Optional game ID for API usage logging.
+            max_concurrency: Max simultaneous checks. Defaults to PLOT_CHECK_MAX_CONCURRENCY.
+            deadline_seconds: Overall time budget for the batch. Defaults to PLOT_CHECK_DEADLINE_SECONDS.
+
+        Returns:
+            One result per input plot point, in input order. Each is the dict returned by
+            check_atomic_plot_completion, or an {"error": ...} dict if the check failed or
+            missed the deadline.
+        """
+        with self._app_context() as app:
+            if max_concurrency is None:
+                max_concurrency = app.config.get('PLOT_CHECK_MAX_CONCURRENCY', 4)
+            if deadline_seconds is None:
+                deadline_seconds = app.config.get('PLOT_CHECK_DEADLINE_SECONDS', 20.0)
+            semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+            async def _bounded_check(pp):
+                async with semaphore:
+                    return await self.check_atomic_plot_completion(
+                        plot_point_id=pp.get('id'),
+                        plot_point_description=pp.get('description'),
+                        current_game_state_data=current_game_state_data,
+                        player_action=player_action,
+                        stage_one_narrative=stage_one_narrative,
+                        game_id=game_id
+                    )
+
+            tasks = [asyncio.ensure_future(_bounded_check(pp)) for pp in plot_points]
+            if not tasks:
+                return []
+            done, pending = await asyncio.wait(tasks, timeout=deadline_seconds)
+            for task in pending:
+                task.cancel()
+            if pending:
+                app.logger.warning(f"Plot check deadline of {deadline_seconds}s reached for game {game_id}. Cancelled {len(pending)} of {len(tasks)} checks.")
+
+            results = []
+            for pp, task in zip(plot_points, tasks):
+                if task in pending:
+                    results.append({"error": f"Plot point check timed out after {deadline_seconds}s", "plot_point_id": pp.get('id')})
+                elif task.exception() is not None:
+                    results.append({"error": f"Failed to check plot point completion: {task.exception()}", "plot_point_id": pp.get('id')})
+                else:
+                    results.append(task.result())
+            return results
+
+    async def generate_historical_summary(self, player_action: str, stage_one_narrative: str, state_changes: Dict[str, Any], game_id: Optional[int] = None) -> Optional[str]:
+        """
+        Awaitable version of AIService.generate_historical_summary.
+        """
+        with self._app_context() as app:
+            client = self._get_client(app)
+            if not client:
+                app.logger.error("OpenAI client not initialized. Cannot generate historical summary.")
+                return None
+            try:
+                payload = self._build_summary_payload(app, player_action, stage_one_narrative, state_changes)
+                with ai_call_span('historical_summary') as ai_span:
+                    response = await client.chat.completions.create(**payload)
+                    ai_span.record_response(response)
+                generated_summary = self._parse_summary_response(app, response)
+                if generated_summary is None:
+                    return None
+
+                if game_id and response.usage:
+                    cost = await self._run_blocking(app, self._log_usage, response.model, response.usage, game_id)
+                    app.logger.info(f"Logged API usage for historical summary (Game {game_id}). Cost: {cost}")
+
+                return generated_summary
+            except Exception as e:
+                app.logger.error(f"Error generating historical summary: {e}", exc_info=True)
+                return None
+
+
+async_ai_service = AsyncAIService()
@@ -6,7 +6,9 @@ from questforge.models.template import Template
 from questforge.models.game_state import GameState
 from questforge.models.api_usage_log import ApiUsageLog # Import the new model
 from questforge.extensions import db
-from questforge.services.ai_service import ai_service # Import the singleton instance
+from questforge.services.ai_service import ai_service, cached_prompt_tokens, record_game_cost # Import the singleton instance
+from questforge.services.game_log_service import game_log_service
+from questforge.utils.metrics import observe_ai_cost
 from typing import Dict, List, Optional, Tuple # Import typing helpers
 from decimal import Decimal # For accurate cost calculation
 
@@ -144,7 +146,10 @@ def generate_campaign_structure(game: Game, template: Template, player_details:
                 total_tokens = usage_data.total_tokens
 
                 if pricing_info:
-                    prompt_cost = (Decimal(prompt_tokens) / 1000) * Decimal(pricing_info['prompt'])
+                    cached_tokens = min(cached_prompt_tokens(usage_data), prompt_tokens)
+                    cached_price = pricing_info.get('cached_prompt', Decimal(str(pricing_info['prompt'])) * Decimal(str(current_app.config.get('OPENAI_CACHED_PROMPT_PRICE_RATIO', 0.5))))
+                    prompt_cost = (Decimal(prompt_tokens - cached_tokens) / 1000) * Decimal(pricing_info['prompt'])
+                    prompt_cost += (Decimal(cached_tokens) / 1000) * Decimal(str(cached_price))
                     completion_cost = (Decimal(completion_tokens) / 1000) * Decimal(pricing_info['completion'])
                     cost = prompt_cost + completion_cost
                     logger.info(f"Calculated cost for game {game_id} API call: ${cost:.6f}")
@@ -157,9 +162,12 @@ def generate_campaign_structure(game: Game, template: Template, player_details:
                     prompt_tokens=prompt_tokens,
                     completion_tokens=completion_tokens,
                     total_tokens=total_tokens,
-                    cost=cost
+                    cost=cost,
+                    cached_tokens=cached_prompt_tokens(usage_data)
                 )
                 db.session.add(usage_log)
+                record_game_cost(game_id, cost)
+                observe_ai_cost(model_used, cost)
                 # Don't commit yet, part of the larger transaction
                 logger.info(f"Created ApiUsageLog entry for game {game_id} (Initial Campaign Gen)")
             except Exception as log_e:
@@ -195,6 +203,7 @@ def generate_campaign_structure(game: Game, template: Template, player_details:
         db.session.add(new_campaign)
         db.session.flush() # Flush to get the new_campaign.id for GameState
         logger.info(f"Created Campaign object (ID: {new_campaign.id}) for game {game_id}")
+        logger.debug(f"Built plot point index for campaign {new_campaign.id}: {len(new_campaign.plot_point_index.get('points', {}))} points, {len(new_campaign.plot_point_index.get('postings', {}))} terms")
 
         # 4. Create initial GameState
         # Use ai_response_data now
@@ -249,9 +258,10 @@ def generate_campaign_structure(game: Game, template: Template, player_details:
         # Set attributes *after* object creation
         initial_game_state.campaign_id = new_campaign.id
         initial_game_state.current_location = initial_state_dict.get('location')
-        initial_game_state.game_log = [initial_narrative]
         initial_game_state.available_actions = initial_actions
         db.session.add(initial_game_state)
+        # The opening narrative is the first GameLogEntry row (seq 0)
+        game_log_service.append_entries(initial_game_state, [initial_narrative])
         logger.info(f"Created initial GameState object for game {game_id}")
 
         # --- Auto-complete first required plot point (ID-based) ---
@@ -298,7 +308,7 @@ def generate_campaign_structure(game: Game, template: Template, player_details:
         game_state_service.active_games[game_id]['state'] = initial_state_dict
         game_state_service.active_games[game_id]['log'] = [initial_narrative]
         game_state_service.active_games[game_id]['actions'] = initial_actions
-        game_state_service.active_games[game_id]['version'] = 1 # Initial version
+        # 'version' is the persisted GameState.version (1 for a new game), loaded by join_game
         logger.info(f"Initialized game state in memory for game {game_id}")
 
         return True
@@ -0,0 +1,207 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.orm import undefer
+
+from ..extensions import db
+from ..models.game_log_entry import GameLogEntry
+from ..models.game_state import GameState
+
+# Default page size for paginated log reads (the history view and API)
+DEFAULT_PAGE_SIZE = 100
+# Entries read per query when streaming a whole log (transcript export)
+EXPORT_BATCH_SIZE = 500
+
+
+class GameLogService:
+    """
+    Reads and appends game log entries stored as GameLogEntry rows.
+
+    A game's log is addressed by seq (0-based). Games created before the table existed may
+    still have their first entries in the legacy GameState.game_log JSON column: those are
+    seq 0..len(game_log)-1 and rows continue after them, so reads transparently stitch the
+    two together until 'manage.py migrate-game-logs' has moved the JSON into rows.
+    """
+
+    @staticmethod
+    def _entry_type(entry: Any) -> Optional[str]:
+        if isinstance(entry, dict) and isinstance(entry.get('type'), str):
+            return entry['type'][:20]
+        return None
+
+    @staticmethod
+    def _legacy_entries(game_state: Optional[GameState]) -> List[Any]:
+        """Entries still in the legacy JSON column (loads the deferred column)."""
+        if game_state is None:
+            return []
+        legacy = game_state.game_log
+        if isinstance(legacy, str):
+            return [legacy]
+        return legacy if isinstance(legacy, list) else []
+
+    def length(self, game_state: GameState) -> int:
+        """Number of entries in the game's log (the seq the next entry gets)."""
+        if game_state.log_length:
+            return game_state.log_length
+        # Not yet initialized (legacy game or empty log): the legacy entries come first
+        return len(self._legacy_entries(game_state))
+
+    def append_entries(self, game_state: GameState, entries: List[Any]) -> int:
+        """
+        Adds entries to the end of the game's log within the caller's transaction (no commit).
+
+        One row is inserted per entry and GameState.log_length is bumped, so the cost does not
+        depend on the log's length. The GameState row update also takes part in its optimistic
+        version check, so two concurrent writers cannot both claim the same seq numbers.
+
+        Returns:
+            The new log length.
+        """
+        next_seq = self.length(game_state)
+        for offset, entry in enumerate(entries or []):
+            db.session.add(GameLogEntry(
+                game_id=game_state.game_id,
+                seq=next_seq + offset,
+                entry_type=self._entry_type(entry),
+                data=entry
+            ))
+        game_state.log_length = next_seq + len(entries or [])
+        return game_state.log_length
+
+    def _game_state(self, game_id, game_state: Optional[GameState] = None) -> Optional[GameState]:
+        return game_state if game_state is not None else GameState.query.filter_by(game_id=game_id).first()
+
+    def get_entries(self, game_id, start_seq: int = 0, end_seq: Optional[int] = None,
+                    game_state: Optional[GameState] = None) -> List[Any]:
+        """
+        Returns the entries with start_seq <= seq < end_seq (end_seq=None means to the end), in order.
+        """
+        query = db.session.query(GameLogEntry.seq, GameLogEntry.data).filter(
+            GameLogEntry.game_id == game_id,
+            GameLogEntry.seq >= start_seq
+        )
+        if end_seq is not None:
+            query = query.filter(GameLogEntry.seq < end_seq)
+        rows = query.order_by(GameLogEntry.seq).all()
+
+        # Rows start at seq 0 for new and migrated games; anything before the first row is legacy JSON
+        first_row_seq = rows[0].seq if rows else end_seq
+        if first_row_seq is not None and first_row_seq <= start_seq:
+            return [row.data for row in rows]
+        legacy = self._legacy_entries(self._game_state(game_id, game_state))
+        legacy_end = len(legacy) if first_row_seq is None else min(first_row_seq, len(legacy))
+        return legacy[start_seq:legacy_end] + [row.data for row in rows]
+
+    def get_log(self, game_id, game_state: Optional[GameState] = None) -> List[Any]:
+        """The whole log (prefer get_tail/get_page where the full log is not needed)."""
+        return self.get_entries(game_id, 0, None, game_state=game_state)
+
+    def get_tail(self, game_id, limit: int, game_state: Optional[GameState] = None) -> Tuple[int, List[Any]]:
+        """
+        The last `limit` entries.
+
+        Returns:
+            (seq of the first returned entry, entries).
+        """
+        game_state = self._game_state(game_id, game_state)
+        if game_state is None:
+            return 0, []
+        total = self.length(game_state)
+        start = max(total - max(limit, 0), 0)
+        return start, self.get_entries(game_id, start, total, game_state=game_state)
+
+    def get_page(self, game_id, before_seq: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE,
+                 game_state: Optional[GameState] = None, after_seq: Optional[int] = None) -> Dict[str, Any]:
+        """
+        One page of the log, returned oldest first. By default pages run backwards from the end:
+        the `limit` entries before before_seq (None means the end of the log). With after_seq
+        the page instead holds the `limit` entries from after_seq on (reading forwards).
+
+        Returns:
+            {'entries': [{'seq': n, 'entry': ...}, ...], 'total': log length,
+             'older_before_seq': before_seq for the next (older) page or None,
+             'newer_before_seq': before_seq for the previous (newer) page or None,
+             'next_after_seq': after_seq for the next page when reading forwards, or None}
+        """
+        game_state = self._game_state(game_id, game_state)
+        if game_state is None:
+            return {'entries': [], 'total': 0, 'older_before_seq': None, 'newer_before_seq': None, 'next_after_seq': None}
+        limit = max(limit, 1)
+        total = self.length(game_state)
+        if after_seq is not None:
+            start = max(min(after_seq, total), 0)
+            end = min(start + limit, total)
+        else:
+            end = total if before_seq is None else max(min(before_seq, total), 0)
+            start = max(end - limit, 0)
+        entries = self.get_entries(game_id, start, end, game_state=game_state)
+        return {
+            'entries': [{'seq': start + offset, 'entry': entry} for offset, entry in enumerate(entries)],
+            'total': total,
+            'older_before_seq': start if start > 0 else None,
+            'newer_before_seq': min(end + limit, total) if end < total else None,
+            'next_after_seq': end if end < total else None
+        }
+
+    def iter_entries(self, game_id, batch_size: int = EXPORT_BATCH_SIZE,
+                     game_state: Optional[GameState] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Yields (seq, entry) for the whole log, reading batch_size entries per query, so a long
+        log is never held in memory at once. The read transaction is ended between batches, so a
+        slow consumer (a streamed download) does not keep a pooled connection checked out.
+        """
+        game_state = self._game_state(game_id, game_state)
+        if game_state is None:
+            return
+        total = self.length(game_state)
+        for start in range(0, total, max(batch_size, 1)):
+            end = min(start + batch_size, total)
+            entries = self.get_entries(game_id, start, end, game_state=game_state)
+            db.session.rollback()
+            for offset, entry in enumerate(entries):
+                yield start + offset, entry
+
+    def migrate_legacy_logs(self, batch_size: int = 100) -> Tuple[int, int]:
+        """
+        Moves every legacy GameState.game_log JSON list into GameLogEntry rows, one commit per batch.
+
+        The legacy entries become seq 0..n-1 (rows appended since the upgrade already start at n),
+        the JSON column is emptied and log_length is set, so it is safe to re-run.
+
+        Returns:
+            (number of games migrated, number of entries inserted).
+        """
+        games_migrated = 0
+        entries_inserted = 0
+        state_ids = [row.id for row in db.session.query(GameState.id).order_by(GameState.id).all()]
+        for batch_start in range(0, len(state_ids), batch_size):
+            batch_ids = state_ids[batch_start:batch_start + batch_size]
+            states = GameState.query.options(undefer(GameState.game_log)).filter(GameState.id.in_(batch_ids)).all()
+            rows = []
+            for game_state in states:
+                legacy = self._legacy_entries(game_state)
+                if not legacy:
+                    continue
+                already_migrated = db.session.query(GameLogEntry.id).filter_by(game_id=game_state.game_id, seq=0).first()
+                if already_migrated:
+                    current_app.logger.warning(f"Game {game_state.game_id} already has log rows from seq 0; leaving its legacy game_log in place.")
+                    continue
+                rows.extend({
+                    'game_id': game_state.game_id,
+                    'seq': seq,
+                    'entry_type': self._entry_type(entry),
+                    'data': entry
+                } for seq, entry in enumerate(legacy))
+                game_state.log_length = max(game_state.log_length or 0, len(legacy))
+                game_state.game_log = []
+                games_migrated += 1
+                entries_inserted += len(legacy)
+            if rows:
+                db.session.execute(sa.insert(GameLogEntry), rows)
+            db.session.commit()
+            current_app.logger.info(f"Migrated game logs for GameState ids {batch_ids[0]}..{batch_ids[-1]} ({len(rows)} entries).")
+        return games_migrated, entries_inserted
+
+
+game_log_service = GameLogService()
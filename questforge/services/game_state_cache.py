@@ -0,0 +1,270 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import current_app, has_app_context
+
+
+class GameStateCache:
+    """
+    Bounded LRU cache for the in-memory game entries of GameStateService.
+
+    Replaces the old unbounded active_games/state_history dicts. Entries are the same
+    plain dicts as before ({'players', 'state', 'version', 'log', 'actions',
+    'player_locations', ...}) and are keyed by str(game_id), so socket payloads
+    (string ids) and service calls (int ids) hit the same entry.
+
+    Limits:
+        max_entries:  Most games kept in memory (least recently used go first).
+        max_bytes:    Approximate memory budget, estimated from the JSON size of each entry
+                      (the append-only log is measured incrementally, see _estimate_size).
+        idle_seconds: Entries not accessed for this long are evicted, so games whose
+                      players dropped without 'leave_game' do not stay in memory forever.
+
+    Entries marked dirty (in-memory changes not known to be in the database) are handed
+    to the write_back callable before they are evicted. Evicted games are simply
+    reloaded from the database on their next access.
+    """
+
+    # Entry keys that are bookkeeping, not game data (excluded from the size estimate).
+    # 'views' is derived from the log (GameStateService) and is not counted separately.
+    _META_KEYS = ('players', 'dirty', 'last_access', 'size', 'log_size', 'views')
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 256 * 1024 * 1024, idle_seconds: float = 3600.0,
+                 write_back: Optional[Callable[[str, Dict[str, Any]], bool]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.write_back = write_back
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._total_bytes = 0
+        self._last_idle_sweep = time.monotonic()
+        self._write_back_queue = [] # (key, entry) evicted while dirty; written back outside the lock
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions_lru': 0,
+            'evictions_bytes': 0,
+            'evictions_idle': 0,
+            'evictions_explicit': 0,
+            'write_backs': 0,
+            'write_back_failures': 0,
+        }
+
+    def configure(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None, idle_seconds: Optional[float] = None) -> None:
+        """Updates the limits (from app config) and evicts anything now over them."""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if idle_seconds is not None:
+                self.idle_seconds = idle_seconds
+            self._enforce_limits()
+        self._flush_write_backs()
+
+    @staticmethod
+    def _key(game_id) -> str:
+        return str(game_id)
+
+    @staticmethod
+    def _json_size(data: Any) -> int:
+        try:
+            return len(json.dumps(data, default=str))
+        except (TypeError, ValueError):
+            return len(repr(data))
+
+    def _estimate_size(self, entry: Dict[str, Any]) -> int:
+        """
+        Approximate memory footprint of an entry (length of its JSON form).
+
+        The log is append-only, so only the entries appended since the last estimate are
+        measured and added to the running total kept in entry['log_size'] (remeasured from
+        scratch if the log got shorter). Everything else (state, actions, patches, ...) is
+        bounded by the size of the state and is measured again each time.
+        Called without holding the lock, since it JSON-encodes the state.
+        """
+        size = self._json_size({k: v for k, v in entry.items() if k not in self._META_KEYS and k != 'log'})
+        log = entry.get('log')
+        if isinstance(log, list):
+            log_size = entry.get('log_size')
+            if log_size is None or log_size['length'] > len(log):
+                log_size = {'length': 0, 'bytes': 0}
+            if log_size['length'] < len(log):
+                appended = sum(self._json_size(log_entry) + 2 for log_entry in islice(log, log_size['length'], None))
+                log_size = {'length': len(log), 'bytes': log_size['bytes'] + appended}
+            entry['log_size'] = log_size
+            size += log_size['bytes']
+        return size
+
+    # --- Dict-style access (drop-in for the old active_games dict) ---
+
+    def __contains__(self, game_id) -> bool:
+        with self._lock:
+            return self._key(game_id) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries.keys()))
+
+    def __getitem__(self, game_id) -> Dict[str, Any]:
+        entry = self.get(game_id)
+        if entry is None:
+            raise KeyError(game_id)
+        return entry
+
+    def __setitem__(self, game_id, entry: Dict[str, Any]) -> None:
+        key = self._key(game_id)
+        size = self._estimate_size(entry) # Measured before taking the lock
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.get('size', 0)
+            entry.setdefault('dirty', False)
+            entry['last_access'] = time.monotonic()
+            entry['size'] = size
+            self._entries[key] = entry
+            self._total_bytes += entry['size']
+            self._enforce_limits(protect=key)
+        self._flush_write_backs()
+
+    def __delitem__(self, game_id) -> None:
+        if self.pop(game_id) is None:
+            raise KeyError(game_id)
+
+    def get(self, game_id, default=None) -> Optional[Dict[str, Any]]:
+        """Returns the entry (marking it recently used) or default. Counts a hit or miss."""
+        key = self._key(game_id)
+        self._maybe_sweep_idle()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            self._stats['hits'] += 1
+            entry['last_access'] = time.monotonic()
+            self._entries.move_to_end(key)
+        return entry
+
+    def pop(self, game_id, write_back: bool = True) -> Optional[Dict[str, Any]]:
+        """Removes an entry (e.g. when the last player leaves), writing it back first if dirty."""
+        key = self._key(game_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._evict(key, 'evictions_explicit', write_back=write_back)
+        self._flush_write_backs()
+        return entry
+
+    # --- Dirty tracking ---
+
+    def mark_dirty(self, game_id) -> None:
+        """Flags an entry as holding changes that must be written back before eviction, and re-measures it."""
+        self._update_entry(game_id, dirty=True)
+
+    def mark_clean(self, game_id) -> None:
+        """Flags an entry as matching the database (e.g. right after a commit), and re-measures it."""
+        self._update_entry(game_id, dirty=False)
+
+    def _update_entry(self, game_id, dirty: bool) -> None:
+        key = self._key(game_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['dirty'] = dirty
+        # Re-measured outside the lock so other games' cache access is not held up
+        new_size = self._estimate_size(entry)
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return # Evicted or replaced while it was being measured
+            self._total_bytes += new_size - entry.get('size', 0)
+            entry['size'] = new_size
+            self._enforce_limits(protect=key)
+        self._flush_write_backs()
+
+    # --- Eviction ---
+
+    def _maybe_sweep_idle(self) -> None:
+        """Runs evict_idle at most once a minute (or every idle_seconds if shorter) as a side effect of access."""
+        now = time.monotonic()
+        if now - self._last_idle_sweep >= min(60.0, self.idle_seconds):
+            self.evict_idle()
+
+    def evict_idle(self) -> int:
+        """Evicts every entry idle for longer than idle_seconds. Returns the number evicted."""
+        with self._lock:
+            now = time.monotonic()
+            self._last_idle_sweep = now
+            if not self.idle_seconds or self.idle_seconds <= 0:
+                return 0
+            idle_keys = [key for key, entry in self._entries.items() if now - entry.get('last_access', now) > self.idle_seconds]
+            for key in idle_keys:
+                self._evict(key, 'evictions_idle')
+        self._flush_write_backs()
+        return len(idle_keys)
+
+    def _enforce_limits(self, protect: Optional[str] = None) -> None:
+        """Evicts least recently used entries until both limits hold. Caller holds the lock."""
+        while len(self._entries) > max(self.max_entries, 1):
+            key = next((k for k in self._entries if k != protect), None)
+            if key is None:
+                break
+            self._evict(key, 'evictions_lru')
+        while self.max_bytes and self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next((k for k in self._entries if k != protect), None)
+            if key is None:
+                break
+            self._evict(key, 'evictions_bytes')
+
+    def _evict(self, key: str, reason: str, write_back: bool = True) -> None:
+        """Removes one entry and queues it for write-back if dirty. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.get('size', 0)
+        self._stats[reason] += 1
+        if write_back and entry.get('dirty') and self.write_back is not None:
+            self._write_back_queue.append((key, entry))
+        if has_app_context():
+            current_app.logger.debug(f"GameStateCache: evicted game {key} ({reason}).")
+
+    def _flush_write_backs(self) -> None:
+        """Writes back dirty entries evicted by the last operation. Called without holding the lock (it does DB I/O)."""
+        while True:
+            with self._lock:
+                if not self._write_back_queue:
+                    return
+                key, entry = self._write_back_queue.pop(0)
+            try:
+                ok = self.write_back(key, entry)
+            except Exception as e:
+                ok = False
+                if has_app_context():
+                    current_app.logger.error(f"GameStateCache: write-back of game {key} failed on eviction: {e}", exc_info=True)
+            with self._lock:
+                self._stats['write_backs' if ok else 'write_back_failures'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current occupancy (entries, approximate bytes, dirty entries)."""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'dirty_entries': sum(1 for entry in self._entries.values() if entry.get('dirty')),
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'idle_seconds': self.idle_seconds,
+                'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+            })
+            return stats
@@ -1,9 +1,88 @@
 from questforge.models.game_state import GameState
 from questforge.models.user import User
 from questforge.models.template import Template
-from deepdiff import DeepDiff
-from flask import current_app # Import current_app
+import copy
+from flask import current_app, has_app_context # Import current_app
+from sqlalchemy.orm import attributes
 from ..extensions import db # Import db for commit/rollback
+from .game_state_cache import GameStateCache
+from .state_store import InProcessStateStore, create_state_store
+from .game_log_service import game_log_service
+from questforge.utils.json_patch import make_patch
+from questforge.utils.plot_index import count_displayed_plot_points
+
+# Default number of version-to-version patches kept per game (STATE_HISTORY_SIZE)
+STATE_HISTORY_SIZE = 20
+
+# Entry fields shared between workers through the state store ('players' and 'patches' stay per-process)
+# (the store's own 'version' is its compare-and-set revision; the game version is 'db_version').
+# The log is not shared: payloads carry its 'log_length' and other workers read new rows from game_log_entries.
+SHARED_FIELDS = ('state', 'actions', 'db_version', 'player_locations')
+
+# Compare-and-set attempts before a publish gives up (the local entry is still valid, just not shared)
+PUBLISH_ATTEMPTS = 3
+
+def new_log_views():
+    """Empty derived views of a game log, to be brought up to date with fold_log_views."""
+    return {
+        'log_length': 0, # Number of log entries folded in
+        'ai_positions': [], # Log positions of the AI entries
+        'player_commands': [], # {'user_id', 'content'} of the player entries, in log order
+        'player_positions': [], # Log position of each player command
+    }
+
+def fold_log_views(views, game_log, keep=None):
+    """
+    Brings derived log views up to date with game_log by scanning only the entries appended
+    since the last fold, so keeping them current costs O(new entries) rather than O(log).
+
+    Args:
+        views: A dict from new_log_views, updated in place.
+        game_log: The log the views describe.
+        keep: Number of leading entries known to be unchanged since the last fold (default:
+            all folded entries, i.e. the log was only appended to). Entries after it are
+            dropped from the views and folded again.
+
+    Returns:
+        The views.
+    """
+    game_log = game_log or []
+    keep = min(views['log_length'] if keep is None else keep, views['log_length'], len(game_log))
+    ai_positions = views['ai_positions']
+    player_commands = views['player_commands']
+    player_positions = views['player_positions']
+    while ai_positions and ai_positions[-1] >= keep:
+        ai_positions.pop()
+    while player_positions and player_positions[-1] >= keep:
+        player_positions.pop()
+        player_commands.pop()
+    for position in range(keep, len(game_log)):
+        entry = game_log[position]
+        if isinstance(entry, dict):
+            if entry.get("type") == "ai":
+                ai_positions.append(position)
+            elif entry.get("type") == "player":
+                player_commands.append({
+                    "user_id": entry.get("user_id"),
+                    "content": entry.get("content")
+                })
+                player_positions.append(position)
+    views['log_length'] = len(game_log)
+    return views
+
+def build_log_views(game_log):
+    """
+    Derives the views of a game log the play page shows: the content of the latest AI entry
+    and the list of player commands ({'user_id', 'content'}), in log order.
+
+    Scans the whole log; cached games keep these up to date instead (GameStateService.get_log_views).
+
+    Returns:
+        (latest_ai_response or None, player_commands).
+    """
+    views = fold_log_views(new_log_views(), game_log)
+    latest_ai_response = game_log[views['ai_positions'][-1]].get("content") if views['ai_positions'] else None
+    return latest_ai_response, views['player_commands']
 
 class GameStateService:
     """Implements spec section 4.3 (Campaign State Management)
@@ -16,9 +95,359 @@ class GameStateService:
     Architecture Note: Uses double-checked locking pattern to ensure
     thread-safe singleton behavior across socket connections"""
     def __init__(self):
-        # Added player_locations to active_games structure
-        self.active_games = {}  # game_id: {'players': set(), 'state': {}, 'version': 0, 'log': [], 'actions': [], 'player_locations': {}}
-        self.state_history = {}  # game_id: {version: state} # Consider if history needs log/actions too
+        # Bounded LRU of in-memory games, keyed by str(game_id):
+        # {'players': set(), 'state': {}, 'version': 0, 'log': [], 'actions': [], 'player_locations': {},
+        #  'patches': [{'from_version', 'to_version', 'patch'}, ...] (ring buffer of recent RFC 6902 patches over {'state', 'log'}),
+        #  'base': committed state/log length saved before update_state mutates the entry,
+        #  'db_version': GameState.version the entry was synced with,
+        #  'views': per-process views derived from the log and state for broadcasts, folded in as entries are appended}
+        # 'version' is the persisted GameState.version once the entry is synced, so clients can compare it across reloads.
+        # Idle and over-budget entries are evicted (dirty ones written back first) and reloaded from the DB on demand.
+        self.active_games = GameStateCache(write_back=self._write_back)
+        # Versioned store shared by all workers (STATE_CACHE_BACKEND). Each entry remembers the
+        # store version it last read or wrote as 'shared_version', used for compare-and-set.
+        self.store = InProcessStateStore()
+        self.history_size = STATE_HISTORY_SIZE
+
+    def init_app(self, app):
+        """Applies the cache limits and selects the shared state store from the app config."""
+        self.active_games.configure(
+            max_entries=app.config.get('GAME_STATE_CACHE_MAX_GAMES', 500),
+            max_bytes=app.config.get('GAME_STATE_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+            idle_seconds=app.config.get('GAME_STATE_CACHE_IDLE_SECONDS', 3600.0)
+        )
+        self.history_size = app.config.get('STATE_HISTORY_SIZE', STATE_HISTORY_SIZE)
+        try:
+            self.store = create_state_store(app.config)
+        except Exception as e:
+            app.logger.error(f"Could not create the '{app.config.get('STATE_CACHE_BACKEND')}' state store, falling back to in-process: {e}", exc_info=True)
+            self.store = InProcessStateStore(max_entries=app.config.get('GAME_STATE_CACHE_MAX_GAMES', 500),
+                                             ttl_seconds=app.config.get('STATE_CACHE_TTL_SECONDS', 3600))
+        app.logger.info(f"Game state store: {type(self.store).__name__}")
+
+    # --- Shared state store ---
+
+    def _read_shared(self, game_id):
+        """Reads the shared payload for a game; store errors are logged and treated as a miss."""
+        try:
+            return self.store.get(game_id)
+        except Exception as e:
+            current_app.logger.warning(f"State store read failed for game {game_id}: {e}")
+            return None
+
+    def _adopt_shared(self, game_id, entry, shared):
+        """
+        Replaces an entry's shared fields with the store's copy (which mirrors committed data).
+        The log is brought up to the shared 'log_length' by reading only the rows the entry lacks.
+        """
+        log = entry.get('log') or []
+        shared_log_length = shared.get('log_length')
+        if shared_log_length is None: # Payload without a log length: reread the committed log
+            keep, new_log = 0, game_log_service.get_log(game_id)
+        else:
+            keep = self._committed_log_length(entry, shared_log_length)
+            if keep == len(log) == shared_log_length:
+                new_log = log
+            elif not keep:
+                new_log = game_log_service.get_entries(game_id, 0, shared_log_length)
+            else:
+                new_log = log[:keep] + game_log_service.get_entries(game_id, keep, shared_log_length)
+        self._record_patch(entry, shared.get('state') or {}, new_log, shared.get('db_version'))
+        for field in SHARED_FIELDS:
+            if field in shared:
+                entry[field] = shared[field]
+        entry['log'] = new_log
+        entry['version'] = shared.get('db_version', entry.get('version'))
+        entry['shared_version'] = shared.get('version')
+        self._fold_views(entry, keep)
+        self.active_games.mark_clean(game_id)
+
+    def _publish(self, game_id, entry=None):
+        """
+        Writes an entry's shared fields to the store with compare-and-set against 'shared_version'.
+
+        On a conflict the store is re-read: if another worker holds newer committed data
+        (a higher db_version) that copy is adopted, otherwise the write is retried on top of it.
+        Each successful write bumps the store revision by one.
+
+        Returns:
+            True if the entry was published.
+        """
+        entry = entry if entry is not None else self.active_games.get(game_id)
+        if entry is None:
+            return False
+        for _ in range(PUBLISH_ATTEMPTS):
+            expected = entry.get('shared_version')
+            payload = {field: entry[field] for field in SHARED_FIELDS if field in entry}
+            payload['log_length'] = len(entry.get('log') or [])
+            payload['version'] = (expected or 0) + 1
+            try:
+                if self.store.compare_and_set(game_id, expected, payload):
+                    entry['shared_version'] = payload['version']
+                    return True
+            except Exception as e:
+                current_app.logger.warning(f"State store write failed for game {game_id}: {e}")
+                return False
+            shared = self._read_shared(game_id)
+            if shared is None:
+                entry['shared_version'] = None
+                continue
+            if (shared.get('db_version') or 0) > (entry.get('db_version') or 0):
+                current_app.logger.debug(f"Game {game_id}: adopting newer shared state v{shared.get('version')} from another worker.")
+                self._adopt_shared(game_id, entry, shared)
+                return False
+            entry['shared_version'] = shared.get('version')
+        current_app.logger.warning(f"Game {game_id}: gave up publishing to the state store after {PUBLISH_ATTEMPTS} conflicts.")
+        return False
+
+    def _refresh_from_shared(self, game_id, entry):
+        """Adopts the shared copy if another worker published a newer one and this entry has no unsaved changes."""
+        if entry.get('dirty'):
+            return
+        shared = self._read_shared(game_id)
+        if shared and shared.get('version') != entry.get('shared_version') and (shared.get('db_version') or 0) >= (entry.get('db_version') or 0):
+            self._adopt_shared(game_id, entry, shared)
+
+    def _load_entry(self, game_id, db_game_state):
+        """
+        Caches a game loaded from the DB. The shared copy is adopted when it reflects the same
+        committed row (keeping the version and player locations other workers have seen);
+        otherwise the DB data is published on top of it.
+        """
+        entry = {
+            'players': set(), # Players will join via socket events
+            'state': db_game_state.state_data or {},
+            'version': db_game_state.version, # Persisted GameState.version
+            'log': game_log_service.get_log(game_id, game_state=db_game_state),
+            'actions': db_game_state.available_actions or [],
+            'player_locations': {}, # Initialize player locations on load
+            'db_version': db_game_state.version,
+            'shared_version': None
+        }
+        self._fold_views(entry)
+        shared = self._read_shared(game_id)
+        self.active_games[game_id] = entry
+        if shared and shared.get('db_version') == db_game_state.version:
+            self._adopt_shared(game_id, entry, shared)
+        else:
+            if shared:
+                entry['shared_version'] = shared.get('version')
+                entry['player_locations'] = shared.get('player_locations') or {}
+            self._publish(game_id, entry)
+        return entry
+
+    def sync_from_db(self, game_id, db_game_state):
+        """
+        Refreshes a cached game's state, log and actions from a just-committed GameState
+        and marks the entry clean. Does nothing if the game is not cached (it is loaded on next access).
+        """
+        entry = self.active_games.get(game_id)
+        if entry is None:
+            return
+        new_state = copy.deepcopy(db_game_state.state_data or {})
+        keep = self._committed_log_length(entry, db_game_state.log_length or 0)
+        new_log = self._synced_log(game_id, entry, db_game_state)
+        self._record_patch(entry, new_state, new_log, db_game_state.version)
+        entry['state'] = new_state
+        entry['log'] = new_log
+        self._fold_views(entry, keep) # Entries update_state appended in memory are replaced by the committed rows
+        entry['actions'] = copy.deepcopy(db_game_state.available_actions or [])
+        entry['db_version'] = db_game_state.version
+        entry['version'] = db_game_state.version
+        self.active_games.mark_clean(game_id)
+        self._publish(game_id, entry)
+
+    def _synced_log(self, game_id, entry, db_game_state):
+        """
+        The committed log for an entry being synced. The log is append-only, so only the rows
+        after the part the entry already holds from its last sync are read.
+        """
+        committed_length = db_game_state.log_length or 0
+        known = self._committed_log_length(entry, committed_length)
+        if not known:
+            return game_log_service.get_log(game_id, game_state=db_game_state)
+        return (entry.get('log') or [])[:known] + game_log_service.get_entries(game_id, known, committed_length, game_state=db_game_state)
+
+    def _committed_log_length(self, entry, committed_length):
+        """
+        Length of the leading part of an entry's log that is committed (and so also leads a
+        committed log of committed_length entries); 0 if that is not known.
+        """
+        base = entry.get('base')
+        if base is not None and base.get('version') == entry.get('db_version'):
+            known = base['log_length'] # update_state appended in memory after this point
+        elif not entry.get('dirty'):
+            known = len(entry.get('log') or [])
+        else:
+            known = 0
+        return min(known, committed_length)
+
+    # --- Derived views ---
+
+    def _fold_views(self, entry, keep=None):
+        """
+        Brings an entry's derived log views up to date after its log changed (see fold_log_views
+        for `keep`). Only new entries are scanned, so this is O(appended entries) per turn.
+        """
+        views = entry.get('views')
+        if views is None:
+            views = entry['views'] = new_log_views()
+        log = entry.get('log')
+        fold_log_views(views, log if isinstance(log, list) else [], keep)
+        return views
+
+    def get_log_views(self, game_id):
+        """
+        The play page's log views of a cached game without scanning its log.
+
+        Returns:
+            (latest_ai_response or None, player_commands) like build_log_views, or None if the
+            game is not cached. player_commands is the cached list; callers must not modify it.
+        """
+        entry = self.active_games.get(game_id)
+        if entry is None:
+            return None
+        views = self._fold_views(entry) # Picks up anything appended without going through a hook
+        log = entry.get('log') or []
+        latest_ai_response = log[views['ai_positions'][-1]].get("content") if views['ai_positions'] else None
+        return latest_ai_response, views['player_commands']
+
+    def get_completed_display_count(self, game_id, completed_plot_points, first_required_id):
+        """
+        Number of completed plot points shown on the play page (all but the first required one).
+
+        completed_plot_points only grows during a game, so for a cached game the count is kept
+        with the entry and only newly completed plot points are counted; it is recounted if the
+        list shrank, its last counted item changed or first_required_id differs.
+        """
+        if not isinstance(completed_plot_points, list):
+            return 0
+        entry = self.active_games.get(game_id)
+        if entry is None:
+            return count_displayed_plot_points(completed_plot_points, first_required_id)
+        views = self._fold_views(entry)
+        counted = views.get('plot_points')
+        if (counted is None or counted['first_required_id'] != first_required_id
+                or counted['length'] > len(completed_plot_points)
+                or (counted['length'] and completed_plot_points[counted['length'] - 1] != counted['last'])):
+            counted = views['plot_points'] = {'first_required_id': first_required_id, 'length': 0, 'last': None, 'count': 0}
+        if counted['length'] < len(completed_plot_points):
+            counted['count'] += count_displayed_plot_points(completed_plot_points, first_required_id, start=counted['length'])
+            counted['length'] = len(completed_plot_points)
+            counted['last'] = copy.deepcopy(completed_plot_points[-1])
+        return counted['count']
+
+    # --- Version patches ---
+
+    def _snapshot_base(self, entry):
+        """
+        Saves the committed state (and log length; the log is append-only) before update_state
+        mutates the entry in place, so the next sync can diff against the committed version.
+
+        Copy-on-write: the committed state object becomes the base and the entry gets a copy to
+        mutate, so a state already published to the store (which may share it) is never changed.
+        """
+        base = entry.get('base')
+        if base is not None and base.get('version') == entry.get('db_version'):
+            return
+        committed_state = entry.get('state') or {}
+        entry['base'] = {
+            'version': entry.get('db_version'),
+            'state': committed_state,
+            'log_length': len(entry.get('log') or [])
+        }
+        entry['state'] = copy.deepcopy(committed_state)
+
+    def _record_patch(self, entry, new_state, new_log, new_version):
+        """
+        Appends the patch from the entry's committed version to new_version to its ring buffer.
+        If the committed content is no longer known (dirty entry without a base) the buffer is
+        cleared, so no delta is ever built across a gap.
+        """
+        old_version = entry.get('db_version')
+        base = entry.pop('base', None)
+        if old_version is None or new_version is None or new_version == old_version:
+            return
+        if base is not None and base.get('version') == old_version:
+            old_state = base['state']
+            old_log = (entry.get('log') or [])[:base['log_length']]
+        elif not entry.get('dirty'):
+            old_state = entry.get('state') or {}
+            old_log = entry.get('log') or []
+        else:
+            entry['patches'] = []
+            return
+
+        patches = entry.setdefault('patches', [])
+        if patches and patches[-1]['to_version'] != old_version:
+            patches.clear() # Versions were skipped without a patch; older patches no longer chain
+        patches.append({
+            'from_version': old_version,
+            'to_version': new_version,
+            'patch': make_patch({'state': old_state, 'log': old_log}, {'state': new_state, 'log': new_log})
+        })
+        # Ring buffer: keep only the most recent versions
+        del patches[:-max(self.history_size, 1)]
+
+    def get_patches_since(self, game_id, from_version):
+        """
+        Composes the buffered patches from from_version up to the entry's current version.
+
+        Returns:
+            (to_version, ops) with ops applying to {'state': ..., 'log': [...]}, or None if
+            from_version is no longer (or was never) in the ring buffer.
+        """
+        entry = self.active_games.get(game_id)
+        if entry is None:
+            return None
+        if from_version == entry.get('db_version'):
+            return from_version, []
+        ops = []
+        version = from_version
+        for patch in entry.get('patches', []):
+            if patch['from_version'] == version:
+                ops.extend(patch['patch'])
+                version = patch['to_version']
+        if version == from_version or version != entry.get('db_version'):
+            return None
+        return version, ops
+
+    def _write_back(self, game_id, entry):
+        """
+        Persists a dirty cache entry's state, log and actions before it is evicted.
+
+        The write is skipped if the GameState row has moved past the version the entry
+        was synced with, so an old in-memory copy never overwrites newer committed data.
+
+        Returns:
+            True if the entry was written, False otherwise.
+        """
+        if not has_app_context():
+            return False
+        with current_app.app_context():
+            try:
+                db_game_state = GameState.query.filter_by(game_id=game_id).first()
+                if not db_game_state:
+                    return False
+                if entry.get('db_version') is not None and db_game_state.version != entry['db_version']:
+                    current_app.logger.warning(f"Skipping write-back of evicted game {game_id}: cached v{entry['db_version']} is older than DB v{db_game_state.version}.")
+                    return False
+                db_game_state.state_data = entry.get('state') or {}
+                # The log is append-only: only entries beyond the committed length are new
+                cached_log = entry.get('log') or []
+                committed_length = game_log_service.length(db_game_state)
+                if len(cached_log) > committed_length:
+                    game_log_service.append_entries(db_game_state, cached_log[committed_length:])
+                db_game_state.available_actions = entry.get('actions') or []
+                attributes.flag_modified(db_game_state, "state_data")
+                attributes.flag_modified(db_game_state, "available_actions")
+                db.session.commit()
+                current_app.logger.info(f"Wrote back dirty cached state for game {game_id} before eviction.")
+                return True
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Error writing back cached state for game {game_id}: {e}", exc_info=True)
+                return False
 
     def join_game(self, game_id, user_id):
         """Add player to game state and initialize their location"""
@@ -28,19 +457,13 @@ class GameStateService:
                 db_game_state = GameState.query.filter_by(game_id=game_id).first()
                 if db_game_state:
                     current_app.logger.info(f"Loading existing game {game_id} state from DB into memory on join.")
-                    self.active_games[game_id] = {
-                        'players': set(),
-                        'state': db_game_state.state_data or {},
-                        'version': 1, # Or derive from timestamp/version field if added
-                        'log': db_game_state.game_log or [],
-                        'actions': db_game_state.available_actions or [],
-                        'player_locations': {} # Initialize player locations
-                    }
+                    self._load_entry(game_id, db_game_state)
                     # If initial state has a location, set it for the joining player
-                    initial_location = db_game_state.state_data.get('current_location')
+                    initial_location = (db_game_state.state_data or {}).get('current_location')
                     if initial_location:
-                         self.active_games[game_id]['player_locations'][user_id] = initial_location
+                         self.active_games[game_id]['player_locations'][str(user_id)] = initial_location
                          current_app.logger.debug(f"Set initial location for player {user_id} in game {game_id}: {initial_location}")
+                         self._publish(game_id)
 
                 else:
                     # If not in DB either, initialize fresh
@@ -62,10 +485,11 @@ class GameStateService:
         """Remove player from game state and their location"""
         if game_id in self.active_games:
             self.active_games[game_id]['players'].discard(user_id)
-            # Remove player's location
-            if user_id in self.active_games[game_id].get('player_locations', {}):
-                 del self.active_games[game_id]['player_locations'][user_id]
+            # Remove player's location (keys are strings so they survive the shared store's JSON round trip)
+            if str(user_id) in self.active_games[game_id].get('player_locations', {}):
+                 del self.active_games[game_id]['player_locations'][str(user_id)]
                  current_app.logger.debug(f"Player {user_id} location removed from game {game_id}.")
+                 self._publish(game_id)
 
             current_app.logger.debug(f"Player {user_id} removed from game {game_id}. Remaining players: {self.active_games[game_id]['players']}")
             # Check if this was the last player
@@ -73,10 +497,8 @@ class GameStateService:
                 current_app.logger.info(f"Last player left game {game_id}. Removing from active games.")
                 # Persist final state before removing? Optional.
                 # self.persist_state(game_id) # Example if needed
-                del self.active_games[game_id]
-                # Optionally clear history too
-                if game_id in self.state_history:
-                    del self.state_history[game_id]
+                # Dirty entries are written back by the cache before removal; its patch buffer goes with it
+                self.active_games.pop(game_id)
 
     def get_state(self, game_id):
         """Get current game state with version and ensure all necessary data is included"""
@@ -89,23 +511,30 @@ class GameStateService:
                  db_game_state = GameState.query.filter_by(game_id=game_id).order_by(GameState.last_updated.desc()).first()
                  if db_game_state:
                      current_app.logger.info(f"Loading latest game {game_id} state (ID: {db_game_state.id}) from DB into memory on get_state.")
-                     # Initialize the game in memory with data from the loaded record
-                     self.active_games[game_id] = {
-                         'players': set(), # Players will join via socket events
-                         'state': db_game_state.state_data or {},
-                         'version': 1, # Consider a real versioning mechanism later
-                         'log': db_game_state.game_log or [],
-                         'actions': db_game_state.available_actions or [],
-                         'player_locations': {} # Initialize player locations on load
-                     }
+                     # Initialize the game in memory with data from the loaded record (or the shared copy)
                      # Return the newly loaded state
-                     return self.active_games[game_id]
+                     return self._load_entry(game_id, db_game_state)
                  else:
                      current_app.logger.error(f"get_state: Game {game_id} not found in active games or DB.")
                      return None # Game truly doesn't exist or wasn't initialized
 
         # Game is active in memory, proceed to retrieve its state
         with current_app.app_context():
+            current_memory_state = self.active_games[game_id]
+            # Pick up versions/player locations/logs published by other workers
+            self._refresh_from_shared(game_id, current_memory_state)
+
+            # Fast path: if the entry mirrors the committed row, only the version column is read
+            db_version = db.session.query(GameState.version).filter_by(game_id=game_id).scalar()
+            if db_version is not None and not current_memory_state.get('dirty') and db_version == current_memory_state.get('db_version'):
+                return {
+                    'version': current_memory_state['version'],
+                    'state': current_memory_state.get('state') or {},
+                    'log': current_memory_state.get('log') or [],
+                    'actions': current_memory_state.get('actions') or [],
+                    'player_locations': current_memory_state.get('player_locations', {})
+                }
+
             db_game_state = GameState.query.filter_by(game_id=game_id).first()
 
             if not db_game_state:
@@ -121,15 +550,21 @@ class GameStateService:
                  }
 
             # Game state exists in DB, ensure memory is synced for log/actions
-            current_memory_state = self.active_games[game_id]
+
+            # A clean entry that is behind the committed row (written by another path) is refreshed wholesale
+            if not current_memory_state.get('dirty') and current_memory_state.get('db_version') != db_game_state.version:
+                 self.sync_from_db(game_id, db_game_state)
+
+            db_game_log = game_log_service.get_log(game_id, game_state=db_game_state)
 
             # Sync log and actions from DB to memory if they seem empty/missing in memory
             # Also sync state_data if memory seems empty
             if not current_memory_state.get('state') and db_game_state.state_data:
                  current_memory_state['state'] = db_game_state.state_data
                  current_app.logger.debug(f"Synced state_data from DB to memory for game {game_id}")
-            if not current_memory_state.get('log') and db_game_state.game_log:
-                 current_memory_state['log'] = db_game_state.game_log
+            if not current_memory_state.get('log') and db_game_log:
+                 current_memory_state['log'] = db_game_log
+                 self._fold_views(current_memory_state, keep=0)
                  current_app.logger.debug(f"Synced game_log from DB to memory for game {game_id}")
             if not current_memory_state.get('actions') and db_game_state.available_actions:
                  current_memory_state['actions'] = db_game_state.available_actions
@@ -137,9 +572,9 @@ class GameStateService:
 
             # Return state using the definitive data from the DB object
             return {
-                'version': current_memory_state['version'], # Version is managed in memory
+                'version': db_game_state.version, # Persisted GameState.version
                 'state': db_game_state.state_data or {}, # Use state_data from DB
-                'log': db_game_state.game_log or [], # Use game_log from DB
+                'log': db_game_log, # Use the log rows from DB
                 'actions': db_game_state.available_actions or [], # Use actions from DB
                 'player_locations': current_memory_state.get('player_locations', {}) # Player locations are memory-only
             }
@@ -155,20 +590,40 @@ class GameStateService:
         if from_version >= current_version:
             return {}
 
-        base_state_dict = self.state_history.get(game_id, {}).get(from_version)
-        if not base_state_dict:
+        composed = self.get_patches_since(game_id, from_version)
+        if not composed or composed[0] != current_version:
             return current_state_dict # Return full state if base version not found
 
-        diff = DeepDiff(
-            base_state_dict,
-            current_state_dict,
-            ignore_order=True,
-            report_repetition=True
-        )
+        # RFC 6902 operations over {'state': ..., 'log': [...]}
         return {
             'from_version': from_version,
             'to_version': current_version,
-            'changes': diff
+            'patch': composed[1]
+        }
+
+    def get_state_delta(self, game_id, from_version, current_state_info=None):
+        """
+        Builds a JSON-serializable delta from a version the client already holds to the current one.
+
+        Args:
+            game_id: The game.
+            from_version: The client's known GameState.version.
+            current_state_info: The result of get_state, if the caller already has it.
+
+        Returns:
+            {'from_version', 'to_version', 'patch': RFC 6902 operations over {'state': ..., 'log': [...]}},
+            or None if from_version is not in the patch ring buffer (the caller sends the full state).
+        """
+        current_state_info = current_state_info or self.get_state(game_id)
+        if not current_state_info:
+            return None
+        composed = self.get_patches_since(game_id, from_version)
+        if not composed or composed[0] != current_state_info['version']:
+            return None
+        return {
+            'from_version': from_version,
+            'to_version': composed[0],
+            'patch': composed[1]
         }
 
     def get_player_state(self, game_id, user_id):
@@ -228,6 +683,9 @@ class GameStateService:
             # This shouldn't happen if called correctly from socket_service
             return None
 
+        # Keep the committed content before the in-place merges below, for the next version patch
+        self._snapshot_base(self.active_games[game_id])
+
         # --- Update State Dictionary ---
         if state_changes:
             validated_changes = state_changes
@@ -254,7 +712,7 @@ class GameStateService:
                 # Assuming the location change in state_changes applies to the acting player (user_id)
                 if 'player_locations' not in self.active_games[game_id] or not isinstance(self.active_games[game_id]['player_locations'], dict):
                      self.active_games[game_id]['player_locations'] = {}
-                self.active_games[game_id]['player_locations'][user_id] = new_location
+                self.active_games[game_id]['player_locations'][str(user_id)] = new_location
                 current_app.logger.debug(f"Updated player {user_id} location to {new_location} in game {game_id}")
                 # Note: player_locations is only tracked in memory for now as per spec Option B
             # --- End Location Handling ---
@@ -300,14 +758,10 @@ class GameStateService:
             if 'log' not in self.active_games[game_id] or not isinstance(self.active_games[game_id]['log'], list):
                  self.active_games[game_id]['log'] = []
             self.active_games[game_id]['log'].append(log_object)
+            self._fold_views(self.active_games[game_id])
             
-            # Create a NEW list for the DB object assignment
-            new_db_game_log = list(db_game_state.game_log or []) # Ensure it's a list
-            new_db_game_log.append(log_object)
-            db_game_state.game_log = new_db_game_log # Assign the new list
-            
+            # The DB copy is a GameLogEntry row written by the turn's commit (game_log_service.append_entries)
             current_app.logger.debug(f"Appended AI log entry for game {game_id}")
-            # Note: flag_modified will be called in socket_service before commit
 
         # --- Update Actions ---
         if actions is not None:
@@ -323,13 +777,13 @@ class GameStateService:
 
         # --- Increment Version (In-memory only) ---
         if increment_version:
-            if game_id not in self.state_history:
-                self.state_history[game_id] = {}
-            # Store a copy of the state *before* this update
-            self.state_history[game_id][self.active_games[game_id]['version']] = self.active_games[game_id]['state'].copy()
+            # The turn commit bumps GameState.version by one; sync_from_db then confirms the value
             self.active_games[game_id]['version'] += 1
             current_app.logger.info(f"Incremented version for game {game_id} to {self.active_games[game_id]['version']}")
 
+        # The in-memory entry now differs from the DB until the caller commits and syncs it
+        self.active_games.mark_dirty(game_id)
+
         # Return the latest full state from memory (as DB commit happens later)
         return {
             'version': self.active_games[game_id]['version'],
@@ -4,28 +4,69 @@ from flask_login import current_user
 from sqlalchemy.orm import joinedload, attributes # Import joinedload and attributes
 from sqlalchemy import func # Import func for sum aggregation
 import json # Import json for logging state_data
+import copy
+from sqlalchemy.orm.exc import StaleDataError
 from ..extensions import db
 from ..extensions.socketio import get_socketio
 from ..models import Game, User, GamePlayer, GameState, Template, ApiUsageLog, Campaign # Added Campaign
 from decimal import Decimal # For cost calculation
 from questforge.utils.context_manager import build_context # Import build_context
-
-socketio = get_socketio()
-from .game_state_service import game_state_service # Import the instance
-from .ai_service import ai_service, calculate_cost, log_api_usage # Import the singleton INSTANCE and helper functions
+from questforge.utils.plot_index import get_plot_point_index, plot_point_display_totals, select_plausible_plot_points
+from .game_state_service import game_state_service, build_log_views # Import the instance
+from .game_log_service import game_log_service
+from .ai_service import ai_service, calculate_cost, log_api_usage, log_completion_usage, cached_prompt_tokens # Import the singleton INSTANCE and helper functions
+from .async_ai_service import async_ai_service
+from .summary_service import summary_service, append_historical_summaries
+from .usage_recorder import usage_recorder
+from .action_queue import action_queue
+from questforge.utils.async_runner import async_runner
+from questforge.utils.profiling import current_turn, turn_timer, timing_stats
+from questforge.utils.metrics import counted_socket_event
 # Import the specific function needed, not a non-existent instance
 from .campaign_service import generate_campaign_structure
 
+socketio = get_socketio()
+
+def socketio_event(event_name):
+    """@socketio.on(event_name) plus per-event metrics (count, handler time, SQL statements)."""
+    return counted_socket_event(socketio, event_name)
+
 class SocketService:
+    @staticmethod
+    def _delta_broadcast(game_id, from_version, broadcast_data):
+        """
+        Turns a full 'game_state_update' payload into a delta one: 'state' and 'log' are replaced by
+        'from_version' and an RFC 6902 'patch' over {'state', 'log'}, and 'player_commands' by the
+        commands appended this turn. historical_summary is dropped (clients read it from the patched state).
+
+        Returns the full payload unchanged if no patch from from_version is buffered.
+        """
+        delta = game_state_service.get_state_delta(game_id, from_version, current_state_info={'version': broadcast_data['version']})
+        if not delta:
+            current_app.logger.info(f"[socket_service] No patch from v{from_version} buffered for game {game_id}; sending the full state.")
+            return broadcast_data
+
+        delta_data = {key: value for key, value in broadcast_data.items() if key not in ('state', 'log', 'player_commands', 'historical_summary')}
+        delta_data.update(delta)
+        log_ops = [op for op in delta['patch'] if op['path'] == '/log' or op['path'].startswith('/log/')]
+        if all(op['op'] == 'add' and op['path'] == '/log/-' for op in log_ops):
+            delta_data['player_commands_appended'] = [
+                {"user_id": op['value'].get("user_id"), "content": op['value'].get("content")}
+                for op in log_ops if isinstance(op['value'], dict) and op['value'].get("type") == "player"
+            ]
+        else:
+            delta_data['player_commands'] = broadcast_data.get('player_commands', [])
+        return delta_data
+
     @staticmethod
     def register_handlers():
         """Register all Socket.IO event handlers"""
         
-        @socketio.on('connect')
+        @socketio_event('connect')
         def handle_connect():
             emit('connection_response', {'status': 'connected'})
 
-        @socketio.on('join_game')
+        @socketio_event('join_game')
         def handle_join_game(data):
             """Handle player joining a game room"""
             game_id = data.get('game_id')
@@ -107,7 +148,7 @@ class SocketService:
 
             # Removed separate context block and emit logic for player_joined
 
-        @socketio.on('leave_game')
+        @socketio_event('leave_game')
         def handle_leave_game(data):
             """Handle player leaving a game room"""
             game_id = data.get('game_id')
@@ -124,7 +165,7 @@ class SocketService:
                     'user_id': user_id,
                 }, room=game_id)
 
-        @socketio.on('player_ready')
+        @socketio_event('player_ready')
         def handle_player_ready(data):
             """Handle player clicking the ready button."""
             game_id = data.get('game_id')
@@ -161,7 +202,7 @@ class SocketService:
                 else:
                     current_app.logger.info(f"User {user_id} already marked as ready for game {game_id}")
 
-        @socketio.on('start_game')
+        @socketio_event('start_game')
         def handle_start_game(data):
             """Handle request to start the game."""
             game_id = data.get('game_id')
@@ -295,9 +336,9 @@ class SocketService:
 
             # Removed the misplaced try...except block that was here
 
-        @socketio.on('player_action')
+        @socketio_event('player_action')
         def handle_player_action(data):
-            """Process player actions through AI and update game state"""
+            """Queue a player action behind any in-flight turn for the same game, then run it"""
             game_id = data.get('game_id')
             user_id = data.get('user_id')
             action = data.get('action')
@@ -306,14 +347,80 @@ class SocketService:
                 emit('error', {'message': 'Missing required fields'}, room=game_id)
                 return
 
+            # One turn at a time per game; other games are not affected (see GameActionQueue)
+            coalesce_mode = current_app.config.get('ACTION_QUEUE_COALESCE_MODE', 'none')
+            submission = action_queue.submit(game_id, user_id, action, coalesce_mode)
+            queue_status = submission['status']
+            current_app.logger.debug(f"Action queue for game {game_id}: '{queue_status}' action from user {user_id} at position {submission['position']} (depth {submission['depth']}).")
+
+            if queue_status != 'queued' or submission['position'] > 0:
+                # Tell the room the action is waiting (or how it was coalesced) so the UI can show it
+                emit('action_queued', {
+                    'game_id': game_id,
+                    'user_id': user_id,
+                    'action': action,
+                    'status': queue_status,
+                    'position': submission['position'],
+                    'depth': submission['depth']
+                }, room=game_id)
+            if queue_status != 'queued':
+                return # Merged into (or superseded by) this player's waiting action
+
+            ticket = submission['ticket']
+            if not action_queue.wait_for_turn(ticket, current_app.config.get('ACTION_QUEUE_WAIT_SECONDS', 300.0)):
+                current_app.logger.warning(f"Action '{action}' for game {game_id} waited too long in the action queue. Discarded.")
+                emit('error', {'message': 'The game is busy. Your action was not processed, please try again.'}, room=request.sid)
+                return
+            current_app.logger.info(f"Action queue for game {game_id}: running ticket {ticket.ticket_id} after waiting {ticket.wait_seconds:.2f}s (merged actions: {ticket.merged_count}).")
+            try:
+                # ticket.action includes any merged follow-up actions; the turn's stage timings are
+                # logged as one record on 'questforge.turn_timing' when it finishes
+                with turn_timer(game_id, enabled=current_app.config.get('TURN_TIMING_ENABLED', True),
+                                user_id=user_id, queue_wait_ms=round(ticket.wait_seconds * 1000.0, 2),
+                                merged_actions=ticket.merged_count):
+                    _run_player_turn(game_id, user_id, ticket.action)
+            finally:
+                action_queue.finish(ticket)
+
+        def _run_player_turn(game_id, user_id, action):
+            """Process a player action through AI and update game state (runs while holding the game's queue slot)"""
             player_log = {"type": "player", "user_id": user_id, "content": action} # Include user_id for mapping
             updated_state_info = None # Define updated_state_info early
             stage_one_ai_result_tuple = None # Renamed from ai_result for clarity
             narrative_from_stage1 = "Action not processed due to validation failure or AI error." # Default narrative
             available_actions_from_stage1 = [] # Default actions
 
+            timer = current_turn() # Stage timings (no-op when TURN_TIMING_ENABLED is off)
+
+            # The previous turn's deferred summary must land in state_data before this turn reads it
+            summary_service.wait_for_pending(game_id)
+            timer.lap('summary_wait')
+
+            # Buffered usage rows this turn's transaction took over (handed back if it rolls back)
+            turn_usage_rows = []
+            # Stage 1 usage is written with the turn; a turn that fails before that buffers it instead
+            stage_one_usage = None # (model_used, usage_data)
+            stage_one_usage_logged = False
+            # Summaries of earlier turns that finished after the wait above; written with this turn
+            late_summaries = []
+
+            # The streamed narrative reaches the whole room before the turn commits; every path that
+            # then discards the turn retracts it, so other players do not keep an uncommitted narrative
+            narrative_streamed = False
+            turn_committed = False
+
+            def retract_streamed_narrative():
+                if narrative_streamed and not turn_committed:
+                    emit('narrative_done', {'game_id': game_id, 'user_id': user_id, 'narrative': None, 'discarded': True}, room=game_id)
+
             try:
-                # --- Perform ALL DB operations within a single transaction ---
+                # The turn runs in three phases so no DB session or pooled connection is held
+                # while the AI calls are in flight:
+                #   1. read a snapshot (short session),
+                #   2. AI work on plain copies (no session),
+                #   3. a short write transaction guarded by the optimistic GameState.version check.
+
+                # --- Phase 1: Read snapshot ---
                 with current_app.app_context():
                     # 1. Fetch GameState and related Campaign
                     db_game_state = db.session.query(GameState).options(
@@ -326,7 +433,10 @@ class SocketService:
                         raise ValueError(f"Campaign data not found for game_id {game_id}")
 
                     campaign = db_game_state.game.campaign
-                    state_data = db_game_state.state_data or {}
+                    # Work on copies from here on; the ORM object is only written in phase 3
+                    snapshot_version = db_game_state.version
+                    state_data = copy.deepcopy(db_game_state.state_data or {})
+                    current_difficulty = db_game_state.game.current_difficulty
 
                     # --- Narrative Guidance Logic (ID-Based) ---
                     STUCK_THRESHOLD = 3
@@ -344,9 +454,11 @@ class SocketService:
                         completed_plot_points_data = []
                     completed_plot_point_ids = [pp.get('id') for pp in completed_plot_points_data if isinstance(pp, dict) and pp.get('id')]
                     
+                    # Only read during the turn (no copy); a completed plot point is copied into state_data below
                     major_plot_points_list = campaign.major_plot_points
                     if not isinstance(major_plot_points_list, list):
                         major_plot_points_list = []
+                    plot_point_index = get_plot_point_index(campaign) # Cached per (campaign.id, campaign.version)
 
                     for plot_point in major_plot_points_list:
                         if isinstance(plot_point, dict) and plot_point.get('required') and plot_point.get('id') not in completed_plot_point_ids:
@@ -365,364 +477,338 @@ class SocketService:
                     # Log the state *as fetched* before AI call
                     current_app.logger.debug(f"State data *before* AI call: {json.dumps(state_data)}") # Use updated state_data
 
-                    # --- Inventory Validation ---
-                    action_lower = action.lower()
-                    item_keywords = ["use ", "give ", "read ", "equip ", "combine "] # Note the space
-                    required_item = None
-                    keyword_found = None
-                    validation_passed = True # Assume validation passes unless proven otherwise
-
-                    for keyword in item_keywords:
-                        if action_lower.startswith(keyword):
-                            keyword_found = keyword
-                            # Final extraction fix v3: Capture the item name more intelligently
-                            parts = action_lower.split(keyword, 1)
-                            if len(parts) > 1:
-                                # Take the remainder and split by common prepositions/articles
-                                item_part = parts[1].strip()
-                                # Split by common prepositions/articles, stopping at the first one found
-                                for preposition in ["on", "at", "in", "to", "with", "the", "a", "an"]:
-                                    item_part = item_part.split(preposition, 1)[0].strip() # Take the first part before any preposition
-                                # Assign the cleaned item_part to required_item
-                                required_item = item_part
-                                current_app.logger.debug(f"Keyword '{keyword.strip()}' found. Extracted required_item: '{required_item}'")
-                            else:
-                                current_app.logger.debug(f"Keyword '{keyword.strip()}' found, but no item name followed.")
-                                required_item = None # Ensure required_item is None if nothing follows keyword
-                            break # Stop after first keyword match
-
-                    # Check if an item was successfully extracted
-                    if required_item:
-                        current_app.logger.info(f"Action '{action}' requires item: '{required_item}'")
-                        # Corrected key lookup: use 'current_inventory' based on logs
-                        inventory = db_game_state.state_data.get('current_inventory') 
-                        
-                        if not isinstance(inventory, list):
-                            current_app.logger.warning(f"Inventory validation failed for game {game_id}: 'current_inventory' key missing or not a list in state_data.")
-                            emit('error', {'message': f"You don't seem to have a '{required_item}'."}, room=game_id)
-                            validation_passed = False
+                    # Build the Stage 1 context now, while the session is open (it reads players and campaign data)
+                    turn_context = build_context(db_game_state, next_required_plot_point_desc)
+                    current_app.logger.debug(f"Phase 1: Snapshot taken for game {game_id} at GameState version {snapshot_version}.")
+                timer.lap('snapshot_read')
+
+                # --- Phase 2: AI work (no DB session) ---
+                new_log_entries = [] # Log entries to append in phase 3
+
+                # --- Inventory Validation ---
+                action_lower = action.lower()
+                item_keywords = ["use ", "give ", "read ", "equip ", "combine "] # Note the space
+                required_item = None
+                keyword_found = None
+                validation_passed = True # Assume validation passes unless proven otherwise
+
+                for keyword in item_keywords:
+                    if action_lower.startswith(keyword):
+                        keyword_found = keyword
+                        # Final extraction fix v3: Capture the item name more intelligently
+                        parts = action_lower.split(keyword, 1)
+                        if len(parts) > 1:
+                            # Take the remainder and split by common prepositions/articles
+                            item_part = parts[1].strip()
+                            # Split by common prepositions/articles, stopping at the first one found
+                            for preposition in ["on", "at", "in", "to", "with", "the", "a", "an"]:
+                                item_part = item_part.split(preposition, 1)[0].strip() # Take the first part before any preposition
+                            # Assign the cleaned item_part to required_item
+                            required_item = item_part
+                            current_app.logger.debug(f"Keyword '{keyword.strip()}' found. Extracted required_item: '{required_item}'")
                         else:
-                            # Normalize inventory items to lowercase strings for comparison
-                            inventory_lower = [str(item).lower() for item in inventory if isinstance(item, str)]
-                            required_item_lower = required_item.lower()
+                            current_app.logger.debug(f"Keyword '{keyword.strip()}' found, but no item name followed.")
+                            required_item = None # Ensure required_item is None if nothing follows keyword
+                        break # Stop after first keyword match
+
+                # Check if an item was successfully extracted
+                if required_item:
+                    current_app.logger.info(f"Action '{action}' requires item: '{required_item}'")
+                    # Corrected key lookup: use 'current_inventory' based on logs
+                    inventory = state_data.get('current_inventory') 
+                    
+                    if not isinstance(inventory, list):
+                        current_app.logger.warning(f"Inventory validation failed for game {game_id}: 'current_inventory' key missing or not a list in state_data.")
+                        emit('error', {'message': f"You don't seem to have a '{required_item}'."}, room=game_id)
+                        validation_passed = False
+                    else:
+                        # Normalize inventory items to lowercase strings for comparison
+                        inventory_lower = [str(item).lower() for item in inventory if isinstance(item, str)]
+                        required_item_lower = required_item.lower()
 
-                            # Check for exact match first
-                            exact_match_found = required_item_lower in inventory_lower
+                        # Check for exact match first
+                        exact_match_found = required_item_lower in inventory_lower
 
-                            if exact_match_found:
-                                current_app.logger.info(f"Inventory validation passed (exact match) for game {game_id}: Item '{required_item}' found in inventory.")
-                                # validation_passed remains True (set initially)
-                            else:
-                                # No exact match found, now check for partial (startswith) match
-                                partial_match_found = False
-                                for item_in_inv_lower in inventory_lower:
-                                    if item_in_inv_lower.startswith(required_item_lower):
-                                        current_app.logger.info(f"Inventory validation passed (partial match): Inventory item '{item_in_inv_lower}' starts with required '{required_item_lower}'. Allowing action.")
-                                        partial_match_found = True
-                                        validation_passed = True 
-                                        break # Allow action based on first partial match
-                                
-                                # Only set validation_passed to False if NEITHER exact NOR partial match was found
-                                if not partial_match_found: 
-                                    current_app.logger.warning(f"Inventory validation failed for game {game_id}: Item '{required_item}' not found (exact or partial match) in current_inventory {inventory}.")
-                                    emit('error', {'message': f"You don't have a '{required_item}'."}, room=game_id)
-                                    validation_passed = False
-
-                    # 2. Call Stage 1 AI Service (only if validation passed)
-                    if validation_passed:
-                        stage_one_ai_result_tuple = ai_service.get_response( # This is now Stage 1
-                            game_state=db_game_state,
-                            player_action=action,
-                            is_stuck=is_stuck,
-                            next_required_plot_point=next_required_plot_point_desc,
-                            current_difficulty=db_game_state.game.current_difficulty # Pass current difficulty
-                        )
-                        if not stage_one_ai_result_tuple:
-                            raise ValueError("AI service (Stage 1) failed to respond after inventory check (or no check needed).")
-                    # else: stage_one_ai_result_tuple remains None
-
-                    # 3. Add player action to log (ALWAYS happens)
-                    if not isinstance(db_game_state.game_log, list):
-                        db_game_state.game_log = []
-                    db_game_state.game_log.append(player_log)
-                    if game_id in game_state_service.active_games:
-                         if 'log' not in game_state_service.active_games[game_id] or not isinstance(game_state_service.active_games[game_id]['log'], list):
-                              game_state_service.active_games[game_id]['log'] = []
-                         game_state_service.active_games[game_id]['log'].append(player_log)
-                    current_app.logger.debug(f"Appended player log entry for game {game_id}")
-                    attributes.flag_modified(db_game_state, "game_log") # Flag game_log modification immediately
-
-                    # 4. Process Stage 1 AI Result (if validation passed AND AI responded)
-                    if stage_one_ai_result_tuple:
-                        stage_one_ai_output, model_used, usage_data = stage_one_ai_result_tuple
-
-                        # Ensure stage_one_ai_output is a dictionary before accessing keys
-                        if isinstance(stage_one_ai_output, dict):
-                            narrative_from_stage1 = stage_one_ai_output.get('narrative', 'Error: AI narrative missing.')
-                            general_state_changes_from_stage1 = stage_one_ai_output.get('state_changes', {})
-                            available_actions_from_stage1 = stage_one_ai_output.get('available_actions', [])
+                        if exact_match_found:
+                            current_app.logger.info(f"Inventory validation passed (exact match) for game {game_id}: Item '{required_item}' found in inventory.")
+                            # validation_passed remains True (set initially)
                         else:
-                            # Handle unexpected AI output format
-                            current_app.logger.error(f"Stage 1 AI service returned unexpected output format for game {game_id}. Expected dict, got {type(stage_one_ai_output)}. Raw output: {stage_one_ai_output}")
-                            narrative_from_stage1 = 'Error: AI returned unexpected format.'
-                            general_state_changes_from_stage1 = {}
-                            available_actions_from_stage1 = []
-                            # Optionally, raise an error or emit a client error here if this is critical
-                            # raise ValueError("AI service (Stage 1) returned unexpected output format.")
-
-                        # Add AI narrative to game_log
-                        db_game_state.game_log.append({"type": "ai", "content": narrative_from_stage1})
-                        if game_id in game_state_service.active_games: # Also update in-memory log
-                             if 'log' not in game_state_service.active_games[game_id] or not isinstance(game_state_service.active_games[game_id]['log'], list):
-                                  game_state_service.active_games[game_id]['log'] = []
-                             game_state_service.active_games[game_id]['log'].append({"type": "ai", "content": narrative_from_stage1})
-                        current_app.logger.debug(f"Appended AI (Stage 1) narrative log entry for game {game_id}")
-                        attributes.flag_modified(db_game_state, "game_log") # Flag game_log modification
-
-                        # Merge general_state_changes_from_stage1 into state_data
-                        # This includes location, inventory_changes, npc_status, world_object_states, conclusion flags etc.
-                        # It does NOT include plot point completions.
-                        if general_state_changes_from_stage1:
-                            state_data.update(general_state_changes_from_stage1)
-                            current_app.logger.debug(f"Merged Stage 1 AI's general_state_changes into state_data. Current state_data: {json.dumps(state_data)}")
-
-                        # Update visited_locations based on AI's reported new location from Stage 1
-                        new_location_from_stage1 = general_state_changes_from_stage1.get('location')
-                        if new_location_from_stage1:
-                            if 'visited_locations' not in state_data or not isinstance(state_data['visited_locations'], list):
-                                state_data['visited_locations'] = []
-                            if new_location_from_stage1 not in state_data['visited_locations']:
-                                state_data['visited_locations'].append(new_location_from_stage1)
-                                current_app.logger.debug(f"Added '{new_location_from_stage1}' to state_data['visited_locations']. Current: {state_data.get('visited_locations')}")
+                            # No exact match found, now check for partial (startswith) match
+                            partial_match_found = False
+                            for item_in_inv_lower in inventory_lower:
+                                if item_in_inv_lower.startswith(required_item_lower):
+                                    current_app.logger.info(f"Inventory validation passed (partial match): Inventory item '{item_in_inv_lower}' starts with required '{required_item_lower}'. Allowing action.")
+                                    partial_match_found = True
+                                    validation_passed = True 
+                                    break # Allow action based on first partial match
+                            
+                            # Only set validation_passed to False if NEITHER exact NOR partial match was found
+                            if not partial_match_found: 
+                                current_app.logger.warning(f"Inventory validation failed for game {game_id}: Item '{required_item}' not found (exact or partial match) in current_inventory {inventory}.")
+                                emit('error', {'message': f"You don't have a '{required_item}'."}, room=game_id)
+                                validation_passed = False
+
+                timer.lap('inventory_validation')
+
+                # 2. Call Stage 1 AI Service (only if validation passed)
+                if validation_passed:
+                    # Stream the narrative to the room as it is generated (STREAM_NARRATIVE).
+                    # Clients render 'narrative_chunk' deltas immediately; the authoritative
+                    # 'game_state_update' still follows once all stages have finished.
+                    stream_narrative = current_app.config.get('STREAM_NARRATIVE', True)
+
+                    def emit_narrative_chunk(delta):
+                        emit('narrative_chunk', {'game_id': game_id, 'user_id': user_id, 'delta': delta}, room=game_id)
+
+                    stage_one_ai_result_tuple = ai_service.get_response( # This is now Stage 1
+                        game_state=db_game_state, # Detached snapshot; the context is prebuilt in phase 1
+                        player_action=action,
+                        is_stuck=is_stuck,
+                        next_required_plot_point=next_required_plot_point_desc,
+                        current_difficulty=current_difficulty, # Pass current difficulty
+                        stream_callback=emit_narrative_chunk if stream_narrative else None,
+                        context=turn_context
+                    )
+                    if stream_narrative:
+                        emit('narrative_done', {
+                            'game_id': game_id,
+                            'user_id': user_id,
+                            'narrative': stage_one_ai_result_tuple[0].get('narrative') if stage_one_ai_result_tuple else None
+                        }, room=game_id)
+                        narrative_streamed = bool(stage_one_ai_result_tuple)
+                    if not stage_one_ai_result_tuple:
+                        raise ValueError("AI service (Stage 1) failed to respond after inventory check (or no check needed).")
+                # else: stage_one_ai_result_tuple remains None
+
+                # 3. Add player action to log (ALWAYS happens; written in phase 3)
+                new_log_entries.append(player_log)
+
+                # 4. Process Stage 1 AI Result (if validation passed AND AI responded)
+                if stage_one_ai_result_tuple:
+                    stage_one_ai_output, model_used, usage_data = stage_one_ai_result_tuple
+
+                    # Ensure stage_one_ai_output is a dictionary before accessing keys
+                    if isinstance(stage_one_ai_output, dict):
+                        narrative_from_stage1 = stage_one_ai_output.get('narrative', 'Error: AI narrative missing.')
+                        general_state_changes_from_stage1 = stage_one_ai_output.get('state_changes', {})
+                        available_actions_from_stage1 = stage_one_ai_output.get('available_actions', [])
+                    else:
+                        # Handle unexpected AI output format
+                        current_app.logger.error(f"Stage 1 AI service returned unexpected output format for game {game_id}. Expected dict, got {type(stage_one_ai_output)}. Raw output: {stage_one_ai_output}")
+                        narrative_from_stage1 = 'Error: AI returned unexpected format.'
+                        general_state_changes_from_stage1 = {}
+                        available_actions_from_stage1 = []
+                        # Optionally, raise an error or emit a client error here if this is critical
+                        # raise ValueError("AI service (Stage 1) returned unexpected output format.")
+
+                    # Add AI narrative to game_log (written in phase 3)
+                    new_log_entries.append({"type": "ai", "content": narrative_from_stage1})
+
+                    # Merge general_state_changes_from_stage1 into state_data
+                    # This includes location, inventory_changes, npc_status, world_object_states, conclusion flags etc.
+                    # It does NOT include plot point completions.
+                    if general_state_changes_from_stage1:
+                        state_data.update(general_state_changes_from_stage1)
+                        current_app.logger.debug(f"Merged Stage 1 AI's general_state_changes into state_data. Current state_data: {json.dumps(state_data)}")
+
+                    # Update visited_locations based on AI's reported new location from Stage 1
+                    new_location_from_stage1 = general_state_changes_from_stage1.get('location')
+                    if new_location_from_stage1:
+                        if 'visited_locations' not in state_data or not isinstance(state_data['visited_locations'], list):
+                            state_data['visited_locations'] = []
+                        if new_location_from_stage1 not in state_data['visited_locations']:
+                            state_data['visited_locations'].append(new_location_from_stage1)
+                            current_app.logger.debug(f"Added '{new_location_from_stage1}' to state_data['visited_locations']. Current: {state_data.get('visited_locations')}")
+
+                    # Available actions (from Stage 1) are written to db_game_state in phase 3
+
+                    # API usage for Stage 1 is logged inside the phase 3 write transaction
+                    if usage_data:
+                        stage_one_usage = (model_used, usage_data)
+                    else:
+                        current_app.logger.warning(f"No usage data returned from Stage 1 AI service for game {game_id} player action.")
 
-                        # Update available actions in db_game_state (will be part of the final emit)
-                        db_game_state.available_actions = available_actions_from_stage1 # These are from Stage 1
-                        attributes.flag_modified(db_game_state, "available_actions")
+                    # At this point, state_data contains updates from Stage 1.
+                    
+                    # Historical summary generation is deferred until after the broadcast
+                    # (summary_service.schedule below); it is only needed by the next turn's context.
+
+                    # Plot point completion is handled next.
+                    # We will persist state_data in phase 3, after Stage 4.
+
+                timer.lap('stage1_response')
+
+                # --- STAGE 2: System-Side Plausibility Check ---
+                plausible_plot_points_to_check = []
+                if stage_one_ai_result_tuple: # Only do Stage 2-4 if Stage 1 was successful
+                    # completed_plot_point_ids was defined earlier for narrative guidance, reuse it.
+                    # major_plot_points_list was also defined earlier.
+                    # Pending plot points are scored through the campaign's precomputed inverted index
+                    # (built once per campaign; rules and thresholds match the original word-overlap check)
+                    action_narrative_text_lower = f"{action.lower()} {narrative_from_stage1.lower()}"
+                    stage_two = select_plausible_plot_points(
+                        plot_point_index,
+                        major_plot_points_list,
+                        completed_plot_point_ids,
+                        action_narrative_text_lower,
+                        state_data,
+                        turns_since_plot_progress=turns_since_plot_progress
+                    )
+                    current_app.logger.debug(f"Stage 2: Found {len(stage_two['pending'])} pending plot points for plausibility check.")
+                    current_app.logger.debug(f"Stage 2: Current location: '{stage_two['current_location']}', NPCs present: {stage_two['npcs_present']}")
 
-                        # Log API Usage for Stage 1
-                        if usage_data:
-                            try:
-                                # Cost calculation and logging for Stage 1
-                                cost = calculate_cost(model_used, {'prompt_tokens': usage_data.prompt_tokens, 'completion_tokens': usage_data.completion_tokens})
-                                log_api_usage(
-                                    model_name=model_used,
-                                    prompt_tokens=usage_data.prompt_tokens,
-                                    completion_tokens=usage_data.completion_tokens,
-                                    total_tokens=usage_data.total_tokens,
-                                    cost=cost,
-                                    game_id=game_id
-                                )
-                                current_app.logger.info(f"Logged API usage for Stage 1 AI call (Game {game_id}). Cost: {cost}")
-                            except Exception as log_e:
-                                current_app.logger.error(f"Failed to create ApiUsageLog entry for game {game_id} (Stage 1 action): {log_e}", exc_info=True)
+                    pending_by_id = {str(pp.get('id')): pp for pp in stage_two['pending'] if pp.get('id')}
+                    for candidate in stage_two['candidates']:
+                        if candidate['plausible']:
+                            current_app.logger.debug(f"Stage 2: Plot point ID '{candidate['id']}' (Desc: '{pending_by_id[candidate['id']].get('description')}') deemed plausible (score {candidate['score']}). Reasons: {', '.join(candidate['reasons'])}")
                         else:
-                            current_app.logger.warning(f"No usage data returned from Stage 1 AI service for game {game_id} player action.")
+                            current_app.logger.debug(f"Stage 2: Plot point ID '{candidate['id']}' not deemed plausible.")
+                    plausible_plot_points_to_check = stage_two['plausible']
 
-                        # At this point, state_data contains updates from Stage 1.
-                        
-                        # --- Historical Summary Generation (New Step) ---
-                        current_app.logger.debug(f"Attempting to generate historical summary for game {game_id}, action: '{action}'")
-                        try:
-                            # Pass the general state changes from Stage 1, as these are the immediate consequences of the action.
-                            historical_summary_text = ai_service.generate_historical_summary(
-                                player_action=action,
-                                stage_one_narrative=narrative_from_stage1,
-                                state_changes=general_state_changes_from_stage1, # Pass the state_changes from Stage 1
-                                game_id=game_id
-                            )
-
-                            if historical_summary_text:
-                                if 'historical_summary' not in state_data or not isinstance(state_data['historical_summary'], list):
-                                    state_data['historical_summary'] = []
-                                
-                                # Optional: Limit the number of summaries stored to prevent unbounded growth
-                                MAX_SUMMARIES = current_app.config.get('MAX_HISTORICAL_SUMMARIES', 20) # Default to 20
-                                if len(state_data['historical_summary']) >= MAX_SUMMARIES:
-                                    state_data['historical_summary'].pop(0) # Remove the oldest summary
-
-                                state_data['historical_summary'].append(historical_summary_text)
-                                # state_data is modified in place. The existing flag_modified call after Stage 4 will cover this.
-                                current_app.logger.info(f"Successfully generated and appended historical summary for game {game_id}: '{historical_summary_text}'")
-                                current_app.logger.debug(f"Current historical_summary list for game {game_id}: {state_data['historical_summary']}")
-                            else:
-                                current_app.logger.warning(f"Historical summary generation returned None for game {game_id}.")
-                        except Exception as hs_e:
-                            current_app.logger.error(f"Error during historical summary generation for game {game_id}: {str(hs_e)}", exc_info=True)
-                        # --- End Historical Summary Generation ---
-
-                        # Plot point completion is handled next.
-                        # We will persist db_game_state.state_data after Stage 4.
-
-                    # --- STAGE 2: System-Side Plausibility Check ---
-                    plausible_plot_points_to_check = []
-                    if stage_one_ai_result_tuple: # Only do Stage 2-4 if Stage 1 was successful
-                        # completed_plot_point_ids was defined earlier for narrative guidance, reuse it.
-                        # major_plot_points_list was also defined earlier.
-                        pending_plot_points = [
-                            pp for pp in major_plot_points_list 
-                            if isinstance(pp, dict) and pp.get('id') not in completed_plot_point_ids
-                        ]
-                        current_app.logger.debug(f"Stage 2: Found {len(pending_plot_points)} pending plot points for plausibility check.")
-
-                        action_narrative_text_lower = f"{action.lower()} {narrative_from_stage1.lower()}"
-                        current_location = state_data.get('location', '').lower()
-                        
-                        # Get NPCs present in the current location from state_data
-                        npcs_present = []
-                        npc_status = state_data.get('npc_status', {})
-                        if isinstance(npc_status, dict):
-                            for npc_name, npc_info in npc_status.items():
-                                # Check if NPC is in current location (either as string or in a dict)
-                                if isinstance(npc_info, dict) and npc_info.get('location', '').lower() == current_location:
-                                    npcs_present.append(npc_name.lower())
-                                elif isinstance(npc_info, str) and npc_info.lower() in ['present', 'here']:
-                                    npcs_present.append(npc_name.lower())
-                        
-                        current_app.logger.debug(f"Stage 2: Current location: '{current_location}', NPCs present: {npcs_present}")
-                        
-                        # Check each pending plot point for plausibility
-                        for pp in pending_plot_points:
-                            pp_desc_lower = pp.get('description', '').lower()
-                            pp_id = pp.get('id', '')
-                            is_plausible = False
-                            plausibility_reasons = []
-                            
-                            # 1. Enhanced word matching (TF-IDF inspired approach)
-                            # Extract meaningful words (longer than 3 chars) from plot point description
-                            pp_words = set(w for w in pp_desc_lower.split() if len(w) > 3)
-                            action_narrative_words = set(w for w in action_narrative_text_lower.split() if len(w) > 3)
-                            
-                            # Calculate word overlap ratio for more nuanced matching
-                            if pp_words and action_narrative_words:  # Avoid division by zero
-                                overlap_words = pp_words.intersection(action_narrative_words)
-                                overlap_ratio = len(overlap_words) / len(pp_words)
-                                
-                                # More significant overlap (25% or more of plot point words)
-                                if overlap_ratio >= 0.25:
-                                    is_plausible = True
-                                    plausibility_reasons.append(f"Word overlap ratio: {overlap_ratio:.2f}")
-                                # Some overlap but below threshold
-                                elif overlap_words:
-                                    plausibility_reasons.append(f"Some word overlap but below threshold: {overlap_ratio:.2f}")
-                            
-                            # 2. Location-based relevance
-                            if current_location and current_location in pp_desc_lower:
-                                is_plausible = True
-                                plausibility_reasons.append(f"Current location '{current_location}' mentioned in plot point")
-                            
-                            # 3. NPC-based relevance
-                            for npc in npcs_present:
-                                if npc and len(npc) > 3 and npc in pp_desc_lower:
-                                    is_plausible = True
-                                    plausibility_reasons.append(f"NPC '{npc}' present and mentioned in plot point")
-                            
-                            # 4. Special handling for critical game moments
-                            # Check if this is a "required" plot point - give these higher priority
-                            if pp.get('required', False):
-                                # For required plot points, be more lenient
-                                if not is_plausible and pp_words and action_narrative_words:
-                                    # Check for any meaningful word overlap for required plot points
-                                    if pp_words.intersection(action_narrative_words):
-                                        is_plausible = True
-                                        plausibility_reasons.append("Required plot point with some word overlap")
-                            
-                            # Add to plausible list if any check passed
-                            if is_plausible:
-                                plausible_plot_points_to_check.append(pp)
-                                current_app.logger.debug(f"Stage 2: Plot point ID '{pp_id}' (Desc: '{pp.get('description')}') deemed plausible. Reasons: {', '.join(plausibility_reasons)}")
-                            else:
-                                current_app.logger.debug(f"Stage 2: Plot point ID '{pp_id}' not deemed plausible.")
-                        
-                        # If no plot points were deemed plausible but there are pending required plot points,
-                        # include the first required plot point to ensure progress can be made
-                        if not plausible_plot_points_to_check:
-                            required_pending_plot_points = [pp for pp in pending_plot_points if pp.get('required', False)]
-                            if required_pending_plot_points and turns_since_plot_progress >= 2:  # Only after 2+ turns without progress
-                                first_required = required_pending_plot_points[0]
-                                plausible_plot_points_to_check.append(first_required)
-                                current_app.logger.info(f"Stage 2: No plot points deemed plausible, but including first required plot point '{first_required.get('id')}' due to {turns_since_plot_progress} turns without progress.")
-                        
-                        current_app.logger.info(f"Stage 2: Identified {len(plausible_plot_points_to_check)} plausible plot points for Stage 3 AI check.")
-
-                    # --- STAGE 3: Focused AI Completion Analysis ---
-                    stage_3_ai_results = [] # To store results from AI calls
-                    if plausible_plot_points_to_check: # Only if there are plausible points
-                        current_app.logger.info(f"Stage 3: Beginning focused AI completion analysis for {len(plausible_plot_points_to_check)} plot points.")
-                        for plausible_pp in plausible_plot_points_to_check:
-                            pp_id = plausible_pp.get('id')
-                            pp_desc = plausible_pp.get('description')
-                            current_app.logger.debug(f"Stage 3: Calling ai_service.check_atomic_plot_completion for ID: {pp_id}")
-                            
-                            # Call the new AI service method
-                            # state_data here is the one already updated by Stage 1 general changes
-                            stage_3_single_result = ai_service.check_atomic_plot_completion(
-                                plot_point_id=pp_id,
-                                plot_point_description=pp_desc,
-                                current_game_state_data=state_data, 
+                    # If no plot points were deemed plausible but there are pending required plot points,
+                    # the first required plot point is included to ensure progress can be made
+                    if stage_two['fallback'] is not None:
+                        current_app.logger.info(f"Stage 2: No plot points deemed plausible, but including first required plot point '{stage_two['fallback'].get('id')}' due to {turns_since_plot_progress} turns without progress.")
+                    
+                    current_app.logger.info(f"Stage 2: Identified {len(plausible_plot_points_to_check)} plausible plot points for Stage 3 AI check.")
+
+                timer.lap('stage2_plausibility', candidates=len(plausible_plot_points_to_check))
+
+                # --- STAGE 3: Focused AI Completion Analysis ---
+                stage_3_ai_results = [] # To store results from AI calls
+                if plausible_plot_points_to_check: # Only if there are plausible points
+                    current_app.logger.info(f"Stage 3: Beginning focused AI completion analysis for {len(plausible_plot_points_to_check)} plot points.")
+                    # Checks run on the shared async loop: one batched request when PLOT_CHECK_BATCH_MODE is on
+                    # (with single-check fallback for IDs it misses), otherwise parallel single checks.
+                    # Concurrency and the per-turn deadline come from PLOT_CHECK_MAX_CONCURRENCY / PLOT_CHECK_DEADLINE_SECONDS.
+                    # state_data here is the one already updated by Stage 1 general changes
+                    try:
+                        stage_3_raw_results = async_runner.run(
+                            async_ai_service.check_plot_points(
+                                plot_points=plausible_plot_points_to_check,
+                                current_game_state_data=state_data,
                                 player_action=action,
                                 stage_one_narrative=narrative_from_stage1,
                                 game_id=game_id # For logging API usage
                             )
-                            
-                            if stage_3_single_result and 'error' not in stage_3_single_result:
-                                stage_3_ai_results.append(stage_3_single_result)
-                                current_app.logger.info(f"Stage 3: AI check for plot ID '{pp_id}' returned: Completed={stage_3_single_result.get('completed')}, Confidence={stage_3_single_result.get('confidence_score')}")
-                            else:
-                                current_app.logger.error(f"Stage 3: AI check_atomic_plot_completion call failed for plot ID '{pp_id}'. Result: {stage_3_single_result}")
-                        current_app.logger.info(f"Stage 3: Finished focused AI completion analysis. Got {len(stage_3_ai_results)} valid results.")
+                        )
+                    except Exception as s3_e:
+                        current_app.logger.error(f"Stage 3: Plot point checks failed for game {game_id}: {s3_e}", exc_info=True)
+                        stage_3_raw_results = []
+
+                    for plausible_pp, stage_3_single_result in zip(plausible_plot_points_to_check, stage_3_raw_results):
+                        pp_id = plausible_pp.get('id')
+                        if stage_3_single_result and 'error' not in stage_3_single_result:
+                            stage_3_ai_results.append(stage_3_single_result)
+                            current_app.logger.info(f"Stage 3: AI check for plot ID '{pp_id}' returned: Completed={stage_3_single_result.get('completed')}, Confidence={stage_3_single_result.get('confidence_score')}")
+                        else:
+                            current_app.logger.error(f"Stage 3: AI check_atomic_plot_completion call failed for plot ID '{pp_id}'. Result: {stage_3_single_result}")
+                    current_app.logger.info(f"Stage 3: Finished focused AI completion analysis. Got {len(stage_3_ai_results)} valid results.")
+                
+                timer.lap('stage3_plot_checks')
+
+                # --- STAGE 4: System Aggregation & Final State Update (Plot Points) ---
+                CONFIDENCE_THRESHOLD = float(current_app.config.get('PLOT_COMPLETION_CONFIDENCE_THRESHOLD', 0.7))
+                newly_completed_plot_points_this_turn_ids = [] 
+
+                if stage_3_ai_results: # Only if Stage 3 produced results
+                    current_app.logger.info(f"Stage 4: Aggregating {len(stage_3_ai_results)} Stage 3 AI results. Confidence threshold: {CONFIDENCE_THRESHOLD}")
+                    if 'completed_plot_points' not in state_data or not isinstance(state_data['completed_plot_points'], list):
+                        state_data['completed_plot_points'] = []
                     
-                    # --- STAGE 4: System Aggregation & Final State Update (Plot Points) ---
-                    CONFIDENCE_THRESHOLD = float(current_app.config.get('PLOT_COMPLETION_CONFIDENCE_THRESHOLD', 0.7))
-                    newly_completed_plot_points_this_turn_ids = [] 
-
-                    if stage_3_ai_results: # Only if Stage 3 produced results
-                        current_app.logger.info(f"Stage 4: Aggregating {len(stage_3_ai_results)} Stage 3 AI results. Confidence threshold: {CONFIDENCE_THRESHOLD}")
-                        if 'completed_plot_points' not in state_data or not isinstance(state_data['completed_plot_points'], list):
-                            state_data['completed_plot_points'] = []
-                        
-                        # Get IDs of plot points already marked as completed *before* this turn's Stage 4 processing
-                        # This uses the `completed_plot_point_ids` list which was up-to-date before Stage 1.
-                        # Or, more robustly, re-derive from current state_data['completed_plot_points'] before modification in this loop.
-                        ids_already_completed = [cp.get('id') for cp in state_data.get('completed_plot_points', []) if isinstance(cp, dict)]
-
-                        for res in stage_3_ai_results:
-                            is_completed_by_ai = res.get('completed', False)
-                            confidence = res.get('confidence_score', 0.0)
-                            plot_id_from_ai = res.get('plot_point_id')
-
-                            if is_completed_by_ai and confidence >= CONFIDENCE_THRESHOLD:
-                                if plot_id_from_ai not in ids_already_completed:
-                                    # Find the full plot point object from campaign.major_plot_points
-                                    full_plot_point_obj = next((p for p in major_plot_points_list if isinstance(p, dict) and p.get('id') == plot_id_from_ai), None)
-                                    if full_plot_point_obj:
-                                        state_data['completed_plot_points'].append(full_plot_point_obj)
-                                        newly_completed_plot_points_this_turn_ids.append(plot_id_from_ai)
-                                        current_app.logger.info(f"Stage 4: NEWLY COMPLETED plot point ID '{plot_id_from_ai}' (Desc: '{full_plot_point_obj.get('description')}'). Added to state_data.")
-                                    else:
-                                        current_app.logger.warning(f"Stage 4: AI confirmed completion for ID '{plot_id_from_ai}', but full object not found in campaign's major_plot_points.")
+                    # Get IDs of plot points already marked as completed *before* this turn's Stage 4 processing
+                    # This uses the `completed_plot_point_ids` list which was up-to-date before Stage 1.
+                    # Or, more robustly, re-derive from current state_data['completed_plot_points'] before modification in this loop.
+                    ids_already_completed = [cp.get('id') for cp in state_data.get('completed_plot_points', []) if isinstance(cp, dict)]
+
+                    for res in stage_3_ai_results:
+                        is_completed_by_ai = res.get('completed', False)
+                        confidence = res.get('confidence_score', 0.0)
+                        plot_id_from_ai = res.get('plot_point_id')
+
+                        if is_completed_by_ai and confidence >= CONFIDENCE_THRESHOLD:
+                            if plot_id_from_ai not in ids_already_completed:
+                                # Find the full plot point object from campaign.major_plot_points
+                                full_plot_point_obj = next((p for p in major_plot_points_list if isinstance(p, dict) and p.get('id') == plot_id_from_ai), None)
+                                if full_plot_point_obj:
+                                    state_data['completed_plot_points'].append(copy.deepcopy(full_plot_point_obj))
+                                    newly_completed_plot_points_this_turn_ids.append(plot_id_from_ai)
+                                    current_app.logger.info(f"Stage 4: NEWLY COMPLETED plot point ID '{plot_id_from_ai}' (Desc: '{full_plot_point_obj.get('description')}'). Added to state_data.")
                                 else:
-                                    current_app.logger.debug(f"Stage 4: Plot point ID '{plot_id_from_ai}' was already in completed_plot_points. No change from this AI check.")
+                                    current_app.logger.warning(f"Stage 4: AI confirmed completion for ID '{plot_id_from_ai}', but full object not found in campaign's major_plot_points.")
                             else:
-                                current_app.logger.debug(f"Stage 4: Plot point ID '{plot_id_from_ai}' not completed or confidence too low (Completed: {is_completed_by_ai}, Confidence: {confidence}).")
-                        
-                        if newly_completed_plot_points_this_turn_ids:
-                            current_app.logger.info(f"Stage 4: Newly completed plot points this turn: {newly_completed_plot_points_this_turn_ids}")
-                            # Check if any of the *newly completed* plot points were *required*
-                            was_any_newly_completed_required = any(
-                                pp_obj.get('required') for newly_id in newly_completed_plot_points_this_turn_ids
-                                for pp_obj in major_plot_points_list if isinstance(pp_obj, dict) and pp.get('id') == newly_id
-                            )
-                            if was_any_newly_completed_required:
-                                state_data['turns_since_plot_progress'] = 0 # Reset counter
-                                current_app.logger.info(f"Stage 4: Reset turns_since_plot_progress to 0 due to new required plot point(s) completion.")
-                            else:
-                                current_app.logger.info(f"Stage 4: Newly completed plot points were optional or none that were required. Turns since progress remains: {state_data['turns_since_plot_progress']}")
+                                current_app.logger.debug(f"Stage 4: Plot point ID '{plot_id_from_ai}' was already in completed_plot_points. No change from this AI check.")
                         else:
-                             current_app.logger.info(f"Stage 4: No new plot points confirmed as completed this turn based on Stage 3 AI checks and confidence.")
-                    else:
-                        current_app.logger.info("Stage 4: No Stage 3 AI results to process for plot point completion.")
+                            current_app.logger.debug(f"Stage 4: Plot point ID '{plot_id_from_ai}' not completed or confidence too low (Completed: {is_completed_by_ai}, Confidence: {confidence}).")
                     
-                    # state_data now contains Stage 1 general updates + Stage 4 plot point completions.
+                    if newly_completed_plot_points_this_turn_ids:
+                        current_app.logger.info(f"Stage 4: Newly completed plot points this turn: {newly_completed_plot_points_this_turn_ids}")
+                        # Check if any of the *newly completed* plot points were *required*
+                        was_any_newly_completed_required = any(
+                            pp_obj.get('required') for newly_id in newly_completed_plot_points_this_turn_ids
+                            for pp_obj in major_plot_points_list if isinstance(pp_obj, dict) and pp_obj.get('id') == newly_id
+                        )
+                        if was_any_newly_completed_required:
+                            state_data['turns_since_plot_progress'] = 0 # Reset counter
+                            current_app.logger.info(f"Stage 4: Reset turns_since_plot_progress to 0 due to new required plot point(s) completion.")
+                        else:
+                            current_app.logger.info(f"Stage 4: Newly completed plot points were optional or none that were required. Turns since progress remains: {state_data['turns_since_plot_progress']}")
+                    else:
+                         current_app.logger.info(f"Stage 4: No new plot points confirmed as completed this turn based on Stage 3 AI checks and confidence.")
+                else:
+                    current_app.logger.info("Stage 4: No Stage 3 AI results to process for plot point completion.")
+                
+                # state_data now contains Stage 1 general updates + Stage 4 plot point completions.
+                timer.lap('stage4_aggregation')
+
+                # --- Phase 3: Short write transaction with optimistic version check ---
+                with current_app.app_context():
+                    db_game_state = db.session.query(GameState).options(
+                        joinedload(GameState.game).joinedload(Game.campaign)
+                    ).filter_by(game_id=game_id).first()
+                    if not db_game_state:
+                        raise ValueError(f"GameState record disappeared for game_id {game_id} during action processing")
+
+                    # Log API Usage for Stage 1 (the call was made, so it is recorded even if the write below is rejected)
+                    if stage_one_usage:
+                        try:
+                            model_used, usage_data = stage_one_usage
+                            cost = log_completion_usage(model_used, usage_data, game_id, in_transaction=True) # Part of this turn's write transaction
+                            current_app.logger.info(f"Logged API usage for Stage 1 AI call (Game {game_id}). Cost: {cost}, cached prompt tokens: {cached_prompt_tokens(usage_data)}")
+                        except Exception as log_e:
+                            current_app.logger.error(f"Failed to create ApiUsageLog entry for game {game_id} (Stage 1 action): {log_e}", exc_info=True)
+
+                    # Usage of this turn's other AI calls (plot checks) is still in the buffer: write it in
+                    # the same transaction, so the cost rollup broadcast below already includes it
+                    turn_usage_rows = usage_recorder.take(game_id)
+                    usage_recorder.add_to_session(turn_usage_rows)
+
+                    if db_game_state.version != snapshot_version:
+                        # Another writer changed this game while the AI calls were running.
+                        # Keep the usage row, discard this turn's result and ask the player to retry.
+                        db.session.commit()
+                        stage_one_usage_logged = True
+                        current_app.logger.warning(f"Version conflict for game {game_id}: snapshot v{snapshot_version}, current v{db_game_state.version}. Discarding action '{action}'.")
+                        retract_streamed_narrative()
+                        emit('error', {'message': 'The game changed while your action was being processed. Please try again.'}, room=request.sid)
+                        return
+
+                    # Append this turn's log entries (player action, AI narrative)
+                    # One GameLogEntry row per new entry; the existing log is neither loaded nor rewritten
+                    game_log_service.append_entries(db_game_state, new_log_entries)
+                    current_app.logger.debug(f"Appended {len(new_log_entries)} log entries for game {game_id}")
+
+                    if stage_one_ai_result_tuple:
+                        # Update available actions in db_game_state (will be part of the final emit)
+                        db_game_state.available_actions = available_actions_from_stage1 # These are from Stage 1
+                        attributes.flag_modified(db_game_state, "available_actions")
+
+                    # A previous summary that missed the wait is appended in this transaction
+                    late_summaries = summary_service.take_late(game_id)
+                    if late_summaries:
+                        append_historical_summaries(state_data, late_summaries, current_app.config.get('MAX_HISTORICAL_SUMMARIES', 20))
+                        current_app.logger.info(f"Appending {len(late_summaries)} late historical summaries for game {game_id} with this turn.")
+
                     # Persist the final state_data to the database object
                     db_game_state.state_data = state_data
                     attributes.flag_modified(db_game_state, "state_data") # Ensure it's flagged for SQLAlchemy
@@ -731,10 +817,36 @@ class SocketService:
                     # Log state JUST BEFORE final commit
                     current_app.logger.debug(f"PRE-COMMIT final state_data (after all stages): {json.dumps(db_game_state.state_data)}")
 
-                    # 5. Commit the transaction (saves all logs and the fully updated state_data)
-                    db.session.commit()
-                    current_app.logger.info(f"Committed all updates for game {game_id} after action '{action}'.")
-                    
+                    # 5. Commit the transaction (saves all logs and the fully updated state_data).
+                    # The UPDATE is issued with "WHERE version = <snapshot>", so a writer that slips in
+                    # after the check above makes it fail with StaleDataError instead of being overwritten.
+                    try:
+                        db.session.commit()
+                    except StaleDataError:
+                        db.session.rollback()
+                        usage_recorder.requeue(turn_usage_rows)
+                        summary_service.requeue_late(game_id, late_summaries)
+                        turn_usage_rows, late_summaries = [], [] # Handed back; not again by the except below
+                        current_app.logger.warning(f"Version conflict on commit for game {game_id} (snapshot v{snapshot_version}). Discarding action '{action}'.")
+                        if stage_one_usage:
+                            model_used, usage_data = stage_one_usage
+                            log_completion_usage(model_used, usage_data, game_id)
+                            stage_one_usage_logged = True
+                        retract_streamed_narrative()
+                        emit('error', {'message': 'The game changed while your action was being processed. Please try again.'}, room=request.sid)
+                        return
+                    turn_usage_rows = [] # Committed with the turn
+                    late_summaries = []
+                    stage_one_usage_logged = True
+                    turn_committed = True
+                    timer.lap('commit')
+                    current_app.logger.info(f"Committed all updates for game {game_id} after action '{action}' (GameState v{db_game_state.version}).")
+
+                    # Without a Stage 1 result there is no update_state call below, so bring the
+                    # cached entry in step with the committed log (player action / error entries) here
+                    if not stage_one_ai_result_tuple:
+                        game_state_service.sync_from_db(game_id, db_game_state)
+
                     # Log state JUST AFTER final commit
                     current_app.logger.debug(f"POST-COMMIT final state_data: {json.dumps(db_game_state.state_data)}")
 
@@ -777,30 +889,30 @@ class SocketService:
                          current_app.logger.error(f"Failed to update in-memory game_state_service for game {game_id} after all stages.")
                          # This is not ideal, but DB is consistent.
 
+                    # update_state bumped the version and snapshotted history; the committed row is the
+                    # source of truth for state/log/actions, so realign the cached entry and mark it clean
+                    with current_app.app_context():
+                        committed_game_state = GameState.query.filter_by(game_id=game_id).first()
+                        if committed_game_state:
+                            game_state_service.sync_from_db(game_id, committed_game_state)
+                    timer.lap('cache_update')
+
                     with current_app.app_context(): # Context for cost query and game status update
-                        new_total_cost_query = db.session.query(func.sum(ApiUsageLog.cost)).filter(ApiUsageLog.game_id == game_id).scalar()
+                        # Maintained rollup (incremented with each usage row in this turn's transaction)
+                        new_total_cost_query = db.session.query(Game.total_cost).filter(Game.id == game_id).scalar()
                         new_total_cost = new_total_cost_query if new_total_cost_query is not None else Decimal('0.0')
+                        timer.lap('cost_query')
 
                         # Prepare broadcast data using the definitive state from the DB
                         
                         # --- Calculate Plot Point Display Counts ---
-                        first_required_pp_id = None
-                        if major_plot_points_list:
-                            for pp in major_plot_points_list:
-                                if isinstance(pp, dict) and pp.get('required'):
-                                    first_required_pp_id = pp.get('id')
-                                    break
-                        
-                        total_plot_points_for_display = 0
-                        for pp in major_plot_points_list:
-                            if isinstance(pp, dict) and pp.get('id') != first_required_pp_id:
-                                total_plot_points_for_display += 1
-                        
-                        current_completed_for_display = db_game_state.state_data.get('completed_plot_points', [])
-                        completed_plot_points_display_count = 0
-                        for pp in current_completed_for_display:
-                            if isinstance(pp, dict) and pp.get('id') != first_required_pp_id:
-                                completed_plot_points_display_count += 1
+                        # Campaign totals come with the cached plot point index; the completed count is
+                        # kept with the cached game and only counts plot points completed since last time
+                        display_totals = plot_point_index.get('display') or plot_point_display_totals(major_plot_points_list)
+                        first_required_pp_id = display_totals['first_required_id']
+                        total_plot_points_for_display = display_totals['total']
+                        completed_plot_points_display_count = game_state_service.get_completed_display_count(
+                            game_id, db_game_state.state_data.get('completed_plot_points', []), first_required_pp_id)
                         
                         newly_completed_display_details_msg = None
                         if newly_completed_plot_points_this_turn_ids:
@@ -814,21 +926,17 @@ class SocketService:
                         # --- End Calculate Plot Point Display Counts ---
 
                         # --- New: Extract latest_ai_response, player_commands, historical_summary for frontend ---
-                        game_log = db_game_state.game_log if isinstance(db_game_state.game_log, list) else []
-                        latest_ai_response = None
-                        player_commands = []
-                        for entry in game_log:
-                            if isinstance(entry, dict):
-                                if entry.get("type") == "ai":
-                                    latest_ai_response = entry.get("content")
-                                elif entry.get("type") == "player":
-                                    player_commands.append({
-                                        "user_id": entry.get("user_id"),
-                                        "content": entry.get("content")
-                                    })
-                        # If multiple AI entries, take the last one
-                        if any(e.get("type") == "ai" for e in game_log if isinstance(e, dict)):
-                            latest_ai_response = [e.get("content") for e in game_log if isinstance(e, dict) and e.get("type") == "ai"][-1]
+                        # The cached entry was just synced with the committed log rows and its log views were
+                        # folded in with them, so nothing here scans the log. The log is shared with the cache
+                        # (delta broadcasts drop it); the conclusion branch copies it before appending.
+                        cached_entry = game_state_service.active_games.get(game_id) or {}
+                        log_views = game_state_service.get_log_views(game_id) if isinstance(cached_entry.get('log'), list) else None
+                        if log_views is not None:
+                            game_log = cached_entry['log']
+                            latest_ai_response, player_commands = log_views
+                        else:
+                            game_log = game_log_service.get_log(game_id, game_state=db_game_state)
+                            latest_ai_response, player_commands = build_log_views(game_log)
                         # Historical summary from state_data
                         historical_summary = db_game_state.state_data.get("historical_summary", [])
 
@@ -844,9 +952,9 @@ class SocketService:
                             'game_id': game_id,
                             'user_id': user_id, # User who took the action
                             'state': db_game_state.state_data,       # Fully updated state from DB
-                            'log': db_game_state.game_log,           # Fully updated log from DB
+                            'log': game_log,                         # Fully updated log (committed rows)
                             'actions': db_game_state.available_actions, # Actions from Stage 1, stored in DB
-                            'version': updated_state_info.get('version') if updated_state_info else db_game_state.version,
+                            'version': db_game_state.version, # Persisted GameState.version, bumped by this turn's commit
                             'total_cost': float(new_total_cost),
                             'total_plot_points_display': total_plot_points_for_display,
                             'completed_plot_points_display_count': completed_plot_points_display_count,
@@ -858,18 +966,21 @@ class SocketService:
                             'player_display_map': player_display_map
                         }
                         
-                        current_app.logger.debug(f"Final broadcast data prepared for game {game_id}: {json.dumps(broadcast_data)}")
+                        # Summary only: dumping the full payload would serialize the whole log on every turn
+                        current_app.logger.debug(f"Final broadcast data prepared for game {game_id}: v{broadcast_data['version']}, {len(game_log)} log entries, {len(player_commands)} player commands")
 
+                        timer.lap('broadcast_prepare')
                         from .campaign_service import check_conclusion
                         game_has_concluded = check_conclusion(db_game_state)
+                        timer.lap('check_conclusion')
 
                         if game_has_concluded:
                             current_app.logger.info(f"Game {game_id} has concluded. Modifying final broadcast.")
                             
-                            # 1. Append system message to log
+                            # 1. Append system message to a copy of the log (the cached one stays the committed rows)
                             if not isinstance(broadcast_data.get('log'), list): # Ensure log is a list
                                 broadcast_data['log'] = []
-                            broadcast_data['log'].append({"type": "system", "content": "** CAMPAIGN COMPLETE! **"})
+                            broadcast_data['log'] = broadcast_data['log'] + [{"type": "system", "content": "** CAMPAIGN COMPLETE! **"}]
                             
                             # 2. Set actions to indicate completion
                             broadcast_data['actions'] = ["Campaign Complete"]
@@ -877,6 +988,7 @@ class SocketService:
                             # Emit the modified game_state_update for the final turn
                             current_app.logger.info(f"Broadcasting FINAL game_state_update for concluded game {game_id} (v{broadcast_data['version']})")
                             emit('game_state_update', broadcast_data, room=game_id)
+                            timer.lap('broadcast')
 
                             # Emit game_concluded event
                             current_app.logger.info(f"Emitting 'game_concluded' for game {game_id}.")
@@ -897,10 +1009,27 @@ class SocketService:
                                 current_app.logger.error(f"Could not find game {game_id} to update status to 'completed'.")
                         else:
                             # Game has not concluded, broadcast normal update
-                            current_app.logger.info(f"[socket_service] Game {game_id} has not concluded. Broadcasting normal 'game_state_update' (v{broadcast_data.get('version')}) to room {game_id}.")
-                            current_app.logger.debug(f"[socket_service] Full 'game_state_update' data for room {game_id}: {json.dumps(broadcast_data)}")
+                            if current_app.config.get('BROADCAST_MODE', 'delta') == 'delta':
+                                # Send only the patch from the version this turn started from (clients resync on a gap)
+                                broadcast_data = SocketService._delta_broadcast(game_id, snapshot_version, broadcast_data)
+                            current_app.logger.info(f"[socket_service] Game {game_id} has not concluded. Broadcasting {'delta' if 'patch' in broadcast_data else 'full'} 'game_state_update' (v{broadcast_data.get('version')}) to room {game_id}.")
+                            current_app.logger.debug(f"[socket_service] 'game_state_update' data for room {game_id}: {json.dumps(broadcast_data)}")
                             emit('game_state_update', broadcast_data, room=game_id)
+                            timer.lap('broadcast')
                             current_app.logger.info(f"[socket_service] Game {game_id} has not concluded yet after action by user {user_id}.")
+
+                    # --- Deferred Historical Summary ---
+                    # Runs in the background after the broadcast; the next action for this game waits for it.
+                    try:
+                        summary_service.schedule(
+                            game_id=game_id,
+                            player_action=action,
+                            stage_one_narrative=narrative_from_stage1,
+                            state_changes=temp_general_state_changes # The state_changes from Stage 1
+                        )
+                    except Exception as hs_e:
+                        current_app.logger.error(f"Error scheduling historical summary generation for game {game_id}: {str(hs_e)}", exc_info=True)
+                    timer.lap('summary_schedule')
                 # else: # No broadcast if commit was skipped or AI call failed
                 #    current_app.logger.info(f"[socket_service] Skipping broadcast and conclusion check for game {game_id} as full AI update and commit did not occur.")
 
@@ -908,15 +1037,37 @@ class SocketService:
                 # Rollback needed if any error occurred within the try block OR if inventory check failed and we need to ensure no partial changes
                 with current_app.app_context(): # Need context for rollback
                     db.session.rollback()
+                usage_recorder.requeue(turn_usage_rows) # Not committed; the background flusher writes them
+                summary_service.requeue_late(game_id, late_summaries) # Left for the game's next state update
+                if stage_one_usage and not stage_one_usage_logged:
+                    # The Stage 1 call was billed even though the turn failed
+                    try:
+                        model_used, usage_data = stage_one_usage
+                        log_completion_usage(model_used, usage_data, game_id)
+                    except Exception as log_e:
+                        current_app.logger.error(f"Failed to record Stage 1 API usage for game {game_id} after the turn failed: {log_e}", exc_info=True)
                 current_app.logger.error(f"Error processing player action '{action}' in game {game_id}, rolling back transaction: {str(e)}", exc_info=True)
+                retract_streamed_narrative()
                 emit('error', {'message': 'Failed to process action'}, room=game_id)
 
 
-        @socketio.on('request_state')
+        @socketio_event('request_state')
         def handle_state_request(data):
-            """Send current game state to requesting player"""
+            """
+            Send current game state to requesting player.
+
+            A client that already holds a state may send its 'known_version'; it then gets
+            'game_state_not_modified' if that is still current, or 'game_state_delta' (an RFC 6902
+            patch over {'state', 'log'}) if that version is still in the game's patch ring buffer.
+            Otherwise the full 'game_state' is sent.
+            """
             game_id = data.get('game_id')
             user_id = data.get('user_id')
+            known_version = data.get('known_version')
+            try:
+                known_version = int(known_version) if known_version is not None else None
+            except (TypeError, ValueError):
+                known_version = None
             
             current_app.logger.info(f"[socket_service] Received 'request_state' for game_id={game_id}, user_id={user_id}, from SID: {request.sid}")
 
@@ -951,6 +1102,15 @@ class SocketService:
                         emit('error', {'message': 'Failed to retrieve game state. Please contact support.'}, room=request.sid)
                         return
                     
+                    if known_version is not None and known_version == state_info['version']:
+                        current_app.logger.info(f"[socket_service] Game {game_id} state unchanged at v{known_version} for SID {request.sid}. Sending 'game_state_not_modified'.")
+                        emit('game_state_not_modified', {
+                            'game_id': game_id,
+                            'version': state_info['version'],
+                            'player_locations': state_info.get('player_locations', {})
+                        }, room=request.sid)
+                        return
+
                     current_app.logger.debug(f"[socket_service] 'request_state' handler: State found in service. Calculating plot display counts. state_info['state'] keys: {list(state_info['state'].keys()) if state_info.get('state') else 'None'}")
 
 
@@ -960,43 +1120,24 @@ class SocketService:
                     if not isinstance(major_plot_points_list_initial, list):
                         major_plot_points_list_initial = []
 
-                    first_required_pp_id_initial = None
-                    if major_plot_points_list_initial:
-                        for pp_init in major_plot_points_list_initial:
-                            if isinstance(pp_init, dict) and pp_init.get('required'):
-                                first_required_pp_id_initial = pp_init.get('id')
-                                break
-                    
-                    total_plot_points_for_display_initial = 0
-                    for pp_init in major_plot_points_list_initial:
-                        if isinstance(pp_init, dict) and pp_init.get('id') != first_required_pp_id_initial:
-                            total_plot_points_for_display_initial += 1
-                    
+                    # Same incremental counts and log views as the turn broadcast (no scan of the plot points or log)
+                    display_totals_initial = get_plot_point_index(game.campaign).get('display') or plot_point_display_totals(major_plot_points_list_initial)
+                    first_required_pp_id_initial = display_totals_initial['first_required_id']
+                    total_plot_points_for_display_initial = display_totals_initial['total']
+
                     completed_plot_points_initial_raw = state_info['state'].get('completed_plot_points', [])
                     if not isinstance(completed_plot_points_initial_raw, list):
                         completed_plot_points_initial_raw = []
-                        
-                    completed_plot_points_display_count_initial = 0
-                    for pp_init in completed_plot_points_initial_raw:
-                        if isinstance(pp_init, dict) and pp_init.get('id') != first_required_pp_id_initial:
-                            completed_plot_points_display_count_initial += 1
+                    completed_plot_points_display_count_initial = game_state_service.get_completed_display_count(
+                        game_id, completed_plot_points_initial_raw, first_required_pp_id_initial)
 
                     # --- New: Extract latest_ai_response, player_commands, historical_summary for frontend initial state ---
                     game_log = state_info.get('log', [])
-                    latest_ai_response = None
-                    player_commands = []
-                    for entry in game_log:
-                        if isinstance(entry, dict):
-                            if entry.get("type") == "ai":
-                                latest_ai_response = entry.get("content")
-                            elif entry.get("type") == "player":
-                                player_commands.append({
-                                    "user_id": entry.get("user_id"),
-                                    "content": entry.get("content")
-                                })
-                    # If multiple AI entries, take the last one
-                    if any(e.get("type") == "ai" for e in game_log if isinstance(e, dict)):
-                        latest_ai_response = [e.get("content") for e in game_log if isinstance(e, dict) and e.get("type") == "ai"][-1]
+                    # get_state returns the cached log when the entry mirrors the committed row; otherwise
+                    # (DB rows after a resync) the views are built from the returned log
+                    cached_entry = game_state_service.active_games.get(game_id) or {}
+                    log_views = game_state_service.get_log_views(game_id) if game_log is cached_entry.get('log') else None
+                    latest_ai_response, player_commands = log_views if log_views is not None else build_log_views(game_log)
                     # Historical summary from state_data
                     historical_summary = state_info['state'].get("historical_summary", [])
 
@@ -1021,6 +1162,14 @@ class SocketService:
                         'historical_summary': historical_summary,
                         'player_display_map': player_display_map
                     }
+                    if known_version is not None and known_version < state_info['version']:
+                        # Replace the full state and log with the patch since the client's version
+                        delta_data = SocketService._delta_broadcast(game_id, known_version, emit_data)
+                        if 'patch' in delta_data:
+                            current_app.logger.info(f"[socket_service] Emitting 'game_state_delta' (v{delta_data['from_version']} -> v{delta_data['to_version']}, {len(delta_data['patch'])} patch ops) for game {game_id} to SID {request.sid}.")
+                            emit('game_state_delta', delta_data, room=request.sid)
+                            return
+
                     current_app.logger.info(f"[socket_service] Emitting 'game_state' (v{emit_data.get('version')}) for game {game_id} to SID {request.sid}. Plot counts: {total_plot_points_for_display_initial} total, {completed_plot_points_display_count_initial} completed.")
                     current_app.logger.debug(f"[socket_service] Full 'game_state' data being emitted to SID {request.sid}: {json.dumps(emit_data)}")
                     emit('game_state', emit_data, room=request.sid)
@@ -1032,7 +1181,7 @@ class SocketService:
                     'details': str(e)
                 }, room=request.sid)
 
-        @socketio.on('update_character_details') # Renamed event
+        @socketio_event('update_character_details') # Renamed event
         def handle_update_character_details(data): # Renamed function
             """Handle player updating their character name and description.""" # Updated docstring
             game_id = data.get('game_id')
@@ -1078,7 +1227,7 @@ class SocketService:
                     current_app.logger.error(f"Database error updating character details for user {user_id} in game {game_id}: {str(e)}", exc_info=True) # Updated log
                     emit('error', {'message': 'Failed to save details'}, room=request.sid) # Updated message
 
-        @socketio.on('slash_command')
+        @socketio_event('slash_command')
         def handle_slash_command(data):
             game_id = data.get('game_id')
             user_id = data.get('user_id')
@@ -1130,7 +1279,9 @@ class SocketService:
                         "/debug_plot_points_show_all - Shows all plot points with details.",
                         "/debug_plot_point_complete <plot_point_id> - Mark a plot point as completed.",
                         "/debug_plot_point_uncomplete <plot_point_id> - Mark a plot point as not completed.",
-                        "/debug_show_state_data - Show full GameState.state_data JSON."
+                        "/debug_show_state_data - Show full GameState.state_data JSON.",
+                        "/debug_api_usage - Show API token usage, prompt cache hit rate and cost for this game.",
+                        "/debug_turn_timing - Show p50/p95/p99 latency per turn stage and AI call (this server process)."
                     ]
                     # Ensure lines are unique to avoid duplication
                     unique_debug_commands = list(dict.fromkeys(debug_commands))
@@ -1437,6 +1588,49 @@ class SocketService:
                         'header': 'Debug: Full GameState.state_data',
                         'lines': state_data_json_lines # Pass the list of lines
                     }, room=request.sid)
+                elif command == 'debug_api_usage':
+                    usage_recorder.flush() # Include rows still waiting in the buffer
+                    usage_rows = db.session.query(
+                        ApiUsageLog.model_name,
+                        func.count(ApiUsageLog.id),
+                        func.sum(ApiUsageLog.prompt_tokens),
+                        func.sum(ApiUsageLog.cached_tokens),
+                        func.sum(ApiUsageLog.completion_tokens),
+                        func.sum(ApiUsageLog.cost)
+                    ).filter(ApiUsageLog.game_id == game_id).group_by(ApiUsageLog.model_name).all()
+
+                    pricing = current_app.config.get('OPENAI_PRICING', {})
+                    cached_ratio = Decimal(str(current_app.config.get('OPENAI_CACHED_PROMPT_PRICE_RATIO', 0.5)))
+                    usage_lines = []
+                    for model_name, calls, prompt_tokens, cached_tokens, completion_tokens, cost in usage_rows:
+                        prompt_tokens, cached_tokens = prompt_tokens or 0, cached_tokens or 0
+                        hit_rate = (cached_tokens / prompt_tokens * 100) if prompt_tokens else 0.0
+                        # Savings versus paying the full prompt price for the cached tokens
+                        prompt_price = Decimal(str(pricing.get(model_name, {}).get('prompt', 0)))
+                        cached_price = Decimal(str(pricing.get(model_name, {}).get('cached_prompt', prompt_price * cached_ratio)))
+                        saved = (Decimal(cached_tokens) / Decimal(1_000_000)) * (prompt_price - cached_price)
+                        usage_lines.append(
+                            f"{model_name}: {calls} calls, {prompt_tokens} prompt tokens ({cached_tokens} cached, {hit_rate:.1f}% hit rate), "
+                            f"{completion_tokens or 0} completion tokens, cost ${float(cost or 0):.4f}, cache saved ${float(saved):.4f}"
+                        )
+                    emit('slash_command_response', {
+                        'command': command,
+                        'type': 'info',
+                        'header': 'Debug: API usage for this game',
+                        'lines': usage_lines or ["No API usage recorded for this game yet."]
+                    }, room=request.sid)
+                elif command == 'debug_turn_timing':
+                    timing_lines = [
+                        f"{name}: n={summary['count']}, p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, "
+                        f"p99 {summary['p99_ms']:.0f} ms, max {summary['max_ms']:.0f} ms"
+                        for name, summary in timing_stats.snapshot().items()
+                    ]
+                    emit('slash_command_response', {
+                        'command': command,
+                        'type': 'info',
+                        'header': 'Debug: Turn stage and AI call latency (recent turns, all games)',
+                        'lines': timing_lines or ["No turns timed yet."]
+                    }, room=request.sid)
                 else:
                     emit('slash_command_response', {
                         'command': command,
@@ -1444,7 +1638,7 @@ class SocketService:
                         'message': f"Unknown command: /{command}"
                     }, room=request.sid)
 
-        @socketio.on('change_difficulty')
+        @socketio_event('change_difficulty')
         def handle_change_difficulty(data):
             """Handle game creator changing the game difficulty."""
             game_id = data.get('game_id')
@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    import redis
+except ImportError: # Only needed for STATE_CACHE_BACKEND = 'redis'
+    redis = None
+
+# Raised by EXEC when a WATCHed key changed (an empty tuple catches nothing without redis)
+_WATCH_ERRORS = (redis.WatchError,) if redis is not None else ()
+
+
+class StateStore:
+    """
+    Versioned key-value store for the game state shared by all worker processes.
+
+    Each game is stored as one JSON-serializable payload dict carrying an integer
+    'version'. Writers use compare_and_set with the version they last read, so two
+    workers updating the same game cannot silently overwrite each other: the loser
+    gets False back, re-reads and decides what to do.
+    """
+
+    def get(self, game_id) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored payload, or None if the game is not stored. The values may be shared
+        with the writer (InProcessStateStore), so callers must not modify them in place.
+        """
+        raise NotImplementedError
+
+    def compare_and_set(self, game_id, expected_version: Optional[int], payload: Dict[str, Any]) -> bool:
+        """
+        Stores payload only if the stored version equals expected_version
+        (expected_version=None means "only if absent"). The payload's values must not be
+        modified in place after the write.
+
+        Returns:
+            True if the payload was written, False on a version conflict.
+        """
+        raise NotImplementedError
+
+    def delete(self, game_id) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InProcessStateStore(StateStore):
+    """
+    StateStore held in this process (the default). Only shares state between threads of
+    one worker, so it is the right choice for the single-process socketio server.
+
+    Payload values are shared with the writer rather than copied (the payload dict itself is
+    copied, so adding keys to it does not reach the store). Like the Redis backend, games not
+    read or written for ttl_seconds are dropped.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl_seconds: Optional[float] = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._touched: Dict[str, float] = {} # Last read/write per key (same order as _entries)
+        self._lock = threading.Lock()
+        self._stats = {'reads': 0, 'writes': 0, 'conflicts': 0, 'expired': 0}
+
+    def _expire(self) -> None:
+        """Drops the least recently used games idle for longer than ttl_seconds. Caller holds the lock."""
+        if not self.ttl_seconds:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            key = next(iter(self._entries))
+            if self._touched.get(key, 0) > cutoff:
+                break
+            self._entries.pop(key)
+            self._touched.pop(key, None)
+            self._stats['expired'] += 1
+
+    def _touch(self, key: str) -> None:
+        self._entries.move_to_end(key)
+        self._touched[key] = time.monotonic()
+
+    def get(self, game_id) -> Optional[Dict[str, Any]]:
+        key = str(game_id)
+        with self._lock:
+            self._stats['reads'] += 1
+            self._expire()
+            payload = self._entries.get(key)
+            if payload is None:
+                return None
+            self._touch(key)
+            return dict(payload)
+
+    def compare_and_set(self, game_id, expected_version: Optional[int], payload: Dict[str, Any]) -> bool:
+        key = str(game_id)
+        with self._lock:
+            current = self._entries.get(key)
+            current_version = current.get('version') if current is not None else None
+            if current_version != expected_version:
+                self._stats['conflicts'] += 1
+                return False
+            self._entries[key] = dict(payload)
+            self._touch(key)
+            self._stats['writes'] += 1
+            while len(self._entries) > max(self.max_entries, 1):
+                oldest, _ = self._entries.popitem(last=False)
+                self._touched.pop(oldest, None)
+            self._expire()
+            return True
+
+    def delete(self, game_id) -> None:
+        with self._lock:
+            self._entries.pop(str(game_id), None)
+            self._touched.pop(str(game_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, backend='memory', entries=len(self._entries))
+
+
+class RedisStateStore(StateStore):
+    """
+    StateStore kept in Redis, shared by every gunicorn worker.
+
+    Payloads are stored as JSON strings under '<key_prefix><game_id>' and expire after
+    ttl_seconds without a write. compare_and_set uses WATCH/MULTI/EXEC, so it works with
+    any client implementing the redis-py pipeline API, including a local stand-in such
+    as fakeredis.FakeRedis() passed as client.
+    """
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', key_prefix: str = 'questforge:game_state:',
+                 ttl_seconds: Optional[int] = 3600, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("STATE_CACHE_BACKEND is 'redis' but the redis package is not installed.")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self._stats = {'reads': 0, 'writes': 0, 'conflicts': 0}
+        self._stats_lock = threading.Lock()
+
+    def _key(self, game_id) -> str:
+        return f"{self.key_prefix}{game_id}"
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _decode(raw) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        return json.loads(raw)
+
+    def get(self, game_id) -> Optional[Dict[str, Any]]:
+        self._count('reads')
+        return self._decode(self.client.get(self._key(game_id)))
+
+    def compare_and_set(self, game_id, expected_version: Optional[int], payload: Dict[str, Any]) -> bool:
+        key = self._key(game_id)
+        data = json.dumps(payload, default=str)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = self._decode(pipe.get(key))
+                current_version = current.get('version') if current is not None else None
+                if current_version != expected_version:
+                    pipe.unwatch()
+                    self._count('conflicts')
+                    return False
+                pipe.multi()
+                if self.ttl_seconds:
+                    pipe.set(key, data, ex=int(self.ttl_seconds))
+                else:
+                    pipe.set(key, data)
+                pipe.execute()
+            except _WATCH_ERRORS:
+                # Another worker wrote the key between WATCH and EXEC
+                self._count('conflicts')
+                return False
+        self._count('writes')
+        return True
+
+    def delete(self, game_id) -> None:
+        self.client.delete(self._key(game_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self._stats, backend='redis')
+
+
+def create_state_store(config) -> StateStore:
+    """Builds the StateStore selected by STATE_CACHE_BACKEND ('memory' or 'redis')."""
+    backend = (config.get('STATE_CACHE_BACKEND') or 'memory').lower()
+    if backend == 'redis':
+        return RedisStateStore(
+            url=config.get('STATE_CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+            key_prefix=config.get('STATE_CACHE_KEY_PREFIX', 'questforge:game_state:'),
+            ttl_seconds=config.get('STATE_CACHE_TTL_SECONDS', 3600)
+        )
+    return InProcessStateStore(
+        max_entries=config.get('GAME_STATE_CACHE_MAX_GAMES', 500),
+        ttl_seconds=config.get('STATE_CACHE_TTL_SECONDS', 3600)
+    )
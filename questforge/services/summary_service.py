@@ -0,0 +1,215 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy.orm import attributes
+
+from ..extensions import db
+from ..extensions.socketio import get_socketio
+from ..models.game_state import GameState
+from .async_ai_service import async_ai_service
+from .game_state_service import game_state_service
+from questforge.utils.async_runner import async_runner
+from questforge.utils.metrics import historical_summaries as summary_outcomes
+
+
+def append_historical_summaries(state_data: Dict[str, Any], summaries: List[str], max_summaries: int) -> None:
+    """Appends summaries to state_data['historical_summary'], dropping the oldest beyond max_summaries."""
+    if 'historical_summary' not in state_data or not isinstance(state_data['historical_summary'], list):
+        state_data['historical_summary'] = []
+    for summary in summaries:
+        # Limit the number of summaries stored to prevent unbounded growth
+        while len(state_data['historical_summary']) >= max_summaries:
+            state_data['historical_summary'].pop(0) # Remove the oldest summary
+        state_data['historical_summary'].append(summary)
+
+
+class HistoricalSummaryService:
+    """
+    Generates per-turn historical summaries as deferred background jobs.
+
+    The summary is only consumed by the next turn's build_context, so it does not
+    need to be on the critical path of the turn that produced it. handle_player_action
+    schedules the job after broadcasting, and calls wait_for_pending() before it
+    processes the next action for the same game, so the summary is normally persisted
+    before the next turn reads state_data.
+
+    A summary that is still being generated when that wait times out is marked late: it
+    no longer writes state_data itself (that would conflict with the running turn), but is
+    kept until the game's next state_data write takes it (take_late), i.e. the running
+    turn's transaction or the next summary's own write.
+    """
+
+    def __init__(self):
+        # str(game_id): the in-flight summary job,
+        # {'future': Future, 'persisting': True once the DB write has started, 'late': bool,
+        #  'persisted': Event set when the DB write (and cache sync) has finished}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # str(game_id): late summaries waiting for the game's next state_data write, oldest first
+        self._late: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, game_id, player_action: str, stage_one_narrative: str, state_changes: Dict[str, Any]) -> Future:
+        """
+        Starts generating and persisting the summary for a completed turn in the background.
+
+        Args:
+            game_id: The game the turn belongs to.
+            player_action: The player's action text.
+            stage_one_narrative: The Stage 1 narrative for the turn.
+            state_changes: The Stage 1 state changes (copied, so the caller may keep mutating its dicts).
+
+        Returns:
+            A concurrent.futures.Future resolving to the updated summary list (or None).
+        """
+        app = current_app._get_current_object()
+        key = str(game_id)
+        job = {'future': None, 'persisting': False, 'late': False, 'persisted': threading.Event()}
+        with self._lock:
+            # Registered before the job starts, so it can never finish before it is tracked
+            self._pending[key] = job
+            future = async_runner.submit(
+                self._run(app, game_id, player_action, stage_one_narrative, copy.deepcopy(state_changes), job)
+            )
+            job['future'] = future
+
+        def _clear(done_future, key=key, job=job):
+            with self._lock:
+                if self._pending.get(key) is job:
+                    del self._pending[key]
+        future.add_done_callback(_clear)
+        app.logger.debug(f"Scheduled deferred historical summary for game {game_id}.")
+        return future
+
+    def pending_count(self) -> int:
+        """Number of summary jobs scheduled and not finished yet (all games)."""
+        with self._lock:
+            return sum(1 for job in self._pending.values() if job['future'] is not None and not job['future'].done())
+
+    def take_late(self, game_id) -> List[str]:
+        """Removes and returns the game's late summaries (to be appended by the caller's state_data write)."""
+        with self._lock:
+            return self._late.pop(str(game_id), [])
+
+    def requeue_late(self, game_id, summaries: List[str]) -> None:
+        """Puts late summaries back (e.g. after the transaction that took them rolled back)."""
+        if not summaries:
+            return
+        with self._lock:
+            key = str(game_id)
+            self._late[key] = list(summaries) + self._late.get(key, [])
+
+    def wait_for_pending(self, game_id, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until the previous turn's summary for this game has been persisted.
+
+        If it does not finish within the timeout (HISTORICAL_SUMMARY_WAIT_SECONDS) while the
+        summary LLM call is still running, the job is marked late: it keeps running but hands
+        its summary to take_late instead of writing it. Once its DB write has started it cannot
+        be stopped (it runs in an executor thread), so that short write is waited out instead.
+        Either way the job can never commit state_data underneath the next turn's snapshot.
+        """
+        with self._lock:
+            job = self._pending.get(str(game_id))
+        if job is None or job['future'].done():
+            return
+        if timeout is None:
+            timeout = current_app.config.get('HISTORICAL_SUMMARY_WAIT_SECONDS', 30.0)
+        current_app.logger.debug(f"Waiting for pending historical summary of game {game_id} before processing the next action.")
+        try:
+            job['future'].result(timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                persisting = job['persisting']
+                if not persisting:
+                    job['late'] = True # _run checks this under the lock before it starts the write
+            if not persisting:
+                current_app.logger.warning(f"Historical summary for game {game_id} did not finish within {timeout}s. It will be written with the game's next state update.")
+            else:
+                current_app.logger.info(f"Historical summary for game {game_id} is being written; waiting for the write to finish.")
+                if not job['persisted'].wait(timeout):
+                    current_app.logger.error(f"Historical summary write for game {game_id} still running after another {timeout}s.")
+        except Exception as e:
+            current_app.logger.error(f"Deferred historical summary for game {game_id} failed: {e}", exc_info=True)
+
+    async def _run(self, app, game_id, player_action, stage_one_narrative, state_changes, job) -> Optional[List[str]]:
+        try:
+            historical_summary_text = await async_ai_service.generate_historical_summary(
+                player_action=player_action,
+                stage_one_narrative=stage_one_narrative,
+                state_changes=state_changes,
+                game_id=game_id
+            )
+        except Exception:
+            summary_outcomes.inc(outcome='failed')
+            raise
+        if not historical_summary_text:
+            summary_outcomes.inc(outcome='failed')
+            app.logger.warning(f"Historical summary generation returned None for game {game_id}.")
+            return None
+        with self._lock:
+            if job['late']:
+                # The next turn stopped waiting and may be writing state_data; let the next write append it
+                self._late.setdefault(str(game_id), []).append(historical_summary_text)
+                summary_outcomes.inc(outcome='late')
+                app.logger.info(f"Late historical summary for game {game_id} kept for the game's next state update.")
+                return None
+            job['persisting'] = True # From here on wait_for_pending waits for the write instead of marking it late
+        return await asyncio.get_running_loop().run_in_executor(None, self._persist_job, job, app, game_id, historical_summary_text)
+
+    def _persist_job(self, job, app, game_id, historical_summary_text: str) -> Optional[List[str]]:
+        """Runs _persist in the executor and signals the job's 'persisted' event when it is done."""
+        try:
+            return self._persist(app, game_id, historical_summary_text)
+        finally:
+            job['persisted'].set()
+
+    def _persist(self, app, game_id, historical_summary_text: str) -> Optional[List[str]]:
+        """
+        Appends the summary, after any late ones still waiting for this game, to
+        state_data['historical_summary'] (capped) and tells the room.
+        """
+        late_summaries = self.take_late(game_id)
+        with app.app_context():
+            try:
+                db_game_state = GameState.query.filter_by(game_id=game_id).first()
+                if not db_game_state:
+                    app.logger.error(f"Cannot persist historical summary: GameState not found for game {game_id}.")
+                    summary_outcomes.inc(outcome='failed')
+                    return None
+
+                state_data = db_game_state.state_data or {}
+                append_historical_summaries(state_data, late_summaries + [historical_summary_text],
+                                            app.config.get('MAX_HISTORICAL_SUMMARIES', 20))
+                previous_version = db_game_state.version
+                db_game_state.state_data = state_data
+                attributes.flag_modified(db_game_state, "state_data")
+                db.session.commit()
+                historical_summary = list(state_data['historical_summary'])
+                summary_outcomes.inc(outcome='persisted')
+                app.logger.info(f"Successfully generated and appended historical summary for game {game_id}: '{historical_summary_text}'")
+            except Exception as e:
+                db.session.rollback()
+                self.requeue_late(game_id, late_summaries)
+                summary_outcomes.inc(outcome='failed')
+                app.logger.error(f"Error persisting historical summary for game {game_id}: {e}", exc_info=True)
+                return None
+
+            # Keep the in-memory copy in step with the DB
+            game_state_service.sync_from_db(game_id, db_game_state)
+
+            # The commit bumped GameState.version; clients holding previous_version apply the
+            # summary and move to the new version, so the next delta broadcast still chains
+            get_socketio().emit('historical_summary_update', {
+                'game_id': game_id,
+                'historical_summary': historical_summary,
+                'from_version': previous_version,
+                'version': db_game_state.version
+            }, room=game_id)
+            return historical_summary
+
+
+summary_service = HistoricalSummaryService()
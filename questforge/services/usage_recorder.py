@@ -0,0 +1,244 @@
+import atexit
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+
+from ..extensions import db
+from ..models.api_usage_log import ApiUsageLog
+from ..models.game import Game
+
+
+def record_game_cost(game_id: Optional[int], cost: Optional[Decimal]):
+    """
+    Adds cost to the game's Game.total_cost rollup within the caller's transaction.
+
+    The increment is a single UPDATE ... SET total_cost = total_cost + :cost, so concurrent
+    usage rows for the same game cannot lose each other's cost. Call it alongside every
+    ApiUsageLog insert that carries a game_id.
+    """
+    if game_id is None or cost is None:
+        return
+    db.session.execute(
+        sa.update(Game)
+        .where(Game.id == game_id)
+        .values(total_cost=sa.func.coalesce(Game.total_cost, 0) + Decimal(str(cost)))
+        .execution_options(synchronize_session=False)
+    )
+
+
+class UsageRecorder:
+    """
+    Buffers ApiUsageLog rows and writes them in bulk.
+
+    Recording an LLM call no longer commits in the middle of whatever the caller is doing:
+    the row is appended to an in-memory buffer and written by a background flusher thread
+    every USAGE_FLUSH_INTERVAL_SECONDS (or as soon as USAGE_FLUSH_MAX_ROWS are waiting),
+    as one bulk INSERT plus one Game.total_cost increment per game, in its own transaction.
+
+    A turn can instead take its game's pending rows and write them in its own transaction
+    (take + add_to_session), handing them back with requeue if that transaction rolls back.
+    The buffer is flushed once more at interpreter exit, so nothing recorded is dropped on a
+    clean shutdown.
+
+    If a bulk flush fails its rows are retried one at a time, so one bad row (e.g. for a game
+    deleted before the flush) cannot hold back the rest. A row that fails max_attempts flushes
+    is logged in full and dropped, and the buffer is capped at max_buffered rows.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.flush_interval = 2.0
+        self.max_rows = 50
+        self.max_attempts = 5
+        self.max_buffered = 10000
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopping = False
+
+    def init_app(self, app):
+        """Registers the app (the flusher pushes its own app context) and applies the flush settings."""
+        self.app = app
+        self.flush_interval = app.config.get('USAGE_FLUSH_INTERVAL_SECONDS', 2.0)
+        self.max_rows = app.config.get('USAGE_FLUSH_MAX_ROWS', 50)
+        self.max_attempts = app.config.get('USAGE_FLUSH_MAX_ATTEMPTS', 5)
+        self.max_buffered = app.config.get('USAGE_BUFFER_MAX_ROWS', 10000)
+
+    def _ensure_flusher(self):
+        """Starts the flusher thread if it is not running in this process yet (restarted after a fork)."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Rows buffered by the parent belong to the parent's flusher
+                self._rows = []
+            self._stopping = False
+            self._wake.clear()
+            self._thread = threading.Thread(target=self._run, name="questforge-usage-flusher", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._rows:
+                self.flush()
+
+    def record(self, model_name: str, prompt_tokens: int, completion_tokens: int, total_tokens: int,
+               cost: Optional[Decimal], game_id: Optional[int] = None, cached_tokens: int = 0):
+        """Buffers one usage row (timestamped now). Written by the flusher, not by the caller."""
+        row = {
+            'model_name': model_name,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': total_tokens,
+            'cost': cost,
+            'game_id': game_id,
+            'cached_tokens': cached_tokens or 0,
+            'timestamp': datetime.utcnow()
+        }
+        if not self.flush_interval or self.flush_interval <= 0:
+            # Buffering disabled: write straight away (still in a transaction of its own)
+            self._write_in_own_context([row])
+            return
+        self._ensure_flusher()
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+            dropped = self._trim()
+        self._log_dropped(dropped, "the usage buffer is full")
+        if full:
+            self._wake.set()
+
+    def _trim(self) -> List[Dict[str, Any]]:
+        """Removes and returns the oldest rows beyond max_buffered. Caller holds the lock."""
+        if not self.max_buffered or len(self._rows) <= self.max_buffered:
+            return []
+        dropped = self._rows[:len(self._rows) - self.max_buffered]
+        del self._rows[:len(dropped)]
+        return dropped
+
+    def _log_dropped(self, rows: List[Dict[str, Any]], reason: str):
+        """Logs dropped rows in full, so their usage and cost can still be recovered from the log."""
+        if not rows:
+            return
+        message = f"Dropped {len(rows)} API usage rows ({reason}): {json.dumps(rows, default=str)}"
+        if self.app is not None:
+            self.app.logger.error(message)
+        elif has_app_context():
+            current_app.logger.error(message)
+
+    def take(self, game_id) -> List[Dict[str, Any]]:
+        """Removes and returns the pending rows of one game (to be written by the caller's transaction)."""
+        with self._lock:
+            taken = [row for row in self._rows if str(row['game_id']) == str(game_id)]
+            if taken:
+                self._rows = [row for row in self._rows if str(row['game_id']) != str(game_id)]
+        return taken
+
+    def requeue(self, rows: List[Dict[str, Any]]):
+        """Puts rows back at the front of the buffer (e.g. after the transaction that took them rolled back)."""
+        if not rows:
+            return
+        with self._lock:
+            self._rows = list(rows) + self._rows
+            dropped = self._trim()
+        self._log_dropped(dropped, "the usage buffer is full")
+
+    @staticmethod
+    def add_to_session(rows: List[Dict[str, Any]]):
+        """Bulk-inserts rows and increments their games' cost rollups in the current session (no commit)."""
+        if not rows:
+            return
+        # 'attempts' is the recorder's own retry count, not a column
+        db.session.execute(sa.insert(ApiUsageLog), [{k: v for k, v in row.items() if k != 'attempts'} for row in rows])
+        cost_by_game = defaultdict(Decimal)
+        for row in rows:
+            if row.get('game_id') is not None and row.get('cost') is not None:
+                cost_by_game[row['game_id']] += Decimal(str(row['cost']))
+        for game_id, cost in cost_by_game.items():
+            record_game_cost(game_id, cost)
+
+    def _write_in_own_context(self, rows: List[Dict[str, Any]], log_errors: bool = True) -> bool:
+        """
+        Writes rows in a fresh app context, so the transaction never includes (or commits)
+        anything pending in the caller's session.
+        """
+        app = self.app or (current_app._get_current_object() if has_app_context() else None)
+        if app is None:
+            raise RuntimeError("UsageRecorder used outside an app context before init_app() was called.")
+        with app.app_context():
+            try:
+                self.add_to_session(rows)
+                db.session.commit()
+                return True
+            except Exception as e:
+                db.session.rollback()
+                if log_errors:
+                    app.logger.error(f"Failed to write {len(rows)} API usage rows: {e}", exc_info=True)
+                else:
+                    app.logger.warning(f"Failed to write API usage row for game {rows[0].get('game_id')}: {e}")
+                return False
+
+    def flush(self) -> int:
+        """
+        Writes every buffered row in one transaction. If that fails, each row is retried in a
+        transaction of its own; rows that still fail are re-queued until they have failed
+        max_attempts flushes, then logged and dropped.
+
+        Returns:
+            The number of rows written.
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        if self._write_in_own_context(rows):
+            return len(rows)
+
+        written = 0
+        retry, dropped = [], []
+        for row in rows:
+            if self._write_in_own_context([row], log_errors=False):
+                written += 1
+                continue
+            row['attempts'] = row.get('attempts', 0) + 1
+            (dropped if row['attempts'] >= max(self.max_attempts, 1) else retry).append(row)
+        self.requeue(retry)
+        self._log_dropped(dropped, f"failed {self.max_attempts} flushes")
+        return written
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def shutdown(self):
+        """Stops the flusher and writes what is left. Rows that still cannot be written are logged in full."""
+        if self._pid != os.getpid():
+            return
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if not self._rows or self.app is None:
+            return
+        self.flush()
+        if self._rows:
+            self.app.logger.error(
+                f"Could not write {len(self._rows)} API usage rows at shutdown: "
+                f"{json.dumps(self._rows, default=str)}"
+            )
+
+
+usage_recorder = UsageRecorder()
+atexit.register(usage_recorder.shutdown)
@@ -6,6 +6,7 @@
 // console.log("Initializing socketClient (no class)..."); // DEBUG REMOVED
 
 let hasSetupListenersForCurrentConnection = false; // Flag to ensure setup runs once per connection
+let lastGameStatePacket = null; // Most recent full state packet, re-rendered when a deferred summary arrives
 
 const socketClient = {
   socket: null,
@@ -49,7 +50,16 @@ const socketClient = {
       this.socket.on('game_state_update', (data) => {
           console.log("SocketClient: 'game_state_update' event received. Data object will be logged on next line.");
           console.log(data);
-          updateGameState(data); 
+          if (data && data.patch) {
+              // Delta broadcast (BROADCAST_MODE 'delta'): patch from the version we should be holding
+              if (!applyGameStateDelta(data)) {
+                  console.warn(`SocketClient: Missed an update (holding v${lastGameStatePacket?.version}, patch from v${data.from_version}). Resyncing.`);
+                  this.requestStateSync();
+                  return;
+              }
+          } else {
+              updateGameState(data);
+          }
           const plotProgressDisplay = document.getElementById('plot-progress-display');
           if (plotProgressDisplay) {
               if (typeof data.total_plot_points_display === 'number' && typeof data.completed_plot_points_display_count === 'number') {
@@ -84,6 +94,61 @@ const socketClient = {
           }
       });
 
+      this.socket.off('game_state_not_modified');
+      this.socket.off('game_state_delta');
+
+      // Reply to request_state when the version we already hold is still current
+      this.socket.on('game_state_not_modified', (data) => {
+          console.log(`SocketClient: 'game_state_not_modified' received (v${data?.version}). Keeping current state.`);
+          if (lastGameStatePacket && lastGameStatePacket.state && data?.player_locations) {
+              updatePlayerLocationsDisplay(data.player_locations);
+          }
+      });
+
+      // Reply to request_state with only what changed since the version we hold
+      this.socket.on('game_state_delta', (delta) => {
+          console.log(`SocketClient: 'game_state_delta' received (v${delta?.from_version} -> v${delta?.to_version}).`);
+          if (!applyGameStateDelta(delta)) {
+              console.warn("SocketClient: Delta does not match the held state. Requesting the full state.");
+              this.requestFullState();
+          }
+      });
+
+      this.socket.off('narrative_chunk');
+      this.socket.off('narrative_done');
+
+      // Stage 1 narrative streamed while the server is still working on the turn.
+      // The full 'game_state_update' that follows re-renders the log and replaces this preview.
+      this.socket.on('narrative_chunk', (data) => {
+          appendStreamingNarrative(data?.delta || '');
+      });
+
+      this.socket.on('narrative_done', (data) => {
+          finishStreamingNarrative(data?.narrative ?? null);
+      });
+
+      this.socket.off('historical_summary_update');
+
+      // Turn summaries are generated in the background and arrive after the turn's game_state_update
+      this.socket.on('historical_summary_update', (data) => {
+          if (lastGameStatePacket && Array.isArray(data?.historical_summary)) {
+              lastGameStatePacket.historical_summary = data.historical_summary;
+              // The summary commit bumped the version; follow it so the next delta broadcast chains
+              if (Number.isInteger(data.version) && lastGameStatePacket.version === data.from_version) {
+                  lastGameStatePacket.state = { ...(lastGameStatePacket.state || {}), historical_summary: data.historical_summary };
+                  lastGameStatePacket.version = data.version;
+              }
+              updateGameLog(lastGameStatePacket);
+          }
+      });
+
+      this.socket.off('action_queued');
+
+      // Another turn for this game is still running; the action waits (or was merged/dropped)
+      this.socket.on('action_queued', (data) => {
+          showActionQueueStatus(data);
+      });
+
       this.socket.on('slash_command_response', (data) => {
           console.log("SocketClient: 'slash_command_response' event received:", data);
           appendSlashCommandResponseToLog(data);
@@ -133,7 +198,9 @@ const socketClient = {
 
       if (!this.initialStateRequestedThisConnection && this.socket && this.connected && userId) {
           console.log(`SocketClient: Condition MET for emitting 'request_state'. GameID: ${this.gameId}, UserID: ${userId}`);
-          this.socket.emit('request_state', { game_id: this.gameId, user_id: userId });
+          // On a reconnect we may still hold a state; the server then replies with not-modified or a delta
+          const knownVersion = (lastGameStatePacket && Number.isInteger(lastGameStatePacket.version)) ? lastGameStatePacket.version : null;
+          this.socket.emit('request_state', { game_id: this.gameId, user_id: userId, known_version: knownVersion });
           this.initialStateRequestedThisConnection = true;
           console.log("SocketClient: Emitted 'request_state'. initialStateRequestedThisConnection set to true.");
       } else if (!this.initialStateRequestedThisConnection) {
@@ -143,6 +210,22 @@ const socketClient = {
       }
   },
 
+  requestFullState: function() {
+      const userId = document.getElementById('gameTitle')?.dataset.userId;
+      if (this.socket && this.connected && userId) {
+          this.socket.emit('request_state', { game_id: this.gameId, user_id: userId });
+      }
+  },
+
+  // Asks for whatever we are missing since the version we hold (a delta if the server still has it)
+  requestStateSync: function() {
+      const userId = document.getElementById('gameTitle')?.dataset.userId;
+      const knownVersion = (lastGameStatePacket && Number.isInteger(lastGameStatePacket.version)) ? lastGameStatePacket.version : null;
+      if (this.socket && this.connected && userId) {
+          this.socket.emit('request_state', { game_id: this.gameId, user_id: userId, known_version: knownVersion });
+      }
+  },
+
   connect: function(gameId) {
     // console.log(`socketClient.connect(${gameId}) called.`); // DEBUG REMOVED
     if (this.socket && this.connected && this.gameId === gameId) {
@@ -363,6 +446,7 @@ const socketClient = {
 
 function updateGameState(packet) {
     console.log("--- updateGameState received state:", JSON.stringify(packet, null, 2));
+    lastGameStatePacket = packet;
 
     updateActionControls(packet?.actions || []);
     updateGameLog(packet); // This function will now handle all log display
@@ -375,6 +459,64 @@ function updateGameState(packet) {
     }
 }
 
+// Applies RFC 6902 add/remove/replace operations (as built by the server's json_patch.make_patch)
+// to a copy of doc. Throws if a path does not resolve.
+function applyJsonPatch(doc, ops) {
+    let result = JSON.parse(JSON.stringify(doc));
+    for (const op of ops) {
+        const tokens = op.path === '' ? [] : op.path.slice(1).split('/').map((t) => t.replace(/~1/g, '/').replace(/~0/g, '~'));
+        if (tokens.length === 0) {
+            result = JSON.parse(JSON.stringify(op.value));
+            continue;
+        }
+        let parent = result;
+        for (const token of tokens.slice(0, -1)) {
+            parent = Array.isArray(parent) ? parent[Number(token)] : parent?.[token];
+            if (parent === undefined || parent === null) throw new Error(`Patch path ${op.path} does not exist`);
+        }
+        const last = tokens[tokens.length - 1];
+        const value = op.value === undefined ? undefined : JSON.parse(JSON.stringify(op.value));
+        if (Array.isArray(parent)) {
+            const index = last === '-' ? parent.length : Number(last);
+            if (!Number.isInteger(index) || index < 0 || index > parent.length) throw new Error(`Patch index ${op.path} out of range`);
+            if (op.op === 'add') parent.splice(index, 0, value);
+            else if (op.op === 'remove') parent.splice(index, 1);
+            else if (op.op === 'replace') parent[index] = value;
+            else throw new Error(`Unsupported patch op ${op.op}`);
+        } else {
+            if (op.op === 'add' || op.op === 'replace') parent[last] = value;
+            else if (op.op === 'remove') delete parent[last];
+            else throw new Error(`Unsupported patch op ${op.op}`);
+        }
+    }
+    return result;
+}
+
+// Applies a 'game_state_delta' on top of lastGameStatePacket. Returns false if the delta
+// was computed from a different version than the one we hold, or does not apply
+// (caller requests the full state).
+function applyGameStateDelta(delta) {
+    if (!lastGameStatePacket || !delta || lastGameStatePacket.version !== delta.from_version) {
+        return false;
+    }
+    const { patch, player_commands_appended, from_version, to_version, ...fields } = delta;
+    let patched;
+    try {
+        patched = applyJsonPatch({ state: lastGameStatePacket.state || {}, log: lastGameStatePacket.log || [] }, patch || []);
+    } catch (err) {
+        console.warn("SocketClient: Failed to apply state patch:", err);
+        return false;
+    }
+    const playerCommands = Array.isArray(player_commands_appended)
+        ? (lastGameStatePacket.player_commands || []).concat(player_commands_appended)
+        : (fields.player_commands || []);
+
+    const historicalSummary = fields.historical_summary ?? patched.state?.historical_summary ?? lastGameStatePacket.historical_summary;
+
+    updateGameState({ ...lastGameStatePacket, ...fields, state: patched.state, log: patched.log, player_commands: playerCommands, historical_summary: historicalSummary, version: to_version });
+    return true;
+}
+
 function updateGameLog(packet) {
     const gameStateVisualization = document.getElementById('gameStateVisualization');
     if (!gameStateVisualization) return;
@@ -468,6 +610,70 @@ function updateGameLog(packet) {
     gameStateVisualization.scrollTop = gameStateVisualization.scrollHeight;
 }
 
+function getStreamingNarrativeElement(create) {
+    const gameStateVisualization = document.getElementById('gameStateVisualization');
+    if (!gameStateVisualization) return null;
+
+    let streamingDiv = document.getElementById('streamingNarrative');
+    if (!streamingDiv && create) {
+        // Show the in-progress narrative at the top, where the latest AI response is rendered
+        const streamingHeader = document.createElement('h6');
+        streamingHeader.id = 'streamingNarrativeHeader';
+        streamingHeader.textContent = 'Latest AI Response';
+        streamingHeader.className = 'mt-2 mb-1';
+
+        streamingDiv = document.createElement('div');
+        streamingDiv.id = 'streamingNarrative';
+        streamingDiv.className = 'log-entry log-entry-ai-latest';
+        streamingDiv.style.whiteSpace = 'pre-wrap';
+
+        gameStateVisualization.prepend(streamingDiv);
+        gameStateVisualization.prepend(streamingHeader);
+        gameStateVisualization.scrollTop = 0;
+    }
+    return streamingDiv;
+}
+
+function appendStreamingNarrative(delta) {
+    if (!delta) return;
+    const streamingDiv = getStreamingNarrativeElement(true);
+    if (streamingDiv) {
+        streamingDiv.textContent += delta;
+    }
+}
+
+function finishStreamingNarrative(narrative) {
+    const streamingDiv = getStreamingNarrativeElement(false);
+    if (!streamingDiv) return;
+    if (narrative === null) {
+        // Stage 1 failed or the turn was discarded (e.g. version conflict); drop the text
+        // (the server sends an 'error' event)
+        streamingDiv.remove();
+        document.getElementById('streamingNarrativeHeader')?.remove();
+    } else {
+        streamingDiv.textContent = narrative;
+    }
+}
+
+function showActionQueueStatus(data) {
+    const gameStateVisualization = document.getElementById('gameStateVisualization');
+    if (!gameStateVisualization || !data) return;
+
+    let message;
+    if (data.status === 'merged') {
+        message = `"${data.action}" was added to a waiting action.`;
+    } else if (data.status === 'dropped') {
+        message = `"${data.action}" was ignored; an action from that player is already waiting.`;
+    } else {
+        message = `"${data.action}" is queued (${data.position} ahead).`;
+    }
+    const statusEntry = document.createElement('div');
+    statusEntry.classList.add('log-entry', 'log-entry-system', 'text-muted');
+    statusEntry.innerText = message;
+    gameStateVisualization.appendChild(statusEntry);
+    gameStateVisualization.scrollTop = gameStateVisualization.scrollHeight;
+}
+
 function appendSlashCommandResponseToLog(data) {
     const gameStateVisualization = document.getElementById('gameStateVisualization');
     if (!gameStateVisualization) return;
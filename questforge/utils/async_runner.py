@@ -0,0 +1,95 @@
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Coroutine, Optional
+
+
+class AsyncRunner:
+    """
+    Runs coroutines on a single background asyncio event loop.
+
+    The Flask/Socket.IO handlers are synchronous, so they cannot await the async
+    AI service directly. Instead they hand coroutines to this runner, which owns
+    one long-lived event loop in a daemon thread. Because every coroutine runs on
+    the same loop, loop-bound resources (like the shared httpx connection pool
+    used by AsyncAIService) are reused across all games and turns.
+
+    The loop is started lazily on first use and restarted after a fork, so it is
+    safe to import this module before gunicorn forks its workers.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Starts the background loop if it is not running in this process yet."""
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run_loop, name="questforge-async-loop", daemon=True)
+            thread.start()
+            ready.wait()
+
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+            return loop
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._ensure_loop()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """
+        Schedules a coroutine on the background loop without waiting for it.
+
+        Returns:
+            A concurrent.futures.Future that resolves with the coroutine's result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Runs a coroutine on the background loop and blocks the calling thread until it finishes.
+
+        Args:
+            coro: The coroutine to run.
+            timeout: Optional number of seconds to wait before cancelling the coroutine.
+
+        Returns:
+            The coroutine's result. Exceptions raised by the coroutine are re-raised here.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self):
+        """Stops the background loop (if it was started in this process)."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+
+async_runner = AsyncRunner()
+atexit.register(async_runner.shutdown)
@@ -1,35 +1,23 @@
 import json
+import threading
+from collections import OrderedDict
 from questforge.models.game_state import GameState
 from questforge.models.game import GamePlayer # Import GamePlayer
 from questforge.models.user import User # Import User
 from sqlalchemy.orm import joinedload # Import joinedload
-from typing import Optional # Import Optional for type hinting
+from typing import Optional, Tuple # Import Optional for type hinting
 
-def build_context(game_state: GameState, next_required_plot_point: Optional[str] = None) -> str:
-    """
-    Builds a context string for the AI based on the current game state and
-    associated campaign information.
+# Memoized "--- Campaign Context ---" blocks, keyed by (campaign.id, campaign.version).
+# The block only depends on campaign columns that do not change after generation; edits go
+# through update_campaign, which bumps Campaign.version (so other processes miss their stale
+# entry too) and calls invalidate_campaign_context for this process.
+CAMPAIGN_CONTEXT_CACHE_SIZE = 256
+_campaign_context_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_campaign_context_lock = threading.Lock()
 
-    Args:
-        game_state: The current GameState object.
-        next_required_plot_point: Optional string describing the next required plot point.
-
-    Returns:
-        A string containing formatted context information for the AI prompt.
-        Returns an error message string if essential data is missing.
-    """
-    if not game_state:
-        return "Error: Invalid game state provided."
-
-    # Access campaign via game relationship
-    if not game_state.game:
-         return "Error: GameState object does not have a valid 'game' relationship."
-    
-    campaign = game_state.game.campaign
-    if not campaign:
-        # This shouldn't happen if data is consistent, but good to check
-        return f"Error: Could not find associated campaign for game {game_state.game_id}."
 
+def _render_campaign_context_block(campaign) -> str:
+    """Renders the static campaign section of the context (summary, objectives, key elements, plot points, conclusion)."""
     context_lines = []
 
     # 1. Campaign Overview & Goals
@@ -100,9 +88,97 @@ def build_context(game_state: GameState, next_required_plot_point: Optional[str]
     else:
         context_lines.append("Conclusion Conditions: None specifically defined beyond completing required plot points.")
 
+    return "\n".join(context_lines)
+
+
+def get_campaign_context_block(campaign) -> str:
+    """
+    Returns the rendered campaign section for build_context, from the cache when possible.
+
+    Args:
+        campaign: The Campaign object.
+
+    Returns:
+        The "--- Campaign Context ---" block as a single string (no trailing newline).
+    """
+    if campaign.id is None:
+        return _render_campaign_context_block(campaign) # Unsaved campaign; nothing stable to key on
+    key = (campaign.id, getattr(campaign, 'version', None) or 1)
+    with _campaign_context_lock:
+        block = _campaign_context_cache.get(key)
+        if block is not None:
+            _campaign_context_cache.move_to_end(key)
+            return block
+
+    block = _render_campaign_context_block(campaign)
+    with _campaign_context_lock:
+        _campaign_context_cache[key] = block
+        _campaign_context_cache.move_to_end(key)
+        while len(_campaign_context_cache) > CAMPAIGN_CONTEXT_CACHE_SIZE:
+            _campaign_context_cache.popitem(last=False)
+    return block
+
+
+def invalidate_campaign_context(campaign_id) -> None:
+    """Drops every cached campaign block for campaign_id (all versions)."""
+    with _campaign_context_lock:
+        for key in [k for k in _campaign_context_cache if k[0] == campaign_id]:
+            del _campaign_context_cache[key]
+
+
+# Header that starts the state-dependent part of the build_context output
+CURRENT_STATE_HEADER = "--- Current Game State ---"
+
+
+def split_context(context: str) -> Tuple[str, str]:
+    """
+    Splits a build_context string into its campaign section and its state-dependent tail.
+
+    The prompt builders send the two parts as separate messages so the campaign part can
+    be served from the provider's prompt prefix cache.
+
+    Returns:
+        (campaign_context, turn_context). campaign_context is empty if the marker is missing.
+    """
+    marker = f"\n{CURRENT_STATE_HEADER}"
+    position = context.find(marker)
+    if position < 0:
+        return "", context
+    return context[:position], context[position + 1:]
+
+
+def build_context(game_state: GameState, next_required_plot_point: Optional[str] = None) -> str:
+    """
+    Builds a context string for the AI based on the current game state and
+    associated campaign information.
+
+    Args:
+        game_state: The current GameState object.
+        next_required_plot_point: Optional string describing the next required plot point.
+
+    Returns:
+        A string containing formatted context information for the AI prompt.
+        Returns an error message string if essential data is missing.
+    """
+    if not game_state:
+        return "Error: Invalid game state provided."
+
+    # Access campaign via game relationship
+    if not game_state.game:
+         return "Error: GameState object does not have a valid 'game' relationship."
+    
+    campaign = game_state.game.campaign
+    if not campaign:
+        # This shouldn't happen if data is consistent, but good to check
+        return f"Error: Could not find associated campaign for game {game_state.game_id}."
+
+    context_lines = []
+
+    # 1. Campaign Overview & Goals (static after generation; memoized per campaign id and version)
+    context_lines.append(get_campaign_context_block(campaign))
 
     # 2. Current Game State & Progress
-    context_lines.append("\n--- Current Game State ---")
+    context_lines.append(f"\n{CURRENT_STATE_HEADER}")
     current_state_dict = game_state.state_data or {}
     context_lines.append(f"Current Location: {current_state_dict.get('location', 'Unknown')}") # Get location from state_data
 
@@ -0,0 +1,203 @@
+import copy
+from typing import Any, Dict, List
+
+# A list edit that removes more than this fraction of the old list is sent as one 'replace'
+# (cheaper to apply, and usually smaller than the individual remove/add operations)
+LIST_REPLACE_RATIO = 0.5
+
+# Most leading items checked when looking for a front-trimmed list
+MAX_FRONT_TRIM = 16
+
+
+def escape_pointer_token(token: Any) -> str:
+    """Escapes one JSON Pointer reference token (RFC 6901: '~' -> '~0', '/' -> '~1')."""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def unescape_pointer_token(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def make_patch(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """
+    Builds an RFC 6902 patch (add/remove/replace operations) that turns old into new.
+
+    Dicts are compared key by key and recursed into. Lists are compared by their common
+    prefix and suffix, so the usual game state edits stay tiny:
+        - appends (game log, inventory, visited locations) become 'add' ops on '<path>/-',
+        - trimming from the front (capped historical_summary) becomes 'remove' ops on index 0,
+        - a single inserted, removed or edited element touches only that index.
+    Anything else falls back to one 'replace' of the value.
+
+    Args:
+        old: The previous JSON-compatible value.
+        new: The current JSON-compatible value.
+        path: JSON Pointer of old/new inside the document ('' for the root).
+
+    Returns:
+        The list of operations (empty if old == new).
+    """
+    if old is new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        return _diff_dicts(old, new, path)
+    if isinstance(old, list) and isinstance(new, list):
+        return _diff_lists(old, new, path)
+    if type(old) is type(new) and old == new:
+        return []
+    return [{'op': 'replace', 'path': path, 'value': copy.deepcopy(new)}]
+
+
+def _diff_dicts(old: Dict[str, Any], new: Dict[str, Any], path: str) -> List[Dict[str, Any]]:
+    ops = []
+    for key in old:
+        if key not in new:
+            ops.append({'op': 'remove', 'path': f"{path}/{escape_pointer_token(key)}"})
+    for key, value in new.items():
+        child = f"{path}/{escape_pointer_token(key)}"
+        if key not in old:
+            ops.append({'op': 'add', 'path': child, 'value': copy.deepcopy(value)})
+        else:
+            ops.extend(make_patch(old[key], value, child))
+    return ops
+
+
+def _diff_lists(old: List[Any], new: List[Any], path: str) -> List[Dict[str, Any]]:
+    old_len, new_len = len(old), len(new)
+    shortest = min(old_len, new_len)
+
+    prefix = 0
+    while prefix < shortest and _same(old[prefix], new[prefix]):
+        prefix += 1
+    if prefix == old_len == new_len:
+        return []
+
+    # Capped lists drop their oldest items while appending new ones (e.g. historical_summary)
+    if prefix == 0 and old_len and new_len:
+        for dropped in range(1, min(old_len - 1, MAX_FRONT_TRIM) + 1):
+            kept = old_len - dropped
+            if kept <= new_len and all(_same(old[dropped + i], new[i]) for i in range(kept)):
+                ops = [{'op': 'remove', 'path': f"{path}/0"} for _ in range(dropped)]
+                ops.extend({'op': 'add', 'path': f"{path}/-", 'value': copy.deepcopy(item)} for item in new[kept:])
+                return ops
+
+    suffix = 0
+    while suffix < shortest - prefix and _same(old[old_len - 1 - suffix], new[new_len - 1 - suffix]):
+        suffix += 1
+
+    old_mid = old[prefix:old_len - suffix]
+    new_mid = new[prefix:new_len - suffix]
+
+    # Same number of changed elements: edit them in place (recursing into nested dicts/lists)
+    if len(old_mid) == len(new_mid):
+        ops = []
+        for offset, (old_item, new_item) in enumerate(zip(old_mid, new_mid)):
+            ops.extend(make_patch(old_item, new_item, f"{path}/{prefix + offset}"))
+        return ops
+
+    if old_len and len(old_mid) > old_len * LIST_REPLACE_RATIO and len(old_mid) > 1:
+        return [{'op': 'replace', 'path': path, 'value': copy.deepcopy(new)}]
+
+    ops = []
+    # Remove from the highest index down so earlier indexes stay valid
+    for index in range(prefix + len(old_mid) - 1, prefix - 1, -1):
+        ops.append({'op': 'remove', 'path': f"{path}/{index}"})
+    appending = suffix == 0
+    for offset, item in enumerate(new_mid):
+        target = f"{path}/-" if appending else f"{path}/{prefix + offset}"
+        ops.append({'op': 'add', 'path': target, 'value': copy.deepcopy(item)})
+    return ops
+
+
+def _same(a: Any, b: Any) -> bool:
+    """
+    Deep equality that does not treat True == 1 or 1 == 1.0 as unchanged, at any depth
+    (list items matched by it are left out of the patch, so nested changes must count too).
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return len(a) == len(b) and all(key in b and _same(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _parse_pointer(path: str) -> List[str]:
+    if path == '':
+        return []
+    if not path.startswith('/'):
+        raise ValueError(f"Invalid JSON Pointer: '{path}'")
+    return [unescape_pointer_token(token) for token in path[1:].split('/')]
+
+
+def _list_index(container: List[Any], token: str, allow_end: bool) -> int:
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit():
+        raise ValueError(f"Invalid list index '{token}'")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise ValueError(f"List index {index} out of range")
+    return index
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]], in_place: bool = False) -> Any:
+    """
+    Applies add/remove/replace operations (as produced by make_patch) and returns the result.
+
+    Args:
+        document: The JSON-compatible value to patch.
+        patch: The operations, applied in order.
+        in_place: If False (default) the document is deep-copied first.
+
+    Raises:
+        ValueError: If an operation's path does not resolve or the op is not supported.
+    """
+    if not in_place:
+        document = copy.deepcopy(document)
+    for operation in patch:
+        op = operation.get('op')
+        tokens = _parse_pointer(operation.get('path', ''))
+        if not tokens:
+            if op in ('add', 'replace'):
+                document = copy.deepcopy(operation['value'])
+                continue
+            raise ValueError(f"Unsupported root operation '{op}'")
+
+        parent = document
+        for token in tokens[:-1]:
+            if isinstance(parent, list):
+                parent = parent[_list_index(parent, token, allow_end=False)]
+            elif isinstance(parent, dict) and token in parent:
+                parent = parent[token]
+            else:
+                raise ValueError(f"Path '{operation.get('path')}' does not exist")
+
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = _list_index(parent, last, allow_end=(op == 'add'))
+            if op == 'add':
+                parent.insert(index, copy.deepcopy(operation['value']))
+            elif op == 'remove':
+                del parent[index]
+            elif op == 'replace':
+                parent[index] = copy.deepcopy(operation['value'])
+            else:
+                raise ValueError(f"Unsupported patch operation '{op}'")
+        elif isinstance(parent, dict):
+            if op in ('add', 'replace'):
+                if op == 'replace' and last not in parent:
+                    raise ValueError(f"Path '{operation.get('path')}' does not exist")
+                parent[last] = copy.deepcopy(operation['value'])
+            elif op == 'remove':
+                if last not in parent:
+                    raise ValueError(f"Path '{operation.get('path')}' does not exist")
+                del parent[last]
+            else:
+                raise ValueError(f"Unsupported patch operation '{op}'")
+        else:
+            raise ValueError(f"Path '{operation.get('path')}' does not resolve to a container")
+    return document
@@ -0,0 +1,143 @@
+import json
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class JsonStringFieldStreamer:
+    """
+    Incrementally extracts one top-level string field from a JSON object that is
+    arriving in pieces (e.g. a streamed chat completion in json_object mode).
+
+    Feed each raw text delta to `feed()`; it returns the newly available, already
+    unescaped text of the target field (possibly an empty string). Everything
+    outside the target value is scanned only to track nesting and string state, so
+    a matching key inside a nested object or inside another string is ignored.
+
+    Example:
+        streamer = JsonStringFieldStreamer('content')
+        streamer.feed('{"cont')            # -> ''
+        streamer.feed('ent": "You ent')    # -> 'You ent'
+        streamer.feed('er.\\n", "x": 1}')  # -> 'er.\n'
+    """
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._last_string = None # Last complete string seen at depth 1 (a candidate key)
+        self._pending_key = None # Key whose value comes next at depth 1
+        self._in_value = False
+
+    def feed(self, delta: str) -> str:
+        """Appends a raw delta and returns any newly decoded text from the target field."""
+        if not delta or self.done:
+            self.buffer += delta or ""
+            return ""
+        self.buffer += delta
+        output = []
+        buf = self.buffer
+        while self._pos < len(buf) and not self.done:
+            if self._in_value:
+                ch = buf[self._pos]
+                if ch == '"':
+                    self._pos += 1
+                    self._in_value = False
+                    self.done = True
+                elif ch == '\\':
+                    decoded, consumed = self._decode_escape(buf, self._pos)
+                    if consumed == 0:
+                        break # Incomplete escape sequence; wait for more data
+                    output.append(decoded)
+                    self._pos += consumed
+                else:
+                    # Copy the run of plain characters up to the next quote or backslash
+                    end = self._pos
+                    while end < len(buf) and buf[end] not in '"\\':
+                        end += 1
+                    output.append(buf[self._pos:end])
+                    self._pos = end
+                continue
+
+            ch = buf[self._pos]
+            if self._in_string:
+                if ch == '\\':
+                    if self._pos + 1 >= len(buf):
+                        break # Wait for the escaped character
+                    self._pos += 2
+                    continue
+                if ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        try:
+                            self._last_string = json.loads(buf[self._string_start:self._pos + 1])
+                        except ValueError:
+                            self._last_string = None
+                self._pos += 1
+                continue
+
+            if ch == '"':
+                if self._depth == 1 and self._pending_key == self.field_name:
+                    self._in_value = True
+                    self._pending_key = None
+                else:
+                    self._in_string = True
+                    self._string_start = self._pos
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+            elif ch == ':' and self._depth == 1:
+                self._pending_key = self._last_string
+            elif ch == ',' and self._depth == 1:
+                self._pending_key = None
+                self._last_string = None
+            elif not ch.isspace() and self._depth == 1:
+                # A non-string value (number, bool, null); the key is no longer pending
+                self._pending_key = None
+            self._pos += 1
+        return "".join(output)
+
+    @staticmethod
+    def _decode_escape(buf: str, pos: int):
+        """
+        Decodes the escape sequence starting at buf[pos] (a backslash).
+
+        Returns:
+            (decoded_text, characters_consumed). characters_consumed is 0 if the
+            sequence is not complete yet.
+        """
+        if pos + 1 >= len(buf):
+            return "", 0
+        kind = buf[pos + 1]
+        if kind in _SIMPLE_ESCAPES:
+            return _SIMPLE_ESCAPES[kind], 2
+        if kind != 'u':
+            return kind, 2 # Invalid escape; pass the character through
+        if pos + 6 > len(buf):
+            return "", 0
+        try:
+            code = int(buf[pos + 2:pos + 6], 16)
+        except ValueError:
+            return buf[pos:pos + 6], 6 # Malformed \u escape; pass it through untouched
+        if 0xD800 <= code <= 0xDBFF:
+            # High surrogate: needs the following \uXXXX low surrogate to form one character
+            if pos + 12 > len(buf):
+                return "", 0
+            if buf[pos + 6:pos + 8] == '\\u':
+                low = int(buf[pos + 8:pos + 12], 16)
+                if 0xDC00 <= low <= 0xDFFF:
+                    return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+        return chr(code), 6
@@ -0,0 +1,327 @@
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Default latency buckets in seconds (AI calls run from ~0.3s to well over 10s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+# Buckets for "queries per request" style counts
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape_label_value(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Gauge(_Metric):
+    """
+    Current value per label set. Either set() explicitly or computed at scrape time by a
+    callback returning a number (no labels) or a {label values tuple: number} dict.
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Any]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            try:
+                result = self.callback()
+            except Exception as e: # A failing collector must not break the whole scrape
+                if has_app_context():
+                    current_app.logger.warning(f"Metrics: collector for {self.name} failed: {e}")
+                return
+            items = sorted(result.items()) if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        for key, value in items:
+            key = key if isinstance(key, tuple) else (key,)
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(value))}'
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set (Prometheus _bucket/_sum/_count series)."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[Any]] = {} # key: [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._series[key] = series
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", _format_value(float(bound))))} {cumulative}'
+            yield f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", "+Inf"))} {series[-1]}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(series[-2]))}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}'
+
+
+class MetricsRegistry:
+    """In-process metrics registry rendered in the Prometheus text exposition format (0.0.4)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Any]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+registry = MetricsRegistry()
+
+# --- AI calls (fed by profiling.ai_call_span and ai_service.log_api_usage) ---
+ai_call_seconds = registry.histogram('questforge_ai_call_duration_seconds', 'Duration of AI completion requests.', ('method', 'model'))
+ai_call_errors = registry.counter('questforge_ai_call_errors_total', 'AI completion requests that raised.', ('method',))
+ai_tokens = registry.counter('questforge_ai_tokens_total', 'Tokens used by AI requests (rate() gives tokens per minute).', ('model', 'type'))
+ai_cost = registry.counter('questforge_ai_cost_dollars_total', 'Cost of recorded AI usage in dollars (rate() gives cost per minute).', ('model',))
+
+# --- Turns (fed by profiling.TurnTimer) ---
+turn_stage_seconds = registry.histogram('questforge_turn_stage_duration_seconds', 'Duration of each handle_player_action stage.', ('stage',))
+
+# --- Historical summaries (fed by summary_service) ---
+historical_summaries = registry.counter('questforge_historical_summaries_total', 'Deferred historical summaries by outcome: persisted, late (missed the wait of the next turn, written with a later state update) or failed (lost).', ('outcome',))
+
+# --- Socket.IO ---
+socket_events = registry.counter('questforge_socketio_events_total', 'Socket.IO events received (rate() gives events per second).', ('event',))
+socket_event_seconds = registry.histogram('questforge_socketio_event_duration_seconds', 'Time spent in Socket.IO event handlers.', ('event',))
+
+# --- Database ---
+db_queries = registry.counter('questforge_db_queries_total', 'SQL statements executed.')
+db_queries_per_request = registry.histogram('questforge_db_queries_per_request', 'SQL statements per HTTP request or Socket.IO event.', ('kind', 'endpoint'), buckets=COUNT_BUCKETS)
+http_request_seconds = registry.histogram('questforge_http_request_duration_seconds', 'HTTP request duration.', ('endpoint', 'method'))
+
+
+def observe_ai_call(method: str, model: Optional[str], seconds: float, attrs: Dict[str, Any]) -> None:
+    """Records one finished AI request (called by profiling.ai_call_span)."""
+    model = model or 'unknown'
+    ai_call_seconds.observe(seconds, method=method, model=model)
+    if attrs.get('error'):
+        ai_call_errors.inc(method=method)
+    cached = attrs.get('cached_tokens') or 0
+    if attrs.get('prompt_tokens') is not None:
+        ai_tokens.inc(attrs['prompt_tokens'] - cached, model=model, type='prompt')
+    if cached:
+        ai_tokens.inc(cached, model=model, type='cached_prompt')
+    if attrs.get('completion_tokens') is not None:
+        ai_tokens.inc(attrs['completion_tokens'], model=model, type='completion')
+
+
+def observe_ai_cost(model: Optional[str], cost) -> None:
+    if cost is not None:
+        ai_cost.inc(float(cost), model=model or 'unknown')
+
+
+def _query_count_key() -> str:
+    return '_metrics_db_queries'
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    db_queries.inc()
+    if has_request_context():
+        setattr(g, _query_count_key(), getattr(g, _query_count_key(), 0) + 1)
+
+
+def request_query_count() -> int:
+    """SQL statements executed so far in the current request / Socket.IO event."""
+    return getattr(g, _query_count_key(), 0) if has_request_context() else 0
+
+
+def counted_socket_event(socketio, event_name: str):
+    """
+    Drop-in for @socketio.on(event_name) that also counts the event, times the handler and
+    records how many SQL statements it ran.
+    """
+    def decorator(handler):
+        parameters = inspect.signature(handler).parameters.values()
+        takes_varargs = any(p.kind == p.VAR_POSITIONAL for p in parameters)
+        positional = sum(1 for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+        @functools.wraps(handler)
+        def wrapper(*args):
+            socket_events.inc(event=event_name)
+            queries_before = request_query_count()
+            started = time.perf_counter()
+            try:
+                # Flask-SocketIO retries connect handlers without arguments on TypeError; passing
+                # only what the handler accepts avoids that (and counting the event twice)
+                return handler(*(args if takes_varargs else args[:positional]))
+            finally:
+                socket_event_seconds.observe(time.perf_counter() - started, event=event_name)
+                db_queries_per_request.observe(request_query_count() - queries_before, kind='socketio', endpoint=event_name)
+
+        return socketio.on(event_name)(wrapper)
+    return decorator
+
+
+def _register_collectors() -> None:
+    """Gauges computed at scrape time from the services' own statistics."""
+
+    def game_cache():
+        from questforge.services.game_state_service import game_state_service
+        stats = game_state_service.active_games.stats()
+        return {('entries',): stats['entries'], ('bytes',): stats['bytes'], ('dirty_entries',): stats['dirty_entries']}
+
+    def queue_depths():
+        from questforge.services.action_queue import action_queue
+        from questforge.services.summary_service import summary_service
+        from questforge.services.usage_recorder import usage_recorder
+        return {
+            ('player_actions',): sum(action_queue.depths().values()),
+            ('usage_rows',): usage_recorder.pending(),
+            ('historical_summaries',): summary_service.pending_count()
+        }
+
+    def max_action_queue_depth():
+        from questforge.services.action_queue import action_queue
+        return max(action_queue.depths().values(), default=0)
+
+    registry.gauge('questforge_active_games', 'Games held in the GameStateService cache.', callback=lambda: game_cache()[('entries',)])
+    registry.gauge('questforge_game_state_cache', 'GameStateService cache occupancy.', ('measure',), callback=game_cache)
+    registry.gauge('questforge_queue_depth', 'Items waiting in in-process queues.', ('queue',), callback=queue_depths)
+    registry.gauge('questforge_action_queue_max_depth', 'Deepest per-game player action queue.', callback=max_action_queue_depth)
+
+
+_engine_listener_installed = False
+
+
+def init_app(app) -> None:
+    """Installs the SQL statement counter, the per-request hooks and the service gauges."""
+    global _engine_listener_installed
+    if not _engine_listener_installed:
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+        _engine_listener_installed = True
+    _register_collectors()
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        setattr(g, _query_count_key(), 0)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        endpoint = request.endpoint or 'unmatched'
+        started = getattr(g, '_metrics_started', None)
+        if started is not None:
+            http_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        db_queries_per_request.observe(request_query_count(), kind='http', endpoint=endpoint)
+        return response
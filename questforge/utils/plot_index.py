@@ -0,0 +1,383 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Bump when the index layout or tokenization changes, so stored indexes are rebuilt
+PLOT_INDEX_VERSION = 3
+
+# Same minimum as the original Stage 2 check ("meaningful words" are longer than 3 characters)
+MIN_TOKEN_LENGTH = 4
+
+# Stage 2 thresholds (same values as the original word-overlap check; the ratio is now over
+# stemmed meaningful words, see score_plot_points)
+OVERLAP_RATIO_THRESHOLD = 0.25
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+_STOPWORDS = frozenset({
+    'about', 'after', 'again', 'also', 'been', 'before', 'being', 'both', 'does', 'done',
+    'down', 'each', 'from', 'have', 'having', 'here', 'into', 'just', 'more', 'most',
+    'must', 'only', 'other', 'over', 'same', 'should', 'some', 'such', 'than', 'that',
+    'their', 'them', 'then', 'there', 'these', 'they', 'this', 'those', 'through', 'under',
+    'until', 'upon', 'very', 'were', 'what', 'when', 'where', 'which', 'while', 'will',
+    'with', 'within', 'without', 'would', 'your',
+})
+
+# Longest suffixes first; a suffix is only stripped if at least 3 characters remain
+_SUFFIXES = ('ational', 'ations', 'ation', 'ments', 'ment', 'ness', 'ings', 'ing', 'ies', 'ied',
+             'ers', 'er', 'est', 'ed', 'ly', 'es', 's')
+
+
+def stem(token: str) -> str:
+    """
+    A small suffix-stripping stemmer, so 'opens', 'opened' and 'opening' all map to 'open'.
+    It is not a full Porter stemmer; it only has to be consistent between the index and the lookup.
+    """
+    if token.endswith("'s"):
+        token = token[:-2]
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            if suffix in ('ies', 'ied'):
+                token += 'y'
+            break
+    # Collapse a doubled final consonant left behind by -ing/-ed ('stopped' -> 'stopp' -> 'stop')
+    if len(token) > 3 and token[-1] == token[-2] and token[-1] not in 'aeiouls':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases text and returns its meaningful words (punctuation stripped, stopwords and short words removed)."""
+    if not text:
+        return []
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in _STOPWORDS
+    ]
+
+
+def stem_set(text: str) -> set:
+    """The set of stemmed meaningful words in text."""
+    return {stem(token) for token in tokenize(text)}
+
+
+def plot_index_fingerprint(major_plot_points: Any, key_locations: Any = None, key_characters: Any = None) -> str:
+    """Stable hash of everything the index is built from; a stored index is stale whenever this changes."""
+    serialized = json.dumps([major_plot_points, key_locations, key_characters], sort_keys=True, default=str)
+    return hashlib.sha1(f"{PLOT_INDEX_VERSION}:{serialized}".encode('utf-8')).hexdigest()
+
+
+def _entity_names(entities: Any) -> List[str]:
+    """Lowercased names from a key_locations/key_characters list (dicts with 'name', or plain strings)."""
+    names = []
+    if isinstance(entities, list):
+        for entity in entities:
+            name = entity.get('name') if isinstance(entity, dict) else entity
+            if isinstance(name, str) and len(name.strip()) > 3:
+                names.append(name.strip().lower())
+    return names
+
+
+def build_plot_point_index(major_plot_points: Any, key_locations: Any = None, key_characters: Any = None) -> Dict[str, Any]:
+    """
+    Builds the inverted index used by the Stage 2 plausibility check.
+
+    Args:
+        major_plot_points: The campaign's plot point list ({"id", "description", "required"} dicts).
+        key_locations: The campaign's key locations (used to precompute location references).
+        key_characters: The campaign's key characters (used to precompute NPC references).
+
+    Returns:
+        A JSON-serializable dict:
+            'version', 'fingerprint': for staleness checks.
+            'points': {plot_point_id: {'stems': [...], 'required': bool, 'text': lowercased description}}.
+            'postings': {stem: [plot_point_id, ...]}.
+            'idf': {stem: weight}, smoothed inverse document frequency over the plot points.
+            'location_refs' / 'npc_refs': {name: [plot_point_id, ...]} for key locations/characters
+                named in a description.
+            'display': {'first_required_id', 'total'} for the play page's progress counter
+                (see plot_point_display_totals).
+    """
+    points: Dict[str, Dict[str, Any]] = {}
+    postings: Dict[str, List[str]] = {}
+    location_refs: Dict[str, List[str]] = {}
+    npc_refs: Dict[str, List[str]] = {}
+    location_names = _entity_names(key_locations)
+    npc_names = _entity_names(key_characters)
+
+    for plot_point in major_plot_points if isinstance(major_plot_points, list) else []:
+        if not isinstance(plot_point, dict) or not plot_point.get('id'):
+            continue
+        pp_id = str(plot_point['id'])
+        text = str(plot_point.get('description', '')).lower()
+        stems = sorted(stem_set(text))
+        points[pp_id] = {'stems': stems, 'required': bool(plot_point.get('required', False)), 'text': text}
+        for pp_stem in stems:
+            postings.setdefault(pp_stem, []).append(pp_id)
+        for name in location_names:
+            if name in text:
+                location_refs.setdefault(name, []).append(pp_id)
+        for name in npc_names:
+            if name in text:
+                npc_refs.setdefault(name, []).append(pp_id)
+
+    total = len(points)
+    idf = {pp_stem: math.log((1 + total) / (1 + len(ids))) + 1.0 for pp_stem, ids in postings.items()}
+
+    return {
+        'version': PLOT_INDEX_VERSION,
+        'fingerprint': plot_index_fingerprint(major_plot_points, key_locations, key_characters),
+        'points': points,
+        'postings': postings,
+        'idf': idf,
+        'location_refs': location_refs,
+        'npc_refs': npc_refs,
+        'display': plot_point_display_totals(major_plot_points),
+    }
+
+
+def plot_point_display_totals(major_plot_points: Any) -> Dict[str, Any]:
+    """
+    The campaign side of the play page's plot point counter. The first required plot point is
+    the campaign's opening and is not shown, so it is left out of the total.
+
+    Returns:
+        {'first_required_id': id of the first required plot point (or None), 'total': number of
+        displayed plot points}.
+    """
+    plot_points = major_plot_points if isinstance(major_plot_points, list) else []
+    first_required_id = next((pp.get('id') for pp in plot_points if isinstance(pp, dict) and pp.get('required')), None)
+    return {
+        'first_required_id': first_required_id,
+        'total': count_displayed_plot_points(plot_points, first_required_id),
+    }
+
+
+def count_displayed_plot_points(plot_points: Any, first_required_id: Optional[str], start: int = 0) -> int:
+    """Number of plot point dicts from position `start` on that are shown on the play page."""
+    if not isinstance(plot_points, list):
+        return 0
+    return sum(1 for pp in plot_points[start:] if isinstance(pp, dict) and pp.get('id') != first_required_id)
+
+
+def _matching_ids(refs: Dict[str, List[str]], name: str, points: Dict[str, Dict[str, Any]]) -> Iterable[str]:
+    """IDs of plot points mentioning name; falls back to a substring scan for names that are not key entities."""
+    if name in refs:
+        return refs[name]
+    return [pp_id for pp_id, entry in points.items() if name in entry['text']]
+
+
+def score_plot_points(index: Dict[str, Any], pending_ids: Iterable[str], action_narrative_text: str,
+                      current_location: str = '', npcs_present: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Scores the pending plot points against one turn's action and narrative.
+
+    The plausibility rules and thresholds follow the original Stage 2 check: a plot point is
+    plausible if at least 25% of its words appear in the text, if it mentions the current
+    location or an NPC who is present, or (for required plot points) if any word overlaps.
+    Words are matched by stem through the postings lists, so only plot points sharing a
+    word with the turn are touched.
+
+    Unlike the original whitespace split, words are normalized first (punctuation stripped,
+    stopwords dropped, stemmed), so the overlap ratio is taken over a plot point's distinct
+    meaningful stems. That denominator is usually smaller than the old word count, and
+    'opened'/'opens' now match, so ratios near the 25% threshold can differ from the old check.
+
+    Returns:
+        One dict per pending plot point ({'id', 'plausible', 'score', 'overlap_ratio', 'reasons'}),
+        plausible ones first, ordered by score (IDF-weighted overlap plus location/NPC bonuses).
+    """
+    points = index.get('points', {})
+    postings = index.get('postings', {})
+    idf = index.get('idf', {})
+    pending = [str(pp_id) for pp_id in pending_ids if str(pp_id) in points]
+    pending_set = set(pending)
+
+    matched: Dict[str, set] = {pp_id: set() for pp_id in pending}
+    for turn_stem in stem_set(action_narrative_text):
+        for pp_id in postings.get(turn_stem, ()):
+            if pp_id in pending_set:
+                matched[pp_id].add(turn_stem)
+
+    location_hits = set()
+    if current_location:
+        location_hits = set(_matching_ids(index.get('location_refs', {}), current_location, points)) & pending_set
+
+    npc_hits: Dict[str, List[str]] = {}
+    for npc in npcs_present or []:
+        if npc and len(npc) > 3:
+            for pp_id in _matching_ids(index.get('npc_refs', {}), npc, points):
+                if pp_id in pending_set:
+                    npc_hits.setdefault(pp_id, []).append(npc)
+
+    candidates = []
+    for pp_id in pending:
+        entry = points[pp_id]
+        stems = entry['stems']
+        overlap = matched[pp_id]
+        overlap_ratio = len(overlap) / len(stems) if stems else 0.0
+        total_weight = sum(idf.get(s, 1.0) for s in stems)
+        score = sum(idf.get(s, 1.0) for s in overlap) / total_weight if total_weight else 0.0
+        is_plausible = False
+        reasons = []
+
+        if overlap_ratio >= OVERLAP_RATIO_THRESHOLD:
+            is_plausible = True
+            reasons.append(f"Word overlap ratio: {overlap_ratio:.2f}")
+        elif overlap:
+            reasons.append(f"Some word overlap but below threshold: {overlap_ratio:.2f}")
+
+        if pp_id in location_hits:
+            is_plausible = True
+            score += 1.0
+            reasons.append(f"Current location '{current_location}' mentioned in plot point")
+
+        for npc in npc_hits.get(pp_id, []):
+            is_plausible = True
+            score += 0.5
+            reasons.append(f"NPC '{npc}' present and mentioned in plot point")
+
+        if entry['required'] and not is_plausible and overlap:
+            # For required plot points, be more lenient
+            is_plausible = True
+            reasons.append("Required plot point with some word overlap")
+
+        candidates.append({
+            'id': pp_id,
+            'plausible': is_plausible,
+            'score': round(score, 4),
+            'overlap_ratio': round(overlap_ratio, 4),
+            'reasons': reasons,
+        })
+
+    candidates.sort(key=lambda c: (not c['plausible'], -c['score']))
+    return candidates
+
+
+def npcs_present_at(npc_status: Any, current_location: str) -> List[str]:
+    """
+    Lowercased names of the NPCs in state_data['npc_status'] that are at current_location
+    (an info dict whose 'location' matches) or simply marked 'present'/'here'.
+    """
+    npcs_present = []
+    if isinstance(npc_status, dict):
+        for npc_name, npc_info in npc_status.items():
+            if isinstance(npc_info, dict) and npc_info.get('location', '').lower() == current_location:
+                npcs_present.append(npc_name.lower())
+            elif isinstance(npc_info, str) and npc_info.lower() in ['present', 'here']:
+                npcs_present.append(npc_name.lower())
+    return npcs_present
+
+
+def select_plausible_plot_points(index: Dict[str, Any], major_plot_points: Any, completed_plot_point_ids: Iterable[str],
+                                 action_narrative_text: str, state_data: Dict[str, Any],
+                                 turns_since_plot_progress: int = 0) -> Dict[str, Any]:
+    """
+    The Stage 2 plausibility check of one turn: picks the pending plot points worth a Stage 3 AI check.
+
+    Pending plot points are scored with score_plot_points. If none is plausible, the first pending
+    required plot point is still checked once the players have gone 2+ turns without progress.
+
+    Args:
+        index: The campaign's plot point index (get_plot_point_index).
+        major_plot_points: The campaign's plot point list.
+        completed_plot_point_ids: IDs already completed before this turn.
+        action_narrative_text: The lowercased player action and Stage 1 narrative.
+        state_data: The state after Stage 1 (for the location and the NPCs present).
+        turns_since_plot_progress: Turns since a plot point was last completed.
+
+    Returns:
+        {'pending': pending plot point dicts, 'candidates': the score_plot_points results,
+         'plausible': plot point dicts to check, 'fallback': the required plot point added
+         by the no-progress rule or None, 'current_location': str, 'npcs_present': [...]}
+    """
+    completed = set(completed_plot_point_ids)
+    pending_plot_points = [
+        pp for pp in major_plot_points or []
+        if isinstance(pp, dict) and pp.get('id') not in completed
+    ]
+    current_location = (state_data.get('location') or '').lower()
+    npcs_present = npcs_present_at(state_data.get('npc_status', {}), current_location)
+
+    pending_by_id = {str(pp.get('id')): pp for pp in pending_plot_points if pp.get('id')}
+    candidates = score_plot_points(
+        index,
+        pending_by_id.keys(),
+        action_narrative_text,
+        current_location=current_location,
+        npcs_present=npcs_present
+    )
+    plausible = [pending_by_id[candidate['id']] for candidate in candidates if candidate['plausible']]
+
+    fallback = None
+    if not plausible and turns_since_plot_progress >= 2: # Only after 2+ turns without progress
+        fallback = next((pp for pp in pending_plot_points if pp.get('required', False)), None)
+        if fallback is not None:
+            plausible.append(fallback)
+
+    return {
+        'pending': pending_plot_points,
+        'candidates': candidates,
+        'plausible': plausible,
+        'fallback': fallback,
+        'current_location': current_location,
+        'npcs_present': npcs_present,
+    }
+
+
+class PlotIndexCache:
+    """
+    Process-wide LRU of plot point indexes keyed by campaign id.
+
+    Entries are validated by Campaign.version, so a cache hit costs no hashing or copying.
+    Any ORM update of the plot points, key locations or key characters rebuilds the stored
+    index and bumps the version in the same UPDATE (the Campaign before_update listener), so
+    every process misses on its next read. On a miss the stored Campaign.plot_point_index is
+    used if its fingerprint still matches, otherwise the index is rebuilt.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[int, Dict[str, Any]]]" = OrderedDict() # campaign id: (version, index)
+        self._lock = threading.Lock()
+
+    def get(self, campaign) -> Dict[str, Any]:
+        """
+        Returns a current index for the campaign, preferring the cache, then the
+        persisted Campaign.plot_point_index, then a fresh build.
+        """
+        version = getattr(campaign, 'version', None) or 1
+        with self._lock:
+            cached = self._entries.get(campaign.id)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(campaign.id)
+                return cached[1]
+
+        fingerprint = plot_index_fingerprint(campaign.major_plot_points, campaign.key_locations, campaign.key_characters)
+        index = getattr(campaign, 'plot_point_index', None)
+        if not isinstance(index, dict) or index.get('fingerprint') != fingerprint:
+            index = build_plot_point_index(campaign.major_plot_points, campaign.key_locations, campaign.key_characters)
+
+        with self._lock:
+            self._entries[campaign.id] = (version, index)
+            self._entries.move_to_end(campaign.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def invalidate(self, campaign_id) -> None:
+        with self._lock:
+            self._entries.pop(campaign_id, None)
+
+
+plot_index_cache = PlotIndexCache()
+
+
+def get_plot_point_index(campaign) -> Dict[str, Any]:
+    """Convenience wrapper around the shared PlotIndexCache."""
+    return plot_index_cache.get(campaign)
@@ -0,0 +1,273 @@
+import contextvars
+import itertools
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from . import metrics
+
+# Durations kept per span name for the percentile aggregation (most recent first out)
+DEFAULT_WINDOW = 1000
+
+# Per-turn timing records are logged on this logger (one JSON line per turn)
+timing_logger = logging.getLogger('questforge.turn_timing')
+
+# The turn being timed on this thread. Coroutines handed to async_runner copy the submitting
+# thread's context, so AI calls made on the background loop still find their turn.
+_current_turn: contextvars.ContextVar[Optional['TurnTimer']] = contextvars.ContextVar('questforge_turn_timer', default=None)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class TimingStats:
+    """
+    Rolling per-name latency aggregation (p50/p95/p99 over the last `window` observations).
+
+    Names are 'turn.<stage>' for the stages of handle_player_action, 'turn.total' for whole
+    turns, 'turn.queue_wait' for the action queue wait and 'ai.<call>' for every AI request.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, milliseconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = deque(maxlen=max(self.window, 1))
+                self._samples[name] = samples
+            samples.append(milliseconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def summary(self, name: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            samples = self._samples.get(name)
+            if not samples:
+                return None
+            values = sorted(samples)
+            count = self._counts[name]
+        return {
+            'count': count,
+            'window': len(values),
+            'mean_ms': round(sum(values) / len(values), 2),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+            'max_ms': round(values[-1], 2)
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Summaries of every observed name, sorted by name."""
+        with self._lock:
+            names = sorted(self._samples)
+        return {name: self.summary(name) for name in names}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+timing_stats = TimingStats()
+
+_turn_ids = itertools.count(1)
+
+
+def _usage_attrs(usage) -> Dict[str, Any]:
+    """Token counts from an OpenAI usage object (or dict)."""
+    if usage is None:
+        return {}
+    get = usage.get if isinstance(usage, dict) else (lambda key: getattr(usage, key, None))
+    attrs = {
+        'prompt_tokens': get('prompt_tokens'),
+        'completion_tokens': get('completion_tokens'),
+        'total_tokens': get('total_tokens')
+    }
+    details = get('prompt_tokens_details')
+    cached = (details.get('cached_tokens') if isinstance(details, dict) else getattr(details, 'cached_tokens', None)) if details else None
+    if cached is not None:
+        attrs['cached_tokens'] = cached
+    return {key: value for key, value in attrs.items() if value is not None}
+
+
+class Span:
+    """One timed section: a stage of a turn or a single AI request."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.started = time.perf_counter()
+        self.milliseconds: Optional[float] = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def record_response(self, response) -> None:
+        """Takes the model and token counts from an OpenAI completion response."""
+        if response is None:
+            return
+        self.record_usage(getattr(response, 'model', None), getattr(response, 'usage', None))
+
+    def record_usage(self, model: Optional[str], usage) -> None:
+        if model:
+            self.attrs['model'] = model
+        self.attrs.update(_usage_attrs(usage))
+
+    def finish(self) -> float:
+        if self.milliseconds is None:
+            self.milliseconds = (time.perf_counter() - self.started) * 1000.0
+        return self.milliseconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.attrs, name=self.name, ms=round(self.milliseconds or 0.0, 2))
+
+
+class TurnTimer:
+    """
+    Timing record of one player turn.
+
+    Stages are timed with lap(name), which closes the section since the previous lap (so the
+    long handle_player_action body only needs one line per stage boundary), or with
+    span(name) around a block. AI requests made while the turn is current are added by
+    ai_call_span. finish() logs the record as one JSON line on 'questforge.turn_timing'
+    and feeds every span into timing_stats.
+    """
+
+    def __init__(self, game_id=None, stats: Optional[TimingStats] = None, **attrs):
+        self.turn_id = next(_turn_ids)
+        self.game_id = game_id
+        self.attrs: Dict[str, Any] = dict(attrs)
+        self.stats = stats if stats is not None else timing_stats
+        self.started = time.perf_counter()
+        self._last_lap = self.started
+        self.spans: List[Dict[str, Any]] = []
+        self.ai_calls: List[Dict[str, Any]] = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def lap(self, name: str, **attrs) -> float:
+        """Records the time since the previous lap (or the turn start) as stage `name`."""
+        now = time.perf_counter()
+        milliseconds = (now - self._last_lap) * 1000.0
+        self._last_lap = now
+        self._add(self.spans, dict(attrs, name=name, ms=round(milliseconds, 2)))
+        return milliseconds
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        span = Span(name, **attrs)
+        try:
+            yield span
+        finally:
+            span.finish()
+            self._last_lap = time.perf_counter()
+            self._add(self.spans, span.to_dict())
+
+    def add_ai_call(self, span: Span) -> None:
+        self._add(self.ai_calls, span.to_dict())
+
+    def _add(self, target: List[Dict[str, Any]], record: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self.finished: # Late AI calls (e.g. the deferred summary) are not part of the turn
+                target.append(record)
+
+    def finish(self, **attrs) -> Dict[str, Any]:
+        """Closes the turn, logs its record and updates the per-stage aggregation."""
+        with self._lock:
+            self.finished = True
+            total_ms = (time.perf_counter() - self.started) * 1000.0
+            record = dict(self.attrs, **attrs)
+            record.update({
+                'turn_id': self.turn_id,
+                'game_id': self.game_id,
+                'total_ms': round(total_ms, 2),
+                'stages': list(self.spans),
+                'ai_calls': list(self.ai_calls)
+            })
+        self.stats.observe('turn.total', total_ms)
+        metrics.turn_stage_seconds.observe(total_ms / 1000.0, stage='total')
+        if record.get('queue_wait_ms') is not None:
+            self.stats.observe('turn.queue_wait', record['queue_wait_ms'])
+            metrics.turn_stage_seconds.observe(record['queue_wait_ms'] / 1000.0, stage='queue_wait')
+        for stage in record['stages']:
+            self.stats.observe(f"turn.{stage['name']}", stage['ms'])
+            metrics.turn_stage_seconds.observe(stage['ms'] / 1000.0, stage=stage['name'])
+        timing_logger.info(json.dumps(record, default=str))
+        return record
+
+
+class _NullTurnTimer:
+    """Stand-in used when no turn is being timed, so call sites need no checks."""
+
+    def lap(self, name: str, **attrs) -> float:
+        return 0.0
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        yield Span(name, **attrs)
+
+    def add_ai_call(self, span: Span) -> None:
+        pass
+
+
+_null_turn_timer = _NullTurnTimer()
+
+
+def current_turn():
+    """The TurnTimer of the turn running in this context, or a no-op timer."""
+    return _current_turn.get() or _null_turn_timer
+
+
+@contextmanager
+def turn_timer(game_id=None, enabled: bool = True, **attrs) -> Iterator[Any]:
+    """
+    Times one turn: makes a TurnTimer current for the block and finishes it on exit
+    (also when the block raises). Extra attrs (user_id, queue_wait_ms, ...) go into the record.
+    """
+    if not enabled:
+        yield _null_turn_timer
+        return
+    timer = TurnTimer(game_id, **attrs)
+    token = _current_turn.set(timer)
+    try:
+        yield timer
+    except Exception as e:
+        timer.attrs['error'] = type(e).__name__
+        raise
+    finally:
+        _current_turn.reset(token)
+        timer.finish()
+
+
+@contextmanager
+def ai_call_span(name: str, **attrs) -> Iterator[Span]:
+    """
+    Times one AI request. Call span.record_response(response) (or record_usage for streams)
+    inside the block to attach the model and token counts. The duration is aggregated as
+    'ai.<name>' and, if a turn is being timed, added to that turn's ai_calls.
+    """
+    span = Span(name, **attrs)
+    try:
+        yield span
+    except Exception as e:
+        span.set(error=type(e).__name__)
+        raise
+    finally:
+        span.finish()
+        timing_stats.observe(f"ai.{name}", span.milliseconds)
+        metrics.observe_ai_call(name, span.attrs.get('model'), span.milliseconds / 1000.0, span.attrs)
+        current_turn().add_ai_call(span)
@@ -2,6 +2,7 @@ import json # Import the json module
 from questforge.models.template import Template
 from questforge.models.game_state import GameState # Import GameState for build_response_prompt later
 from typing import Dict, Optional, Any, List # Import Dict, Optional, Any, List for type hinting
+from questforge.utils.context_manager import split_context
 
 def build_campaign_prompt(template: Template, template_overrides: Optional[Dict[str, Any]] = None, creator_customizations: Optional[Dict[str, Any]] = None, player_details: Optional[Dict[str, Dict[str, str]]] = None) -> str:
     """
@@ -164,90 +165,168 @@ def build_campaign_prompt(template: Template, template_overrides: Optional[Dict[
     return final_prompt
 
 
-def build_response_prompt(context: str, player_action: str, is_stuck: bool = False, next_required_plot_point: Optional[str] = None, current_difficulty: Optional[str] = None) -> str:
+# Static Stage 1 instructions. Kept byte-identical across calls (no per-game or per-turn values)
+# so the provider can serve it from its prompt prefix cache.
+RESPONSE_SYSTEM_PROMPT = "\n".join([
+    "You are a Game Master for a text-based adventure game. This is Stage 1 of a multi-stage response generation.",
+    "Your primary task is to: ",
+    "  a) Generate a compelling narrative description of the direct and immediate result of the player's stated action. Detail what happens in this single moment or step.",
+    "  b) Provide a comprehensive and DETAILED update to the general game state based on the action's outcome. This includes player location, inventory changes, NPC presence/status/relationships, and the state of relevant world objects or environmental conditions.",
+    "Focus your response on what transpires in *this specific turn*. Do not narrate subsequent actions the player characters might take, or events that would logically follow *after* the immediate outcome, unless they are an unavoidable and instantaneous consequence.",
+    "The narrative should pause, awaiting the next player input. After describing the outcome, ensure your 'available_actions' present clear choices for the player to drive the story forward.",
+    "**IMPORTANT: Refer to players by their names as listed in the 'Players Present' section of the context.**",
+    "DO NOT attempt to determine if a plot point has been completed. That will be handled by a separate process. Your focus is SOLELY on narrative and detailed general state updates.",
+    "---",
+    "Consider the following aspects while generating the response:",
+    "1. **Narrative Consistency & Logic:** Ensure the response is consistent with the overall game state (location, inventory, character status, completed plot points, players present). Deny actions that are illogical (e.g., using an item not possessed). If an action attempts to bypass or ignore a clear objective from the 'Current Objective/Focus' without strong narrative justification, your response should explain *why* it's difficult or impossible at this time. Maintain narrative consistency with any defined plot points from the game context.",
+    "2. **Narrative Description:** Provide a vivid and engaging description of the outcome. **Use the players' names when describing their actions or interactions.**",
+    "3. **Difficulty:** Follow the difficulty instruction given with the player's action for how to handle unreasonable or unlikely actions.",
+    "4. **Player Guidance:** If the turn instructions say the player might be stuck, subtly weave a hint toward the 'Current Objective/Focus' into the narrative or the available actions. Make it feel natural.",
+    "5. **Detailed State Changes:** Clearly outline ALL relevant changes to the general game state resulting from the action. Be thorough and specific. Examples of state keys to update if relevant:",
+    "   - `location`: (string) The player's new location. **This is mandatory.**",
+    "   - `inventory_changes`: (object, optional) e.g., `{\"items_added\": [{\"name\": \"key\", \"description\": \"A small brass key\"}], \"items_removed\": [\"ration\"]}`. Include item descriptions if new.",
+    "   - `npc_status`: (object, optional) For EACH NPC affected or present: `{\"NPC Name\": {\"status\": \"hostile\"/\"friendly\"/\"neutral\"/\"unconscious\"/\"gone\", \"location\": \"current_location_if_moved_or_still_present\", \"relationship_to_player_X\": \"allied\"/\"suspicious\"}}`. Update status, location if they move, and relationships if they change.",
+    "   - `world_object_states`: (object, optional) e.g., `{\"lever_A\": \"pulled\", \"ancient_door\": \"sealed\", \"computer_terminal\": {\"status\": \"online\", \"accessed_files\": [\"log_001\"]}}`.",
+    "   - `environmental_conditions`: (object, optional) e.g., `{\"weather\": \"stormy\", \"time_of_day\": \"night\", \"light_level\": \"dim\"}`.",
+    "   - `player_character_status`: (object, optional) e.g., `{\"Player1_ID\": {\"condition\": \"injured\", \"mana\": 50}, \"Player2_ID\": {\"carrying_npc_id\": \"npc_elara\"}}`.",
+    "   - **Critical Event Flags for Conclusion:** Review the 'Conclusion Conditions' list provided in the Game Context. If the player's *single, current action directly results* in satisfying one of these conditions (e.g., the narrative describes a successful escape and a condition is `{'type': 'state_key_equals', 'key': 'escaped', 'value': true}`), YOU MUST include the corresponding key and value (e.g., `'escaped': true`) in your `state_changes` object. This is essential for the game to recognize the conclusion.",
+    "   If an action is denied or has no significant effect, state changes might be minimal (e.g., only location if it didn't change, or an empty object for other categories).",
+    "6. **Available Actions:** List relevant actions the player can take *after* this event, reflecting the new situation. These should be logical next steps based on the narrative and updated state.",
+    "---",
+    "Your response MUST be a JSON object containing three keys:",
+    "1. 'content': A string describing the narrative outcome of the action.",
+    "2. 'state_changes': A JSON object detailing ALL relevant general game state variables after the action. **Crucially, this object MUST ALWAYS include the 'location' key.** Do NOT include `achieved_plot_point_id`. Example: `{'location': 'Cave Entrance', 'inventory_changes': {'items_added': [{'name':'torch', 'description':'A lit torch'}]}, 'npc_status': {'Goblin Sentry': {'status':'unconscious', 'location':'Cave Entrance'}}, 'world_object_states': {'trap_A':'disarmed'}, 'bomb_disabled': true}`.",
+    "3. 'available_actions': A JSON list of strings representing the actions the player can take next (e.g., `['Look around', 'Check inventory', 'Go north']`).",
+])
+
+DIFFICULTY_INSTRUCTIONS = {
+    "easy": "**Difficulty - Easy:** The game master should be very forgiving. If the player's action is unreasonable or unlikely to succeed, gently guide them back or allow for a partial success / humorous outcome. Avoid harsh failures.",
+    "normal": "**Difficulty - Normal:** If the player's action is unreasonable or unlikely to succeed, the game master should respond realistically. This might mean the action fails, has unintended consequences, or NPCs react appropriately to the absurdity. Provide a clear outcome.",
+    "hard": "**Difficulty - Hard:** If the player's action is unreasonable or unlikely to succeed, the game master should be strict. The action should likely fail, potentially with negative consequences. NPCs should react strongly to foolish actions. Maintain a challenging environment."
+}
+
+
+def build_response_messages(context: str, player_action: str, is_stuck: bool = False, next_required_plot_point: Optional[str] = None, current_difficulty: Optional[str] = None) -> List[Dict[str, str]]:
     """
-    Generates a prompt for the AI to respond to a player's action, given the game context.
+    Generates the Stage 1 chat messages for a player's action, given the game context.
+
+    The messages are ordered from most to least stable so provider-side prompt prefix
+    caching can reuse as much of the prompt as possible:
+        1. system: the static Game Master instructions (identical for every call),
+        2. system: the campaign section of the context (identical for every turn of a campaign),
+        3. user:   the volatile tail (current state, difficulty, hint, player action).
 
     Args:
-        context: A string containing the relevant game context (campaign info, current state, current objective).
+        context: The context string from build_context (campaign section plus current state).
         player_action: The action taken by the player as a string.
         is_stuck: Boolean indicating if the player might be stuck.
         next_required_plot_point: Optional string describing the next required plot point (used for hints).
+        current_difficulty: The game's difficulty ('easy', 'normal' or 'hard').
 
     Returns:
-        A string containing the formatted prompt for the AI.
+        A list of chat message dicts ({"role": ..., "content": ...}).
     """
-    prompt_lines = [
-        "You are a Game Master for a text-based adventure game. This is Stage 1 of a multi-stage response generation.",
-        "Your primary task is to: ",
-        "  a) Generate a compelling narrative description of the direct and immediate result of the player's stated action. Detail what happens in this single moment or step.",
-        "  b) Provide a comprehensive and DETAILED update to the general game state based on the action's outcome. This includes player location, inventory changes, NPC presence/status/relationships, and the state of relevant world objects or environmental conditions.",
-        "Focus your response on what transpires in *this specific turn*. Do not narrate subsequent actions the player characters might take, or events that would logically follow *after* the immediate outcome, unless they are an unavoidable and instantaneous consequence.",
-        "The narrative should pause, awaiting the next player input. After describing the outcome, ensure your 'available_actions' present clear choices for the player to drive the story forward.",
-        "**IMPORTANT: Refer to players by their names as listed in the 'Players Present' section of the context.**",
-        "DO NOT attempt to determine if a plot point has been completed. That will be handled by a separate process. Your focus is SOLELY on narrative and detailed general state updates.",
-        "---",
-        "Consider the following aspects while generating the response:",
-        "1. **Narrative Consistency & Logic:** Ensure the response is consistent with the overall game state (location, inventory, character status, completed plot points, players present). Deny actions that are illogical (e.g., using an item not possessed). If an action attempts to bypass or ignore a clear objective from the 'Current Objective/Focus' without strong narrative justification, your response should explain *why* it's difficult or impossible at this time. Maintain narrative consistency with any defined plot points from the game context.",
-        "2. **Narrative Description:** Provide a vivid and engaging description of the outcome. **Use the players' names when describing their actions or interactions.**",
-    ]
+    campaign_context, turn_context = split_context(context)
 
-    # Add difficulty-based instructions for handling unreasonable actions
     if current_difficulty:
-        difficulty_instructions = {
-            "easy": "3. **Difficulty - Easy:** The game master should be very forgiving. If the player's action is unreasonable or unlikely to succeed, gently guide them back or allow for a partial success / humorous outcome. Avoid harsh failures.",
-            "normal": "3. **Difficulty - Normal:** If the player's action is unreasonable or unlikely to succeed, the game master should respond realistically. This might mean the action fails, has unintended consequences, or NPCs react appropriately to the absurdity. Provide a clear outcome.",
-            "hard": "3. **Difficulty - Hard:** If the player's action is unreasonable or unlikely to succeed, the game master should be strict. The action should likely fail, potentially with negative consequences. NPCs should react strongly to foolish actions. Maintain a challenging environment."
-        }
-        # Default to Normal if difficulty is not recognized, or handle as an error/log
-        instruction = difficulty_instructions.get(current_difficulty.lower(), difficulty_instructions["normal"])
-        prompt_lines.append(instruction)
+        # Default to Normal if difficulty is not recognized
+        difficulty_instruction = DIFFICULTY_INSTRUCTIONS.get(current_difficulty.lower(), DIFFICULTY_INSTRUCTIONS["normal"])
     else:
         # Default behavior if no difficulty is passed (should ideally always be passed)
-        prompt_lines.append("3. **Difficulty - Normal (Default):** If the player's action is unreasonable or unlikely to succeed, the game master should respond realistically. This might mean the action fails, has unintended consequences, or NPCs react appropriately to the absurdity. Provide a clear outcome.")
+        difficulty_instruction = DIFFICULTY_INSTRUCTIONS["normal"].replace("Normal:", "Normal (Default):", 1)
 
-
-    if is_stuck and next_required_plot_point: # This part can remain as it influences narrative
-        prompt_lines.append(f"4. **Player Guidance (Subtle Hint):** The player might be stuck. If so, subtly weave a hint related to the 'Current Objective/Focus' ('{next_required_plot_point}') into your narrative description or suggest a relevant action. Make it feel natural.")
-    
-    prompt_lines.extend([
-        "5. **Detailed State Changes:** Clearly outline ALL relevant changes to the general game state resulting from the action. Be thorough and specific. Examples of state keys to update if relevant:",
-        "   - `location`: (string) The player's new location. **This is mandatory.**",
-        "   - `inventory_changes`: (object, optional) e.g., `{\"items_added\": [{\"name\": \"key\", \"description\": \"A small brass key\"}], \"items_removed\": [\"ration\"]}`. Include item descriptions if new.",
-        "   - `npc_status`: (object, optional) For EACH NPC affected or present: `{\"NPC Name\": {\"status\": \"hostile\"/\"friendly\"/\"neutral\"/\"unconscious\"/\"gone\", \"location\": \"current_location_if_moved_or_still_present\", \"relationship_to_player_X\": \"allied\"/\"suspicious\"}}`. Update status, location if they move, and relationships if they change.",
-        "   - `world_object_states`: (object, optional) e.g., `{\"lever_A\": \"pulled\", \"ancient_door\": \"sealed\", \"computer_terminal\": {\"status\": \"online\", \"accessed_files\": [\"log_001\"]}}`.",
-        "   - `environmental_conditions`: (object, optional) e.g., `{\"weather\": \"stormy\", \"time_of_day\": \"night\", \"light_level\": \"dim\"}`.",
-        "   - `player_character_status`: (object, optional) e.g., `{\"Player1_ID\": {\"condition\": \"injured\", \"mana\": 50}, \"Player2_ID\": {\"carrying_npc_id\": \"npc_elara\"}}`.",
-        "   - **Critical Event Flags for Conclusion:** Review the 'Conclusion Conditions' list provided in the Game Context. If the player's *single, current action directly results* in satisfying one of these conditions (e.g., the narrative describes a successful escape and a condition is `{'type': 'state_key_equals', 'key': 'escaped', 'value': true}`), YOU MUST include the corresponding key and value (e.g., `'escaped': true`) in your `state_changes` object. This is essential for the game to recognize the conclusion.",
-        "   If an action is denied or has no significant effect, state changes might be minimal (e.g., only location if it didn't change, or an empty object for other categories).",
-        "6. **Available Actions:** List relevant actions the player can take *after* this event, reflecting the new situation. These should be logical next steps based on the narrative and updated state.",
-        "---",
-        "Your response MUST be a JSON object containing three keys:",
-        "1. 'content': A string describing the narrative outcome of the action.",
-        "2. 'state_changes': A JSON object detailing ALL relevant general game state variables after the action. **Crucially, this object MUST ALWAYS include the 'location' key.** Do NOT include `achieved_plot_point_id`. Example: `{'location': 'Cave Entrance', 'inventory_changes': {'items_added': [{'name':'torch', 'description':'A lit torch'}]}, 'npc_status': {'Goblin Sentry': {'status':'unconscious', 'location':'Cave Entrance'}}, 'world_object_states': {'trap_A':'disarmed'}, 'bomb_disabled': true}`.",
-        "3. 'available_actions': A JSON list of strings representing the actions the player can take next (e.g., `['Look around', 'Check inventory', 'Go north']`).",
+    turn_lines = [
+        "Game Context (current state):",
+        turn_context,
         "---",
-        "Game Context:",
-        context, # Insert the pre-built context string
+        "Turn instructions:",
+        f"- {difficulty_instruction}",
+    ]
+    if is_stuck and next_required_plot_point:
+        turn_lines.append(f"- **Player Guidance (Subtle Hint):** The player might be stuck. If so, subtly weave a hint related to the 'Current Objective/Focus' ('{next_required_plot_point}') into your narrative description or suggest a relevant action. Make it feel natural.")
+    turn_lines.extend([
         "---",
         f"Player Action: {player_action}",
         "---",
         "Generate the JSON response now:"
     ])
 
-    return "\n".join(prompt_lines)
+    messages = [{"role": "system", "content": RESPONSE_SYSTEM_PROMPT}]
+    if campaign_context:
+        messages.append({"role": "system", "content": f"Game Context (campaign):\n{campaign_context}"})
+    messages.append({"role": "user", "content": "\n".join(turn_lines)})
+    return messages
+
+
+_PLOT_CHECK_CRITERIA = [
+    "CRITERIA FOR COMPLETION (General Guidelines - adapt to the specific plot point description):",
+    "  - **Location-based:** Is the player (or relevant entity) at the specified location AND has any other condition tied to that location in the plot point description been met? (e.g., 'Reach the Control Room and activate the console'). The `current_game_state_data.location` is key.",
+    "  - **Item-based (Acquisition/Usage):** Has the player acquired the necessary item, or used it in the manner described? Check `current_game_state_data.inventory_changes` or other relevant state keys for item presence/usage.",
+    "  - **NPC Interaction:** Has the specified interaction with an NPC occurred as described (e.g., 'Convince Guard Captain to help', 'Defeat the Goblin Sentry')? Look for changes in `current_game_state_data.npc_status` or narrative confirmation.",
+    "  - **State Change:** Does the `current_game_state_data` reflect a specific condition mentioned in the plot point (e.g., 'Disable the security system' might be `current_game_state_data.security_system_status: \"disabled\"`)?",
+    "  - **Action-based:** Did the player's action *directly and unambiguously* fulfill the plot point's requirement as described in the narrative and reflected in state changes?",
+    "  - **Information Gathering:** Has the player obtained the specific piece of information mentioned in the plot point? This might be reflected in the narrative or a specific state variable.",
+    "---",
+    "Evaluate completion **directly and unambiguously** for **THIS TURN** based on the player's action, the narrative result, AND, most importantly, the **Full Current Game State Data**, which is the primary source of truth. The narrative should align with state changes.",
+    "Do not infer completion if the state data does not support it, even if the narrative is suggestive. The state data is paramount.",
+]
+
+# Static instructions for Stage 3 checks; the per-turn objective and context follow in the user message
+PLOT_CHECK_SYSTEM_PROMPT = "\n".join([
+    "You are an analytical AI assistant evaluating game events with high precision.",
+    "Your task is to determine if a specific, single game objective (an atomic plot point) has been completed based on the provided information. Scrutinize all provided context.",
+    "---",
+    *_PLOT_CHECK_CRITERIA,
+    "---",
+    "Your response MUST be a single, valid JSON object with NO additional text before or after it. The JSON object must contain exactly these three keys:",
+    "1. `plot_point_id`: The string ID of the plot point you evaluated (exactly as given).",
+    "2. `completed`: A boolean value (`true` or `false`). Set to `true` ONLY if all conditions of the plot point description are met according to the provided context, especially the game state data.",
+    "3. `confidence_score`: A floating-point number between 0.0 (no confidence) and 1.0 (absolute confidence) representing your certainty in the `completed` status. Be conservative with high confidence unless completion is undeniable from the state and narrative.",
+    "---",
+    "Example of a valid JSON response (DO NOT include this example in your actual response):",
+    "{\"plot_point_id\": \"pp_example_001\", \"completed\": true, \"confidence_score\": 0.85}",
+])
+
+BATCH_PLOT_CHECK_SYSTEM_PROMPT = "\n".join([
+    "You are an analytical AI assistant evaluating game events with high precision.",
+    "Your task is to determine, independently for each listed game objective (atomic plot point), whether it has been completed based on the provided information. Scrutinize all provided context.",
+    "---",
+    *_PLOT_CHECK_CRITERIA,
+    "Evaluate each plot point on its own. The completion of one plot point says nothing about the others.",
+    "---",
+    "Your response MUST be a single, valid JSON object with NO additional text before or after it. The JSON object must contain exactly one key, `results`, whose value is a list with one entry per listed plot point. Each entry must contain exactly these three keys:",
+    "1. `plot_point_id`: The string ID of the plot point evaluated (exactly as given).",
+    "2. `completed`: A boolean value (`true` or `false`). Set to `true` ONLY if all conditions of the plot point description are met according to the provided context, especially the game state data.",
+    "3. `confidence_score`: A floating-point number between 0.0 (no confidence) and 1.0 (absolute confidence) representing your certainty in the `completed` status. Be conservative with high confidence unless completion is undeniable from the state and narrative.",
+    "---",
+    "Example of a valid JSON response (DO NOT include this example in your actual response):",
+    "{\"results\": [{\"plot_point_id\": \"pp_example_001\", \"completed\": true, \"confidence_score\": 0.85}, {\"plot_point_id\": \"pp_example_002\", \"completed\": false, \"confidence_score\": 0.9}]}",
+])
+
+
+def _plot_check_context_lines(current_game_state_data: Dict[str, Any], player_action: str, stage_one_narrative: str) -> List[str]:
+    """The per-turn evaluation context shared by the single and batched plot check prompts."""
+    return [
+        "CONTEXT FOR EVALUATION:",
+        f"  1. Player's Action This Turn: \"{player_action}\"",
+        f"  2. Narrative Result of Action (from Stage 1 AI): \"{stage_one_narrative}\"",
+        "     - Pay close attention to explicit statements in the narrative that confirm or deny the objective's conditions.",
+        "  3. Full Current Game State Data (this reflects changes from the player's action and Stage 1 AI):",
+        f"     {json.dumps(current_game_state_data, indent=2)}",
+    ]
 
 
-def build_plot_completion_check_prompt(
+def build_plot_completion_check_messages(
     plot_point_id: str,
     plot_point_description: str,
     current_game_state_data: Dict[str, Any],
     player_action: str,
     stage_one_narrative: str
-) -> str:
+) -> List[Dict[str, str]]:
     """
-    Builds the prompt for the AI to check if a specific atomic plot point was completed.
-    This is for Stage 3 of the plot point completion strategy.
+    Builds the chat messages for the AI to check if a specific atomic plot point was completed.
+    This is for Stage 3 of the plot point completion strategy. The static instructions form
+    the system message (a cacheable prefix); the objective and turn context form the user message.
 
     Args:
         plot_point_id: The ID of the atomic plot point to check.
@@ -257,48 +336,62 @@ def build_plot_completion_check_prompt(
         stage_one_narrative: The narrative generated by the Stage 1 AI in the current turn.
 
     Returns:
-        A string containing the prompt for the AI.
+        A list of chat message dicts.
     """
     prompt_lines = [
-        "You are an analytical AI assistant evaluating game events with high precision.",
-        "Your task is to determine if a specific, single game objective (an atomic plot point) has been completed based on the provided information. Scrutinize all provided context.",
-        "---",
         "OBJECTIVE TO EVALUATE:",
         f"  Plot Point ID: {plot_point_id}",
         f"  Description: \"{plot_point_description}\"",
         "---",
-        "CRITERIA FOR COMPLETION (General Guidelines - adapt to the specific plot point description):",
-        "  - **Location-based:** Is the player (or relevant entity) at the specified location AND has any other condition tied to that location in the plot point description been met? (e.g., 'Reach the Control Room and activate the console'). The `current_game_state_data.location` is key.",
-        "  - **Item-based (Acquisition/Usage):** Has the player acquired the necessary item, or used it in the manner described? Check `current_game_state_data.inventory_changes` or other relevant state keys for item presence/usage.",
-        "  - **NPC Interaction:** Has the specified interaction with an NPC occurred as described (e.g., 'Convince Guard Captain to help', 'Defeat the Goblin Sentry')? Look for changes in `current_game_state_data.npc_status` or narrative confirmation.",
-        "  - **State Change:** Does the `current_game_state_data` reflect a specific condition mentioned in the plot point (e.g., 'Disable the security system' might be `current_game_state_data.security_system_status: \"disabled\"`)?",
-        "  - **Action-based:** Did the player's action *directly and unambiguously* fulfill the plot point's requirement as described in the narrative and reflected in state changes?",
-        "  - **Information Gathering:** Has the player obtained the specific piece of information mentioned in the plot point? This might be reflected in the narrative or a specific state variable.",
+        *_plot_check_context_lines(current_game_state_data, player_action, stage_one_narrative),
         "---",
-        "CONTEXT FOR EVALUATION:",
-        f"  1. Player's Action This Turn: \"{player_action}\"",
-        f"  2. Narrative Result of Action (from Stage 1 AI): \"{stage_one_narrative}\"",
-        "     - Pay close attention to explicit statements in the narrative that confirm or deny the objective's conditions.",
-        "  3. Full Current Game State Data (this reflects changes from the player's action and Stage 1 AI):",
-        f"     {json.dumps(current_game_state_data, indent=2)}",
-        "     - This is the **primary source of truth** for objective conditions. The narrative should align with state changes.",
-        "---",
-        "INSTRUCTION:",
-        f"Carefully consider the objective for plot point \"{plot_point_id}\" (Description: \"{plot_point_description}\").",
-        "Evaluate if this specific atomic plot point was **directly and unambiguously** completed **THIS TURN** based on the player's action, the narrative result, AND, most importantly, the **Full Current Game State Data**.",
-        "Do not infer completion if the state data does not support it, even if the narrative is suggestive. The state data is paramount.",
-        "---",
-        "Your response MUST be a single, valid JSON object with NO additional text before or after it. The JSON object must contain exactly these three keys:",
-        "1. `plot_point_id`: The string ID of the plot point you evaluated (which MUST be \"{plot_point_id}\").",
-        "2. `completed`: A boolean value (`true` or `false`). Set to `true` ONLY if all conditions of the plot point description are met according to the provided context, especially the game state data.",
-        "3. `confidence_score`: A floating-point number between 0.0 (no confidence) and 1.0 (absolute confidence) representing your certainty in the `completed` status. Be conservative with high confidence unless completion is undeniable from the state and narrative.",
+        f"Generate the JSON response now for plot point \"{plot_point_id}\":"
+    ]
+    return [
+        {"role": "system", "content": PLOT_CHECK_SYSTEM_PROMPT},
+        {"role": "user", "content": "\n".join(prompt_lines)}
+    ]
+
+
+def build_batch_plot_completion_check_messages(
+    plot_points: List[Dict[str, Any]],
+    current_game_state_data: Dict[str, Any],
+    player_action: str,
+    stage_one_narrative: str
+) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for the AI to check several atomic plot points in a single request.
+    Batched variant of build_plot_completion_check_messages for Stage 3: the game state,
+    action and narrative are sent once instead of once per plot point.
+
+    Args:
+        plot_points: The candidate plot point dicts (each with 'id' and 'description').
+        current_game_state_data: The full current GameState.state_data dictionary.
+        player_action: The player's original action from the current turn.
+        stage_one_narrative: The narrative generated by the Stage 1 AI in the current turn.
+
+    Returns:
+        A list of chat message dicts.
+    """
+    objective_lines = []
+    for pp in plot_points:
+        objective_lines.append(f"  - Plot Point ID: {pp.get('id')}")
+        objective_lines.append(f"    Description: \"{pp.get('description')}\"")
+    plot_point_ids = [pp.get('id') for pp in plot_points]
+
+    prompt_lines = [
+        f"OBJECTIVES TO EVALUATE ({len(plot_points)}):",
+        *objective_lines,
         "---",
-        "Example of a valid JSON response (DO NOT include this example in your actual response):",
-        "{\"plot_point_id\": \"pp_example_001\", \"completed\": true, \"confidence_score\": 0.85}",
+        *_plot_check_context_lines(current_game_state_data, player_action, stage_one_narrative),
         "---",
-        "Generate the JSON response now for plot point \"{plot_point_id}\":"
+        "Valid `plot_point_id` values: " + ", ".join(f'\"{pp_id}\"' for pp_id in plot_point_ids) + ".",
+        f"Generate the JSON response now for all {len(plot_points)} plot points:"
+    ]
+    return [
+        {"role": "system", "content": BATCH_PLOT_CHECK_SYSTEM_PROMPT},
+        {"role": "user", "content": "\n".join(prompt_lines)}
     ]
-    return "\n".join(prompt_lines)
 
 
 def build_character_name_prompt(description: str) -> str:
@@ -321,25 +414,38 @@ Generated Name:"""
     return prompt.strip()
 
 
-def build_hint_prompt(context: str, campaign_objective: Optional[str] = None, next_required_plot_point_desc: Optional[str] = None) -> str:
+HINT_SYSTEM_PROMPT = "\n".join([
+    "You are a helpful Game Master for a text-based adventure game.",
+    "A player has asked for a hint. Your goal is to provide a subtle, non-spoilery clue to help them progress.",
+    "Consider the provided game context, the overall campaign objective, and especially the next immediate required plot point.",
+    "---",
+    "YOUR TASK:",
+    "Based on all the information provided, provide one concise, subtle hint to guide the player. The hint should encourage exploration or thought related to their current situation or next objective.",
+    "Do NOT give away direct solutions or spoil upcoming events.",
+    "Output ONLY the hint text itself, as a single string. No extra labels, no JSON.",
+])
+
+
+def build_hint_messages(context: str, campaign_objective: Optional[str] = None, next_required_plot_point_desc: Optional[str] = None) -> List[Dict[str, str]]:
     """
-    Builds a prompt for the AI to generate a game hint.
+    Builds the chat messages for the AI to generate a game hint.
+
+    Uses the same stable-prefix layout as build_response_messages: static instructions,
+    then the campaign section of the context, then the current state and goals.
 
     Args:
-        context: The current game context string (includes recent log, current location, etc.).
+        context: The current game context string from build_context.
         campaign_objective: The overall campaign objective.
         next_required_plot_point_desc: The description of the next immediate required plot point.
 
     Returns:
-        A string containing the prompt for the AI.
+        A list of chat message dicts.
     """
+    campaign_context, turn_context = split_context(context)
+
     prompt_lines = [
-        "You are a helpful Game Master for a text-based adventure game.",
-        "A player has asked for a hint. Your goal is to provide a subtle, non-spoilery clue to help them progress.",
-        "Consider the provided game context, the overall campaign objective, and especially the next immediate required plot point.",
-        "---",
-        "GAME CONTEXT:",
-        context,
+        "GAME CONTEXT (current state):",
+        turn_context,
         "---"
     ]
 
@@ -350,15 +456,15 @@ def build_hint_prompt(context: str, campaign_objective: Optional[str] = None, ne
         prompt_lines.append(f"Next Immediate Goal/Plot Point: {next_required_plot_point_desc}")
     
     prompt_lines.extend([
-        "---",
-        "YOUR TASK:",
-        "Based on all the information above, provide one concise, subtle hint to guide the player. The hint should encourage exploration or thought related to their current situation or next objective.",
-        "Do NOT give away direct solutions or spoil upcoming events.",
-        "Output ONLY the hint text itself, as a single string. No extra labels, no JSON.",
         "---",
         "Hint:"
     ])
-    return "\n".join(prompt_lines)
+
+    messages = [{"role": "system", "content": HINT_SYSTEM_PROMPT}]
+    if campaign_context:
+        messages.append({"role": "system", "content": f"GAME CONTEXT (campaign):\n{campaign_context}"})
+    messages.append({"role": "user", "content": "\n".join(prompt_lines)})
+    return messages
 
 
 def build_summary_prompt(player_action: str, stage_one_narrative: str, state_changes: Dict[str, Any]) -> str:
@@ -399,3 +505,8 @@ def build_summary_prompt(player_action: str, stage_one_narrative: str, state_cha
         "CONCISE SUMMARY SENTENCE:"
     ])
     return "\n".join(prompt_lines)
+
+
+def format_messages_for_log(messages: List[Dict[str, str]]) -> str:
+    """Renders a chat message list as readable text for debug logging."""
+    return "\n".join(f"[{message.get('role')}]\n{message.get('content')}" for message in messages)
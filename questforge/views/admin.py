@@ -1,13 +1,16 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, Response
 from flask_login import login_required, current_user
 import os
 import json
+import hmac
 from datetime import datetime
 from sqlalchemy.orm import joinedload
 from questforge.models.game import Game, GamePlayer # Correctly import GamePlayer
 from questforge.models.campaign import Campaign
 from questforge.models.game_state import GameState
 from questforge.models.user import User # Needed for import validation
+from questforge.services.game_log_service import game_log_service
+from questforge.utils import metrics
 from questforge.extensions import db
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -99,7 +102,7 @@ def admin_index():
                         'player_decisions': latest_state.player_decisions,
                         'current_branch': latest_state.current_branch,
                         'campaign_complete': latest_state.campaign_complete,
-                        'game_log': latest_state.game_log,
+                        'game_log': game_log_service.get_log(game.id, game_state=latest_state),
                         'available_actions': latest_state.available_actions,
                         'visited_locations': latest_state.visited_locations,
                         'created_at': latest_state.created_at.isoformat() if latest_state.created_at else None,
@@ -202,12 +205,12 @@ def admin_index():
                     new_gs.player_decisions=gs_data.get('player_decisions', [])
                     new_gs.current_branch=gs_data.get('current_branch', 'main')
                     new_gs.campaign_complete=gs_data.get('campaign_complete', False)
-                    new_gs.game_log=gs_data.get('game_log', [])
                     new_gs.available_actions=gs_data.get('available_actions', [])
                     new_gs.visited_locations=gs_data.get('visited_locations', [])
                     # Timestamps are handled by DB defaults/onupdate
 
                     db.session.add(new_gs)
+                    game_log_service.append_entries(new_gs, gs_data.get('game_log', []))
 
                 db.session.commit()
                 flash(f'Game "{new_game_name}" created successfully from seed.', 'success')
@@ -217,3 +220,20 @@ def admin_index():
             return redirect(url_for('admin.admin_index'))
 
     return render_template('admin/admin.html', seed_files=seed_files)
+
+
+def _metrics_authorized():
+    """A scraper presenting METRICS_TOKEN as a bearer token, or a logged-in user listed in ADMIN_USERNAMES."""
+    token = current_app.config.get('METRICS_TOKEN')
+    auth_header = request.headers.get('Authorization', '')
+    if token and auth_header.startswith('Bearer ') and hmac.compare_digest(auth_header[len('Bearer '):], token):
+        return True
+    admin_usernames = current_app.config.get('ADMIN_USERNAMES') or []
+    return current_user.is_authenticated and current_user.username in admin_usernames
+
+@admin_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text-format metrics for this process (admin only)."""
+    if not _metrics_authorized():
+        abort(403)
+    return Response(metrics.registry.render(), mimetype='text/plain', headers={'Content-Type': metrics.CONTENT_TYPE})
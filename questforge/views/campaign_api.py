@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify, url_for, redirect, current_app
 from flask_login import login_required, current_user
 from ..models.template import Template
 from ..models.game import Game, GamePlayer # Import GamePlayer
+from ..models.campaign import Campaign
 from ..extensions import db
+from ..utils.context_manager import invalidate_campaign_context
 
 # ==============================================================================
 # Campaign API Blueprint (`/api`)
@@ -83,8 +85,11 @@ def update_campaign(campaign_id):
         campaign.description = data['description']
     if 'content' in data:
         campaign.content = data['content']
-        
+
+    # Bump the content version so every process rebuilds its cached campaign context block
+    campaign.version = (campaign.version or 1) + 1
     db.session.commit()
+    invalidate_campaign_context(campaign.id)
     return jsonify({'message': 'Campaign updated successfully'})
 
 @campaign_api_bp.route('/games/create', methods=['POST']) # Corrected route relative to blueprint prefix
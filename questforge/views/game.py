@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, abort, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, abort, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from ..models.game import Game, GamePlayer
 from ..models.game_state import GameState # Added GameState import
@@ -6,11 +6,15 @@ from ..models.campaign import Campaign
 from ..models.template import Template
 from ..models.user import User
 from ..models.api_usage_log import ApiUsageLog
+from ..services.game_log_service import game_log_service, DEFAULT_PAGE_SIZE
 from ..extensions import db, socketio
 from .forms import GameForm
 from flask_wtf import FlaskForm # Import FlaskForm
-from sqlalchemy import func # Import func for sum aggregation
 from decimal import Decimal # Import Decimal
+from datetime import datetime
+import json
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload, selectinload
 # Removed unused ai_service import
 import traceback # Import traceback
 
@@ -30,6 +34,13 @@ import traceback # Import traceback
 # ==============================================================================
 game_bp = Blueprint('game', __name__, url_prefix='/game')
 
+# Games per page of the game list
+GAME_LIST_PAGE_SIZE = 25
+# Statuses offered by the game list filter
+GAME_STATUSES = ['active', 'in_progress', 'completed']
+# Largest page the history API returns
+HISTORY_API_MAX_LIMIT = 500
+
 @game_bp.route('/<int:game_id>/lobby')
 @login_required
 def lobby(game_id):
@@ -86,9 +97,8 @@ def play(game_id): # Renamed from play_game to play for consistency
     # Retrieve the current game state (latest one)
     game_state = game.game_states[-1] if game.game_states else None
 
-    # Calculate total cost for the current game
-    total_cost_query = db.session.query(func.sum(ApiUsageLog.cost)).filter(ApiUsageLog.game_id == game_id).scalar()
-    total_cost = total_cost_query if total_cost_query is not None else Decimal('0.0')
+    # Total cost for the current game (maintained rollup on Game)
+    total_cost = game.total_cost if game.total_cost is not None else Decimal('0.0')
 
     # Get the AI model from config
     ai_model = current_app.config.get('OPENAI_MODEL_LOGIC', 'Not Configured') # Changed to OPENAI_MODEL_LOGIC
@@ -114,19 +124,65 @@ def play(game_id): # Renamed from play_game to play for consistency
                            ai_model=ai_model,
                            user_id=current_user.id,
                            game_state=game_state,
-                           game_log=game_state.game_log if game_state else [],
                            total_cost=total_cost,
                            player_details=player_details) # Pass updated player details map
 
+def _latest_game_state(game_id):
+    """The game's latest GameState, fetched on its own (not by loading every row of game.game_states)."""
+    return GameState.query.filter_by(game_id=game_id).order_by(GameState.created_at.desc()).first()
+
+def _format_log_entry(entry):
+    """One transcript line for a log entry (as shown on the history page)."""
+    if not isinstance(entry, dict):
+        return str(entry)
+    labels = {'player': 'Player', 'ai': 'AI'}
+    label = labels.get(entry.get('type'), 'System')
+    timestamp = entry.get('timestamp')
+    prefix = f"[{timestamp}] " if timestamp else ""
+    return f"{prefix}{label}: {entry.get('content', '')}"
+
 @game_bp.route('/<int:game_id>/history')
 @login_required
 def history(game_id):
     """Game history view"""
     game = Game.query.get_or_404(game_id)
-    # Fetch the latest GameState for the game
-    game_state = game.game_states[-1] if game.game_states else None
-    game_log = game_state.game_log if game_state and game_state.game_log else []
-    return render_template('game/history.html', game=game, game_log=game_log)
+    game_state = _latest_game_state(game_id)
+    # One page of log rows at a time; ?before=<seq> pages back through older entries
+    before_seq = request.args.get('before', type=int)
+    if game_state:
+        log_page = game_log_service.get_page(game_id, before_seq=before_seq, game_state=game_state)
+    else:
+        log_page = {'entries': [], 'total': 0, 'older_before_seq': None, 'newer_before_seq': None, 'next_after_seq': None}
+    return render_template('game/history.html', game=game, log_page=log_page)
+
+@game_bp.route('/<int:game_id>/history/export')
+@login_required
+def export_history(game_id):
+    """
+    Streams the full transcript as a download, reading the log in batches.
+
+    Query parameters:
+        format: 'txt' (default, one readable line per entry) or 'jsonl' (one JSON object per entry)
+    """
+    game = Game.query.get_or_404(game_id)
+    game_state = _latest_game_state(game_id)
+    export_format = request.args.get('format', 'txt')
+    if export_format not in ('txt', 'jsonl'):
+        abort(400)
+
+    def generate():
+        if not game_state:
+            return
+        for seq, entry in game_log_service.iter_entries(game_id, game_state=game_state):
+            if export_format == 'jsonl':
+                yield json.dumps({'seq': seq, 'entry': entry}, default=str) + '\n'
+            else:
+                yield _format_log_entry(entry) + '\n'
+
+    mimetype = 'application/x-ndjson' if export_format == 'jsonl' else 'text/plain'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="game_{game.id}_transcript.{export_format}"'
+    return response
 
 @game_bp.route('/create')
 @login_required
@@ -136,23 +192,82 @@ def create_game_view():
     templates = Template.query.order_by(Template.name).all() # Fetch templates for the dropdown
     return render_template('game/create.html', templates=templates, form=form) 
 
+def _encode_game_cursor(game):
+    """Keyset cursor for the game list: '<created_at ISO>|<id>' of the boundary game."""
+    return f"{game.created_at.isoformat()}|{game.id}"
+
+def _decode_game_cursor(cursor):
+    """Returns (created_at, id) for a cursor from _encode_game_cursor, or None if it is missing/invalid."""
+    if not cursor:
+        return None
+    try:
+        created_at, game_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(game_id)
+    except (ValueError, TypeError):
+        return None
+
 @game_bp.route('/list')
 @login_required
 def list_games():
-    """Lists all games."""
-    # Query for all games, ordered by creation date
-    all_games = Game.query.order_by(Game.created_at.desc()).all()
-    
-    # Calculate total cost for each game
-    game_costs = {}
-    for game in all_games:
-        total_cost_query = db.session.query(func.sum(ApiUsageLog.cost)).filter(ApiUsageLog.game_id == game.id).scalar()
-        total_cost = total_cost_query if total_cost_query is not None else Decimal('0.0')
-        game_costs[game.id] = total_cost
-    
+    """
+    Lists games, newest first, one page at a time.
+
+    Uses keyset pagination on (created_at, id) instead of OFFSET, so every page is an
+    index range read no matter how many games exist. Query parameters:
+        before / after: cursor of the last / first game of the current page (older / newer page)
+        status: only games with this status
+        q: name contains this text
+        mine: '1' to only list games created by the current user
+    """
+    status_filter = request.args.get('status') or None
+    search = (request.args.get('q') or '').strip()
+    mine = request.args.get('mine') == '1'
+    before = _decode_game_cursor(request.args.get('before'))
+    after = None if before else _decode_game_cursor(request.args.get('after'))
+
+    query = Game.query.options(
+        joinedload(Game.creator),
+        joinedload(Game.template),
+        selectinload(Game.player_associations) # Player counts without a query per game
+    )
+    if status_filter:
+        query = query.filter(Game.status == status_filter)
+    if search:
+        query = query.filter(Game.name.ilike(f"%{search}%"))
+    if mine:
+        query = query.filter(Game.created_by == current_user.id)
+
+    if after:
+        # Newer page: walk forwards from the cursor, then show it newest first like every page
+        created_at, game_id = after
+        query = query.filter(or_(Game.created_at > created_at, and_(Game.created_at == created_at, Game.id > game_id)))
+        games = query.order_by(Game.created_at.asc(), Game.id.asc()).limit(GAME_LIST_PAGE_SIZE + 1).all()
+        has_more_newer = len(games) > GAME_LIST_PAGE_SIZE
+        games = list(reversed(games[:GAME_LIST_PAGE_SIZE]))
+        has_more_older = True
+    else:
+        if before:
+            created_at, game_id = before
+            query = query.filter(or_(Game.created_at < created_at, and_(Game.created_at == created_at, Game.id < game_id)))
+        games = query.order_by(Game.created_at.desc(), Game.id.desc()).limit(GAME_LIST_PAGE_SIZE + 1).all()
+        has_more_older = len(games) > GAME_LIST_PAGE_SIZE
+        games = games[:GAME_LIST_PAGE_SIZE]
+        has_more_newer = before is not None
+
+    # Total cost for each game, read from the maintained rollup column (no per-game SUM query)
+    game_costs = {game.id: game.total_cost if game.total_cost is not None else Decimal('0.0') for game in games}
+
+    filters = {key: value for key, value in (('status', status_filter), ('q', search), ('mine', '1' if mine else None)) if value}
+    pagination = {
+        'older_cursor': _encode_game_cursor(games[-1]) if games and has_more_older else None,
+        'newer_cursor': _encode_game_cursor(games[0]) if games and has_more_newer else None,
+        'filters': filters
+    }
+
     form = FlaskForm() # Create a generic form instance for CSRF token
 
-    return render_template('game/list.html', games=all_games, game_costs=game_costs, form=form)
+    return render_template('game/list.html', games=games, game_costs=game_costs, form=form,
+                           pagination=pagination, statuses=GAME_STATUSES)
 
 @game_bp.route('/<int:game_id>/delete', methods=['POST'])
 @login_required
@@ -234,6 +349,33 @@ def get_game_state(game_id):
         'data': latest_state.to_dict() if latest_state else None # Adapt GameState model if needed
     })
 
+@game_bp.route('/api/<int:game_id>/history', methods=['GET'])
+@login_required
+def get_game_history(game_id):
+    """
+    API: One page of the game log.
+
+    Query parameters:
+        before: return the entries before this seq (default: the newest page)
+        after: return the entries from this seq on instead (reading forwards)
+        limit: page size (default 100, at most HISTORY_API_MAX_LIMIT)
+    The response carries the cursors for the neighbouring pages (older_before_seq,
+    newer_before_seq, next_after_seq).
+    """
+    Game.query.get_or_404(game_id)
+    game_state = _latest_game_state(game_id)
+    if not game_state:
+        return jsonify({'status': 'error', 'message': 'Game has no state yet'}), 404
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), HISTORY_API_MAX_LIMIT)
+    page = game_log_service.get_page(
+        game_id,
+        before_seq=request.args.get('before', type=int),
+        after_seq=request.args.get('after', type=int),
+        limit=limit,
+        game_state=game_state
+    )
+    return jsonify({'status': 'success', 'data': page})
+
 @game_bp.route('/api/<int:game_id>/state', methods=['POST'])
 @login_required
 def update_game_state(game_id):
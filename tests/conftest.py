@@ -0,0 +1,81 @@
+import os
+
+# Config reads the database URL at import time; the suite runs on an in-memory SQLite database
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('USAGE_FLUSH_INTERVAL_SECONDS', '0') # Write usage rows immediately, no background flusher
+
+import pytest
+
+from questforge import create_app
+from questforge.extensions import db
+from questforge.extensions.socketio import get_socketio
+
+
+@pytest.fixture(scope='session')
+def app():
+    """One application per test session (socket handlers register on the shared SocketIO instance)."""
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture
+def db_session(app):
+    """Fresh tables and empty in-memory caches for each test."""
+    from questforge.services import game_state_service as game_state_module
+    from questforge.services.game_state_cache import GameStateCache
+    from questforge.services.state_store import InProcessStateStore
+    from questforge.utils import plot_index
+
+    service = game_state_module.game_state_service
+    service.active_games = GameStateCache(write_back=service._write_back)
+    service.store = InProcessStateStore()
+    plot_index.plot_index_cache = plot_index.PlotIndexCache()
+
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.remove()
+        db.drop_all()
+
+
+PLOT_POINTS = [
+    {'id': 'pp1', 'description': 'Open the sealed gate', 'required': True},
+    {'id': 'pp2', 'description': 'Cross the frozen lake', 'required': True},
+]
+
+
+@pytest.fixture
+def game(db_session):
+    """A started game with one player, its campaign (PLOT_POINTS) and initial GameState."""
+    from questforge.models import Campaign, Game, GamePlayer, GameState, Template, User
+
+    user = User(username='alice', email='alice@example.com', password='secret')
+    db_session.add(user)
+    db_session.flush()
+    template = Template(name='Test Template', description='Template for tests', created_by=user.id,
+                        genre='Fantasy', core_conflict='A gate blocks the way')
+    db_session.add(template)
+    db_session.flush()
+    game = Game(name='Test Game', template_id=template.id, created_by=user.id)
+    db_session.add(game)
+    db_session.flush()
+    db_session.add(GamePlayer(game_id=game.id, user_id=user.id))
+    db_session.add(Campaign(
+        game_id=game.id, template_id=template.id,
+        campaign_data={'title': 'The Gate'}, objectives=['Get through the gate'],
+        conclusion_conditions=[{'type': 'plot_point', 'id': 'pp1'}],
+        key_locations=[{'name': 'Gate'}], key_characters=[{'name': 'Warden'}],
+        major_plot_points=[dict(pp) for pp in PLOT_POINTS], possible_branches=[]
+    ))
+    db_session.add(GameState(game_id=game.id))
+    db_session.commit()
+    return game
+
+
+@pytest.fixture
+def socket_client(app, db_session):
+    client = get_socketio().test_client(app)
+    yield client
+    if client.is_connected():
+        client.disconnect()
@@ -0,0 +1,118 @@
+import threading
+
+from questforge.services.action_queue import GameActionQueue
+
+
+def test_actions_for_one_game_run_in_order():
+    queue = GameActionQueue()
+    first = queue.submit(1, 'alice', 'look')
+    second = queue.submit(1, 'bob', 'listen')
+
+    assert (first['status'], first['position']) == ('queued', 0)
+    assert (second['status'], second['position'], second['depth']) == ('queued', 1, 2)
+    assert queue.wait_for_turn(first['ticket'], timeout=1)
+
+    started = threading.Event()
+
+    def run_second():
+        assert queue.wait_for_turn(second['ticket'], timeout=5)
+        started.set()
+    thread = threading.Thread(target=run_second)
+    thread.start()
+    assert not started.wait(0.1) # Blocked behind the running ticket
+
+    queue.finish(first['ticket'])
+    assert started.wait(5)
+    thread.join()
+    queue.finish(second['ticket'])
+    assert queue.depth(1) == 0
+    assert queue.stats(1)['processed'] == 2
+
+
+def test_other_games_are_not_blocked():
+    queue = GameActionQueue()
+    running = queue.submit(1, 'alice', 'look')['ticket']
+    assert queue.wait_for_turn(running, timeout=1)
+
+    other = queue.submit(2, 'bob', 'look')
+    assert other['position'] == 0
+    assert queue.wait_for_turn(other['ticket'], timeout=0.1)
+
+
+def test_merge_appends_to_the_waiting_action():
+    queue = GameActionQueue()
+    running = queue.submit(1, 'alice', 'look')['ticket']
+    queue.wait_for_turn(running, timeout=1)
+    waiting = queue.submit(1, 'alice', 'open the gate', coalesce_mode='merge')
+
+    merged = queue.submit(1, 'alice', 'go through', coalesce_mode='merge')
+
+    assert merged['status'] == 'merged'
+    assert merged['ticket'] is waiting['ticket']
+    assert waiting['ticket'].action == 'open the gate; then go through'
+    assert waiting['ticket'].merged_count == 1
+    assert queue.depth(1) == 2
+    assert queue.stats(1)['merged'] == 1
+
+
+def test_merge_never_touches_the_running_action():
+    queue = GameActionQueue()
+    running = queue.submit(1, 'alice', 'look')['ticket']
+    queue.wait_for_turn(running, timeout=1)
+
+    submission = queue.submit(1, 'alice', 'open the gate', coalesce_mode='merge')
+
+    assert submission['status'] == 'queued'
+    assert running.action == 'look'
+
+
+def test_drop_keeps_the_waiting_action():
+    queue = GameActionQueue()
+    running = queue.submit(1, 'alice', 'look')['ticket']
+    queue.wait_for_turn(running, timeout=1)
+    waiting = queue.submit(1, 'alice', 'open the gate', coalesce_mode='drop')
+
+    dropped = queue.submit(1, 'alice', 'go through', coalesce_mode='drop')
+    other_player = queue.submit(1, 'bob', 'wave', coalesce_mode='drop')
+
+    assert (dropped['status'], dropped['ticket']) == ('dropped', None)
+    assert waiting['ticket'].action == 'open the gate'
+    assert other_player['status'] == 'queued'
+    assert queue.depth(1) == 3
+    assert queue.stats(1)['dropped'] == 1
+
+
+def test_wait_times_out_and_leaves_the_queue():
+    queue = GameActionQueue()
+    running = queue.submit(1, 'alice', 'look')['ticket']
+    queue.wait_for_turn(running, timeout=1)
+    waiting = queue.submit(1, 'bob', 'listen')['ticket']
+    behind = queue.submit(1, 'carol', 'wait')['ticket']
+
+    assert not queue.wait_for_turn(waiting, timeout=0.05)
+
+    assert queue.depth(1) == 2
+    assert queue.stats(1)['timed_out'] == 1
+    queue.finish(running)
+    assert queue.wait_for_turn(behind, timeout=1) # The timed-out ticket no longer blocks the queue
+    queue.finish(behind)
+    assert queue.depths() == {}
+
+
+def test_unknown_coalesce_mode_queues_separately():
+    queue = GameActionQueue()
+    queue.submit(1, 'alice', 'look')
+    queue.submit(1, 'alice', 'open the gate')
+
+    assert queue.submit(1, 'alice', 'go through', coalesce_mode='bogus')['status'] == 'queued'
+    assert queue.depth(1) == 3
+
+
+def test_stats_are_bounded_to_recent_idle_games():
+    queue = GameActionQueue(max_stats_games=2)
+    for game_id in (1, 2, 3):
+        ticket = queue.submit(game_id, 'alice', 'look')['ticket']
+        queue.wait_for_turn(ticket, timeout=1)
+        queue.finish(ticket)
+
+    assert set(queue.stats()) == {'2', '3'}
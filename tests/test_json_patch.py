@@ -0,0 +1,129 @@
+import copy
+import json
+import random
+
+import pytest
+
+from questforge.utils.json_patch import apply_patch, make_patch
+
+
+def canonical(value):
+    """JSON text of value; unlike ==, it tells 1, 1.0 and True apart."""
+    return json.dumps(value, sort_keys=True)
+
+
+def round_trip(old, new):
+    patch = make_patch(old, new)
+    original = canonical(old)
+    assert canonical(apply_patch(old, patch)) == canonical(new)
+    assert canonical(old) == original # apply_patch copies unless in_place=True
+    return patch
+
+
+STATE = {
+    'location': 'Gate',
+    'current_inventory': ['rope', 'torch'],
+    'npc_status': {'Warden': {'location': 'gate', 'mood': 'wary'}},
+    'historical_summary': [f"summary {n}" for n in range(5)],
+    'completed_plot_points': [],
+}
+
+
+@pytest.mark.parametrize('edit', [
+    lambda s: s['current_inventory'].append('key'),
+    lambda s: s.update(location='Lake'),
+    lambda s: s['npc_status']['Warden'].update(mood='friendly'),
+    lambda s: s['npc_status'].pop('Warden'),
+    lambda s: s['completed_plot_points'].append({'id': 'pp1', 'required': True}),
+    lambda s: s.update(historical_summary=s['historical_summary'][1:] + ['summary 5']), # Capped list
+    lambda s: s['current_inventory'].insert(1, 'lamp'),
+    lambda s: s['current_inventory'].remove('rope'),
+    lambda s: s.update(current_inventory='nothing'), # Type change
+    lambda s: s.update({'a/b': 1, 'c~d': {'e/f~g': [1]}}), # Keys that need JSON Pointer escaping
+])
+def test_state_edits_round_trip(edit):
+    new = copy.deepcopy(STATE)
+    edit(new)
+    round_trip(STATE, new)
+
+
+def test_appends_are_add_operations():
+    old = {'log': [{'type': 'player', 'content': 'hi'}]}
+    new = {'log': old['log'] + [{'type': 'ai', 'content': 'hello'}, {'type': 'player', 'content': 'bye'}]}
+
+    patch = round_trip(old, new)
+
+    assert [(op['op'], op['path']) for op in patch] == [('add', '/log/-'), ('add', '/log/-')]
+
+
+def test_front_trim_removes_from_the_front():
+    old = {'historical_summary': ['a', 'b', 'c', 'd']}
+    new = {'historical_summary': ['b', 'c', 'd', 'e']}
+
+    patch = round_trip(old, new)
+
+    assert {'op': 'remove', 'path': '/historical_summary/0'} in patch
+
+
+def test_equal_documents_give_an_empty_patch():
+    assert make_patch(copy.deepcopy(STATE), copy.deepcopy(STATE)) == []
+
+
+@pytest.mark.parametrize('old, new', [
+    ([1, 0], [True, False]),
+    ({'n': 1}, {'n': 1.0}),
+    ([[1]], [[True]]),
+    ({'a': [{'b': 0}]}, {'a': [{'b': False}]}),
+])
+def test_values_of_different_types_are_not_equal(old, new):
+    assert round_trip(old, new)
+
+
+def _random_value(rng, depth=0):
+    kind = rng.randrange(7 if depth < 3 else 4)
+    if kind == 0:
+        return rng.randrange(-3, 4)
+    if kind == 1:
+        return rng.choice([True, False, None])
+    if kind == 2:
+        return rng.choice(['a', 'b', 'x/y', 't~u', ''])
+    if kind == 3:
+        return rng.choice([0.5, 1.0, -2.25])
+    if kind in (4, 5):
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(5))]
+    return {rng.choice(['k', 'l', 'm/n', 'o~p', '']): _random_value(rng, depth + 1) for _ in range(rng.randrange(4))}
+
+
+def _mutate(rng, value, depth=0):
+    if isinstance(value, list) and value and rng.random() < 0.8:
+        value = list(value)
+        choice = rng.randrange(4)
+        if choice == 0:
+            value.append(_random_value(rng, depth + 1))
+        elif choice == 1:
+            del value[rng.randrange(len(value))]
+        elif choice == 2:
+            value.insert(rng.randrange(len(value) + 1), _random_value(rng, depth + 1))
+        else:
+            index = rng.randrange(len(value))
+            value[index] = _mutate(rng, value[index], depth + 1)
+        return value
+    if isinstance(value, dict) and value and rng.random() < 0.8:
+        value = dict(value)
+        key = rng.choice(list(value))
+        if rng.random() < 0.3:
+            del value[key]
+        else:
+            value[key] = _mutate(rng, value[key], depth + 1)
+        return value
+    return _random_value(rng, depth)
+
+
+def test_random_documents_round_trip():
+    rng = random.Random(1234)
+    for _ in range(500):
+        old = _random_value(rng)
+        new = old
+        for _ in range(rng.randrange(1, 4)):
+            new = _mutate(rng, new)
+        round_trip(old, new)
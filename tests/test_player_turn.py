@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+from questforge.extensions import db
+from questforge.models import ApiUsageLog, GameState
+from questforge.services.ai_service import ai_service
+from questforge.services.async_ai_service import async_ai_service
+from questforge.services.summary_service import summary_service
+
+
+def stub_ai(monkeypatch, completed_ids, usage=None):
+    """Replaces the LLM calls of a turn: Stage 1 narrates, Stage 3 reports completed_ids as completed."""
+    def get_response(**kwargs):
+        narrative = 'The warden steps aside and the gate swings open.'
+        if kwargs.get('stream_callback'):
+            kwargs['stream_callback'](narrative)
+        return {'narrative': narrative, 'state_changes': {'location': 'Gate'}, 'available_actions': ['Go through']}, 'gpt-4.1', usage
+
+    async def check_plot_points(plot_points, current_game_state_data, player_action, stage_one_narrative, game_id=None):
+        return [{'plot_point_id': pp['id'], 'completed': pp['id'] in completed_ids, 'confidence_score': 0.95}
+                for pp in plot_points]
+
+    monkeypatch.setattr(ai_service, 'get_response', get_response)
+    monkeypatch.setattr(async_ai_service, 'check_plot_points', check_plot_points)
+    monkeypatch.setattr(summary_service, 'schedule', lambda **kwargs: None)
+
+
+def play_turn(socket_client, game, action):
+    user_id = game.created_by
+    socket_client.emit('join_game', {'game_id': game.id, 'user_id': user_id})
+    socket_client.get_received()
+    socket_client.emit('player_action', {'game_id': game.id, 'user_id': user_id, 'action': action})
+    return {event['name']: event['args'][0] for event in socket_client.get_received()}
+
+
+def set_turns_since_progress(game, turns):
+    """Returns the GameState version after the update."""
+    game_state = GameState.query.filter_by(game_id=game.id).one()
+    game_state.state_data = dict(game_state.state_data, turns_since_plot_progress=turns)
+    db.session.commit()
+    return game_state.version
+
+
+def test_turn_completes_required_plot_point(monkeypatch, socket_client, game):
+    stub_ai(monkeypatch, completed_ids={'pp1'})
+    version = set_turns_since_progress(game, 2) # Stage 2 falls back to the first required plot point
+
+    events = play_turn(socket_client, game, 'I talk to the warden')
+
+    assert 'error' not in events
+    update = events['game_state_update']
+    assert update['newly_completed_plot_point_message'] is None # pp1 is the first required one, not displayed
+    db.session.expire_all()
+    game_state = GameState.query.filter_by(game_id=game.id).one()
+    assert [pp['id'] for pp in game_state.state_data['completed_plot_points']] == ['pp1']
+    assert game_state.state_data['turns_since_plot_progress'] == 0
+    assert game_state.version == version + 1
+    assert game_state.log_length == 2
+
+
+def test_turn_without_completion_keeps_progress_counter(monkeypatch, socket_client, game):
+    stub_ai(monkeypatch, completed_ids=set())
+    set_turns_since_progress(game, 2)
+
+    events = play_turn(socket_client, game, 'I talk to the warden')
+
+    assert 'error' not in events
+    assert 'game_state_update' in events
+    db.session.expire_all()
+    game_state = GameState.query.filter_by(game_id=game.id).one()
+    assert game_state.state_data['completed_plot_points'] == []
+    assert game_state.state_data['turns_since_plot_progress'] == 3
+
+
+def test_failed_turn_still_records_stage_one_usage(monkeypatch, socket_client, game):
+    from questforge.services.game_log_service import game_log_service
+
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120, prompt_tokens_details=None)
+    stub_ai(monkeypatch, completed_ids=set(), usage=usage)
+
+    def append_entries(*args, **kwargs):
+        raise RuntimeError('log write failed')
+    monkeypatch.setattr(game_log_service, 'append_entries', append_entries)
+
+    events = play_turn(socket_client, game, 'I talk to the warden')
+
+    assert events['error'] == {'message': 'Failed to process action'}
+    rows = ApiUsageLog.query.filter_by(game_id=game.id).all()
+    assert [(row.model_name, row.prompt_tokens, row.completion_tokens) for row in rows] == [('gpt-4.1', 100, 20)]
+
+
+def test_turn_writes_late_historical_summaries(monkeypatch, socket_client, game):
+    stub_ai(monkeypatch, completed_ids=set())
+    summary_service.requeue_late(game.id, ['The party reached the gate.']) # Finished after the turn's wait
+
+    events = play_turn(socket_client, game, 'I talk to the warden')
+
+    assert 'error' not in events
+    db.session.expire_all()
+    game_state = GameState.query.filter_by(game_id=game.id).one()
+    assert game_state.state_data['historical_summary'] == ['The party reached the gate.']
+    assert summary_service.take_late(game.id) == []
@@ -0,0 +1,62 @@
+from sqlalchemy.orm import attributes
+
+from questforge.models import Campaign
+from questforge.utils.plot_index import get_plot_point_index, plot_index_fingerprint
+
+
+def load_campaign(db_session, game):
+    db_session.expire_all()
+    return Campaign.query.filter_by(game_id=game.id).one()
+
+
+def test_replacing_plot_points_rebuilds_index_and_bumps_version(db_session, game):
+    campaign = load_campaign(db_session, game)
+    assert set(get_plot_point_index(campaign)['points']) == {'pp1', 'pp2'} # Cached at this version
+    version = campaign.version
+
+    campaign.major_plot_points = campaign.major_plot_points + [{'id': 'pp3', 'description': 'Light the beacon', 'required': False}]
+    db_session.commit()
+
+    campaign = load_campaign(db_session, game)
+    assert campaign.version == version + 1
+    assert campaign.plot_point_index['fingerprint'] == plot_index_fingerprint(
+        campaign.major_plot_points, campaign.key_locations, campaign.key_characters)
+    assert set(get_plot_point_index(campaign)['points']) == {'pp1', 'pp2', 'pp3'}
+
+
+def test_in_place_edit_flagged_modified_is_picked_up(db_session, game):
+    campaign = load_campaign(db_session, game)
+    old_fingerprint = get_plot_point_index(campaign)['fingerprint']
+    version = campaign.version
+
+    campaign.key_locations.append({'name': 'Beacon Tower'})
+    attributes.flag_modified(campaign, 'key_locations')
+    db_session.commit()
+
+    campaign = load_campaign(db_session, game)
+    assert campaign.version == version + 1
+    new_fingerprint = plot_index_fingerprint(campaign.major_plot_points, campaign.key_locations, campaign.key_characters)
+    assert new_fingerprint != old_fingerprint
+    assert campaign.plot_point_index['fingerprint'] == new_fingerprint
+    assert get_plot_point_index(campaign)['fingerprint'] == new_fingerprint
+
+
+def test_unrelated_edit_keeps_version(db_session, game):
+    campaign = load_campaign(db_session, game)
+    version = campaign.version
+
+    campaign.campaign_data = {'title': 'The Other Gate'}
+    db_session.commit()
+
+    assert load_campaign(db_session, game).version == version
+
+
+def test_caller_version_bump_is_not_doubled(db_session, game):
+    campaign = load_campaign(db_session, game)
+    version = campaign.version
+
+    campaign.key_characters = [{'name': 'Warden'}, {'name': 'Ferryman'}]
+    campaign.version = version + 1 # As update_campaign does
+    db_session.commit()
+
+    assert load_campaign(db_session, game).version == version + 1
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+from questforge.extensions import db
+from questforge.models import GameState
+from questforge.services.async_ai_service import async_ai_service
+from questforge.services.summary_service import HistoricalSummaryService
+from questforge.utils.metrics import historical_summaries
+
+
+def stub_summaries(monkeypatch, release=None):
+    """generate_historical_summary returns 'Summary of <action>', after release is set if given."""
+    async def generate_historical_summary(player_action, stage_one_narrative, state_changes, game_id=None):
+        if release is not None:
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+        return f"Summary of {player_action}"
+    monkeypatch.setattr(async_ai_service, 'generate_historical_summary', generate_historical_summary)
+
+
+def stored_summaries(game):
+    db.session.expire_all()
+    return GameState.query.filter_by(game_id=game.id).one().state_data.get('historical_summary')
+
+
+def test_summary_is_persisted(monkeypatch, game):
+    stub_summaries(monkeypatch)
+    service = HistoricalSummaryService()
+
+    service.schedule(game.id, 'open the gate', 'It opens.', {}).result(5)
+
+    assert stored_summaries(game) == ['Summary of open the gate']
+
+
+def test_late_summary_is_kept_for_the_next_write(monkeypatch, game):
+    release = threading.Event()
+    stub_summaries(monkeypatch, release)
+    service = HistoricalSummaryService()
+    late_before = historical_summaries.value(outcome='late')
+
+    future = service.schedule(game.id, 'open the gate', 'It opens.', {})
+    service.wait_for_pending(game.id, timeout=0.05) # The next turn stops waiting
+    release.set()
+    assert future.result(5) is None
+
+    assert stored_summaries(game) == [] # Not written underneath the next turn
+    assert historical_summaries.value(outcome='late') == late_before + 1
+
+    # The next summary write appends it first
+    service.schedule(game.id, 'cross the lake', 'You cross.', {}).result(5)
+    assert stored_summaries(game) == ['Summary of open the gate', 'Summary of cross the lake']
+    assert service.take_late(game.id) == []
+
+
+def test_requeued_late_summaries_keep_their_order(game):
+    service = HistoricalSummaryService()
+    service.requeue_late(game.id, ['second'])
+    service.requeue_late(game.id, ['first'])
+
+    assert service.take_late(game.id) == ['first', 'second']
+    assert service.take_late(game.id) == []
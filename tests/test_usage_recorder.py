@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+import pytest
+
+from questforge.models import ApiUsageLog, Game
+from questforge.services.ai_service import log_api_usage
+from questforge.services.usage_recorder import UsageRecorder, usage_recorder as shared_recorder
+
+
+@pytest.fixture
+def recorder(app, db_session):
+    """A buffering recorder whose flusher never fires on its own during a test."""
+    recorder = UsageRecorder()
+    recorder.init_app(app)
+    recorder.flush_interval = 3600.0
+    recorder.max_rows = 1000
+    yield recorder
+    recorder.shutdown()
+
+
+def record(recorder, game_id, cost='0.5'):
+    recorder.record('gpt-4.1', prompt_tokens=10, completion_tokens=5, total_tokens=15,
+                    cost=Decimal(cost), game_id=game_id)
+
+
+def total_cost(db_session, game_id):
+    db_session.expire_all()
+    return db_session.get(Game, game_id).total_cost
+
+
+def test_record_buffers_without_writing(recorder, db_session, game):
+    record(recorder, game.id)
+
+    assert recorder.pending() == 1
+    assert ApiUsageLog.query.count() == 0
+
+
+def test_take_returns_only_that_games_rows_and_requeue_puts_them_first(recorder, game):
+    record(recorder, game.id, '0.1')
+    record(recorder, 999, '0.2')
+    record(recorder, str(game.id), '0.3') # Game ids are matched as strings
+
+    taken = recorder.take(game.id)
+
+    assert [row['cost'] for row in taken] == [Decimal('0.1'), Decimal('0.3')]
+    assert recorder.pending() == 1
+    assert recorder.take(game.id) == []
+
+    recorder.requeue(taken)
+    assert [row['cost'] for row in recorder.take(game.id)] == [Decimal('0.1'), Decimal('0.3')]
+
+
+def test_flush_writes_rows_and_cost_rollup(recorder, db_session, game):
+    record(recorder, game.id, '0.25')
+    record(recorder, game.id, '0.5')
+
+    assert recorder.flush() == 2
+
+    assert recorder.pending() == 0
+    assert ApiUsageLog.query.filter_by(game_id=game.id).count() == 2
+    assert total_cost(db_session, game.id) == Decimal('0.75')
+
+
+def test_flush_falls_back_to_single_rows_and_drops_rows_that_keep_failing(recorder, db_session, game, caplog):
+    recorder.max_attempts = 2
+    record(recorder, game.id, '0.25')
+    record(recorder, None) # api_usage_logs.game_id is NOT NULL: this row can never be written
+    record(recorder, game.id, '0.5')
+
+    assert recorder.flush() == 2 # The bulk insert fails; the good rows are written one by one
+
+    assert ApiUsageLog.query.filter_by(game_id=game.id).count() == 2
+    assert total_cost(db_session, game.id) == Decimal('0.75')
+    assert recorder.pending() == 1 # Retried on the next flush
+
+    assert recorder.flush() == 0
+    assert recorder.pending() == 0 # Failed max_attempts flushes: dropped and logged in full
+    assert 'Dropped 1 API usage rows' in caplog.text
+
+
+def test_buffer_is_capped(recorder, game, caplog):
+    recorder.max_buffered = 2
+    for cost in ('0.1', '0.2', '0.3'):
+        record(recorder, game.id, cost)
+
+    assert [row['cost'] for row in recorder.take(game.id)] == [Decimal('0.2'), Decimal('0.3')]
+    assert 'Dropped 1 API usage rows' in caplog.text
+
+
+def test_rows_taken_by_a_rolled_back_transaction_are_written_later(recorder, db_session, game):
+    record(recorder, game.id, '0.5')
+    rows = recorder.take(game.id)
+    recorder.add_to_session(rows)
+    db_session.rollback()
+    recorder.requeue(rows)
+
+    assert recorder.flush() == 1
+    assert total_cost(db_session, game.id) == Decimal('0.5')
+
+
+def test_log_api_usage_buffers_unless_in_transaction(monkeypatch, recorder, db_session, game):
+    monkeypatch.setattr(shared_recorder, 'record', recorder.record)
+
+    log_api_usage('gpt-4.1', 10, 5, 15, Decimal('0.5'), game_id=game.id)
+    assert recorder.pending() == 1
+    assert ApiUsageLog.query.count() == 0
+
+    log_api_usage('gpt-4.1', 10, 5, 15, Decimal('0.25'), game_id=game.id, in_transaction=True)
+    assert recorder.pending() == 1
+    db_session.commit()
+    assert ApiUsageLog.query.filter_by(game_id=game.id).count() == 1
+    assert total_cost(db_session, game.id) == Decimal('0.25')